@@ -6,7 +6,9 @@ import os
 import uuid
 import base64
 from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
 from openai import OpenAI
 
 from utils.database import (
@@ -15,6 +17,11 @@ from utils.database import (
 )
 from utils.auth import get_current_user
 from utils.models import AIMessage, SetupAnalysis
+from utils.patterns import setup_patterns
+from utils.events import emit
+from utils.briefings import briefing_service
+from utils.streaks import streak_tracker
+from utils.screenshots import screenshot_processor
 
 router = APIRouter(prefix="/api/ai", tags=["AI"])
 
@@ -38,6 +45,14 @@ TEXT_MODEL = "gpt-4o-mini"
 async def analyze_setup(data: SetupAnalysis, user: dict = Depends(get_current_user)):
     """Analyze a trading setup screenshot with AI"""
     user_data = users_collection.find_one({"_id": user["id"]})
+    # Structures detected from market data: with them, a screenshot is optional
+    patterns = await run_in_threadpool(setup_patterns, data.symbol, data.timeframe)
+    if not data.screenshot_base64 and not patterns:
+        raise HTTPException(400, "Ajoutez un screenshot (aucune donnée de marché pour ce symbole)")
+    detected = f"""
+Structures détectées sur les données de marché (bougies clôturées):
+{patterns}
+""" if patterns else ""
     
     context = f"""Tu es un expert en analyse technique de trading. Analyse ce setup de trading.
     
@@ -49,8 +64,8 @@ Informations sur le trader:
 Symbole: {data.symbol or 'Non spécifié'}
 Timeframe: {data.timeframe or 'Non spécifié'}
 Notes du trader: {data.notes or 'Aucune'}
-
-Analyse le screenshot et fournis:
+{detected}
+Analyse {'le screenshot' if data.screenshot_base64 else 'ces structures'} et fournis:
 1. Identification du setup (BOS, FVG, support/résistance, etc.)
 2. Points d'entrée potentiels
 3. Placement du stop loss optimal
@@ -61,24 +76,33 @@ Analyse le screenshot et fournis:
 
 Réponds en français de manière concise et actionnable."""
 
+    screenshot = None
+    if data.screenshot_base64:
+        try:
+            # Cropped and downscaled to the model's resolution, off the event loop
+            screenshot = await screenshot_processor.prepare(data.screenshot_base64)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
     try:
         client = get_openai_client()
-        # Prepare image for OpenAI Vision API
-        image_data = data.screenshot_base64
-        if not image_data.startswith("data:"):
-            image_data = f"data:image/png;base64,{image_data}"
+        if screenshot:
+            image_data = f"data:{screenshot['media_type']};base64,{screenshot['data']}"
+            model = VISION_MODEL
+            content = [
+                {"type": "text", "text": "Analyse ce setup de trading en détail."},
+                {"type": "image_url", "image_url": {"url": image_data}}
+            ]
+        else:
+            # Detected structures only: no vision call needed
+            model = TEXT_MODEL
+            content = "Analyse ce setup de trading en détail."
         
         response = client.chat.completions.create(
-            model=VISION_MODEL,
+            model=model,
             messages=[
                 {"role": "system", "content": context},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Analyse ce setup de trading en détail."},
-                        {"type": "image_url", "image_url": {"url": image_data}}
-                    ]
-                }
+                {"role": "user", "content": content}
             ],
             max_tokens=1500
         )
@@ -93,9 +117,11 @@ Réponds en français de manière concise et actionnable."""
             "symbol": data.symbol,
             "timeframe": data.timeframe,
             "notes": data.notes,
+            "detected_patterns": patterns,
             "ai_analysis": analysis,
             "created_at": datetime.now(timezone.utc)
         })
+        emit(user["id"], "setup_analyzed")
         
         return {"analysis": analysis}
     except Exception as e:
@@ -141,58 +167,34 @@ Réponds en français."""
             "response": coaching_response,
             "created_at": datetime.now(timezone.utc)
         })
+        emit(user["id"], "coaching_received")
         
         return {"response": coaching_response}
     except Exception as e:
         raise HTTPException(500, f"Erreur coaching: {str(e)}")
 
+def generate_briefing(context: str) -> str:
+    """Model call of a daily briefing (on demand and in the overnight batches)"""
+    response = get_openai_client().chat.completions.create(
+        model=TEXT_MODEL,
+        messages=[
+            {"role": "system", "content": context},
+            {"role": "user", "content": "Génère mon briefing du jour"}
+        ],
+        max_tokens=800
+    )
+    return response.choices[0].message.content
+
 @router.get("/daily-briefing")
 async def get_daily_briefing(user: dict = Depends(get_current_user)):
-    """Get personalized daily trading briefing"""
-    user_data = users_collection.find_one({"_id": user["id"]})
-    
-    # Get recent performance
-    from utils.database import trades_collection
-    recent_trades = list(trades_collection.find(
-        {"user_id": user["id"], "status": "closed"}
-    ).sort("created_at", -1).limit(10))
-    
-    recent_pnl = sum(t.get("pnl", 0) for t in recent_trades)
-    recent_winrate = len([t for t in recent_trades if t.get("pnl", 0) > 0]) / len(recent_trades) * 100 if recent_trades else 0
-    
-    context = f"""Tu es un coach de trading personnel. Génère un briefing quotidien pour:
-
-Trader: {user_data.get('name', 'Trader')}
-Style: {user_data.get('trading_style', 'day trading')}
-Niveau: {user_data.get('experience_level', 'intermédiaire')}
-Marchés: {', '.join(user_data.get('preferred_markets', ['forex']))}
-
-Performance récente (10 derniers trades):
-- PnL: {recent_pnl:.2f}€
-- Winrate: {recent_winrate:.1f}%
-
-Le briefing doit inclure:
-1. Rappel du plan de trading
-2. Points de vigilance du jour
-3. Motivation personnalisée
-4. Conseil du jour
-
-Sois concis, pratique et motivant. Réponds en français."""
-
+    """Get personalized daily trading briefing (pre-generated before the local open)"""
     try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model=TEXT_MODEL,
-            messages=[
-                {"role": "system", "content": context},
-                {"role": "user", "content": "Génère mon briefing du jour"}
-            ],
-            max_tokens=800
-        )
-        
-        return {"briefing": response.choices[0].message.content}
+        briefing = briefing_service.cached(user["id"]) or await briefing_service.for_user(user["id"], generate_briefing)
     except Exception as e:
         raise HTTPException(500, f"Erreur briefing: {str(e)}")
+    
+    emit(user["id"], "briefing_viewed", morning=datetime.now(ZoneInfo(streak_tracker.zone(user["id"]))).hour < 10)
+    return {"briefing": briefing}
 
 @router.get("/economic-analysis/{event_id}")
 async def analyze_economic_event(event_id: str, user: dict = Depends(get_current_user)):
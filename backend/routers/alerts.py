@@ -0,0 +1,107 @@
+"""
+Price Alerts Router - threshold, cross and percent-move alerts on live prices
+"""
+import uuid
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends
+
+from utils.database import alerts_collection, user_alerts_collection
+from utils.auth import get_current_user
+from utils.models import AlertCreate
+from utils.alerts import ALERT_TYPES, Alert, alert_service
+from utils.bar_store import normalize_symbol
+
+router = APIRouter(prefix="/api/alerts", tags=["Price Alerts"])
+
+MAX_ALERTS_PER_USER = 200
+
+def _alert(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "symbol": doc["symbol"],
+        "type": doc["type"],
+        "price": doc.get("price"),
+        "percent": doc.get("percent"),
+        "repeat": doc.get("repeat", False),
+        "cooldown_minutes": doc.get("cooldown_minutes", 60),
+        "note": doc.get("note"),
+        "active": doc.get("active", True),
+        "trigger_count": doc.get("trigger_count", 0),
+        "last_triggered_at": doc["last_triggered_at"].isoformat() if isinstance(doc.get("last_triggered_at"), datetime) else doc.get("last_triggered_at"),
+        "created_at": doc["created_at"].isoformat() if isinstance(doc["created_at"], datetime) else doc["created_at"]
+    }
+
+@router.get("")
+async def get_alerts(user: dict = Depends(get_current_user)):
+    """Get the user's price alerts"""
+    alerts = user_alerts_collection.find({"user_id": user["id"]}).sort("created_at", -1)
+    return {"alerts": [_alert(a) for a in alerts]}
+
+@router.post("")
+async def create_alert(data: AlertCreate, user: dict = Depends(get_current_user)):
+    """Create a price alert"""
+    if data.type not in ALERT_TYPES:
+        raise HTTPException(400, f"Type d'alerte invalide ({', '.join(ALERT_TYPES)})")
+    if data.type == "percent":
+        if not data.percent or data.percent <= 0:
+            raise HTTPException(400, "Pourcentage requis pour une alerte de variation")
+    elif data.price is None or data.price <= 0:
+        raise HTTPException(400, "Prix requis pour cette alerte")
+    try:
+        symbol = normalize_symbol(data.symbol)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    # Dedup: the same active alert twice would only double the notifications
+    fields = {
+        "user_id": user["id"], "symbol": symbol, "type": data.type,
+        "price": data.price if data.type != "percent" else None,
+        "percent": data.percent if data.type == "percent" else None
+    }
+    if user_alerts_collection.find_one({**fields, "active": True}):
+        raise HTTPException(409, "Cette alerte existe déjà")
+    if user_alerts_collection.count_documents({"user_id": user["id"], "active": True}) >= MAX_ALERTS_PER_USER:
+        raise HTTPException(400, f"Limite de {MAX_ALERTS_PER_USER} alertes actives atteinte")
+
+    alert = {
+        "_id": str(uuid.uuid4()),
+        **fields,
+        "repeat": data.repeat,
+        "cooldown_minutes": data.cooldown_minutes,
+        "note": data.note,
+        "reference": alert_service.engine.last_price.get(symbol) if data.type == "percent" else None,
+        "active": True,
+        "trigger_count": 0,
+        "created_at": datetime.now(timezone.utc)
+    }
+    user_alerts_collection.insert_one(alert)
+    alert_service.engine.add(Alert.from_doc(alert))
+    return _alert(alert)
+
+@router.delete("/{alert_id}")
+async def delete_alert(alert_id: str, user: dict = Depends(get_current_user)):
+    """Delete a price alert"""
+    result = user_alerts_collection.delete_one({"_id": alert_id, "user_id": user["id"]})
+    if result.deleted_count == 0:
+        raise HTTPException(404, "Alerte non trouvée")
+    alert_service.engine.remove(alert_id)
+    return {"message": "Alerte supprimée"}
+
+@router.get("/history")
+async def get_alert_history(limit: int = 50, user: dict = Depends(get_current_user)):
+    """Triggered alerts, most recent first"""
+    events = alerts_collection.find({"user_id": user["id"]}).sort("triggered_at", -1).limit(min(limit, 500))
+    return {
+        "history": [
+            {
+                "alert_id": e["alert_id"],
+                "symbol": e["symbol"],
+                "type": e["type"],
+                "level": e.get("level"),
+                "percent": e.get("percent"),
+                "price": e["price"],
+                "triggered_at": e["triggered_at"].isoformat() if isinstance(e["triggered_at"], datetime) else e["triggered_at"]
+            }
+            for e in events
+        ]
+    }
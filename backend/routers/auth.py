@@ -7,7 +7,8 @@ from fastapi import APIRouter, HTTPException, Depends
 
 from utils.database import users_collection, hash_password, verify_password
 from utils.auth import create_access_token, get_current_user
-from utils.models import UserRegister, UserLogin, QuestionnaireData
+from utils.models import UserRegister, UserLogin, QuestionnaireData, TimezoneUpdate
+from utils.pnl_rollup import get_zone, invalidate_rollup
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -83,6 +84,7 @@ async def get_me(user: dict = Depends(get_current_user)):
         "experience_level": user_data.get("experience_level"),
         "preferred_markets": user_data.get("preferred_markets", []),
         "trading_goals": user_data.get("trading_goals", []),
+        "timezone": user_data.get("timezone", "UTC"),
         "created_at": user_data.get("created_at")
     }
 
@@ -103,3 +105,14 @@ async def save_questionnaire(data: QuestionnaireData, user: dict = Depends(get_c
         }}
     )
     return {"message": "Questionnaire enregistré"}
+
+@router.put("/timezone")
+async def update_timezone(data: TimezoneUpdate, user: dict = Depends(get_current_user)):
+    """Set the user's timezone (used for daily P&L and streak boundaries)"""
+    get_zone(data.timezone)
+    users_collection.update_one(
+        {"_id": user["id"]},
+        {"$set": {"timezone": data.timezone, "updated_at": datetime.now(timezone.utc)}}
+    )
+    invalidate_rollup(user["id"])
+    return {"message": "Fuseau horaire enregistré", "timezone": data.timezone}
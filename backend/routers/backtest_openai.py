@@ -5,12 +5,17 @@ Compatible with standard OpenAI SDK for external deployment
 import os
 import uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket
+from starlette.concurrency import run_in_threadpool
 from openai import OpenAI
 
 from utils.database import users_collection, backtests_collection
 from utils.auth import get_current_user
-from utils.models import BacktestCreate, BacktestTrade
+from utils.models import BacktestCreate, BacktestTrade, RulesValidate, PortfolioBacktestCreate
+from utils.portfolio import create_portfolio_backtest
+from utils.replay import serve_replay
+from utils.events import emit
+from utils.rules import compile_rules, backtest_signals
 
 router = APIRouter(prefix="/api/backtest", tags=["Backtesting"])
 
@@ -117,6 +122,33 @@ Réponds en français de manière professionnelle et détaillée."""
     except Exception as e:
         raise HTTPException(500, f"Erreur d'analyse: {str(e)}")
 
+@router.post("/rules/validate")
+async def validate_rules(data: RulesValidate, user: dict = Depends(get_current_user)):
+    """Check which rules the backtest engine can evaluate (the others stay AI-only)"""
+    plan = compile_rules(data.rules)
+    return {
+        "rules": plan.rules,
+        "supported": sum(1 for rule in plan.rules if rule["supported"])
+    }
+
+@router.post("/{backtest_id}/signals")
+async def get_backtest_signals(backtest_id: str, user: dict = Depends(get_current_user)):
+    """Evaluate the backtest's entry/exit rules on market data (bar open times, epoch seconds)"""
+    backtest = backtests_collection.find_one({"_id": backtest_id, "user_id": user["id"]})
+    if not backtest:
+        raise HTTPException(404, "Backtest non trouvé")
+    return await run_in_threadpool(backtest_signals, backtest)
+
+@router.post("/portfolio")
+async def create_portfolio_backtest_route(data: PortfolioBacktestCreate, user: dict = Depends(get_current_user)):
+    """Run one strategy over a basket of symbols with shared capital and position limits"""
+    return await run_in_threadpool(create_portfolio_backtest, data, user["id"])
+
+@router.websocket("/{backtest_id}/replay")
+async def replay_backtest(websocket: WebSocket, backtest_id: str, token: str = Query(None), start: str = Query(None)):
+    """Replay the backtest's market data bar by bar and trade it; closed trades are added to the backtest"""
+    await serve_replay(websocket, backtest_id, token, start)
+
 @router.get("")
 async def get_backtests(user: dict = Depends(get_current_user)):
     """Get all backtests for the current user"""
@@ -309,6 +341,8 @@ Réponds en français."""
             "updated_at": datetime.now(timezone.utc)
         }}
     )
+    if backtest.get("status") != "completed":
+        emit(user["id"], "backtest_completed")
     
     return results
 
@@ -11,6 +11,7 @@ from utils.database import (
 )
 from utils.auth import get_current_user, get_optional_user
 from utils.models import CommunityPostCreate, CommunityComment
+from utils.events import emit
 
 router = APIRouter(prefix="/api/community", tags=["Community"])
 
@@ -105,6 +106,7 @@ async def create_post(data: CommunityPostCreate, user: dict = Depends(get_curren
         "updated_at": datetime.now(timezone.utc)
     }
     community_posts_collection.insert_one(post)
+    emit(user["id"], "post_created")
     
     return {"id": post_id, "message": "Post créé avec succès"}
 
@@ -174,6 +176,8 @@ async def toggle_like(post_id: str, user: dict = Depends(get_current_user)):
             "user_id": user["id"],
             "created_at": datetime.now(timezone.utc)
         })
+        if post["user_id"] != user["id"]:
+            emit(post["user_id"], "post_liked")
         return {"liked": True, "message": "Post liké"}
 
 @router.post("/posts/{post_id}/comments")
@@ -191,6 +195,7 @@ async def add_comment(post_id: str, data: CommunityComment, user: dict = Depends
         "content": data.content,
         "created_at": datetime.now(timezone.utc)
     })
+    emit(user["id"], "comment_created", own_post=post["user_id"] == user["id"])
     
     return {"id": comment_id, "message": "Commentaire ajouté"}
 
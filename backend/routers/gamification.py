@@ -1,8 +1,9 @@
 """
 Gamification Router - Challenges, Leaderboard, Achievements, Rewards, Seasons
 """
+import time
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException, Depends
 
 from utils.database import (
@@ -10,10 +11,16 @@ from utils.database import (
     challenges_collection, user_challenges_collection,
     achievements_collection, user_achievements_collection,
     streaks_collection, notifications_collection,
-    seasons_collection, rewards_collection, user_rewards_collection
+    seasons_collection, rewards_collection, user_rewards_collection,
+    xp_transactions_collection, season_standings_collection
 )
 from utils.auth import get_current_user
 from utils.models import ChallengeJoin
+from utils.challenges import window_key
+from utils.events import emit
+from utils.xp import xp_service
+from utils.leaderboard import leaderboard_service, period_key
+from utils.streaks import effective_streak, local_date, month_days, streak_tracker
 
 router = APIRouter(prefix="/api/gamification", tags=["Gamification"])
 
@@ -23,13 +30,16 @@ router = APIRouter(prefix="/api/gamification", tags=["Gamification"])
 async def get_challenges(user: dict = Depends(get_current_user)):
     """Get available challenges"""
     challenges = list(challenges_collection.find({"active": True}))
+    joined = {uc["challenge_id"]: uc for uc in user_challenges_collection.find({"user_id": user["id"]})}
+    now = datetime.now(timezone.utc).timestamp()
+    tz = streak_tracker.zone(user["id"])
     
     result = []
     for ch in challenges:
-        user_challenge = user_challenges_collection.find_one({
-            "user_id": user["id"],
-            "challenge_id": ch["_id"]
-        })
+        user_challenge = joined.get(ch["_id"])
+        # Progress of a past daily / weekly / monthly window no longer counts
+        if user_challenge and user_challenge.get("window") not in (None, window_key(ch["type"], now, tz)):
+            user_challenge = {**user_challenge, "progress": 0, "completed": False}
         
         result.append({
             "id": str(ch["_id"]),
@@ -61,14 +71,19 @@ async def join_challenge(data: ChallengeJoin, user: dict = Depends(get_current_u
     if existing:
         raise HTTPException(400, "Déjà inscrit à ce challenge")
     
-    user_challenges_collection.insert_one({
+    participation = {
         "_id": str(uuid.uuid4()),
         "user_id": user["id"],
         "challenge_id": data.challenge_id,
         "progress": 0,
         "completed": False,
         "joined_at": datetime.now(timezone.utc)
-    })
+    }
+    user_challenges_collection.insert_one(participation)
+    if not emit(user["id"], "challenge_joined", challenge_id=data.challenge_id):
+        # progress would never be counted: let the user join again
+        user_challenges_collection.delete_one({"_id": participation["_id"]})
+        raise HTTPException(503, "Inscription impossible pour le moment, réessayez")
     
     return {"message": "Inscrit au challenge avec succès"}
 
@@ -76,50 +91,8 @@ async def join_challenge(data: ChallengeJoin, user: dict = Depends(get_current_u
 
 @router.get("/leaderboard")
 async def get_leaderboard(period: str = "weekly"):
-    """Get leaderboard"""
-    # Calculate date range
-    now = datetime.now(timezone.utc)
-    if period == "daily":
-        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == "weekly":
-        start_date = now - timedelta(days=now.weekday())
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == "monthly":
-        start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:  # all-time
-        start_date = datetime(2020, 1, 1, tzinfo=timezone.utc)
-    
-    # Aggregate user performance
-    pipeline = [
-        {"$match": {"status": "closed", "created_at": {"$gte": start_date}}},
-        {"$group": {
-            "_id": "$user_id",
-            "total_pnl": {"$sum": {"$ifNull": ["$pnl", 0]}},
-            "trades_count": {"$sum": 1},
-            "wins": {"$sum": {"$cond": [{"$gt": [{"$ifNull": ["$pnl", 0]}, 0]}, 1, 0]}}
-        }},
-        {"$sort": {"total_pnl": -1}},
-        {"$limit": 50}
-    ]
-    
-    results = list(trades_collection.aggregate(pipeline))
-    
-    leaderboard = []
-    for i, entry in enumerate(results):
-        user = users_collection.find_one({"_id": entry["_id"]})
-        if user:
-            winrate = round(entry["wins"] / entry["trades_count"] * 100, 1) if entry["trades_count"] > 0 else 0
-            leaderboard.append({
-                "rank": i + 1,
-                "user_id": entry["_id"],
-                "name": user.get("name", "Anonyme"),
-                "level": user.get("level", 1),
-                "total_pnl": round(entry["total_pnl"], 2),
-                "trades_count": entry["trades_count"],
-                "winrate": winrate
-            })
-    
-    return {"leaderboard": leaderboard, "period": period}
+    """Get leaderboard (daily, weekly, monthly or all-time)"""
+    return {"leaderboard": leaderboard_service.get(period_key(period)), "period": period}
 
 # ============== ACHIEVEMENTS ==============
 
@@ -159,12 +132,27 @@ async def get_streaks(user: dict = Depends(get_current_user)):
             "last_activity": None
         }
     
+    today = local_date(time.time(), streak_tracker.zone(user["id"]))
     return {
-        "current_streak": streak.get("current_streak", 0),
+        "current_streak": effective_streak(streak, today),
         "longest_streak": streak.get("longest_streak", 0),
         "last_activity": streak.get("last_activity")
     }
 
+@router.get("/streaks/calendar")
+async def get_streak_calendar(months: int = 3, user: dict = Depends(get_current_user)):
+    """Active days of the last months, from the per-month bitmaps"""
+    streak = streaks_collection.find_one({"user_id": user["id"]}, {"months": 1}) or {}
+    today = local_date(time.time(), streak_tracker.zone(user["id"]))
+    year, month = today.year, today.month
+    calendar = []
+    for _ in range(max(1, min(months, 24))):
+        key = f"{year}-{month:02d}"
+        bitmap = streak.get("months", {}).get(key, 0)
+        calendar.append({"month": key, "bitmap": bitmap, "days": month_days(bitmap)})
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return {"calendar": calendar}
+
 # ============== NOTIFICATIONS ==============
 
 @router.get("/notifications")
@@ -227,6 +215,35 @@ async def get_current_season():
         }
     }
 
+@router.get("/seasons")
+async def get_past_seasons():
+    """Closed seasons with their podium"""
+    seasons = seasons_collection.find({"status": "closed"}, {
+        "name": 1, "start_date": 1, "end_date": 1, "participants": 1, "final_leaderboard": {"$slice": 3}
+    }).sort("start_date", -1)
+    return {"seasons": [{
+        "id": str(season["_id"]),
+        "name": season["name"],
+        "start_date": season["start_date"],
+        "end_date": season["end_date"],
+        "participants": season.get("participants", 0),
+        "podium": season.get("final_leaderboard", [])
+    } for season in seasons]}
+
+@router.get("/seasons/{season_id}/standings")
+async def get_season_standings(season_id: str, offset: int = 0, limit: int = 50, user: dict = Depends(get_current_user)):
+    """Archived final standings of a closed season"""
+    season = seasons_collection.find_one({"_id": season_id}, {"name": 1, "status": 1})
+    if not season:
+        raise HTTPException(404, "Saison non trouvée")
+    if season.get("status") != "closed":
+        raise HTTPException(400, "Saison non clôturée")
+    
+    standings = season_standings_collection.find({"season_id": season_id}, {"_id": 0, "season_id": 0}) \
+        .sort("rank", 1).skip(max(offset, 0)).limit(min(limit, 200))
+    me = season_standings_collection.find_one({"season_id": season_id, "user_id": user["id"]}, {"_id": 0, "season_id": 0})
+    return {"season": {"id": season_id, "name": season["name"]}, "standings": list(standings), "me": me}
+
 # ============== REWARDS ==============
 
 @router.get("/rewards")
@@ -283,11 +300,7 @@ async def claim_reward(reward_id: str, user: dict = Depends(get_current_user)):
 async def get_gamification_profile(user: dict = Depends(get_current_user)):
     """Get user gamification profile (alias for progress)"""
     user_data = users_collection.find_one({"_id": user["id"]})
-    
-    current_level = user_data.get("level", 1)
-    current_xp = user_data.get("xp", 0)
-    xp_for_next = current_level * 1000
-    xp_progress = (current_xp % 1000) / 10
+    progress = xp_service.curve.progress(user_data.get("xp", 0))
     
     achievements_count = user_achievements_collection.count_documents({"user_id": user["id"]})
     active_challenges = user_challenges_collection.count_documents({
@@ -295,15 +308,16 @@ async def get_gamification_profile(user: dict = Depends(get_current_user)):
         "completed": False
     })
     streak = streaks_collection.find_one({"user_id": user["id"]})
+    current_streak = effective_streak(streak, local_date(time.time(), streak_tracker.zone(user["id"])))
     
     return {
-        "level": current_level,
-        "xp": current_xp,
-        "xp_for_next_level": xp_for_next,
-        "xp_progress_percent": round(xp_progress, 1),
+        "level": progress["level"],
+        "xp": user_data.get("xp", 0),
+        "xp_for_next_level": progress["xp_for_next_level"],
+        "xp_progress_percent": progress["xp_progress_percent"],
         "achievements_unlocked": achievements_count,
         "active_challenges": active_challenges,
-        "current_streak": streak.get("current_streak", 0) if streak else 0,
+        "current_streak": current_streak,
         "name": user_data.get("name", "Trader"),
         "title": user_data.get("title", "Apprenti Trader")
     }
@@ -313,11 +327,8 @@ async def get_user_progress(user: dict = Depends(get_current_user)):
     """Get comprehensive user progress"""
     user_data = users_collection.find_one({"_id": user["id"]})
     
-    # Calculate XP for next level
-    current_level = user_data.get("level", 1)
-    current_xp = user_data.get("xp", 0)
-    xp_for_next = current_level * 1000  # Simple formula
-    xp_progress = (current_xp % 1000) / 10  # Percentage to next level
+    # Level and progress from the level curve
+    progress = xp_service.curve.progress(user_data.get("xp", 0))
     
     # Count achievements
     achievements_count = user_achievements_collection.count_documents({"user_id": user["id"]})
@@ -330,17 +341,30 @@ async def get_user_progress(user: dict = Depends(get_current_user)):
     
     # Get streak
     streak = streaks_collection.find_one({"user_id": user["id"]})
+    current_streak = effective_streak(streak, local_date(time.time(), streak_tracker.zone(user["id"])))
     
     return {
-        "level": current_level,
-        "xp": current_xp,
-        "xp_for_next_level": xp_for_next,
-        "xp_progress_percent": round(xp_progress, 1),
+        "level": progress["level"],
+        "xp": user_data.get("xp", 0),
+        "xp_for_next_level": progress["xp_for_next_level"],
+        "xp_progress_percent": progress["xp_progress_percent"],
         "achievements_unlocked": achievements_count,
         "active_challenges": active_challenges,
-        "current_streak": streak.get("current_streak", 0) if streak else 0
+        "current_streak": current_streak
     }
 
+@router.get("/xp/history")
+async def get_xp_history(limit: int = 50, user: dict = Depends(get_current_user)):
+    """Latest XP ledger entries"""
+    entries = xp_transactions_collection.find({"user_id": user["id"]}).sort("created_at", -1).limit(min(limit, 500))
+    return {"transactions": [{
+        "id": e["_id"],
+        "amount": e["amount"],
+        "source": e["source"],
+        "events": e.get("events"),
+        "created_at": e["created_at"].isoformat()
+    } for e in entries]}
+
 @router.get("/hall-of-fame")
 async def get_hall_of_fame():
     """Get top performers of all time"""
@@ -0,0 +1,216 @@
+"""
+Market Data Router - OHLCV bars from the local bar store
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query
+from starlette.concurrency import run_in_threadpool
+
+from utils.auth import get_current_user
+from utils.database import watchlists_collection, user_watchlists_collection
+from utils.models import WatchlistCreate
+from utils.bar_store import bar_store, normalize_symbol, normalize_timeframe, to_epoch
+from utils.resample import read_bars, tier_info
+from utils.indicators import indicator_cache, parse_params
+from utils.patterns import pattern_scanner, DEFAULT_LOOKBACK, MAX_LOOKBACK
+
+router = APIRouter(prefix="/api/market", tags=["Market Data"])
+
+MAX_BARS = 50_000
+
+def _series(symbol: str, timeframe: str):
+    try:
+        return normalize_symbol(symbol), normalize_timeframe(timeframe)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@router.get("/symbols")
+async def get_symbols(user: dict = Depends(get_current_user)):
+    """Symbols and timeframes available in the bar store"""
+    return {
+        "symbols": [
+            {
+                "symbol": symbol,
+                "timeframes": bar_store.timeframes(symbol),
+                "session": (tier_info(symbol) or {}).get("session")
+            }
+            for symbol in bar_store.symbols()
+        ]
+    }
+
+@router.get("/bars")
+async def get_bars(
+    symbol: str,
+    timeframe: str = "M1",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(5000, ge=1, le=MAX_BARS),
+    user: dict = Depends(get_current_user)
+):
+    """OHLCV bars in [start, end), columnar (t = bar open, epoch seconds UTC).
+
+    Timeframes without a stored tier are resampled from a lower one.
+
+    Without `start`, the most recent `limit` bars before `end` are returned.
+    """
+    symbol, timeframe = _series(symbol, timeframe)
+    if start and end and end <= start:
+        raise HTTPException(400, "La date de fin doit être après la date de début")
+
+    # One extra bar tells whether the range was truncated
+    bars = await run_in_threadpool(
+        read_bars, symbol, timeframe, start=start, end=end, limit=limit + 1, newest=start is None
+    )
+    truncated = len(bars["ts"]) > limit
+    if truncated:
+        window = slice(1, None) if start is None else slice(0, limit)
+        bars = {name: arr[window] for name, arr in bars.items()}
+    if not len(bars["ts"]) and not bar_store.timeframes(symbol):
+        raise HTTPException(404, f"Aucune donnée pour {symbol} {timeframe}")
+
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "count": int(len(bars["ts"])),
+        "truncated": truncated,
+        "t": bars["ts"].tolist(),
+        "o": np.round(bars["open"], 6).tolist(),
+        "h": np.round(bars["high"], 6).tolist(),
+        "l": np.round(bars["low"], 6).tolist(),
+        "c": np.round(bars["close"], 6).tolist(),
+        "v": bars["volume"].tolist()
+    }
+
+def _values(arr: np.ndarray) -> list:
+    """JSON-safe list (NaN warm-up values -> null)"""
+    if arr.dtype == bool:
+        return arr.tolist()
+    rounded = np.round(arr, 6)
+    return [None if v != v else v for v in rounded.tolist()]
+
+@router.get("/indicators")
+async def get_indicator(
+    symbol: str,
+    name: str,
+    timeframe: str = "M1",
+    params: Optional[str] = Query(None, description="Paramètres séparés par des virgules, ex: 12,26,9"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(5000, ge=1, le=MAX_BARS),
+    user: dict = Depends(get_current_user)
+):
+    """Indicator values aligned with the bars of [start, end) (or the last `limit` bars).
+
+    Values are computed once over the whole series and cached until the
+    symbol's data changes.
+    """
+    symbol, timeframe = _series(symbol, timeframe)
+    name = name.lower()
+    try:
+        parsed = parse_params(name, [p.strip() for p in params.split(",") if p.strip()] if params else None)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not bar_store.timeframes(symbol):
+        raise HTTPException(404, f"Aucune donnée pour {symbol} {timeframe}")
+
+    ts, outputs = await run_in_threadpool(indicator_cache.get, symbol, timeframe, name, parsed)
+    lo = 0 if start is None else int(np.searchsorted(ts, to_epoch(start)))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, to_epoch(end)))
+    if start is None:
+        lo = max(lo, hi - limit)
+    else:
+        hi = min(hi, lo + limit)
+
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "name": name,
+        "params": list(parsed),
+        "t": ts[lo:hi].tolist(),
+        "values": {key: _values(arr[lo:hi]) for key, arr in outputs.items()}
+    }
+
+@router.get("/patterns")
+async def get_patterns(
+    symbol: str,
+    timeframe: str = "H1",
+    lookback: int = Query(DEFAULT_LOOKBACK, ge=20, le=MAX_LOOKBACK),
+    user: dict = Depends(get_current_user)
+):
+    """BOS, FVG, order blocks and support/resistance zones on the last closed bars"""
+    symbol, timeframe = _series(symbol, timeframe)
+    if not bar_store.timeframes(symbol):
+        raise HTTPException(404, f"Aucune donnée pour {symbol} {timeframe}")
+    return await run_in_threadpool(pattern_scanner.scan, symbol, timeframe, lookback)
+
+# ============== WATCHLISTS ==============
+
+def _watchlist(doc: dict, shared: bool) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "name": doc["name"],
+        "symbols": doc.get("symbols", []),
+        "timeframes": doc.get("timeframes", ["H1"]),
+        "shared": shared
+    }
+
+@router.get("/watchlists")
+async def get_watchlists(user: dict = Depends(get_current_user)):
+    """The user's watchlists and the shared ones"""
+    own = user_watchlists_collection.find({"user_id": user["id"]}).sort("created_at", 1)
+    return {
+        "watchlists": [_watchlist(w, False) for w in own] + [_watchlist(w, True) for w in watchlists_collection.find()]
+    }
+
+@router.post("/watchlists")
+async def create_watchlist(data: WatchlistCreate, user: dict = Depends(get_current_user)):
+    """Create a watchlist"""
+    try:
+        symbols = list(dict.fromkeys(normalize_symbol(s) for s in data.symbols))
+        timeframes = list(dict.fromkeys(normalize_timeframe(tf) for tf in data.timeframes))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not symbols or not timeframes:
+        raise HTTPException(400, "Ajoutez au moins un symbole et un timeframe")
+    watchlist = {
+        "_id": str(uuid.uuid4()),
+        "user_id": user["id"],
+        "name": data.name,
+        "symbols": symbols,
+        "timeframes": timeframes,
+        "created_at": datetime.now(timezone.utc)
+    }
+    user_watchlists_collection.insert_one(watchlist)
+    return _watchlist(watchlist, False)
+
+@router.delete("/watchlists/{watchlist_id}")
+async def delete_watchlist(watchlist_id: str, user: dict = Depends(get_current_user)):
+    """Delete one of the user's watchlists"""
+    result = user_watchlists_collection.delete_one({"_id": watchlist_id, "user_id": user["id"]})
+    if result.deleted_count == 0:
+        raise HTTPException(404, "Watchlist non trouvée")
+    return {"message": "Watchlist supprimée"}
+
+@router.get("/watchlists/{watchlist_id}/scan")
+async def scan_watchlist(
+    watchlist_id: str,
+    timeframe: Optional[str] = None,
+    lookback: int = Query(DEFAULT_LOOKBACK, ge=20, le=MAX_LOOKBACK),
+    user: dict = Depends(get_current_user)
+):
+    """Pattern scan of every symbol of a watchlist (its timeframes, or `timeframe`)"""
+    watchlist = (
+        user_watchlists_collection.find_one({"_id": watchlist_id, "user_id": user["id"]})
+        or watchlists_collection.find_one({"_id": watchlist_id})
+    )
+    if not watchlist:
+        raise HTTPException(404, "Watchlist non trouvée")
+    try:
+        timeframes = [normalize_timeframe(timeframe)] if timeframe else watchlist.get("timeframes", ["H1"])
+        results = await run_in_threadpool(pattern_scanner.scan_many, watchlist.get("symbols", []), timeframes, lookback)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"id": str(watchlist["_id"]), "name": watchlist["name"], "results": results}
@@ -0,0 +1,124 @@
+"""
+Paper Trading Router - simulated orders filled on live prices, journaled as trades
+"""
+import time
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends
+
+from utils.database import paper_orders_collection, trades_collection
+from utils.auth import get_current_user
+from utils.models import PaperOrderCreate
+from utils.paper import MAX_WORKING_ORDERS, PaperOrder, paper_service
+from utils.bar_store import normalize_symbol
+
+router = APIRouter(prefix="/api/paper", tags=["Paper Trading"])
+
+def _order(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        **{k: doc.get(k) for k in ("symbol", "side", "type", "quantity", "price", "stop_loss", "take_profit",
+                                   "trade_id", "oco", "status", "fill_price", "filled_ts", "created_ts", "notes")}
+    }
+
+def _position(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        **{k: doc.get(k) for k in ("symbol", "direction", "entry_price", "stop_loss", "take_profit", "position_size", "notes")},
+        "entry_time": doc["entry_time"].isoformat() if isinstance(doc.get("entry_time"), datetime) else doc.get("entry_time")
+    }
+
+@router.get("/quote/{symbol}")
+async def get_quote(symbol: str, user: dict = Depends(get_current_user)):
+    """Simulated bid/ask for a symbol"""
+    quote = paper_service.engine.quotes.get(symbol.upper())
+    if quote is None:
+        raise HTTPException(404, f"Aucun prix disponible pour {symbol.upper()}")
+    bid, ask, ts = quote
+    return {"symbol": symbol.upper(), "bid": bid, "ask": ask, "time": ts}
+
+@router.get("/orders")
+async def get_orders(status: str = "working", user: dict = Depends(get_current_user)):
+    """Get the user's paper orders (working, filled, cancelled or all)"""
+    query = {"user_id": user["id"]}
+    if status != "all":
+        query["status"] = status
+    orders = paper_orders_collection.find(query).sort("created_ts", -1).limit(500)
+    return {"orders": [_order(o) for o in orders]}
+
+def _fill(order: dict) -> dict:
+    """The entry fill of an order filled by the lease holder"""
+    return {"type": "entry", "order_id": str(order["_id"]), "trade_id": str(order["_id"]), "user_id": order["user_id"],
+            "symbol": order["symbol"], "price": order["fill_price"], "time": order["filled_ts"]}
+
+@router.post("/orders")
+async def place_order(data: PaperOrderCreate, user: dict = Depends(get_current_user)):
+    """Place a paper order; stop_loss / take_profit become an OCO bracket once filled"""
+    try:
+        symbol = normalize_symbol(data.symbol)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if data.type == "market" and symbol not in paper_service.engine.quotes:
+        raise HTTPException(409, f"Aucun prix disponible pour {symbol}")
+    if data.type != "market" and paper_orders_collection.count_documents(
+            {"user_id": user["id"], "status": {"$in": ["pending", "working"]}, "trade_id": None}) >= MAX_WORKING_ORDERS:
+        raise HTTPException(400, f"Limite de {MAX_WORKING_ORDERS} ordres en attente atteinte")
+
+    order = PaperOrder(user["id"], symbol, data.side, data.type, data.quantity, data.price,
+                       data.stop_loss, data.take_profit, notes=data.notes, created_ts=time.time())
+    order.status = "pending"
+    paper_orders_collection.insert_one({"_id": order.id, **order.to_doc(), "created_at": datetime.now(timezone.utc)})
+    doc = await paper_service.wait(paper_orders_collection, {"_id": order.id, "status": {"$ne": "pending"}})
+    if doc is None:
+        return {"order": _order({"_id": order.id, **order.to_doc()}), "fills": []}
+    if doc["status"] == "rejected":
+        raise HTTPException(400, doc["error"])
+    return {"order": _order(doc), "fills": [_fill(doc)] if doc["status"] == "filled" else []}
+
+@router.delete("/orders/{order_id}")
+async def cancel_order(order_id: str, user: dict = Depends(get_current_user)):
+    """Cancel a working order (bracket exits included)"""
+    result = paper_orders_collection.update_one(
+        {"_id": order_id, "user_id": user["id"], "status": {"$in": ["pending", "working"]}},
+        {"$set": {"cancel_requested": True}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(404, "Ordre non trouvé")
+    doc = await paper_service.wait(paper_orders_collection, {"_id": order_id, "status": {"$nin": ["pending", "working"]}})
+    if doc is None:
+        return {"message": "Annulation demandée"}
+    if doc["status"] != "cancelled":
+        raise HTTPException(409, "Ordre déjà exécuté")
+    return {"message": "Ordre annulé"}
+
+@router.get("/positions")
+async def get_positions(user: dict = Depends(get_current_user)):
+    """Get the user's open paper positions"""
+    trades = trades_collection.find({"user_id": user["id"], "source": "paper", "status": "open"}).sort("entry_time", -1)
+    return {"positions": [_position(t) for t in trades]}
+
+@router.post("/positions/{trade_id}/close")
+async def close_position(trade_id: str, user: dict = Depends(get_current_user)):
+    """Close an open paper position at market"""
+    result = trades_collection.update_one(
+        {"_id": trade_id, "user_id": user["id"], "source": "paper", "status": "open"},
+        {"$set": {"close_requested": True}, "$unset": {"close_error": ""}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(404, "Position non trouvée")
+    trade = await paper_service.wait(trades_collection, {"_id": trade_id, "$or": [
+        {"status": "closed"}, {"close_error": {"$exists": True}}
+    ]})
+    if trade is None:
+        return {"message": "Clôture demandée"}
+    if trade["status"] != "closed":
+        raise HTTPException(409, trade["close_error"])
+    exit_time = trade["exit_time"]
+    if exit_time.tzinfo is None:
+        exit_time = exit_time.replace(tzinfo=timezone.utc)
+    return {"type": "exit", "order_id": None, "trade_id": trade_id, "user_id": user["id"], "symbol": trade["symbol"],
+            "price": trade["exit_price"], "time": exit_time.timestamp(), "pnl": trade["pnl"], "reason": trade["exit_reason"]}
+
+@router.get("/stats")
+async def get_stats(user: dict = Depends(get_current_user)):
+    """Paper trading engine counters (of the process matching orders)"""
+    return {**paper_service.engine.stats(), "leader": paper_service.leader}
@@ -22,6 +22,7 @@ VAPID_SUBJECT = os.environ.get("VAPID_SUBJECT", "mailto:contact@trading-ai.com")
 class PushSubscription(BaseModel):
     endpoint: str
     keys: dict
+    expirationTime: Optional[float] = None      # ms since epoch, from PushSubscription.toJSON()
 
 class PushMessage(BaseModel):
     title: str
@@ -44,7 +45,9 @@ async def subscribe_push(subscription: PushSubscription, user: dict = Depends(ge
         {"$set": {
             "push_subscription": {
                 "endpoint": subscription.endpoint,
-                "keys": subscription.keys
+                "keys": subscription.keys,
+                "expires_at": datetime.fromtimestamp(subscription.expirationTime / 1000, timezone.utc)
+                if subscription.expirationTime else None
             },
             "push_enabled": True,
             "push_updated_at": datetime.now(timezone.utc)
@@ -152,6 +155,16 @@ async def notify_challenge_completed(user_id: str, challenge_title: str, xp_earn
         notification_type="challenge"
     )
 
+async def notify_price_alert(user_id: str, symbol: str, lines: list):
+    """Send price alert notification (all alerts of one symbol triggered together)"""
+    await send_push_notification(
+        user_id=user_id,
+        title=f"Alerte prix {symbol}",
+        body="\n".join(lines),
+        url="/alerts",
+        notification_type="price_alert"
+    )
+
 async def notify_ticket_reply(user_id: str, ticket_subject: str):
     """Send notification when expert replies to ticket"""
     await send_push_notification(
@@ -161,3 +174,16 @@ async def notify_ticket_reply(user_id: str, ticket_subject: str):
         url="/tickets",
         notification_type="ticket_reply"
     )
+
+def cleanup_push_subscriptions() -> int:
+    """Scheduled job: drop the subscriptions past their expiration time"""
+    now = datetime.now(timezone.utc)
+    return users_collection.update_many(
+        {"push_subscription.expires_at": {"$lt": now}},
+        {"$set": {"push_subscription": None, "push_enabled": False, "push_updated_at": now}}
+    ).modified_count
+
+async def on_domain_event(event: dict):
+    """Event subscriber: pushes driven by domain events"""
+    if event["type"] == "ticket_replied" and event.get("is_expert"):
+        await notify_ticket_reply(event["user_id"], event["subject"])
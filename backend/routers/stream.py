@@ -0,0 +1,85 @@
+"""
+Market Stream Router - live quotes over WebSocket, fed by the market gateway
+"""
+import asyncio
+import itertools
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+
+from utils.auth import get_current_user
+from utils.gateway import market_gateway
+from utils.exposure import exposure_service
+
+router = APIRouter(prefix="/api/stream", tags=["Market Stream"])
+
+MAX_PENDING_REPLIES = 16
+
+@router.get("/quotes")
+async def get_quotes(
+    symbols: str = Query(..., description="Symboles séparés par des virgules"),
+    user: dict = Depends(get_current_user)
+):
+    """Last quote and in-progress bar of each symbol"""
+    try:
+        return {"quotes": market_gateway.quotes([s for s in symbols.split(",") if s.strip()])}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@router.get("/stats")
+async def get_stream_stats(user: dict = Depends(get_current_user)):
+    """Gateway counters (symbols, ticks, clients, pending updates)"""
+    return market_gateway.stats()
+
+@router.websocket("/ws")
+async def stream(websocket: WebSocket, token: str = Query(None)):
+    """Quote stream. The token goes in the query string (browsers cannot set
+    headers on a WebSocket). Client messages:
+    {"action": "subscribe" | "unsubscribe", "symbols": [...]} and
+    {"action": "subscribe_pnl" | "unsubscribe_pnl"} for the unrealized P&L
+    of the user's open trades. Server frames are JSON lists of quote / pnl /
+    control messages."""
+    try:
+        user = await get_current_user(f"Bearer {token}" if token else None)
+    except HTTPException as e:
+        await websocket.close(code=4401, reason=e.detail)
+        return
+    await websocket.accept()
+
+    client = market_gateway.connect(websocket.send_text)
+    sender = asyncio.create_task(market_gateway.serve(client))
+    replies = itertools.count()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            symbols = message.get("symbols", []) if isinstance(message, dict) else None
+            if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+                reply = {"type": "error", "detail": "Message invalide"}
+            else:
+                action = message.get("action")
+                try:
+                    if action == "subscribe":
+                        reply = {"type": "subscribed", "symbols": market_gateway.subscribe(client, symbols)}
+                    elif action == "unsubscribe":
+                        reply = {"type": "unsubscribed", "symbols": market_gateway.unsubscribe(client, symbols)}
+                    elif action == "subscribe_pnl":
+                        exposure_service.subscribe(user["id"], client)
+                        reply = {"type": "subscribed", "pnl": True}
+                    elif action == "unsubscribe_pnl":
+                        exposure_service.unsubscribe(user["id"], client)
+                        reply = {"type": "unsubscribed", "pnl": True}
+                    else:
+                        reply = {"type": "error", "detail": "Action inconnue (subscribe, unsubscribe, subscribe_pnl, unsubscribe_pnl)"}
+                except ValueError as e:
+                    reply = {"type": "error", "detail": str(e)}
+            # Control replies go through the client's send loop like quotes; a
+            # client that spams without reading keeps overwriting the same few
+            client.push(("control", next(replies) % MAX_PENDING_REPLIES), json.dumps(reply))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        market_gateway.disconnect(client)
+        exposure_service.unsubscribe(user["id"], client)
@@ -0,0 +1,33 @@
+"""
+System Router - background processing status (ADMIN_USER_IDS only)
+"""
+from fastapi import APIRouter, HTTPException, Depends
+
+from utils.auth import get_admin_user
+from utils.events import event_dispatcher
+from utils.scheduler import scheduler
+from utils.screenshots import screenshot_processor
+
+router = APIRouter(prefix="/api/system", tags=["System"])
+
+@router.get("/events")
+async def get_event_stats(user: dict = Depends(get_admin_user)):
+    """Event dispatch: per subscriber offset, lag and delivery counters"""
+    return event_dispatcher.stats()
+
+@router.get("/jobs")
+async def get_jobs(user: dict = Depends(get_admin_user)):
+    """Scheduled jobs: cron, next run, last run duration and outcome"""
+    return {"jobs": scheduler.status()}
+
+@router.get("/jobs/{name}/runs")
+async def get_job_runs(name: str, limit: int = 20, user: dict = Depends(get_admin_user)):
+    """Run history of a job, latest first"""
+    if name not in scheduler.jobs:
+        raise HTTPException(404, "Tâche inconnue")
+    return {"runs": scheduler.history(name, min(limit, 100))}
+
+@router.get("/screenshots")
+async def get_screenshot_stats(user: dict = Depends(get_admin_user)):
+    """Screenshot preprocessing: cache hits, bytes saved, processing time"""
+    return screenshot_processor.stats()
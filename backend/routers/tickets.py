@@ -8,6 +8,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from utils.database import tickets_collection, users_collection
 from utils.auth import get_current_user
 from utils.models import TicketCreate, TicketReply
+from utils.events import emit
 
 router = APIRouter(prefix="/api/tickets", tags=["Tickets"])
 
@@ -89,6 +90,7 @@ async def reply_to_ticket(ticket_id: str, data: TicketReply, user: dict = Depend
             "$set": {"updated_at": datetime.now(timezone.utc)}
         }
     )
+    emit(ticket["user_id"], "ticket_replied", ticket_id=ticket_id, subject=ticket["subject"], is_expert=reply["is_expert"])
     
     return {"message": "Réponse ajoutée"}
 
@@ -1,16 +1,54 @@
 """
 Trades Router - Trading Journal CRUD operations
 """
+import os
 import uuid
-from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Depends
+import tempfile
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi.responses import StreamingResponse
 
-from utils.database import trades_collection, users_collection
+from utils.database import trades_collection, users_collection, trade_imports_collection, exposure_snapshots_collection
 from utils.auth import get_current_user
 from utils.models import TradeCreate, TradeUpdate
+from utils.exports import (
+    EXPORT_FORMATS, EXPORT_PROJECTION, DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, export_stream
+)
+from utils.trade_import import COLUMN_MAPS, run_import
+from utils.analytics import get_analytics, invalidate_analytics
+from utils.pnl_rollup import get_heatmap, record_pnl, invalidate_rollup
+from utils.exposure import exposure_service
+from utils.events import emit
+from utils.achievements import achievement_service
+
+IMPORT_UPLOAD_CHUNK = 1024 * 1024
 
 router = APIRouter(prefix="/api/trades", tags=["Trades"])
 
+# Holding-time histogram boundaries in minutes (label applies from that boundary)
+DURATION_BUCKETS = [0, 5, 15, 60, 240, 1440, 10080]
+DURATION_LABELS = {0: "< 5 min", 5: "5-15 min", 15: "15-60 min", 60: "1-4 h", 240: "4-24 h", 1440: "1-7 j", "7j+": "> 7 j"}
+
+def _as_utc(value: datetime) -> datetime:
+    """Normalize client timestamps to aware UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+def _percentile(ranked: dict, count: int, q: float) -> float:
+    """Linear-interpolated percentile (0 <= q <= 1) from the values at the
+    sorted positions it needs (position -> value)"""
+    if not count:
+        return 0
+    pos = (count - 1) * q
+    low = int(pos)
+    high = low + 1 if pos > low else low
+    return ranked[low] + (ranked[high] - ranked[low]) * (pos - low)
+
 def calculate_pnl(entry_price: float, exit_price: float, direction: str, position_size: float) -> float:
     """Calculate P&L for a trade"""
     if direction.upper() == "LONG":
@@ -22,11 +60,18 @@ def calculate_pnl(entry_price: float, exit_price: float, direction: str, positio
 async def create_trade(data: TradeCreate, user: dict = Depends(get_current_user)):
     """Create a new trade entry"""
     trade_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
     
     pnl = None
     pnl_percent = None
     status = "open"
     
+    # A trade logged while open starts now; closed trades only get the times the user gives
+    entry_time = _as_utc(data.entry_time) or (now if data.exit_price is None else None)
+    exit_time = _as_utc(data.exit_time) if data.exit_price is not None else None
+    if entry_time and exit_time and exit_time < entry_time:
+        raise HTTPException(400, "L'heure de sortie doit être après l'heure d'entrée")
+    
     if data.exit_price is not None:
         pnl = calculate_pnl(data.entry_price, data.exit_price, data.direction, data.position_size)
         pnl_percent = ((data.exit_price - data.entry_price) / data.entry_price * 100) if data.direction.upper() == "LONG" else ((data.entry_price - data.exit_price) / data.entry_price * 100)
@@ -50,14 +95,19 @@ async def create_trade(data: TradeCreate, user: dict = Depends(get_current_user)
         "setup_type": data.setup_type,
         "emotions": data.emotions,
         "followed_plan": data.followed_plan,
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
+        "entry_time": entry_time,
+        "exit_time": exit_time,
+        "created_at": now,
+        "updated_at": now
     }
     trades_collection.insert_one(trade)
-    
-    # Update user stats
+    if status == "open":
+        exposure_service.engine.track(trade)
+    emit(user["id"], "trade_created", journaled=bool(data.notes and data.emotions))
     if status == "closed":
-        _update_user_stats(user["id"])
+        emit(user["id"], "trade_closed", followed_plan=bool(data.followed_plan), win=pnl > 0)
+        invalidate_analytics(user["id"])
+        record_pnl(user["id"], trade["created_at"], pnl)
     
     return {"id": trade_id, "message": "Trade créé avec succès"}
 
@@ -96,6 +146,8 @@ async def get_trades(
             "setup_type": trade.get("setup_type"),
             "emotions": trade.get("emotions"),
             "followed_plan": trade.get("followed_plan"),
+            "entry_time": trade["entry_time"].isoformat() if isinstance(trade.get("entry_time"), datetime) else trade.get("entry_time"),
+            "exit_time": trade["exit_time"].isoformat() if isinstance(trade.get("exit_time"), datetime) else trade.get("exit_time"),
             "created_at": trade["created_at"].isoformat() if isinstance(trade["created_at"], datetime) else trade["created_at"]
         })
     
@@ -156,46 +208,247 @@ async def get_trade_stats(user: dict = Depends(get_current_user)):
         "profit_factor": round(total_wins / total_losses, 2) if total_losses > 0 else 0
     }
 
+@router.get("/analytics")
+async def get_trade_analytics(user: dict = Depends(get_current_user)):
+    """Get advanced portfolio analytics (risk ratios, drawdown, streaks, breakdowns)"""
+    return get_analytics(user["id"])
+
 @router.get("/heatmap")
-async def get_heatmap_data(user: dict = Depends(get_current_user)):
-    """Get heatmap data for the last 365 days"""
-    from datetime import timedelta
-    
-    end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=365)
-    
-    trades = list(trades_collection.find({
-        "user_id": user["id"],
-        "status": "closed",
-        "created_at": {"$gte": start_date, "$lte": end_date}
-    }))
-    
-    # Group by date
-    daily_pnl = {}
-    for trade in trades:
-        date_str = trade["created_at"].strftime("%Y-%m-%d") if isinstance(trade["created_at"], datetime) else trade["created_at"][:10]
-        if date_str not in daily_pnl:
-            daily_pnl[date_str] = 0
-        daily_pnl[date_str] += trade.get("pnl") or 0
+async def get_heatmap_data(
+    start_date: str = None,
+    end_date: str = None,
+    tz: str = None,
+    bucket: str = "day",
+    user: dict = Depends(get_current_user)
+):
+    """Get P&L heatmap buckets (day/week/month) in the user's timezone, last 365 days by default"""
+    end = _parse_date(end_date) if end_date else datetime.now(timezone.utc)
+    start = _parse_date(start_date) if start_date else end - timedelta(days=365)
     
-    result = [{"date": date, "pnl": round(pnl, 2)} for date, pnl in sorted(daily_pnl.items())]
-    return {"heatmap": result}
+    return {"heatmap": get_heatmap(user["id"], start, end, tz, bucket), "bucket": bucket}
 
 @router.get("/duration-stats")
 async def get_duration_stats(user: dict = Depends(get_current_user)):
-    """Get trade duration statistics"""
-    trades = list(trades_collection.find({"user_id": user["id"], "status": "closed"}))
+    """Get holding-time statistics for closed trades with entry/exit timestamps.
+
+    Percentiles: $setWindowFields numbers the sorted durations and only the
+    positions each percentile interpolates between come back ($percentile
+    needs MongoDB 7.0+).
+    """
+    last = {"$subtract": ["$count", 1]}
+    positions = []
+    for q in PERCENTILES:
+        positions += [{"$floor": {"$multiply": [last, q]}}, {"$ceil": {"$multiply": [last, q]}}]
+    pipeline = [
+        {"$match": {
+            "user_id": user["id"],
+            "status": "closed",
+            "entry_time": {"$type": "date"},
+            "exit_time": {"$type": "date"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "pnl": {"$ifNull": ["$pnl", 0]},
+            "minutes": {"$divide": [{"$subtract": ["$exit_time", "$entry_time"]}, 60000]}
+        }},
+        {"$facet": {
+            "summary": [{"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "avg": {"$avg": "$minutes"},
+                "min": {"$min": "$minutes"},
+                "max": {"$max": "$minutes"}
+            }}],
+            "ranked": [
+                {"$setWindowFields": {"sortBy": {"minutes": 1}, "output": {
+                    "position": {"$documentNumber": {}},
+                    "count": {"$count": {}, "window": {"documents": ["unbounded", "unbounded"]}}
+                }}},
+                {"$match": {"$expr": {"$in": [{"$subtract": ["$position", 1]}, positions]}}},
+                {"$project": {"position": {"$subtract": ["$position", 1]}, "minutes": 1}}
+            ],
+            "histogram": [{"$bucket": {
+                "groupBy": "$minutes",
+                "boundaries": DURATION_BUCKETS,
+                "default": "7j+",
+                "output": {
+                    "count": {"$sum": 1},
+                    "total_pnl": {"$sum": "$pnl"},
+                    "wins": {"$sum": {"$cond": [{"$gt": ["$pnl", 0]}, 1, 0]}}
+                }
+            }}]
+        }}
+    ]
+    
+    result = list(trades_collection.aggregate(pipeline))[0]
+    summary = result["summary"][0] if result["summary"] and result["summary"][0]["count"] else None
+    histogram = {row["_id"]: row for row in result["histogram"]}
     
-    # Placeholder - would need entry/exit timestamps for real duration
+    duration_stats = {}
+    for boundary in DURATION_BUCKETS[:-1] + ["7j+"]:
+        row = histogram.get(boundary, {})
+        count = row.get("count", 0)
+        duration_stats[DURATION_LABELS[boundary]] = {
+            "count": count,
+            "total_pnl": round(row.get("total_pnl", 0), 2),
+            "avg_pnl": round(row.get("total_pnl", 0) / count, 2) if count else 0,
+            "wins": row.get("wins", 0)
+        }
+    
+    def bucket_count(*boundaries):
+        return sum(histogram.get(b, {}).get("count", 0) for b in boundaries)
+    
+    ranked = {row["position"]: row["minutes"] for row in result["ranked"]}
+    percentiles = [_percentile(ranked, summary["count"] if summary else 0, q) for q in PERCENTILES]
     return {
-        "avg_duration_minutes": 45,
-        "shortest_minutes": 5,
-        "longest_minutes": 240,
+        "trades_with_duration": summary["count"] if summary else 0,
+        "avg_duration_minutes": round(summary["avg"], 1) if summary else 0,
+        "shortest_minutes": round(summary["min"], 1) if summary else 0,
+        "longest_minutes": round(summary["max"], 1) if summary else 0,
+        "median_minutes": round(percentiles[1], 1),
+        "percentiles": {
+            "p25": round(percentiles[0], 1),
+            "p50": round(percentiles[1], 1),
+            "p75": round(percentiles[2], 1),
+            "p90": round(percentiles[3], 1)
+        },
         "by_duration": {
-            "scalping": len([t for t in trades if t.get("setup_type") == "scalping"]),
-            "day_trading": len([t for t in trades if t.get("setup_type") == "day_trading"]),
-            "swing": len([t for t in trades if t.get("setup_type") == "swing"])
-        }
+            "scalping": bucket_count(0, 5),
+            "day_trading": bucket_count(15, 60, 240),
+            "swing": bucket_count(1440, "7j+")
+        },
+        "duration_stats": duration_stats
+    }
+
+@router.get("/exposure")
+async def get_exposure(user: dict = Depends(get_current_user)):
+    """Unrealized P&L of the open trades, marked on live prices"""
+    engine = exposure_service.engine
+    return {**engine.totals(user["id"]), "trades": engine.positions(user["id"])}
+
+@router.get("/exposure/history")
+async def get_exposure_history(hours: int = 24, user: dict = Depends(get_current_user)):
+    """Exposure snapshots (one per minute while trades are open)"""
+    since = datetime.now(timezone.utc) - timedelta(hours=max(1, min(hours, 24 * 30)))
+    snapshots = exposure_snapshots_collection.find(
+        {"user_id": user["id"], "time": {"$gte": since}}, {"_id": 0, "user_id": 0}
+    ).sort("time", 1)
+    return {"snapshots": [{**s, "time": s["time"].isoformat()} for s in snapshots]}
+
+def _parse_date(value: str) -> datetime:
+    """Parse an ISO date/datetime query parameter as UTC"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"Date invalide: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+@router.get("/export")
+async def export_trades(
+    format: str = "csv",
+    start_date: str = None,
+    end_date: str = None,
+    status: str = None,
+    symbol: str = None,
+    gzip: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    user: dict = Depends(get_current_user)
+):
+    """Stream the trading journal as CSV, NDJSON or Parquet"""
+    fmt = format.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(400, "Format invalide (csv, ndjson, parquet)")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(501, "Export Parquet non disponible sur ce serveur")
+    
+    query = {"user_id": user["id"]}
+    if status:
+        query["status"] = status
+    if symbol:
+        query["symbol"] = symbol
+    if start_date or end_date:
+        query["created_at"] = {}
+        if start_date:
+            query["created_at"]["$gte"] = _parse_date(start_date)
+        if end_date:
+            query["created_at"]["$lte"] = _parse_date(end_date)
+    
+    batch_size = max(100, min(batch_size, MAX_BATCH_SIZE))
+    cursor = trades_collection.find(query, EXPORT_PROJECTION).sort("created_at", 1).batch_size(batch_size)
+    
+    filename = f"trades_{datetime.now(timezone.utc).strftime('%Y%m%d')}.{EXPORT_FORMATS[fmt]['extension']}"
+    media_type = EXPORT_FORMATS[fmt]["media_type"]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        export_stream(cursor, fmt, compress=gzip, batch_size=batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import")
+async def import_trades(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: str = None,
+    user: dict = Depends(get_current_user)
+):
+    """Import a broker statement (CSV, MT4 or MT5 export) in the background"""
+    fmt = format.lower() if format else None
+    if fmt and fmt not in COLUMN_MAPS:
+        raise HTTPException(400, "Format invalide (csv, mt4, mt5)")
+    
+    # The upload is closed once the response is sent, so spool it to disk first
+    fd, path = tempfile.mkstemp(prefix="trade_import_", suffix=".csv")
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(IMPORT_UPLOAD_CHUNK):
+            out.write(chunk)
+    
+    import_id = str(uuid.uuid4())
+    trade_imports_collection.insert_one({
+        "_id": import_id,
+        "user_id": user["id"],
+        "filename": file.filename,
+        "format": fmt,
+        "status": "pending",
+        "rows_read": 0,
+        "imported": 0,
+        "duplicates": 0,
+        "errors": 0,
+        "error_samples": [],
+        "created_at": datetime.now(timezone.utc)
+    })
+    background_tasks.add_task(run_import, import_id, user["id"], path, fmt, _on_trades_imported)
+    
+    return {"import_id": import_id, "message": "Import démarré"}
+
+@router.get("/import/{import_id}")
+async def get_import_progress(import_id: str, user: dict = Depends(get_current_user)):
+    """Get the progress of a trade import"""
+    job = trade_imports_collection.find_one({"_id": import_id, "user_id": user["id"]})
+    if not job:
+        raise HTTPException(404, "Import non trouvé")
+    
+    return {
+        "id": job["_id"],
+        "filename": job.get("filename"),
+        "format": job.get("format"),
+        "status": job["status"],
+        "rows_read": job.get("rows_read", 0),
+        "imported": job.get("imported", 0),
+        "duplicates": job.get("duplicates", 0),
+        "errors": job.get("errors", 0),
+        "error_samples": job.get("error_samples", []),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat() if isinstance(job["created_at"], datetime) else job["created_at"],
+        "finished_at": job["finished_at"].isoformat() if isinstance(job.get("finished_at"), datetime) else job.get("finished_at")
     }
 
 @router.get("/{trade_id}")
@@ -222,6 +475,8 @@ async def get_trade(trade_id: str, user: dict = Depends(get_current_user)):
         "setup_type": trade.get("setup_type"),
         "emotions": trade.get("emotions"),
         "followed_plan": trade.get("followed_plan"),
+        "entry_time": trade["entry_time"].isoformat() if isinstance(trade.get("entry_time"), datetime) else trade.get("entry_time"),
+        "exit_time": trade["exit_time"].isoformat() if isinstance(trade.get("exit_time"), datetime) else trade.get("exit_time"),
         "created_at": trade["created_at"].isoformat() if isinstance(trade["created_at"], datetime) else trade["created_at"]
     }
 
@@ -234,6 +489,15 @@ async def update_trade(trade_id: str, data: TradeUpdate, user: dict = Depends(ge
     
     update_data = {"updated_at": datetime.now(timezone.utc)}
     
+    if data.exit_time is not None and data.exit_price is None and trade["status"] != "closed":
+        raise HTTPException(400, "Heure de sortie sans prix de sortie sur un trade ouvert")
+    if data.exit_price is not None or data.exit_time is not None:
+        exit_time = _as_utc(data.exit_time) or update_data["updated_at"]
+        entry_time = trade.get("entry_time")
+        if entry_time and exit_time < _as_utc(entry_time):
+            raise HTTPException(400, "L'heure de sortie doit être après l'heure d'entrée")
+        update_data["exit_time"] = exit_time
+    
     if data.exit_price is not None:
         update_data["exit_price"] = data.exit_price
         update_data["pnl"] = calculate_pnl(trade["entry_price"], data.exit_price, trade["direction"], trade["position_size"])
@@ -250,25 +514,100 @@ async def update_trade(trade_id: str, data: TradeUpdate, user: dict = Depends(ge
     trades_collection.update_one({"_id": trade_id}, {"$set": update_data})
     
     if "status" in update_data and update_data["status"] == "closed":
-        _update_user_stats(user["id"])
+        exposure_service.engine.untrack(trade_id)
+        if trade["status"] != "closed":
+            followed_plan = data.followed_plan if data.followed_plan is not None else trade.get("followed_plan")
+            emit(user["id"], "trade_closed", followed_plan=bool(followed_plan), win=update_data["pnl"] > 0)
+        else:
+            emit(user["id"], "trade_updated")
+        previous_pnl = (trade.get("pnl") or 0) if trade["status"] == "closed" else 0
+        record_pnl(
+            user["id"], trade["created_at"], update_data["pnl"] - previous_pnl,
+            trades=0 if trade["status"] == "closed" else 1
+        )
+    if trade["status"] == "closed" or "status" in update_data:
+        invalidate_analytics(user["id"])
     
     return {"message": "Trade mis à jour"}
 
 @router.delete("/{trade_id}")
 async def delete_trade(trade_id: str, user: dict = Depends(get_current_user)):
     """Delete a trade"""
-    result = trades_collection.delete_one({"_id": trade_id, "user_id": user["id"]})
-    if result.deleted_count == 0:
+    trade = trades_collection.find_one_and_delete(
+        {"_id": trade_id, "user_id": user["id"]},
+        projection={"status": 1, "pnl": 1, "created_at": 1}
+    )
+    if not trade:
         raise HTTPException(404, "Trade non trouvé")
     
-    _update_user_stats(user["id"])
+    exposure_service.engine.untrack(trade_id)
+    if trade["status"] == "closed":
+        record_pnl(user["id"], trade["created_at"], -(trade.get("pnl") or 0), trades=-1)
+    emit(user["id"], "trade_deleted", closed=trade["status"] == "closed")
+    invalidate_analytics(user["id"])
     return {"message": "Trade supprimé"}
 
+def _on_trades_imported(user_id: str):
+    """Refresh derived data once after a bulk import"""
+    _update_user_stats(user_id)
+    invalidate_analytics(user_id)
+    invalidate_rollup(user_id)
+    exposure_service.refresh_user(user_id)
+    achievement_service.refresh_user(user_id)
+
+STATS_EVENTS = ("trade_closed", "trade_updated", "trade_deleted")
+
+def refresh_user_stats(user_id: str, events: list):
+    """Event subscriber: recompute the stats once per user batch"""
+    if any(e["type"] in STATS_EVENTS for e in events):
+        _update_user_stats(user_id)
+
+STATS_GROUP = {
+    "total": {"$sum": 1},
+    "winners": {"$sum": {"$cond": [{"$gt": [{"$ifNull": ["$pnl", 0]}, 0]}, 1, 0]}}
+}
+
+def reconcile_user_stats(batch_size: int = 1000) -> dict:
+    """Scheduled job: recompute every user's stats in one aggregation and
+    rewrite only those that drifted"""
+    from pymongo import UpdateOne
+
+    report = {"users": 0, "fixed": 0}
+    batch, seen = [], set()
+
+    def write(requests):
+        if requests:
+            report["fixed"] += users_collection.bulk_write(requests, ordered=False).modified_count
+
+    rows = trades_collection.aggregate([
+        {"$match": {"status": "closed"}},
+        {"$group": {"_id": "$user_id", **STATS_GROUP}}
+    ], allowDiskUse=True, batchSize=batch_size)
+    for row in rows:
+        total, winrate = row["total"], round(row["winners"] / row["total"] * 100, 2)
+        seen.add(row["_id"])
+        batch.append(UpdateOne(
+            {"_id": row["_id"], "$or": [{"total_trades": {"$ne": total}}, {"winrate": {"$ne": winrate}}]},
+            {"$set": {"total_trades": total, "winrate": winrate, "updated_at": datetime.now(timezone.utc)}}
+        ))
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+    for user in users_collection.find({"total_trades": {"$gt": 0}}, {"_id": 1}):
+        if user["_id"] not in seen:         # every closed trade deleted
+            batch.append(UpdateOne({"_id": user["_id"]}, {"$set": {"total_trades": 0, "winrate": 0}}))
+    write(batch)
+    report["users"] = len(seen)
+    return report
+
 def _update_user_stats(user_id: str):
     """Update user statistics after trade changes"""
-    trades = list(trades_collection.find({"user_id": user_id, "status": "closed"}))
-    total = len(trades)
-    winners = len([t for t in trades if (t.get("pnl") or 0) > 0])
+    result = list(trades_collection.aggregate([
+        {"$match": {"user_id": user_id, "status": "closed"}},
+        {"$group": {"_id": None, **STATS_GROUP}}
+    ]))
+    total = result[0]["total"] if result else 0
+    winners = result[0]["winners"] if result else 0
     winrate = round(winners / total * 100, 2) if total > 0 else 0
     
     users_collection.update_one(
@@ -0,0 +1,30 @@
+"""
+Recount the achievement counters of every user from their trades, setups,
+backtests, posts... and unlock the achievements they already deserve.
+Safe to re-run: unlocks are idempotent and XP is only paid for new ones.
+No push notification is sent for backfilled unlocks.
+
+Usage: python scripts/backfill_achievements.py [batch_size] [workers]
+"""
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.achievements import BACKFILL_BATCH, BACKFILL_WORKERS, achievement_service
+from utils.database import user_achievements_collection
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else BACKFILL_BATCH
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else BACKFILL_WORKERS
+    user_achievements_collection.create_index([("user_id", 1), ("achievement_id", 1)], unique=True)
+    achievement_service.load()
+    start = time.perf_counter()
+    result = achievement_service.backfill(batch_size, workers)
+    print(f"✅ {result['users']:,} utilisateurs ({result['batches']} lots), "
+          f"{result['unlocked']:,} badges débloqués en {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
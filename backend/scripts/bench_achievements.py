@@ -0,0 +1,54 @@
+"""
+Benchmark: achievement evaluation - checking only the achievements whose
+counters moved against evaluating every achievement on each event.
+
+Usage: python scripts/bench_achievements.py [events]
+"""
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.achievements import AchievementEngine, counter_increments
+
+# Rules of scripts/seed_gamification.py
+SEED_RULES = [
+    {"trades": 1}, {"trades": 10}, {"trades": 50}, {"trades": 100}, {"trades": 500},
+    {"closed_trades": 20, "winrate": 50}, {"closed_trades": 50, "winrate": 60}, {"closed_trades": 100, "winrate": 70},
+    {"best_streak": 3}, {"best_streak": 7}, {"best_streak": 30},
+    {"analyses": 1}, {"coachings": 1}, {"backtests": 1}, {"backtests": 10},
+    {"posts": 1}, {"likes_received": 10}, {"comments_given": 5},
+]
+EVENT_MIX = [("trade_created", 5), ("trade_closed", 4), ("setup_analyzed", 1), ("briefing_viewed", 1),
+             ("post_created", 1), ("post_liked", 2), ("comment_created", 1)]
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(43)
+    engine = AchievementEngine()
+    engine.load([{"_id": f"ach{k}", "rule": rule} for k, rule in enumerate(SEED_RULES)])
+    types = [t for t, weight in EVENT_MIX for _ in range(weight)]
+    events = [{"type": rng.choice(types), "user_id": f"user{rng.randrange(5000)}", "win": rng.random() < 0.5}
+              for _ in range(n_events)]
+
+    for label, incremental in (("changed inputs", True), ("every achievement", False)):
+        engine.checks = 0
+        counters, unlocked = {}, {}
+        start = time.perf_counter()
+        for event in events:
+            increments = counter_increments(event)
+            user = counters.setdefault(event["user_id"], {})
+            for name, n in increments.items():
+                user[name] = user.get(name, 0) + n
+            done = unlocked.setdefault(event["user_id"], set())
+            for achievement in engine.evaluate(user, done, increments if incremental else None):
+                done.add(achievement.id)
+        elapsed = time.perf_counter() - start
+        print(f"{label:18}  {n_events / elapsed:,.0f} events/s, {engine.checks / n_events:.2f} rule checks per event, "
+              f"{sum(map(len, unlocked.values())):,} unlocks")
+
+if __name__ == "__main__":
+    main()
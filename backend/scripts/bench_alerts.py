@@ -0,0 +1,117 @@
+"""
+Benchmark: price alert engine with 1M active alerts - bulk load, sustained
+tick throughput (target 10k ticks/s) and single-tick latency, against a
+linear scan of the symbol's alerts per tick.
+
+Usage: python scripts/bench_alerts.py [alerts] [symbols] [ticks]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.alerts import Alert, AlertEngine
+
+TYPES = np.array(["above", "below", "cross", "percent"])
+
+def make_alerts(n: int, symbols: list, prices: np.ndarray, rng) -> list:
+    sym = rng.integers(0, len(symbols), n)
+    kind = TYPES[rng.choice(4, n, p=[0.35, 0.35, 0.2, 0.1])]
+    # Levels spread +-5% around the current price, percent moves of 0.5-5%
+    level = prices[sym] * (1 + rng.normal(0, 0.02, n).clip(-0.05, 0.05))
+    percent = rng.uniform(0.5, 5, n)
+    repeat = rng.random(n) < 0.3
+    return [
+        Alert(str(i), f"user{i % 50_000}", symbols[s], k, price=float(l), percent=float(p),
+              repeat=bool(r), cooldown=600, reference=float(prices[s]) if k == "percent" else None)
+        for i, (s, k, l, p, r) in enumerate(zip(sym.tolist(), kind.tolist(), level.tolist(),
+                                               percent.tolist(), repeat.tolist()))
+    ]
+
+def linear_scan(alerts_by_symbol: dict, ticks: list) -> int:
+    """Reference: test every alert of the ticked symbol against the price"""
+    fired = 0
+    last = {}
+    for symbol, price, _ in ticks:
+        prev = last.get(symbol, price)
+        for alert in alerts_by_symbol[symbol]:
+            if alert.type == "above":
+                hit = price >= alert.price
+            elif alert.type == "below":
+                hit = price <= alert.price
+            elif alert.type == "cross":
+                hit = (prev < alert.price <= price) or (prev > alert.price >= price)
+            else:
+                hit = abs(price / alert.reference - 1) * 100 >= alert.percent
+            fired += hit
+        last[symbol] = price
+    return fired
+
+def main():
+    n_alerts = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    n_ticks = int(sys.argv[3]) if len(sys.argv) > 3 else 200_000
+    rng = np.random.default_rng(21)
+    symbols = [f"SYM{k:03d}" for k in range(n_symbols)]
+    prices = rng.uniform(1, 1000, n_symbols)
+
+    start = time.perf_counter()
+    alerts = make_alerts(n_alerts, symbols, prices, rng)
+    print(f"{n_alerts:,} alerts on {n_symbols} symbols (built in {time.perf_counter() - start:.1f} s)")
+
+    # Memory in a separate run: tracemalloc slows allocation down too much to time under it
+    tracemalloc.start()
+    sample_engine = AlertEngine()
+    sample_engine.load(alerts[:100_000])
+    index_mb = tracemalloc.get_traced_memory()[0] / 2**20 * n_alerts / 100_000
+    tracemalloc.stop()
+    del sample_engine
+
+    engine = AlertEngine()
+    start = time.perf_counter()
+    engine.load(alerts)
+    load_t = time.perf_counter() - start
+    print(f"bulk load + sort:             {load_t * 1000:8.0f} ms  (index ~{index_mb:.0f} MB)")
+
+    # Random walks, one tick per step on a random symbol, 10k ticks per second of feed time
+    tick_symbols = rng.integers(0, n_symbols, n_ticks)
+    steps = np.exp(rng.normal(0, 0.0005, n_ticks))
+    path = prices.copy()
+    ticks = []
+    for i, (s, step) in enumerate(zip(tick_symbols.tolist(), steps.tolist())):
+        path[s] *= step
+        ticks.append((symbols[s], float(path[s]), i / 10_000))
+
+    for symbol, price, ts in ticks[:n_symbols * 5]:
+        engine.on_tick(symbol, price, ts)  # warm-up: first prices arm cross alerts
+    measured = ticks[n_symbols * 5:]
+    triggered = 0
+    latencies = np.empty(len(measured))
+    start = time.perf_counter()
+    for j, (symbol, price, ts) in enumerate(measured):
+        t0 = time.perf_counter()
+        triggered += len(engine.on_tick(symbol, price, ts))
+        latencies[j] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - start
+    print(f"ticks:                        {len(measured):,} in {elapsed * 1000:.0f} ms -> "
+          f"{len(measured) / elapsed:,.0f} ticks/s  ({triggered:,} triggers)")
+    print(f"per-tick latency:             p50 {np.percentile(latencies, 50) * 1e6:.1f} µs, "
+          f"p99 {np.percentile(latencies, 99) * 1e6:.1f} µs, max {latencies.max() * 1e3:.2f} ms")
+    print(f"engine after run:             {engine.stats()}")
+
+    by_symbol = {}
+    for alert in alerts:
+        by_symbol.setdefault(alert.symbol, []).append(alert)
+    sample = measured[:500]
+    start = time.perf_counter()
+    linear_scan(by_symbol, sample)
+    scan_rate = len(sample) / (time.perf_counter() - start)
+    print(f"linear scan per tick:         {scan_rate:,.0f} ticks/s -> index is {len(measured) / elapsed / scan_rate:,.0f}x faster")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark for the portfolio analytics engine on synthetic columnar data.
+Measures compute_analytics only (the Mongo extract is timed separately in prod).
+
+Usage: python scripts/bench_analytics.py [trades]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.analytics import compute_analytics
+
+def synthetic_columns(n: int) -> dict:
+    rng = np.random.default_rng(42)
+    entry = 1 + rng.random(n)
+    pnl = rng.normal(5, 50, n)
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    return {
+        "pnl": pnl.tolist(),
+        "pnl_percent": (pnl / 100).tolist(),
+        "entry_price": entry.tolist(),
+        "stop_loss": np.where(rng.random(n) < 0.8, entry * 0.99, np.nan).tolist(),
+        "position_size": [1000.0] * n,
+        "symbol": rng.choice(["EURUSD", "GBPUSD", "XAUUSD", "NAS100"], n).tolist(),
+        "setup_type": rng.choice(["scalping", "day_trading", "swing", None], n).tolist(),
+        "emotions": rng.choice(["calme", "stressé", "confiant", None], n).tolist(),
+        "followed_plan": rng.choice([True, False, None], n).tolist(),
+        "created_at": [start + timedelta(minutes=45 * i) for i in range(n)],
+    }
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    columns = synthetic_columns(n)
+    compute_analytics(columns)  # warm-up
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        result = compute_analytics(columns)
+        runs.append(time.perf_counter() - start)
+    print(f"{n:,} trades: best {min(runs) * 1000:.0f} ms, median {sorted(runs)[2] * 1000:.0f} ms")
+    print(f"sharpe={result['sharpe_ratio']} sortino={result['sortino_ratio']} max_dd={result['max_drawdown']}")
+
+if __name__ == "__main__":
+    main()
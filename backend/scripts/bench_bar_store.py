@@ -0,0 +1,95 @@
+"""
+Benchmark: memory-mapped bar store vs pandas CSV for random range reads and
+full scans over synthetic 1-minute bars. Works in a temp directory.
+
+Usage: python scripts/bench_bar_store.py [years]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bar_store import BarStore
+
+def synthetic_bars(years: int) -> dict:
+    """Random-walk M1 bars, weekdays only"""
+    start = np.datetime64("2018-01-01T00:00", "s").astype(np.int64)
+    ts = start + np.arange(years * 365 * 1440, dtype=np.int64) * 60
+    weekday = (ts // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+    ts = ts[weekday < 5]
+    rng = np.random.default_rng(7)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0002, len(ts)))
+    spread = np.abs(rng.normal(0, 0.0003, len(ts)))
+    return {
+        "ts": ts,
+        "open": np.concatenate(([close[0]], close[:-1])),
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.integers(1, 500, len(ts)).astype(np.float64),
+    }
+
+def timed(label: str, fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:40} {best * 1000:>9.1f} ms")
+    return best
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bars = synthetic_bars(years)
+    n = len(bars["ts"])
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, "bars"))
+        csv_path = os.path.join(tmp, "EURUSD_M1.csv")
+
+        start = time.perf_counter()
+        store.write("EURUSD", "M1", bars)
+        print(f"{n:,} bars written to the store in {time.perf_counter() - start:.1f}s")
+        frame = pd.DataFrame(bars)
+        frame["time"] = pd.to_datetime(frame.pop("ts"), unit="s")
+        frame.to_csv(csv_path, index=False)
+        print(f"CSV: {os.path.getsize(csv_path) / 1e6:.0f} MB")
+
+        # 200 random one-week windows
+        random.seed(1)
+        windows = []
+        for _ in range(200):
+            i = random.randrange(0, n - 7200)
+            windows.append((int(bars["ts"][i]), int(bars["ts"][i + 7200])))
+
+        def store_ranges():
+            for lo, hi in windows:
+                float(store.read("EURUSD", "M1", lo, hi)["close"].sum())
+
+        def store_scan():
+            float(store.read("EURUSD", "M1", columns=("ts", "close"))["close"].sum())
+
+        def csv_ranges():
+            # Parse once, then slice - the best case for the CSV approach
+            df = pd.read_csv(csv_path, parse_dates=["time"]).set_index("time")
+            for lo, hi in windows:
+                float(df.loc[pd.Timestamp(lo, unit="s"):pd.Timestamp(hi, unit="s"), "close"].sum())
+
+        def csv_scan():
+            float(pd.read_csv(csv_path, usecols=["time", "close"])["close"].sum())
+
+        print()
+        store_r = timed("bar store: 200 random 1-week ranges", store_ranges)
+        csv_r = timed("pandas CSV: load + 200 ranges", csv_ranges, repeat=1)
+        store_s = timed("bar store: full scan (close)", store_scan)
+        csv_s = timed("pandas CSV: full scan (close)", csv_scan, repeat=1)
+        print(f"\nranges x{csv_r / store_r:.0f}, scan x{csv_s / store_s:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: challenge engine - events per second on one worker and how many
+progress writes a flush needs, against one update per affected challenge
+per event.
+
+Usage: python scripts/bench_challenges.py [users] [events]
+"""
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.challenges import ChallengeEngine
+
+# Rules of scripts/seed_gamification.py (type, target, rule)
+SEED_RULES = [
+    ("daily", 1, {"event": "trade_created"}),
+    ("daily", 3, {"event": "trade_created", "where": {"journaled": True}}),
+    ("daily", 1, {"event": "briefing_viewed", "where": {"morning": True}}),
+    ("weekly", 10, {"event": "trade_created"}),
+    ("weekly", 5, {"event": "trade_closed", "mode": "streak", "field": "followed_plan"}),
+    ("weekly", 3, {"event": "setup_analyzed"}),
+    ("weekly", 2, {"event": "post_created"}),
+    ("monthly", 50, {"event": "trade_created"}),
+    ("monthly", 55, {"event": "trade_closed", "mode": "ratio", "field": "win", "min_events": 20}),
+    ("monthly", 2, {"event": "backtest_completed"}),
+    ("monthly", 7, {"event": ["trade_created", "setup_analyzed", "briefing_viewed", "post_created"], "mode": "days"}),
+]
+
+EVENT_MIX = [("trade_created", 5), ("trade_closed", 4), ("setup_analyzed", 1), ("briefing_viewed", 1), ("post_created", 1)]
+
+def main():
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_events = int(sys.argv[2]) if len(sys.argv) > 2 else 300_000
+    rng = random.Random(42)
+    challenges = [{"_id": f"ch{k}", "type": kind, "target": target, "xp_reward": 50, "rule": rule}
+                  for k, (kind, target, rule) in enumerate(SEED_RULES)]
+    joined = [{"_id": f"{u}-{c['_id']}", "user_id": f"user{u}", "challenge_id": c["_id"]}
+              for u in range(n_users) for c in challenges if rng.random() < 0.5]
+    engine = ChallengeEngine()
+    start = time.perf_counter()
+    engine.load(challenges, joined)
+    print(f"{len(challenges)} challenges, {n_users:,} users, {len(joined):,} participations loaded in {time.perf_counter() - start:.2f} s")
+
+    types = [t for t, weight in EVENT_MIX for _ in range(weight)]
+    t0 = time.time()
+    # 5,000 events per second spread over 5,000 active users, one flush per second
+    active = [f"user{u}" for u in rng.sample(range(n_users), min(n_users, 5000))]
+    events = [{"type": rng.choice(types), "user_id": rng.choice(active), "ts": t0 + i / 5000,
+               "journaled": rng.random() < 0.3, "followed_plan": rng.random() < 0.7, "win": rng.random() < 0.5,
+               "morning": rng.random() < 0.4} for i in range(n_events)]
+    affected = sum(1 for e in events for ch in engine.by_event.get(e["type"], ()) if e["user_id"] in ch.participants)
+
+    start = time.perf_counter()
+    writes = flushes = 0
+    for i, event in enumerate(events):
+        engine.handle(event)
+        if i % 5000 == 4999:
+            writes += len(engine.take_writes())
+            flushes += 1
+    elapsed = time.perf_counter() - start
+    print(f"events:             {n_events:,} in {elapsed:.2f} s -> {n_events / elapsed:,.0f} events/s "
+          f"(target 5,000/s), writes built included")
+    print(f"progress writes:    {writes:,} over {flushes} flushes of 5,000 events "
+          f"({writes / flushes:,.0f} per flush) vs {affected:,} one-per-update ({affected / writes:.1f}x fewer)")
+    print(f"completions:        {len(engine.completions):,} rewards to pay (one guarded update each)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for the streaming trade export (rows/sec and peak RSS).
+Feeds a synthetic cursor so the numbers reflect serialization cost only.
+
+Usage: python scripts/bench_export.py [rows]
+"""
+import os
+import sys
+import time
+import random
+import resource
+from datetime import datetime, timezone, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exports import export_stream
+
+SYMBOLS = ["EURUSD", "GBPUSD", "XAUUSD", "NAS100", "BTCUSD"]
+
+def synthetic_cursor(rows: int):
+    """Yield trade documents one at a time, like a pymongo cursor"""
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for i in range(rows):
+        entry = 1 + random.random()
+        exit_price = entry * (1 + random.uniform(-0.01, 0.01))
+        yield {
+            "_id": f"trade-{i}",
+            "symbol": random.choice(SYMBOLS),
+            "direction": "LONG",
+            "entry_price": entry,
+            "exit_price": exit_price,
+            "stop_loss": entry * 0.99,
+            "take_profit": entry * 1.02,
+            "position_size": 1000.0,
+            "pnl": (exit_price - entry) * 1000,
+            "pnl_percent": round((exit_price - entry) / entry * 100, 2),
+            "status": "closed",
+            "setup_type": "day_trading",
+            "emotions": "calme",
+            "followed_plan": True,
+            "notes": "Entrée sur cassure",
+            "created_at": start + timedelta(minutes=i),
+            "updated_at": start + timedelta(minutes=i),
+        }
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(fmt: str, rows: int, compress: bool):
+    start = time.perf_counter()
+    total_bytes = 0
+    for chunk in export_stream(synthetic_cursor(rows), fmt, compress=compress):
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - start
+    label = f"{fmt}{'+gzip' if compress else ''}"
+    print(f"{label:14} {rows / elapsed:>12,.0f} rows/s  {total_bytes / 1e6:>8.1f} MB  peak RSS {peak_rss_mb():.0f} MB")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Exporting {rows:,} synthetic trades")
+    print(f"Baseline RSS {peak_rss_mb():.0f} MB")
+    formats = ["csv", "ndjson"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        print("pyarrow not installed, skipping parquet")
+    for fmt in formats:
+        run(fmt, rows, compress=False)
+        run(fmt, rows, compress=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: market gateway fan-out to 5k WebSocket clients - sustained tick
+ingestion with conflated publishing (10% of the clients are slow), event
+loop lag, and the same tick stream fanned out per tick without conflation.
+
+Sockets are in-process stand-ins (an awaitable send), so the numbers are
+the gateway's own cost, not the kernel's.
+
+Usage: python scripts/bench_gateway.py [clients] [symbols] [ticks_per_sec] [seconds]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.gateway import FeedGateway
+
+SUBSCRIPTIONS = 10      # symbols per client
+SLOW_SHARE = 0.1
+SLOW_SEND = 0.3         # seconds per frame for a slow client
+
+class Socket:
+    __slots__ = ("slow", "frames", "bytes", "largest")
+
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.frames = 0
+        self.bytes = 0
+        self.largest = 0
+
+    async def send(self, text: str):
+        if self.slow:
+            await asyncio.sleep(SLOW_SEND)
+        self.frames += 1
+        self.bytes += len(text)
+        self.largest = max(self.largest, text.count('{"type"'))
+
+def tick_stream(n_symbols: int, rng):
+    symbols = [f"SYM{k:03d}" for k in range(n_symbols)]
+    prices = rng.uniform(1, 1000, n_symbols)
+    popularity = 1 / np.arange(1, n_symbols + 1)   # a few symbols get most of the ticks
+    popularity /= popularity.sum()
+    return symbols, prices, popularity
+
+async def run(n_clients: int, n_symbols: int, rate: int, seconds: float):
+    rng = np.random.default_rng(38)
+    symbols, prices, popularity = tick_stream(n_symbols, rng)
+    gateway = FeedGateway()
+    sockets, clients, tasks = [], [], []
+    for k in range(n_clients):
+        socket = Socket(rng.random() < SLOW_SHARE)
+        client = gateway.connect(socket.send)
+        picks = rng.choice(n_symbols, SUBSCRIPTIONS, replace=False, p=popularity)
+        gateway.subscribe(client, [symbols[i] for i in picks])
+        sockets.append(socket)
+        clients.append(client)
+        tasks.append(asyncio.create_task(gateway.serve(client)))
+    await asyncio.sleep(0.5)
+
+    publish_times, lags = [], []
+    publish = gateway.publish
+
+    def timed_publish():
+        start = time.perf_counter()
+        handed = publish()
+        publish_times.append(time.perf_counter() - start)
+        return handed
+
+    gateway.publish = timed_publish
+
+    async def lag_probe():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    helpers = [asyncio.create_task(gateway._publish_loop()), asyncio.create_task(lag_probe())]
+    for socket in sockets:
+        socket.frames = socket.bytes = 0
+    base_sent = sum(c.sent for c in clients)
+
+    batch = max(1, rate // 100)      # ticks arrive in 10 ms bursts
+    picks = rng.choice(n_symbols, int(rate * seconds) + batch, p=popularity).tolist()
+    steps = np.exp(rng.normal(0, 0.0002, len(picks))).tolist()
+    start = time.perf_counter()
+    ts0 = 1_700_000_000.0
+    sent_ticks = 0
+    ingest = 0.0
+    while sent_ticks < rate * seconds:
+        t0 = time.perf_counter()
+        for j in range(sent_ticks, sent_ticks + batch):
+            s = picks[j]
+            prices[s] *= steps[j]
+            gateway.on_tick(symbols[s], prices[s], ts0 + j / rate)
+        ingest += time.perf_counter() - t0
+        sent_ticks += batch
+        delay = start + sent_ticks / rate - time.perf_counter()
+        await asyncio.sleep(max(delay, 0))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.5)
+
+    for task in tasks + helpers:
+        task.cancel()
+    delivered = sum(c.sent for c in clients) - base_sent
+    frames = sum(s.frames for s in sockets)
+    slow_frames = [s.frames for s in sockets if s.slow]
+    print(f"{n_clients:,} clients x {SUBSCRIPTIONS} symbols of {n_symbols}, "
+          f"{int(SLOW_SHARE * 100)}% slow ({SLOW_SEND * 1000:.0f} ms per frame), max {gateway.max_rate} updates/s/symbol")
+    print(f"ticks ingested:               {sent_ticks:,} in {elapsed:.1f} s -> {sent_ticks / elapsed:,.0f} ticks/s "
+          f"(on_tick {ingest / sent_ticks * 1e6:.1f} µs/tick)")
+    print(f"publish cycle:                {len(publish_times) / elapsed:.0f}/s, p50 "
+          f"{np.percentile(publish_times, 50) * 1000:.1f} ms, max {max(publish_times) * 1000:.1f} ms")
+    print(f"delivered:                    {delivered / elapsed:,.0f} updates/s in {frames / elapsed:,.0f} frames/s "
+          f"({sum(s.bytes for s in sockets) / elapsed / 2**20:.1f} MB/s)")
+    print(f"slow clients:                 {np.mean(slow_frames):.1f} frames each, largest frame "
+          f"{max(s.largest for s in sockets)} updates (<= {SUBSCRIPTIONS} subscriptions)")
+    print(f"event loop lag:               p50 {np.percentile(lags, 50) * 1000:.1f} ms, "
+          f"p99 {np.percentile(lags, 99) * 1000:.1f} ms")
+
+    # A frame holds at most one update per symbol, so this bounds updates/s per client and symbol
+    print(f"frames per client:            max {max(s.frames for s in sockets) / elapsed:.1f}/s "
+          f"(cap {gateway.max_rate}/s)")
+
+    # Without conflation: every tick encoded and queued for every subscriber
+    queues = {id(c): [] for c in clients}
+    sample = picks[:2000]
+    start = time.perf_counter()
+    for s in sample:
+        slot = gateway.board.slots[symbols[s]]
+        message = json.dumps(gateway.board.quote(slot))
+        for client in gateway.subscribers.get(slot, ()):
+            queues[id(client)].append(message)
+    per_tick = (time.perf_counter() - start) / len(sample)
+    queued = sum(len(q) for q in queues.values())
+    slow_backlog = rate / len(sample) * max(len(queues[id(c)]) for c, sk in zip(clients, sockets) if sk.slow)
+    print(f"per-tick fan-out, unbounded queues: {queued / len(sample):,.0f} messages per tick, "
+          f"{per_tick * 1000:.2f} ms per tick -> {1 / per_tick:,.0f} ticks/s max; "
+          f"a slow client's queue grows by up to ~{slow_backlog:,.0f} messages/s")
+
+def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rate = int(sys.argv[3]) if len(sys.argv) > 3 else 20_000
+    seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 5
+    asyncio.run(run(n_clients, n_symbols, rate, seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: legacy Python heatmap vs $dateToString aggregation vs daily rollup.
+Inserts synthetic closed trades (with a screenshot payload, like real journal
+entries) for a throwaway user, then removes them. Needs MONGO_URI.
+
+Usage: python scripts/bench_heatmap.py [trades]
+"""
+import os
+import sys
+import time
+import uuid
+import random
+from datetime import datetime, timezone, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import trades_collection, users_collection, daily_pnl_collection
+from utils.pnl_rollup import aggregate_heatmap, rebuild_rollup, rollup_heatmap
+
+SCREENSHOT = "A" * 20_000
+
+def legacy_heatmap(user_id: str, start_date: datetime, end_date: datetime) -> list:
+    """The pre-aggregation implementation, kept here for comparison"""
+    trades = list(trades_collection.find({
+        "user_id": user_id,
+        "status": "closed",
+        "created_at": {"$gte": start_date, "$lte": end_date}
+    }))
+    daily_pnl = {}
+    for trade in trades:
+        date_str = trade["created_at"].strftime("%Y-%m-%d")
+        daily_pnl[date_str] = daily_pnl.get(date_str, 0) + (trade.get("pnl") or 0)
+    return [{"date": date, "pnl": round(pnl, 2)} for date, pnl in sorted(daily_pnl.items())]
+
+def timed(label: str, fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:28} {best * 1000:>8.0f} ms  ({len(result)} buckets)")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    user_id = f"bench_heatmap_{uuid.uuid4().hex[:8]}"
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=365)
+    users_collection.insert_one({"_id": user_id, "email": f"{user_id}@bench.local", "timezone": "Europe/Paris"})
+    try:
+        batch = []
+        for i in range(n):
+            batch.append({
+                "_id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "status": "closed",
+                "pnl": random.gauss(5, 50),
+                "screenshot_base64": SCREENSHOT,
+                "created_at": start + timedelta(seconds=random.randint(0, 365 * 86400)),
+            })
+            if len(batch) == 5000:
+                trades_collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            trades_collection.insert_many(batch, ordered=False)
+        print(f"Inserted {n:,} trades")
+
+        timed("legacy (full docs, Python)", lambda: legacy_heatmap(user_id, start, end))
+        timed("aggregation day", lambda: aggregate_heatmap(user_id, start, end, "Europe/Paris", "day"))
+        timed("aggregation week", lambda: aggregate_heatmap(user_id, start, end, "Europe/Paris", "week"))
+        timed("rollup rebuild", lambda: rebuild_rollup(user_id, "Europe/Paris") or [], repeat=1)
+        timed("rollup day", lambda: rollup_heatmap(user_id, start, end, "Europe/Paris", "day"))
+        timed("rollup month", lambda: rollup_heatmap(user_id, start, end, "Europe/Paris", "month"))
+    finally:
+        trades_collection.delete_many({"user_id": user_id})
+        daily_pnl_collection.delete_many({"user_id": user_id})
+        users_collection.delete_one({"_id": user_id})
+
+if __name__ == "__main__":
+    main()
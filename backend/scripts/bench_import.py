@@ -0,0 +1,71 @@
+"""
+Benchmark for the bulk trade import pipeline.
+Writes a synthetic MT4 statement, imports it for a throwaway user and
+reports parse and end-to-end throughput. Needs MONGO_URI like the seed script.
+
+Usage: python scripts/bench_import.py [rows]
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from utils.database import trades_collection, trade_imports_collection
+from utils.trade_import import CHUNK_ROWS, _normalize_chunk, build_trades, run_import
+
+SYMBOLS = ["EURUSD", "GBPUSD", "XAUUSD", "USDJPY", "US30"]
+HEADER = "Ticket,Open Time,Type,Size,Item,Price,S / L,T / P,Close Time,Price,Commission,Taxes,Swap,Profit\n"
+
+def write_statement(path: str, rows: int):
+    start = datetime(2018, 1, 1)
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for i in range(rows):
+            opened = start + timedelta(minutes=7 * i)
+            closed = opened + timedelta(minutes=random.randint(1, 600))
+            entry = round(1 + random.random(), 5)
+            exit_price = round(entry * (1 + random.uniform(-0.005, 0.005)), 5)
+            side = random.choice(("buy", "sell"))
+            f.write(
+                f"{10_000_000 + i},{opened:%Y.%m.%d %H:%M:%S},{side},0.10,{random.choice(SYMBOLS).lower()},"
+                f"{entry},{entry * 0.99:.5f},{entry * 1.02:.5f},{closed:%Y.%m.%d %H:%M:%S},{exit_price},0,0,0,0\n"
+            )
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    write_statement(path, rows)
+    print(f"Statement: {rows:,} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    built = 0
+    for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS, dtype=str, skipinitialspace=True):
+        documents, _ = build_trades(_normalize_chunk(chunk, "mt4"), "bench", "bench")
+        built += len(documents)
+    parse_elapsed = time.perf_counter() - start
+    print(f"Parse + validate + build: {parse_elapsed:.2f}s ({built / parse_elapsed:,.0f} rows/s)")
+
+    user_id = f"bench_import_{uuid.uuid4().hex[:8]}"
+    import_id = str(uuid.uuid4())
+    trade_imports_collection.insert_one({"_id": import_id, "user_id": user_id, "status": "pending"})
+    try:
+        start = time.perf_counter()
+        run_import(import_id, user_id, path, "mt4")
+        elapsed = time.perf_counter() - start
+        job = trade_imports_collection.find_one({"_id": import_id})
+        print(f"End-to-end import: {elapsed:.2f}s ({job['imported'] / elapsed:,.0f} trades/s), status={job['status']}")
+    finally:
+        trades_collection.delete_many({"user_id": user_id})
+        trade_imports_collection.delete_one({"_id": import_id})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: batch indicator kernels vs naive pandas rolling implementations,
+plus per-bar cost of the incremental state objects.
+
+Usage: python scripts/bench_indicators.py [bars]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import indicators as ind
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def naive_ema(s: pd.Series, period: int) -> pd.Series:
+    # The usual hand-rolled version: rolling mean seed then a Python loop
+    values = s.to_numpy()
+    out = np.full(len(values), np.nan)
+    alpha = 2 / (period + 1)
+    out[period - 1] = values[:period].mean()
+    for i in range(period, len(values)):
+        out[i] = alpha * values[i] + (1 - alpha) * out[i - 1]
+    return pd.Series(out, index=s.index)
+
+def pandas_rsi(s: pd.Series, period: int) -> pd.Series:
+    change = s.diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+    loss = (-change.clip(upper=0)).ewm(alpha=1 / period, adjust=False).mean()
+    return 100 - 100 / (1 + gain / loss)
+
+def pandas_atr(df: pd.DataFrame, period: int) -> pd.Series:
+    prev = df["close"].shift()
+    tr = pd.concat([df["high"] - df["low"], (df["high"] - prev).abs(), (df["low"] - prev).abs()], axis=1).max(axis=1)
+    return tr.rolling(period).apply(lambda w: w.mean(), raw=True)
+
+def pandas_swings(df: pd.DataFrame, left: int, right: int) -> pd.Series:
+    window = left + right + 1
+    return df["high"].rolling(window, center=True).apply(lambda w: float(w.argmax() == left), raw=True)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(5)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0002, n))
+    spread = np.abs(rng.normal(0, 0.0003, n))
+    bars = {
+        "ts": 1_500_000_000 + np.arange(n, dtype=np.int64) * 60,
+        "high": close + spread, "low": close - spread, "close": close,
+        "volume": rng.integers(1, 500, n).astype(np.float64),
+    }
+    df = pd.DataFrame(bars)
+    s = df["close"]
+    naive_n = min(n, 200_000)  # Python-level rolling.apply is too slow for the full series
+    scale = n / naive_n
+
+    cases = [
+        ("SMA(20)", lambda: ind.sma(close, 20), lambda: s.rolling(20).mean(), 1),
+        ("EMA(200)", lambda: ind.ema(close, 200), lambda: naive_ema(s, 200), 1),
+        ("RSI(14)", lambda: ind.rsi(close, 14), lambda: pandas_rsi(s, 14), 1),
+        ("ATR(14)", lambda: ind.atr(bars["high"], bars["low"], close, 14),
+         lambda: pandas_atr(df.iloc[:naive_n], 14), scale),
+        ("Bollinger(20, 2)", lambda: ind.bollinger(close, 20), lambda: (s.rolling(20).mean(), s.rolling(20).std(ddof=0)), 1),
+        ("MACD(12, 26, 9)", lambda: ind.macd(close), lambda: naive_ema(naive_ema(s, 12) - naive_ema(s, 26), 9), 1),
+        ("VWAP (daily)", lambda: ind.vwap(bars["high"], bars["low"], close, bars["volume"], bars["ts"]),
+         lambda: ((df["high"] + df["low"] + df["close"]) / 3 * df["volume"]).groupby(df["ts"] // 86400).cumsum()
+         / df["volume"].groupby(df["ts"] // 86400).cumsum(), 1),
+        ("Swings(2, 2)", lambda: ind.swings(bars["high"], bars["low"]),
+         lambda: pandas_swings(df.iloc[:naive_n], 2, 2), scale),
+    ]
+    print(f"{n:,} bars\n{'indicator':18} {'numpy':>10} {'pandas':>10} {'speedup':>8}")
+    for label, fast, slow, factor in cases:
+        fast_t = best_of(fast)
+        slow_t = best_of(slow, repeat=1) * factor
+        print(f"{label:18} {fast_t * 1000:8.1f}ms {slow_t * 1000:8.0f}ms {slow_t / fast_t:7.1f}x")
+
+    live = 200_000
+    states = [ind.EMA(200), ind.RSI(14), ind.ATR(14), ind.Bollinger(20), ind.MACD()]
+    start = time.perf_counter()
+    for i in range(live):
+        c, h, l = close[i], bars["high"][i], bars["low"][i]
+        states[0].update(c)
+        states[1].update(c)
+        states[2].update(h, l, c)
+        states[3].update(c)
+        states[4].update(c)
+    per_bar = (time.perf_counter() - start) / live
+    print(f"\nincremental (EMA+RSI+ATR+Bollinger+MACD): {per_bar * 1e6:.1f} µs per bar")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: paper trading order book - placement rate, tick throughput and
+tick-to-fill latency with many resting orders, against scanning every
+working order on each tick.
+
+Usage: python scripts/bench_paper.py [orders] [symbols]
+"""
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.paper import ExecutionModel, PaperEngine, PaperOrder
+
+T0 = 1_700_000_000
+
+def resting_orders(n: int, symbols: list, rng: random.Random):
+    """Limits and stops spread +-5% around 100, brackets on half of them"""
+    for k in range(n):
+        side = rng.choice(("buy", "sell"))
+        type_ = rng.choice(("limit", "stop"))
+        below = (side == "buy") == (type_ == "limit")
+        price = 100 * (1 - rng.uniform(0.001, 0.05)) if below else 100 * (1 + rng.uniform(0.001, 0.05))
+        sign = 1 if side == "buy" else -1
+        bracket = k % 2 == 0
+        yield PaperOrder(f"user{k % 5000}", symbols[k % len(symbols)], side, type_, 1, round(price, 4),
+                         price * (1 - sign * 0.01) if bracket else None, price * (1 + sign * 0.02) if bracket else None)
+
+def linear_fills(orders: list, bid: float, ask: float) -> int:
+    hits = 0
+    for o in orders:
+        quote = ask if o.side == "buy" else bid
+        if (o.type == "limit") == (o.side == "buy"):
+            hits += quote <= o.price
+        else:
+            hits += quote >= o.price
+    return hits
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    rng = random.Random(40)
+    engine = PaperEngine(ExecutionModel(spread_bps=1, slippage_bps=0.5))
+    for symbol in symbols:
+        engine.on_tick(symbol, 100, T0)
+
+    orders = list(resting_orders(n, symbols, rng))
+    start = time.perf_counter()
+    for order in orders:
+        engine.place(order)
+    elapsed = time.perf_counter() - start
+    print(f"{n:,} resting orders on {n_symbols} symbols: placed in {elapsed:.2f} s -> {n / elapsed:,.0f} orders/s")
+
+    # Random walk ticks: most move a few bps and fill nothing, some cross levels
+    ticks, fills, latencies = 200_000, 0, []
+    prices = {s: 100.0 for s in symbols}
+    start = time.perf_counter()
+    for i in range(ticks):
+        symbol = symbols[i % n_symbols]
+        prices[symbol] *= 1 + rng.gauss(0, 0.0003)
+        t = time.perf_counter()
+        filled = engine.on_tick(symbol, prices[symbol], T0 + 1 + i)
+        if filled:
+            fills += len(filled)
+            latencies.append((time.perf_counter() - t) / len(filled))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"ticks:              {ticks:,} in {elapsed:.2f} s -> {ticks / elapsed:,.0f} ticks/s, {fills:,} fills")
+    if latencies:
+        print(f"tick-to-fill:       p50 {latencies[len(latencies) // 2] * 1e6:.1f} µs, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} µs per fill")
+    print(f"engine:             {engine.stats()}")
+
+    working = [o for o in engine.orders.values() if o.symbol == symbols[0]]
+    start = time.perf_counter()
+    for _ in range(20):
+        linear_fills(working, 99.99, 100.01)
+    scan = (time.perf_counter() - start) / 20
+    start = time.perf_counter()
+    for i in range(2000):
+        engine.on_quote("SCAN", 99.99, 100.01, T0 + i)
+    empty = (time.perf_counter() - start) / 2000
+    print(f"linear scan:        {scan * 1e3:.2f} ms per tick on {len(working):,} orders of one symbol "
+          f"(book tick without fills: {empty * 1e6:.1f} µs)")
+
+if __name__ == "__main__":
+    main()
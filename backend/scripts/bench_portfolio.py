@@ -0,0 +1,101 @@
+"""
+Benchmark: portfolio backtest scaling - symbols x years of H1 bars, shared
+capital and position limits - against a per-bar Python event loop (the usual
+"for each bar, for each symbol" implementation, timed on a slice and scaled).
+
+Usage: python scripts/bench_portfolio.py [symbols] [years]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.portfolio import PortfolioConfig, simulate
+from utils.rules import strategy_signals
+
+ENTRY_RULES = ["ema(20) crosses above ema(50)", "rsi(14) < 70"]
+EXIT_RULES = ["ema(20) crosses below ema(50)"]
+
+def synthetic_h1(symbol_index: int, years: int) -> dict:
+    """Random-walk H1 bars; every third symbol trades 24/7, the others weekdays only"""
+    start = np.datetime64("2015-01-01T00:00", "s").astype(np.int64)
+    ts = start + np.arange(years * 365 * 24, dtype=np.int64) * 3600
+    if symbol_index % 3:
+        ts = ts[(ts // 86400 + 3) % 7 < 5]  # 1970-01-01 was a Thursday
+    rng = np.random.default_rng(symbol_index)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, len(ts))))
+    spread = close * np.abs(rng.normal(0, 0.002, len(ts)))
+    return {
+        "ts": ts, "open": close, "high": close + spread, "low": close - spread,
+        "close": close, "volume": np.ones(len(ts)),
+    }
+
+def per_bar_loop(bars_by_symbol: dict, signals_by_symbol: dict, config: PortfolioConfig, rows: int) -> float:
+    """Reference: walk the union timeline bar by bar, symbol by symbol"""
+    grid = np.unique(np.concatenate([b["ts"] for b in bars_by_symbol.values()]))[:rows]
+    index = {s: {int(t): i for i, t in enumerate(b["ts"])} for s, b in bars_by_symbol.items()}
+    equity, positions = config.initial_capital, {}
+    for t in grid:
+        t = int(t)
+        for symbol, bars in bars_by_symbol.items():
+            i = index[symbol].get(t)
+            if i is None:
+                continue
+            if symbol in positions:
+                entry, qty = positions[symbol]
+                stop = entry * (1 - config.stop_loss_percent / 100)
+                target = entry * (1 + config.take_profit_percent / 100)
+                if bars["low"][i] <= stop or bars["high"][i] >= target or signals_by_symbol[symbol]["exit"][i]:
+                    price = stop if bars["low"][i] <= stop else target if bars["high"][i] >= target else bars["close"][i]
+                    equity += qty * (price - entry)
+                    del positions[symbol]
+            elif signals_by_symbol[symbol]["entry"][i] and len(positions) < config.max_positions:
+                notional = min(equity * config.risk_per_trade / config.stop_loss_percent,
+                               equity * config.max_position_percent / 100)
+                positions[symbol] = (bars["close"][i], notional / bars["close"][i])
+    return equity
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    config = PortfolioConfig(max_positions=10, max_position_percent=10)
+
+    start = time.perf_counter()
+    bars = {f"SYM{k:02d}": synthetic_h1(k, years) for k in range(n_symbols)}
+    total_bars = sum(len(b["ts"]) for b in bars.values())
+    print(f"{n_symbols} symbols x {years} years H1: {total_bars:,} bars "
+          f"(generated in {time.perf_counter() - start:.1f} s)")
+
+    start = time.perf_counter()
+    signals = {s: strategy_signals(ENTRY_RULES, EXIT_RULES, b) for s, b in bars.items()}
+    signals_t = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = simulate(bars, signals, config)
+    simulate_t = time.perf_counter() - start
+    print(f"signals (rules, all symbols):  {signals_t * 1000:8.0f} ms")
+    print(f"portfolio simulation:          {simulate_t * 1000:8.0f} ms")
+    print(f"  {result['bars']:,} timeline rows, {result['total_trades']:,} trades, "
+          f"{result['rejected_signals']:,} rejected by limits, max DD {result['max_drawdown_percent']}%")
+
+    # Memory is traced in separate runs: tracemalloc slows every allocation
+    for chunk in (5_000, 20_000, 100_000):
+        tracemalloc.start()
+        simulate(bars, signals, config, chunk_bars=chunk)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  chunk_bars={chunk:<7} peak memory {peak / 2**20:6.0f} MB")
+
+    rows = min(result["bars"], 10_000)
+    start = time.perf_counter()
+    per_bar_loop(bars, signals, config, rows)
+    loop_t = (time.perf_counter() - start) * result["bars"] / rows
+    print(f"per-bar Python loop (scaled):  {loop_t * 1000:8.0f} ms  -> {loop_t / simulate_t:.0f}x slower")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: many replay sessions in one worker - bar step throughput and
+memory per session with the shared window cache, against sessions that
+each load their whole date range.
+
+Usage: python scripts/bench_replay.py [sessions] [years]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import replay as replay_module
+from utils.bar_store import BarStore
+from utils.replay import ReplaySession
+
+START = 1_577_836_800  # 2020-01-01
+
+def synthetic_m1(n: int, seed: int = 39) -> dict:
+    rng = np.random.default_rng(seed)
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.0002, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    wick = close * np.abs(rng.normal(0, 0.0001, n))
+    return {
+        "ts": START + np.arange(n, dtype=np.int64) * 60,
+        "open": open_, "high": np.maximum(open_, close) + wick, "low": np.minimum(open_, close) - wick,
+        "close": close, "volume": np.ones(n),
+    }
+
+def main():
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    n_bars = years * 365 * 1440
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        store.write("EURUSD", "M1", synthetic_m1(n_bars))
+        # Practice sessions cluster on a few dates (the same backtest, popular events)
+        starts = [START + (k % 30) * 86400 * 7 for k in range(n_sessions)]
+        backtest = {"_id": "bt", "symbol": "EURUSD", "timeframe": "M1", "initial_capital": 10000, "trades": []}
+        print(f"{n_sessions} sessions on EURUSD M1 ({n_bars:,} bars over {years} years), 30 distinct start dates")
+
+        tracemalloc.start()
+        sessions = [ReplaySession(backtest, f"user{k}", start=s, store=store) for k, s in enumerate(starts)]
+        for session in sessions:
+            session.advance(1)
+        shared = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"memory, shared windows:       {shared / n_sessions / 1024:8.1f} KB per session "
+              f"({len(replay_module._windows)} windows cached, views on the shared memory maps)")
+
+        rounds = 2000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for session in sessions:
+                session.advance(1)
+        elapsed = time.perf_counter() - start
+        steps = rounds * n_sessions
+        print(f"bar steps:                    {steps:,} in {elapsed:.2f} s -> {steps / elapsed:,.0f} bars/s "
+              f"({steps / elapsed / n_sessions:,.0f} bars/s per session)")
+
+        sample = 20
+        tracemalloc.start()
+        private = [store.read("EURUSD", "M1", start=s) for s in starts[:sample]]
+        copied = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del private
+        print(f"memory, whole range per session: {copied / sample / 2**20:8.1f} MB per session "
+              f"(ranges spanning years are concatenated copies)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for the resampling engine: M1 -> higher timeframe throughput per
+session, tier build time, and H4 reads from the persisted tier vs from M1.
+
+Usage: python scripts/bench_resample.py [years]
+"""
+import os
+import sys
+import time
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bar_store import BarStore
+from utils.resample import resample, build_tiers, read_bars
+from scripts.bench_bar_store import synthetic_bars
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bars = synthetic_bars(years)
+    n = len(bars["ts"])
+    print(f"{n:,} M1 bars ({years} years)\n")
+
+    print(f"{'':6} {'utc':>22} {'forex':>22}")
+    for timeframe in ("M5", "H1", "H4", "D1", "W1"):
+        cells = []
+        for session in ("utc", "forex"):
+            elapsed = best_of(lambda: resample(bars, timeframe, session))
+            cells.append(f"{elapsed * 1000:7.1f} ms {n / elapsed / 1e6:6.1f} M/s")
+        print(f"{timeframe:6} {cells[0]:>22} {cells[1]:>22}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, "bars"))
+        store.write("EURUSD", "M1", bars)
+        start = time.perf_counter()
+        build_tiers("EURUSD", store=store)
+        print(f"\nbuild_tiers (M5..W1, forex): {time.perf_counter() - start:.2f}s")
+
+        tier = best_of(lambda: read_bars("EURUSD", "H4", store=store))
+        h4 = read_bars("EURUSD", "H4", store=store)
+        store_m1_only = BarStore(os.path.join(tmp, "bars"))
+        from_m1 = best_of(lambda: resample(store_m1_only.read("EURUSD", "M1"), "H4", "forex"))
+        print(f"H4 over {years} years ({len(h4['ts']):,} bars): tier {tier * 1000:.2f} ms, "
+              f"from M1 {from_m1 * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
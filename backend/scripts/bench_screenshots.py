@@ -0,0 +1,101 @@
+"""
+Benchmark for screenshot preprocessing on a synthetic corpus of chart
+captures (4K, 1440p and 1080p, PNG and JPEG, with and without empty
+margins): bytes uploaded, vision tokens, processing time cold and cached,
+and the upload part of the end-to-end latency at a given uplink, before and
+after preprocessing.
+
+Usage: python scripts/bench_screenshots.py [captures] [uplink Mbit/s]
+"""
+import asyncio
+import base64
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.screenshots import ScreenshotProcessor, vision_tokens
+
+SIZES = [(3840, 2160), (2560, 1440), (1920, 1080)]
+
+def capture(width: int, height: int, margin: int, fmt: str, rng) -> bytes:
+    """A dark-theme candle chart with grid, price scale and a toolbar"""
+    image = Image.new("RGB", (width, height), (19, 23, 34))
+    draw = ImageDraw.Draw(image)
+    left, top, right, bottom = margin, margin + 40, width - margin - 80, height - margin
+    draw.rectangle((margin, margin, width - margin, margin + 36), fill=(30, 34, 45))
+    for i in range(8):
+        draw.text((margin + 10 + i * 90, margin + 12), f"Outil {i}", fill=(180, 180, 190))
+    for y in range(top, bottom, 60):
+        draw.line((left, y, right, y), fill=(36, 41, 56))
+        draw.text((right + 8, y - 6), f"{1.1 + (bottom - y) / 10000:.4f}", fill=(150, 150, 160))
+    for x in range(left, right, 120):
+        draw.line((x, top, x, bottom), fill=(36, 41, 56))
+    n = (right - left) // 12
+    close = (bottom + top) / 2 + np.cumsum(rng.normal(0, 6, n))
+    close = np.clip(close, top + 40, bottom - 40)
+    opens = np.concatenate(([close[0]], close[:-1]))
+    for i in range(n):
+        x = left + i * 12 + 2
+        hi, lo = min(opens[i], close[i]) - rng.random() * 15, max(opens[i], close[i]) + rng.random() * 15
+        color = (38, 166, 154) if close[i] < opens[i] else (239, 83, 80)
+        draw.line((x + 4, hi, x + 4, lo), fill=color)
+        draw.rectangle((x, min(opens[i], close[i]), x + 8, max(opens[i], close[i]) + 1), fill=color)
+    out = io.BytesIO()
+    image.save(out, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return out.getvalue()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    uplink = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0     # Mbit/s
+    rng = np.random.default_rng(5)
+    corpus = []
+    for i in range(count):
+        width, height = SIZES[i % len(SIZES)]
+        raw = capture(width, height, 0 if i % 2 else 160, "PNG" if i % 4 < 2 else "JPEG", rng)
+        corpus.append((width, height, base64.b64encode(raw).decode()))
+
+    processor = ScreenshotProcessor()
+    start = time.perf_counter()
+    results = [processor.process(data) for _, _, data in corpus]
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _, _, data in corpus:
+        processor.process(data)
+    warm = time.perf_counter() - start
+
+    pooled = ScreenshotProcessor()
+
+    async def concurrent():
+        return await asyncio.gather(*(pooled.prepare(data) for _, _, data in corpus))
+
+    start = time.perf_counter()
+    asyncio.run(concurrent())
+    parallel = time.perf_counter() - start
+    pooled.shutdown()
+
+    sent_before = sum(len(data) for _, _, data in corpus)
+    sent_after = sum(len(r["data"]) for r in results)
+    tokens_before = sum(vision_tokens(w, h) for w, h, _ in corpus)
+    tokens_after = sum(vision_tokens(r["width"], r["height"]) for r in results)
+    upload_before = sent_before * 8 / (uplink * 1e6) / count
+    upload_after = sent_after * 8 / (uplink * 1e6) / count
+    print(f"{count} captures ({', '.join(f'{w}x{h}' for w, h in SIZES)}; PNG and JPEG)")
+    print(f"payload: {sent_before / count / 1024:.0f} KB -> {sent_after / count / 1024:.0f} KB per capture "
+          f"({1 - sent_after / sent_before:.0%} saved)")
+    print(f"vision tokens: {tokens_before / count:.0f} -> {tokens_after / count:.0f} per capture")
+    print(f"processing: {cold / count * 1000:.1f} ms cold, {warm / count * 1000:.2f} ms cached, "
+          f"{parallel / count * 1000:.1f} ms/capture on {pooled.workers} threads")
+    print(f"upload at {uplink:g} Mbit/s: {upload_before * 1000:.0f} ms -> {upload_after * 1000:.0f} ms, "
+          f"end to end with processing {(upload_after + cold / count) * 1000:.0f} ms "
+          f"({upload_before * 1000 - (upload_after + cold / count) * 1000:.0f} ms saved per request, "
+          f"{upload_before * 1000 - (upload_after + warm / count) * 1000:.0f} ms cached)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Ingest OHLCV CSV files into the local bar store.
+Accepts generic CSVs (time,open,high,low,close,volume) and MetaTrader
+history exports (<DATE>,<TIME>,<OPEN>,...,<TICKVOL>). Re-ingesting a file is
+safe: bars with the same timestamp are replaced. M1 ingests also refresh the
+pre-aggregated M5..W1 tiers from the first ingested bar on.
+
+Usage: python scripts/ingest_bars.py SYMBOL TIMEFRAME file.csv [file.csv ...]
+"""
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bar_store import bar_store, bars_from_csv, normalize_symbol, normalize_timeframe
+from utils.resample import BASE_TIMEFRAME, build_tiers
+
+def main():
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    symbol = normalize_symbol(sys.argv[1])
+    timeframe = normalize_timeframe(sys.argv[2])
+
+    since = None
+    for path in sys.argv[3:]:
+        start = time.perf_counter()
+        written = 0
+        for bars in bars_from_csv(path):
+            written += bar_store.write(symbol, timeframe, bars)
+            if len(bars["ts"]):
+                first = int(bars["ts"].min())
+                since = first if since is None else min(since, first)
+        print(f"✅ {path}: {written:,} barres en {time.perf_counter() - start:.1f}s")
+
+    if timeframe == BASE_TIMEFRAME and since is not None:
+        start = time.perf_counter()
+        counts = build_tiers(symbol, since=since)
+        print(f"✅ Timeframes agrégés ({', '.join(counts)}) en {time.perf_counter() - start:.1f}s")
+
+    first, last, count = bar_store.bounds(symbol, timeframe)
+    print(f"📊 {symbol} {timeframe}: {count:,} barres ({time.strftime('%Y-%m-%d', time.gmtime(first))} → "
+          f"{time.strftime('%Y-%m-%d', time.gmtime(last))}) dans {bar_store.root}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Deliver domain events again: move the offset of the given subscribers (all
+by default) back to an outbox offset or a UTC date; the running dispatcher
+picks it up on its next round. Meant for a subscriber that missed events
+(parked batch, outage): stats, leaderboards, streaks, XP and unlocks absorb
+events already applied, event counters (achievements, challenge progress)
+count them again - run backfill_achievements.py after a broad replay.
+
+Usage: python scripts/replay_events.py <offset | 2026-10-01T00:00:00> [subscriber ...]
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.events import as_offset, event_dispatcher
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    try:
+        offset = datetime.fromisoformat(sys.argv[1])
+        offset = offset.replace(tzinfo=offset.tzinfo or timezone.utc)
+    except ValueError:
+        offset = sys.argv[1]
+    moved = event_dispatcher.replay(offset, sys.argv[2:] or None)
+    print(f"✅ {moved} abonné(s) replacé(s) à {as_offset(offset)}")
+
+if __name__ == "__main__":
+    main()
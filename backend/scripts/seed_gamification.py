@@ -13,9 +13,10 @@ from utils.database import (
     challenges_collection, achievements_collection, 
     rewards_collection, seasons_collection
 )
+from utils.seasons import season_doc
 
 def seed_challenges():
-    """Seed challenges collection"""
+    """Seed challenges collection (`rule`: the events that advance a challenge, see utils/challenges.py)"""
     challenges = [
         # Daily Challenges
         {
@@ -27,6 +28,7 @@ def seed_challenges():
             "xp_reward": 50,
             "duration_days": 1,
             "difficulty": "easy",
+            "rule": {"event": "trade_created"},
             "active": True
         },
         {
@@ -38,6 +40,7 @@ def seed_challenges():
             "xp_reward": 75,
             "duration_days": 1,
             "difficulty": "medium",
+            "rule": {"event": "trade_created", "where": {"journaled": True}},
             "active": True
         },
         {
@@ -49,6 +52,7 @@ def seed_challenges():
             "xp_reward": 30,
             "duration_days": 1,
             "difficulty": "easy",
+            "rule": {"event": "briefing_viewed", "where": {"morning": True}},
             "active": True
         },
         # Weekly Challenges
@@ -61,6 +65,7 @@ def seed_challenges():
             "xp_reward": 200,
             "duration_days": 7,
             "difficulty": "medium",
+            "rule": {"event": "trade_created"},
             "active": True
         },
         {
@@ -72,6 +77,7 @@ def seed_challenges():
             "xp_reward": 300,
             "duration_days": 7,
             "difficulty": "hard",
+            "rule": {"event": "trade_closed", "mode": "streak", "field": "followed_plan"},
             "active": True
         },
         {
@@ -83,6 +89,7 @@ def seed_challenges():
             "xp_reward": 150,
             "duration_days": 7,
             "difficulty": "medium",
+            "rule": {"event": "setup_analyzed"},
             "active": True
         },
         {
@@ -94,6 +101,7 @@ def seed_challenges():
             "xp_reward": 100,
             "duration_days": 7,
             "difficulty": "easy",
+            "rule": {"event": "post_created"},
             "active": True
         },
         # Monthly Challenges
@@ -106,6 +114,7 @@ def seed_challenges():
             "xp_reward": 500,
             "duration_days": 30,
             "difficulty": "hard",
+            "rule": {"event": "trade_created"},
             "active": True
         },
         {
@@ -117,6 +126,7 @@ def seed_challenges():
             "xp_reward": 750,
             "duration_days": 30,
             "difficulty": "hard",
+            "rule": {"event": "trade_closed", "mode": "ratio", "field": "win", "min_events": 20},
             "active": True
         },
         {
@@ -128,6 +138,7 @@ def seed_challenges():
             "xp_reward": 400,
             "duration_days": 30,
             "difficulty": "medium",
+            "rule": {"event": "backtest_completed"},
             "active": True
         },
         {
@@ -139,6 +150,7 @@ def seed_challenges():
             "xp_reward": 350,
             "duration_days": 30,
             "difficulty": "medium",
+            "rule": {"event": ["trade_created", "setup_analyzed", "briefing_viewed", "post_created"], "mode": "days"},
             "active": True
         }
     ]
@@ -149,7 +161,7 @@ def seed_challenges():
     print(f"✅ {len(challenges)} challenges créés")
 
 def seed_achievements():
-    """Seed achievements/badges collection"""
+    """Seed achievements/badges collection (`rule`: minimum per-user counters, see utils/achievements.py)"""
     achievements = [
         # Trading Milestones
         {
@@ -159,7 +171,8 @@ def seed_achievements():
             "icon": "rocket",
             "xp_reward": 100,
             "rarity": "common",
-            "category": "trading"
+            "category": "trading",
+            "rule": {"trades": 1}
         },
         {
             "_id": "ach_10_trades",
@@ -168,7 +181,8 @@ def seed_achievements():
             "icon": "chart-line",
             "xp_reward": 200,
             "rarity": "common",
-            "category": "trading"
+            "category": "trading",
+            "rule": {"trades": 10}
         },
         {
             "_id": "ach_50_trades",
@@ -177,7 +191,8 @@ def seed_achievements():
             "icon": "chart-bar",
             "xp_reward": 500,
             "rarity": "uncommon",
-            "category": "trading"
+            "category": "trading",
+            "rule": {"trades": 50}
         },
         {
             "_id": "ach_100_trades",
@@ -186,7 +201,8 @@ def seed_achievements():
             "icon": "crown",
             "xp_reward": 1000,
             "rarity": "rare",
-            "category": "trading"
+            "category": "trading",
+            "rule": {"trades": 100}
         },
         {
             "_id": "ach_500_trades",
@@ -195,7 +211,8 @@ def seed_achievements():
             "icon": "gem",
             "xp_reward": 2500,
             "rarity": "legendary",
-            "category": "trading"
+            "category": "trading",
+            "rule": {"trades": 500}
         },
         # Winrate Achievements
         {
@@ -205,7 +222,8 @@ def seed_achievements():
             "icon": "balance-scale",
             "xp_reward": 300,
             "rarity": "common",
-            "category": "performance"
+            "category": "performance",
+            "rule": {"closed_trades": 20, "winrate": 50}
         },
         {
             "_id": "ach_winrate_60",
@@ -214,7 +232,8 @@ def seed_achievements():
             "icon": "trophy",
             "xp_reward": 750,
             "rarity": "uncommon",
-            "category": "performance"
+            "category": "performance",
+            "rule": {"closed_trades": 50, "winrate": 60}
         },
         {
             "_id": "ach_winrate_70",
@@ -223,7 +242,8 @@ def seed_achievements():
             "icon": "crosshairs",
             "xp_reward": 1500,
             "rarity": "rare",
-            "category": "performance"
+            "category": "performance",
+            "rule": {"closed_trades": 100, "winrate": 70}
         },
         # Streak Achievements
         {
@@ -233,7 +253,8 @@ def seed_achievements():
             "icon": "fire",
             "xp_reward": 100,
             "rarity": "common",
-            "category": "engagement"
+            "category": "engagement",
+            "rule": {"best_streak": 3}
         },
         {
             "_id": "ach_streak_7",
@@ -242,7 +263,8 @@ def seed_achievements():
             "icon": "fire-alt",
             "xp_reward": 300,
             "rarity": "uncommon",
-            "category": "engagement"
+            "category": "engagement",
+            "rule": {"best_streak": 7}
         },
         {
             "_id": "ach_streak_30",
@@ -251,7 +273,8 @@ def seed_achievements():
             "icon": "medal",
             "xp_reward": 1000,
             "rarity": "rare",
-            "category": "engagement"
+            "category": "engagement",
+            "rule": {"best_streak": 30}
         },
         # AI Features
         {
@@ -261,7 +284,8 @@ def seed_achievements():
             "icon": "brain",
             "xp_reward": 150,
             "rarity": "common",
-            "category": "ai"
+            "category": "ai",
+            "rule": {"analyses": 1}
         },
         {
             "_id": "ach_first_coaching",
@@ -270,7 +294,8 @@ def seed_achievements():
             "icon": "user-graduate",
             "xp_reward": 150,
             "rarity": "common",
-            "category": "ai"
+            "category": "ai",
+            "rule": {"coachings": 1}
         },
         {
             "_id": "ach_first_backtest",
@@ -279,7 +304,8 @@ def seed_achievements():
             "icon": "flask",
             "xp_reward": 200,
             "rarity": "common",
-            "category": "ai"
+            "category": "ai",
+            "rule": {"backtests": 1}
         },
         {
             "_id": "ach_10_backtests",
@@ -288,7 +314,8 @@ def seed_achievements():
             "icon": "microscope",
             "xp_reward": 750,
             "rarity": "uncommon",
-            "category": "ai"
+            "category": "ai",
+            "rule": {"backtests": 10}
         },
         # Community
         {
@@ -298,7 +325,8 @@ def seed_achievements():
             "icon": "comments",
             "xp_reward": 100,
             "rarity": "common",
-            "category": "community"
+            "category": "community",
+            "rule": {"posts": 1}
         },
         {
             "_id": "ach_10_likes",
@@ -307,7 +335,8 @@ def seed_achievements():
             "icon": "heart",
             "xp_reward": 300,
             "rarity": "uncommon",
-            "category": "community"
+            "category": "community",
+            "rule": {"likes_received": 10}
         },
         {
             "_id": "ach_helpful",
@@ -316,7 +345,8 @@ def seed_achievements():
             "icon": "hands-helping",
             "xp_reward": 400,
             "rarity": "uncommon",
-            "category": "community"
+            "category": "community",
+            "rule": {"comments_given": 5}
         },
         # Special
         {
@@ -496,30 +526,8 @@ def seed_rewards():
     print(f"✅ {len(rewards)} récompenses créées")
 
 def seed_seasons():
-    """Seed current season"""
-    now = datetime.now(timezone.utc)
-    season_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Get next month for end date
-    if now.month == 12:
-        season_end = season_start.replace(year=now.year + 1, month=1)
-    else:
-        season_end = season_start.replace(month=now.month + 1)
-    
-    season = {
-        "_id": "season_2026_02",
-        "name": "Saison Février 2026",
-        "start_date": season_start.isoformat(),
-        "end_date": season_end.isoformat(),
-        "active": True,
-        "rewards": [
-            {"rank": 1, "title": "Champion de la Saison", "xp_bonus": 5000, "badge": "season_champion"},
-            {"rank": 2, "title": "Vice-Champion", "xp_bonus": 3000, "badge": "season_silver"},
-            {"rank": 3, "title": "Médaille de Bronze", "xp_bonus": 2000, "badge": "season_bronze"},
-            {"rank_range": [4, 10], "title": "Top 10", "xp_bonus": 1000, "badge": "season_top10"},
-            {"rank_range": [11, 50], "title": "Top 50", "xp_bonus": 500, "badge": "season_top50"}
-        ]
-    }
+    """Seed current season (later seasons are opened by utils/seasons.py)"""
+    season = season_doc(datetime.now(timezone.utc))
     
     # Clear and insert
     seasons_collection.delete_many({})
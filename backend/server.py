@@ -5,6 +5,7 @@ FastAPI server with modular routers
 import os
 from datetime import datetime, timezone
 from contextlib import asynccontextmanager
+from functools import partial
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,13 +14,33 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import routers
-from routers import auth, trades, ai, community, gamification, backtest, tickets, push, payments, notifications
+from routers import auth, trades, ai, community, gamification, backtest, tickets, push, payments, notifications, market, alerts, stream, paper, system
 
 # Import database for startup tasks
 from utils.database import (
-    client, users_collection, trades_collection, 
-    setups_collection, payment_transactions_collection
+    client, users_collection, trades_collection, daily_pnl_collection, 
+    setups_collection, payment_transactions_collection, user_watchlists_collection,
+    alerts_collection, user_alerts_collection, paper_orders_collection,
+    exposure_snapshots_collection, user_challenges_collection, user_achievements_collection,
+    xp_transactions_collection, streaks_collection, season_standings_collection,
+    outbox_collection, event_failures_collection, scheduler_runs_collection, daily_briefings_collection
 )
+from utils.patterns import pattern_scanner
+from utils.screenshots import screenshot_processor
+from utils.alerts import alert_service
+from utils.feeds import feed_from_url
+from utils.gateway import market_gateway
+from utils.paper import paper_service
+from utils.exposure import SNAPSHOT_CRON, exposure_service
+from utils.challenges import challenge_service
+from utils.achievements import achievement_service
+from utils.xp import RECONCILE_CRON, xp_service
+from utils.streaks import SWEEP_CRON, streak_tracker
+from utils.seasons import ROLL_CRON, season_service
+from utils.leaderboard import leaderboard_service
+from utils.events import RETENTION_DAYS, event_dispatcher, subscribe
+from utils.scheduler import RUN_HISTORY_DAYS, scheduler
+from utils.briefings import BRIEFING_CRON, briefing_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,10 +48,82 @@ async def lifespan(app: FastAPI):
     users_collection.create_index("email", unique=True)
     trades_collection.create_index("user_id")
     trades_collection.create_index("created_at")
+    trades_collection.create_index([("user_id", 1), ("created_at", 1)])
+    trades_collection.create_index([("user_id", 1), ("status", 1)])
+    trades_collection.create_index(
+        [("user_id", 1), ("broker_trade_id", 1)],
+        unique=True,
+        partialFilterExpression={"broker_trade_id": {"$exists": True}}
+    )
+    daily_pnl_collection.create_index([("user_id", 1), ("date", 1)])
     setups_collection.create_index("user_id")
+    user_watchlists_collection.create_index("user_id")
+    user_alerts_collection.create_index([("user_id", 1), ("active", 1)])
+    alerts_collection.create_index([("user_id", 1), ("triggered_at", -1)])
+    paper_orders_collection.create_index([("user_id", 1), ("status", 1)])
+    paper_orders_collection.create_index([("status", 1), ("created_ts", 1)])
+    trades_collection.create_index("close_requested", partialFilterExpression={"close_requested": True})
+    exposure_snapshots_collection.create_index([("user_id", 1), ("time", -1)])
+    user_challenges_collection.create_index([("user_id", 1), ("challenge_id", 1)], unique=True)
+    user_achievements_collection.create_index([("user_id", 1), ("achievement_id", 1)], unique=True)
+    xp_transactions_collection.create_index([("user_id", 1), ("created_at", -1)])
+    streaks_collection.create_index("user_id")
+    streaks_collection.create_index([("timezone", 1), ("current_streak", 1), ("last_day", 1)])
+    streaks_collection.create_index([("timezone", 1), ("last_day", 1)])
+    season_standings_collection.create_index([("season_id", 1), ("rank", 1)])
+    season_standings_collection.create_index([("user_id", 1), ("season_id", 1)])
+    outbox_collection.create_index("created_at", expireAfterSeconds=RETENTION_DAYS * 86400)
+    event_failures_collection.create_index([("subscriber", 1), ("failed_at", -1)])
+    scheduler_runs_collection.create_index([("job", 1), ("started_at", -1)])
+    scheduler_runs_collection.create_index("finished_at", expireAfterSeconds=RUN_HISTORY_DAYS * 86400)
+    users_collection.create_index("push_subscription.expires_at", sparse=True)
+    daily_briefings_collection.create_index("expires_at", expireAfterSeconds=0)
+    daily_briefings_collection.create_index([("date", 1), ("bucket", 1)])
     payment_transactions_collection.create_index("session_id")
+    # Challenge progress, achievements, XP and streaks from domain events
+    challenge_service.start()
+    achievement_service.start()
+    xp_service.start()
+    streak_tracker.start()
+    # Domain events: user stats, leaderboards and pushes, then delivery from the outbox
+    subscribe(trades.refresh_user_stats, name="stats", batch=True)
+    subscribe(push.on_domain_event, name="push")
+    leaderboard_service.start()
+    event_dispatcher.start()
+    # Scheduled jobs (one run per occurrence across workers)
+    scheduler.add("season_roll", ROLL_CRON, season_service.roll)
+    scheduler.add("streak_sweep", SWEEP_CRON, streak_tracker.sweep)
+    scheduler.add("xp_reconcile", RECONCILE_CRON, xp_service.reconcile, jitter=300)
+    scheduler.add("stats_reconcile", "30 3 * * *", trades.reconcile_user_stats, jitter=600)
+    scheduler.add("push_cleanup", "45 4 * * *", push.cleanup_push_subscriptions, jitter=600)
+    scheduler.add("briefing_pregen", BRIEFING_CRON, partial(briefing_service.pregenerate, ai.generate_briefing), lease=1800)
+    if os.environ.get("MARKET_FEED"):
+        scheduler.add("exposure_snapshot", SNAPSHOT_CRON, exposure_service.snapshot)
+    scheduler.start()
+    # Live prices (WebSocket stream, price alerts, paper trading, open P&L) when a feed is configured
+    if os.environ.get("MARKET_FEED"):
+        market_gateway.listeners.append(alert_service.process)
+        market_gateway.listeners.append(paper_service.process)
+        market_gateway.listeners.append(exposure_service.process)
+        market_gateway.start(feed_from_url(os.environ["MARKET_FEED"]))
+        alert_service.start()
+        paper_service.start()
+        exposure_service.start()
     yield
     # Shutdown
+    await scheduler.stop()
+    await event_dispatcher.stop()
+    await market_gateway.stop()
+    await alert_service.stop()
+    await paper_service.stop()
+    await exposure_service.stop()
+    await challenge_service.stop()
+    await achievement_service.stop()
+    await xp_service.stop()
+    await streak_tracker.stop()
+    await leaderboard_service.stop()
+    pattern_scanner.shutdown()
+    screenshot_processor.shutdown()
     client.close()
 
 app = FastAPI(title="Trading AI Platform", lifespan=lifespan)
@@ -55,6 +148,11 @@ app.include_router(tickets.router)
 app.include_router(push.router)
 app.include_router(payments.router)
 app.include_router(notifications.router)
+app.include_router(market.router)
+app.include_router(alerts.router)
+app.include_router(stream.router)
+app.include_router(paper.router)
+app.include_router(system.router)
 
 # ============== HEALTH CHECK ==============
 
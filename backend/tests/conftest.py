@@ -0,0 +1,24 @@
+"""
+Unit test setup: utils.database is replaced by a stub module, so the modules
+importing its collections load without MONGO_URI and never reach MongoDB
+"""
+import os
+import sys
+from types import ModuleType
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubDatabase(ModuleType):
+    """Every attribute (collection, helper) is a MagicMock, the same one on each access"""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = MagicMock(name=f"utils.database.{name}")
+        setattr(self, name, value)
+        return value
+
+
+sys.modules["utils.database"] = StubDatabase("utils.database")
@@ -0,0 +1,78 @@
+"""
+Achievement Engine Test Suite
+Event counters, rule evaluation and the changed-input index
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.achievements import AchievementEngine, AchievementService, counter_increments
+
+ACHIEVEMENTS = [
+    {"_id": "first_trade", "title": "Premier Pas", "rule": {"trades": 1}},
+    {"_id": "10_trades", "rule": {"trades": 10}},
+    {"_id": "winrate_50", "rule": {"closed_trades": 4, "winrate": 50}},
+    {"_id": "first_post", "rule": {"posts": 1}},
+    {"_id": "early_adopter", "title": "Early Adopter"},
+]
+
+
+@pytest.fixture
+def engine():
+    engine = AchievementEngine()
+    engine.load(ACHIEVEMENTS)
+    return engine
+
+
+class TestCounters:
+    """Events to counter increments"""
+
+    def test_increments(self):
+        assert counter_increments({"type": "trade_created"}) == {"trades": 1}
+        assert counter_increments({"type": "trade_closed", "win": True}) == {"closed_trades": 1, "wins": 1}
+        assert counter_increments({"type": "trade_closed", "win": False}) == {"closed_trades": 1}
+        assert counter_increments({"type": "comment_created", "own_post": True}) == {}
+        assert counter_increments({"type": "comment_created", "own_post": False}) == {"comments_given": 1}
+        assert counter_increments({"type": "briefing_viewed"}) == {}
+
+
+class TestEvaluation:
+    """Rules, derived winrate and already unlocked badges"""
+
+    def test_rules_without_rule_skipped_unknown_rejected(self, engine):
+        assert "early_adopter" not in engine.achievements
+        with pytest.raises(ValueError):
+            AchievementEngine().load([{"_id": "x", "rule": {"pips": 100}}])
+
+    def test_thresholds(self, engine):
+        met = engine.evaluate({"trades": 10, "posts": 0}, set())
+        assert {a.id for a in met} == {"first_trade", "10_trades"}
+        assert [a.id for a in engine.evaluate({"trades": 10}, {"first_trade"})] == ["10_trades"]
+
+    def test_winrate_needs_min_trades(self, engine):
+        assert not engine.evaluate({"closed_trades": 3, "wins": 3}, set(), changed={"wins"})
+        assert [a.id for a in engine.evaluate({"closed_trades": 4, "wins": 2}, set(), changed={"closed_trades"})] == ["winrate_50"]
+        assert not engine.evaluate({"closed_trades": 5, "wins": 2}, set(), changed={"closed_trades"})
+
+
+class TestIncremental:
+    """Only achievements reading a changed counter are checked"""
+
+    def test_candidates_by_input(self, engine):
+        assert {a.id for a in engine.candidates({"trades"})} == {"first_trade", "10_trades"}
+        assert [a.id for a in engine.candidates({"wins", "closed_trades"})] == ["winrate_50"]
+        assert engine.candidates({"coachings"}) == []
+
+    def test_unchanged_inputs_not_checked(self, engine):
+        counters = {"trades": 50, "closed_trades": 40, "wins": 30, "posts": 3}
+        assert [a.id for a in engine.evaluate(counters, set(), changed={"posts"})] == ["first_post"]
+        assert engine.checks == 1
+
+    def test_streak_kept_as_maximum(self):
+        service = AchievementService()
+        for streak in (3, 5, 2):
+            service.handle({"type": "streak_updated", "user_id": "u", "streak": streak})
+        assert service.maxima["u"] == {"best_streak": 5} and not service.pending
@@ -0,0 +1,180 @@
+"""
+Price Alert Engine Test Suite
+Threshold index semantics, cool-down, removal/compaction, claimed delivery
+across workers and price feeds
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import alerts as alerts_module
+from utils.alerts import Alert, AlertEngine, AlertService
+from utils.feeds import ReplayFeed, feed_from_url, parse_tick
+
+
+def ids(triggered):
+    return sorted(a.id for a in triggered)
+
+
+class TestEngine:
+    """Which ticks trigger which alerts"""
+
+    def test_above_below_fire_once(self):
+        engine = AlertEngine()
+        engine.load([
+            Alert("a", "u", "EURUSD", "above", price=1.10),
+            Alert("b", "u", "EURUSD", "below", price=1.05),
+            Alert("c", "u", "EURUSD", "above", price=1.20),
+        ])
+        assert ids(engine.on_tick("EURUSD", 1.08, 0)) == []
+        assert ids(engine.on_tick("EURUSD", 1.10, 1)) == ["a"]
+        assert ids(engine.on_tick("EURUSD", 1.15, 2)) == []
+        assert ids(engine.on_tick("EURUSD", 1.00, 3)) == ["b"]
+        assert ids(engine.on_tick("EURUSD", 1.30, 4)) == ["c"]
+        assert engine.alerts == {}
+
+    def test_above_already_beyond_fires_on_next_tick(self):
+        engine = AlertEngine()
+        engine.on_tick("BTCUSD", 50_000, 0)
+        engine.add(Alert("a", "u", "BTCUSD", "above", price=40_000))
+        assert ids(engine.on_tick("BTCUSD", 50_001, 1)) == ["a"]
+
+    def test_cross_needs_a_crossing(self):
+        engine = AlertEngine()
+        engine.add(Alert("x", "u", "EURUSD", "cross", price=1.10))
+        # No price yet: armed from the first tick, which cannot trigger it
+        assert ids(engine.on_tick("EURUSD", 1.12, 0)) == []
+        assert ids(engine.on_tick("EURUSD", 1.11, 1)) == []
+        assert ids(engine.on_tick("EURUSD", 1.09, 2)) == ["x"]
+
+    def test_percent_move_from_reference(self):
+        engine = AlertEngine()
+        engine.add(Alert("p", "u", "EURUSD", "percent", percent=2, reference=100.0, repeat=True, cooldown=10))
+        assert ids(engine.on_tick("EURUSD", 101.9, 0)) == []
+        assert ids(engine.on_tick("EURUSD", 97.9, 1)) == ["p"]
+        # Cooling down, then re-armed around the trigger price (97.9)
+        assert ids(engine.on_tick("EURUSD", 90, 5)) == []
+        assert ids(engine.on_tick("EURUSD", 97.9, 12)) == []
+        assert ids(engine.on_tick("EURUSD", 99.9, 13)) == ["p"]
+        assert engine.alerts["p"].reference == 99.9
+
+    def test_repeat_above_fires_again_after_cooldown(self):
+        engine = AlertEngine()
+        engine.add(Alert("a", "u", "XAUUSD", "above", price=2000, repeat=True, cooldown=60))
+        assert ids(engine.on_tick("XAUUSD", 2001, 0)) == ["a"]
+        assert ids(engine.on_tick("XAUUSD", 2002, 30)) == []
+        # Re-armed once the cool-down is over, still above: fires again
+        assert ids(engine.on_tick("XAUUSD", 2003, 61)) == ["a"]
+        assert ids(engine.on_tick("XAUUSD", 2004, 62)) == []
+
+    def test_removed_alerts_never_fire_and_get_compacted(self, monkeypatch):
+        monkeypatch.setattr(alerts_module, "COMPACT_MIN_STALE", 10)
+        engine = AlertEngine()
+        engine.load([Alert(str(i), "u", "EURUSD", "above", price=1 + i / 1000) for i in range(100)])
+        for i in range(60):
+            engine.remove(str(i))
+        # Compacted once more than half the entries were stale
+        book = engine.books["EURUSD"]
+        assert book.size() == 49 and book.stale == 9
+        assert ids(engine.on_tick("EURUSD", 1.0625, 0)) == ["60", "61", "62"]
+        assert engine.stats()["alerts"] == 37
+
+    def test_symbols_are_independent(self):
+        engine = AlertEngine()
+        engine.load([Alert("e", "u", "EURUSD", "above", price=1.1), Alert("g", "u", "GBPUSD", "above", price=1.1)])
+        assert ids(engine.on_tick("GBPUSD", 1.2, 0)) == ["g"]
+
+
+class TestDelivery:
+    """Each trigger claimed once across workers, batches kept on failure"""
+
+    @pytest.fixture
+    def pushed(self, monkeypatch):
+        import routers.push
+
+        pushed = []
+
+        async def notify(user_id, symbol, lines):
+            pushed.append((user_id, symbol, lines))
+
+        monkeypatch.setattr(routers.push, "notify_price_alert", notify)
+        return pushed
+
+    def worker(self, store, *alerts):
+        """A service whose claims go through the shared store, like the conditional update"""
+        service = AlertService()
+        service.engine.load(alerts)
+
+        def claim(alert, price, ts):
+            doc = store.get(alert.id)
+            last = doc and doc.get("last_tick")
+            if doc and doc["active"] and last != ts and (last is None or last <= ts - alert.cooldown):
+                doc.update(last_tick=ts, active=alert.repeat, trigger_count=doc.get("trigger_count", 0) + 1)
+                return True, None
+            return False, doc
+
+        service._claim = claim
+        return service
+
+    def test_one_delivery_per_trigger(self, pushed):
+        doc = {"_id": "a", "user_id": "u", "symbol": "XAUUSD", "type": "above", "price": 2000,
+               "repeat": True, "cooldown_minutes": 1, "active": True}
+        store = {"a": doc}
+        workers = [self.worker(store, Alert.from_doc(doc)) for _ in range(3)]
+        for service in workers:
+            service.process("XAUUSD", 2001, 0)
+            asyncio.run(service.flush())
+        assert len(pushed) == 1 and doc["trigger_count"] == 1
+        assert sum(service.lost_claims for service in workers) == 2
+        # The losers re-arm from the stored last_tick: next trigger claimed once too
+        for service in workers:
+            service.process("XAUUSD", 2002, 61)
+            asyncio.run(service.flush())
+        assert len(pushed) == 2 and doc["trigger_count"] == 2
+
+    def test_deleted_alert_dropped_by_other_workers(self, pushed):
+        service = self.worker({}, Alert("a", "u", "EURUSD", "above", price=1.1, repeat=True))
+        service.process("EURUSD", 1.2, 0)
+        asyncio.run(service.flush())
+        assert pushed == [] and service.engine.alerts == {}
+
+    def test_failed_history_write_requeued(self, pushed, monkeypatch):
+        store = {"a": {"active": True}}
+        service = self.worker(store, Alert("a", "u", "EURUSD", "above", price=1.1))
+
+        def down(docs):
+            raise RuntimeError("down")
+
+        monkeypatch.setattr(alerts_module.alerts_collection, "insert_many", down)
+        service.process("EURUSD", 1.2, 0)
+        with pytest.raises(RuntimeError):
+            asyncio.run(service.flush())
+        assert len(service._claimed) == 1 and store["a"]["trigger_count"] == 1
+        monkeypatch.setattr(alerts_module.alerts_collection, "insert_many", lambda docs: None)
+        asyncio.run(service.flush())
+        assert service._claimed == [] and pushed == [("u", "EURUSD", ["EURUSD au-dessus de 1.1 (1.2)"])]
+
+
+class TestFeeds:
+    """Tick sources"""
+
+    def test_parse_tick(self):
+        assert parse_tick("eurusd 1.0850 1700000000") == ("EURUSD", 1.085, 1700000000.0)
+        assert parse_tick("EURUSD,1.0850,2024-01-02T10:00:00")[2] == 1704189600.0
+        assert parse_tick("garbage") is None and parse_tick("EURUSD abc") is None
+
+    def test_replay_bid_ask(self, tmp_path):
+        path = tmp_path / "ticks.csv"
+        path.write_text("timestamp,symbol,bid,ask\n1700000000,EURUSD,1.0,1.2\n1700000001,gbpusd,2.0,2.0\n")
+
+        async def collect():
+            return [tick async for tick in feed_from_url(f"replay:{path}")]
+
+        assert asyncio.run(collect()) == [("EURUSD", 1.1, 1700000000.0), ("GBPUSD", 2.0, 1700000001.0)]
+        assert isinstance(feed_from_url(f"replay:{path}?speed=5"), ReplayFeed)
+        with pytest.raises(ValueError):
+            feed_from_url("kafka://broker")
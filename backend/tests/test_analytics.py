@@ -0,0 +1,99 @@
+"""
+Portfolio Analytics Test Suite
+Metrics on a fixed trade set and the trades_version cache
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import analytics as analytics_module
+from utils.analytics import compute_analytics, get_analytics, invalidate_analytics
+
+FIELDS = ("created_at", "pnl", "pnl_percent", "entry_price", "stop_loss", "position_size",
+          "symbol", "setup_type", "emotions", "followed_plan")
+
+# Mon 09:00 and 14:00, Tue, Thu, Fri: equity 100, 50, 20, 220, 220
+TRADES = [
+    (datetime(2026, 1, 5, 9), 100, 1.0, 100, 90, 1, "EURUSD", "breakout", "calm", True),
+    (datetime(2026, 1, 5, 14), -50, -0.5, 100, 95, 2, "EURUSD", "breakout", "fear", False),
+    (datetime(2026, 1, 6, 10), -30, -0.3, 100, None, 1, "XAUUSD", None, None, None),
+    (datetime(2026, 1, 8, 10), 200, 2.0, 100, 80, 1, "XAUUSD", "range", "calm", True),
+    (datetime(2026, 1, 9, 10), 0, 0.0, 100, None, 1, "EURUSD", None, None, None),
+]
+
+
+def columns(trades=TRADES):
+    return {field: [trade[i] for trade in trades] for i, field in enumerate(FIELDS)}
+
+
+class TestMetrics:
+    """compute_analytics on a known trade set"""
+
+    def test_totals_and_ratios(self):
+        result = compute_analytics(columns())
+        assert {k: result[k] for k in ("total_trades", "winning_trades", "losing_trades", "winrate", "total_pnl",
+                                        "avg_win", "avg_loss", "profit_factor", "payoff_ratio", "expectancy")} == {
+            "total_trades": 5, "winning_trades": 2, "losing_trades": 2, "winrate": 40.0, "total_pnl": 220.0,
+            "avg_win": 150.0, "avg_loss": 40.0, "profit_factor": 3.75, "payoff_ratio": 3.75, "expectancy": 44.0}
+
+    def test_r_multiples_only_with_stop_loss(self):
+        result = compute_analytics(columns())
+        assert (result["expectancy_r"], result["avg_r_multiple_win"], result["avg_r_multiple_loss"]) == (5.0, 10.0, -5.0)
+        assert result["trades_with_stop_loss"] == 3
+
+    def test_daily_ratios(self):
+        # Daily returns 0.5, -0.3, 2, 0 (the two Monday trades summed)
+        result = compute_analytics(columns())
+        assert result["trading_days"] == 4
+        assert (result["sharpe_ratio"], result["sortino_ratio"]) == (8.55, 58.21)
+
+    def test_drawdown_and_streaks(self):
+        result = compute_analytics(columns())
+        assert (result["max_drawdown"], result["max_drawdown_percent_of_peak"]) == (80.0, 80.0)
+        assert (result["max_drawdown_duration_trades"], result["max_drawdown_duration_days"]) == (2, 1.0)
+        assert (result["max_consecutive_wins"], result["max_consecutive_losses"]) == (1, 2)
+        assert (result["current_win_streak"], result["current_loss_streak"]) == (0, 0)
+
+    def test_breakdowns(self):
+        result = compute_analytics(columns())
+        assert [(row["key"], row["trades"], row["total_pnl"], row["avg_r_multiple"]) for row in result["by_symbol"]] == [
+            ("XAUUSD", 2, 170.0, 10.0), ("EURUSD", 3, 50.0, 2.5)]
+        assert [row["key"] for row in result["by_weekday"]] == ["jeudi", "lundi", "vendredi", "mardi"]
+        assert {row["key"]: row["trades"] for row in result["by_followed_plan"]} == {True: 2, None: 2, False: 1}
+        assert result["by_hour"][0] == {"key": 10, "trades": 3, "total_pnl": 170.0, "avg_pnl": 56.67,
+                                        "winrate": 33.33, "avg_r_multiple": 10.0}
+
+    def test_no_trades(self):
+        assert compute_analytics(columns([])) == {"total_trades": 0}
+
+
+class TestCache:
+    """Results reused until trades_version moves"""
+
+    @pytest.fixture
+    def loads(self, monkeypatch):
+        loads = []
+        monkeypatch.setattr(analytics_module, "load_columns", lambda user_id: loads.append(user_id) or columns())
+        monkeypatch.setattr(analytics_module, "_cache", type(analytics_module._cache)())
+        return loads
+
+    def test_version_bump_recomputes(self, loads):
+        users = analytics_module.users_collection
+        users.find_one.return_value = {"trades_version": 3}
+        first = get_analytics("u")
+        assert get_analytics("u") is first and loads == ["u"]
+        users.find_one.return_value = {"trades_version": 4}    # bumped by another worker
+        assert get_analytics("u") is not first and loads == ["u", "u"]
+
+    def test_invalidate_bumps_and_drops(self, loads):
+        users = analytics_module.users_collection
+        users.find_one.return_value = {"trades_version": 1}
+        get_analytics("u")
+        users.update_one.reset_mock()
+        invalidate_analytics("u")
+        users.update_one.assert_called_once_with({"_id": "u"}, {"$inc": {"trades_version": 1}})
+        assert "u" not in analytics_module._cache
@@ -0,0 +1,92 @@
+"""
+Briefing Pre-generation Test Suite
+Due timezones, shared profile buckets, prompts and the scheduled job
+"""
+import asyncio
+import os
+import sys
+import threading
+from datetime import date, datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import briefings as briefings_module
+from utils.briefings import BriefingService, briefing_context, bucket_key, due_day, profile_bucket
+
+PROFILE = {"name": "Ana", "trading_style": "scalping", "experience_level": "beginner", "preferred_markets": ["indices", "forex"]}
+
+
+class TestDueDay:
+    """A timezone is due in the hour before its local open"""
+
+    def test_window(self):
+        now = datetime(2026, 10, 19, 5, 30, tzinfo=timezone.utc)        # 07:30 in Paris, 01:30 in New York
+        assert due_day(now, "Europe/Paris") == date(2026, 10, 19)
+        assert due_day(now, "America/New_York") is None
+        assert due_day(now, "UTC") is None                              # 05:30, open in 2 h 30
+        assert due_day(datetime(2026, 10, 19, 6, tzinfo=timezone.utc), "Europe/Paris") is None   # open passed
+
+    def test_local_day_across_midnight(self):
+        now = datetime(2026, 10, 19, 21, 30, tzinfo=timezone.utc)       # 08:30 on the 20th in Sydney
+        assert due_day(now, "Australia/Sydney", local_open="09:00") == date(2026, 10, 20)
+
+
+class TestBuckets:
+    """Users with the same profile and performance band share a briefing"""
+
+    def test_shared_between_users(self):
+        other = {**PROFILE, "name": "Bo", "preferred_markets": ["forex", "indices"]}
+        a = profile_bucket(PROFILE, [120, -40, 15, 30, -10])
+        b = profile_bucket(other, [5, -2, 1, 9, -1])
+        assert a == b and bucket_key(a) == bucket_key(b)
+        assert a["result"] == "en gain" and a["winrate"] == 60
+
+    def test_bands(self):
+        assert profile_bucket(PROFILE, [])["result"] == "aucun trade"
+        assert profile_bucket(PROFILE, [])["winrate"] is None
+        assert profile_bucket(PROFILE, [1, 2])["winrate"] == 80                  # 100% joins the top band
+        assert profile_bucket(PROFILE, [-1, -5, 3])["result"] == "en perte"
+        assert profile_bucket({}, [0])["style"] == "day trading"
+
+    def test_context_has_no_personal_data(self):
+        context = briefing_context(profile_bucket(PROFILE, [120, -40, 15]))
+        assert "Ana" not in context and "120" not in context
+        assert "scalping" in context and "entre 60 et 80%" in context
+
+
+class TestPregenerate:
+    """Due users built in batches, Mongo off the event loop"""
+
+    def test_one_call_per_bucket(self, monkeypatch):
+        threads = set()
+
+        def reads(rows):
+            return lambda *args, **kwargs: threads.add(threading.get_ident()) or list(rows)
+
+        streaks, users = briefings_module.streaks_collection, briefings_module.users_collection
+        daily, trades = briefings_module.daily_briefings_collection, briefings_module.trades_collection
+        monkeypatch.setattr(streaks, "distinct", reads(["Europe/Paris", "America/New_York"]))
+        monkeypatch.setattr(streaks, "find", reads([{"_id": "a"}, {"_id": "b"}, {"_id": "c"}]))
+        monkeypatch.setattr(daily, "find", reads([{"_id": "c"}]))          # c already has today's briefing
+        monkeypatch.setattr(daily, "aggregate", reads([]))
+        monkeypatch.setattr(trades, "aggregate", reads([{"_id": "a", "pnls": [5, -1]}, {"_id": "b", "pnls": [9, -2]}]))
+        monkeypatch.setattr(users, "find", reads([{"_id": "a", **PROFILE}, {"_id": "b", **PROFILE}]))
+        written = []
+        monkeypatch.setattr(daily, "bulk_write", lambda requests, ordered: written.extend(r._doc for r in requests))
+        calls = []
+
+        async def generate(context):
+            calls.append(context)
+            return "Briefing"
+
+        loop_threads = []
+
+        async def run():
+            loop_threads.append(threading.get_ident())
+            return await BriefingService().pregenerate(generate, datetime(2026, 10, 19, 5, 30, tzinfo=timezone.utc))
+
+        report = asyncio.run(run())
+        assert report == {"timezones": 1, "users": 2, "generated": 1, "shared": 0, "failed": 0}
+        assert len(calls) == 1 and [(d["_id"], d["date"], d["briefing"]) for d in written] == [
+            ("a", "2026-10-19", "Briefing"), ("b", "2026-10-19", "Briefing")]
+        assert threads and not threads & set(loop_threads)
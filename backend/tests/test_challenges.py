@@ -0,0 +1,164 @@
+"""
+Challenge Engine Test Suite
+Event routing, rule modes, window resets, coalesced writes and one-time rewards
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.challenges import ChallengeEngine, window_key
+
+MONDAY = datetime(2026, 10, 12, 8, tzinfo=timezone.utc).timestamp()
+DAY = 86400
+
+
+def challenge(cid, kind="weekly", target=3, rule=None, xp=100):
+    return {"_id": cid, "title": cid, "type": kind, "target": target, "xp_reward": xp, "active": True,
+            "rule": rule or {"event": "trade_created"}}
+
+
+def engine_with(*challenges, users=("u",)):
+    engine = ChallengeEngine()
+    engine.load(challenges, [{"_id": f"{u}-{c['_id']}", "user_id": u, "challenge_id": c["_id"]}
+                             for c in challenges for u in users])
+    return engine
+
+
+def event(type="trade_created", user="u", ts=MONDAY, **fields):
+    return {"type": type, "user_id": user, "ts": ts, **fields}
+
+
+def participation(engine, cid, user="u"):
+    return engine.challenges[cid].participants[user]
+
+
+class TestRouting:
+    """Only joined users and matching challenges move"""
+
+    def test_count_and_where(self):
+        engine = engine_with(challenge("all"), challenge("journal", rule={"event": "trade_created", "where": {"journaled": True}}))
+        engine.handle(event(journaled=True))
+        engine.handle(event(journaled=False))
+        engine.handle(event(user="stranger"))
+        engine.handle(event("post_created"))
+        assert participation(engine, "all").progress == 2
+        assert participation(engine, "journal").progress == 1
+        assert engine.applied == 3
+
+    def test_unknown_mode_rejected_and_ruleless_ignored(self):
+        engine = ChallengeEngine()
+        with pytest.raises(ValueError):
+            engine.load([challenge("x", rule={"event": "trade_created", "mode": "median"})])
+        engine.load([{**challenge("y"), "rule": None}])
+        assert not engine.challenges
+
+    def test_challenge_added_after_load(self):
+        engine = engine_with(challenge("a"))
+        engine.add(challenge("b", rule={"event": ["trade_created", "post_created"]}))
+        engine.add(challenge("b"))                          # already indexed
+        engine.join({"_id": "u-b", "user_id": "u", "challenge_id": "b"})
+        engine.handle(event("post_created"))
+        assert participation(engine, "b").progress == 1
+        assert [c.id for c in engine.by_event["trade_created"]] == ["a", "b"]
+
+
+class TestWindows:
+    """Daily / weekly / monthly resets"""
+
+    def test_window_keys(self):
+        assert window_key("daily", MONDAY) == "2026-10-12"
+        assert window_key("weekly", MONDAY) == "2026-W42"
+        assert window_key("monthly", MONDAY) == "2026-10"
+
+    def test_new_window_resets_and_late_events_ignored(self):
+        engine = engine_with(challenge("w", target=2))
+        p = participation(engine, "w")
+        engine.handle(event())
+        engine.handle(event(ts=MONDAY + 7 * DAY))
+        assert (p.window, p.progress) == ("2026-W43", 1)
+        engine.handle(event(ts=MONDAY + DAY))               # previous week, arrives late
+        assert p.progress == 1
+
+    def test_reward_once_per_window(self):
+        engine = engine_with(challenge("d", kind="daily", target=1))
+        for ts in (MONDAY, MONDAY + 60, MONDAY + DAY):
+            engine.handle(event(ts=ts))
+        assert [(p.id, w) for p, w in engine.completions] == [("u-d", "2026-10-12"), ("u-d", "2026-10-13")]
+
+    def test_windows_follow_user_timezone(self):
+        sunday_night = MONDAY - 9 * 3600                     # Sunday 23:00 UTC, Monday 01:00 in Paris
+        assert window_key("weekly", sunday_night) == "2026-W41"
+        assert window_key("weekly", sunday_night, "Europe/Paris") == "2026-W42"
+        engine = engine_with(challenge("d", kind="daily", target=2))
+        engine.handle(event(ts=sunday_night), "Europe/Paris")
+        engine.handle(event(), "Europe/Paris")
+        assert [w for _, w in engine.completions] == ["2026-10-12"]
+
+
+class TestModes:
+    """Streak, ratio and consecutive days"""
+
+    def test_streak_resets_on_false(self):
+        engine = engine_with(challenge("plan", target=3, rule={"event": "trade_closed", "mode": "streak", "field": "followed_plan"}))
+        for followed in (True, True, False, True, True):
+            engine.handle(event("trade_closed", followed_plan=followed))
+        assert participation(engine, "plan").progress == 2 and not engine.completions
+        engine.handle(event("trade_closed", followed_plan=True))
+        assert len(engine.completions) == 1
+
+    def test_ratio_needs_min_events(self):
+        engine = engine_with(challenge("wr", kind="monthly", target=55,
+                                       rule={"event": "trade_closed", "mode": "ratio", "field": "win", "min_events": 4}))
+        p = participation(engine, "wr")
+        for win in (True, True, False):
+            engine.handle(event("trade_closed", win=win))
+        assert p.progress == 0
+        engine.handle(event("trade_closed", win=False))
+        assert p.progress == 50 and not engine.completions
+        engine.handle(event("trade_closed", win=True))
+        assert p.progress == 60 and p.state == {"hits": 3, "events": 5} and len(engine.completions) == 1
+
+    def test_consecutive_days(self):
+        engine = engine_with(challenge("days", kind="monthly", target=3,
+                                       rule={"event": ["trade_created", "post_created"], "mode": "days"}))
+        p = participation(engine, "days")
+        for ts in (MONDAY, MONDAY + 3600, MONDAY + DAY, MONDAY + 3 * DAY, MONDAY + 4 * DAY):
+            engine.handle(event("post_created" if ts % 2 else "trade_created", ts=ts))
+        assert p.progress == 2
+        engine.handle(event(ts=MONDAY + 5 * DAY))
+        assert p.progress == 3 and len(engine.completions) == 1
+
+
+class TestWrites:
+    """Coalesced updates and requeue"""
+
+    def test_inc_coalesced_set_after_reset(self):
+        engine = engine_with(challenge("a", target=100), challenge("s", rule={"event": "trade_closed", "mode": "streak", "field": "ok"}),
+                             users=("u", "v"))
+        for p in (participation(engine, "a"), participation(engine, "a", "v")):
+            p.window, p.reset = "2026-W42", False
+        for _ in range(50):
+            engine.handle(event())
+        engine.handle(event(user="v", ts=MONDAY + 7 * DAY))
+        engine.handle(event("trade_closed", ok=True))
+        writes = {p.id: update for p, update in engine.take_writes()}
+        assert writes["u-a"] == {"$inc": {"progress": 50}, "$set": {"completed": False}}
+        assert writes["v-a"]["$set"]["progress"] == 1 and writes["v-a"]["$set"]["window"] == "2026-W43"
+        assert writes["u-s"]["$set"]["progress"] == 1
+        assert engine.take_writes() == []
+
+    def test_requeue_rewrites_in_full(self):
+        engine = engine_with(challenge("a", target=1))
+        p = participation(engine, "a")
+        p.window = "2026-W42"
+        engine.handle(event())
+        writes, completions = engine.take_writes(), engine.completions
+        engine.completions = []
+        engine.requeue(writes, completions)
+        (_, update), = engine.take_writes()
+        assert update["$set"]["progress"] == 1 and update["$set"]["completed"] is True
+        assert engine.completions == completions
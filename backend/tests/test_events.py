@@ -0,0 +1,86 @@
+"""
+Domain Event Bus Test Suite
+Per-user ordering, subscriber delivery and registration
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import events
+from utils.events import Subscriber, per_user, subscribe, unsubscribe
+
+
+def event(user, type="trade_created", n=0):
+    return {"_id": n, "type": type, "user_id": user, "ts": n}
+
+
+class TestPerUser:
+    """Events grouped by user, each user's events kept in order"""
+
+    def test_groups_in_order(self):
+        stream = [event("a", n=1), event("b", n=2), event("a", "trade_closed", 3), event("c", n=4), event("b", n=5)]
+        groups = per_user(stream)
+        assert list(groups) == ["a", "b", "c"]
+        assert [e["_id"] for e in groups["a"]] == [1, 3]
+        assert [e["_id"] for e in groups["b"]] == [2, 5]
+
+
+class TestSubscriber:
+    """Per-event, per-user batch and coroutine handlers"""
+
+    def test_per_event_and_batch(self):
+        seen, batches = [], []
+        batch = [event("a", n=1), event("a", n=2)]
+        Subscriber("x", seen.append).deliver(None, "a", batch)
+        Subscriber("y", lambda u, evs: batches.append((u, len(evs))), batch=True).deliver(None, "a", batch)
+        assert [e["_id"] for e in seen] == [1, 2]
+        assert batches == [("a", 2)]
+
+    def test_coroutine_handler_run_on_loop(self):
+        seen = []
+
+        async def handler(e):
+            await asyncio.sleep(0)
+            seen.append(e["_id"])
+
+        async def run():
+            subscriber = Subscriber("z", handler)
+            await asyncio.to_thread(subscriber.deliver, asyncio.get_running_loop(), "a", [event("a", n=1), event("a", n=2)])
+
+        asyncio.run(run())
+        assert seen == [1, 2]
+
+    def test_handled_events_skipped_until_commit(self):
+        seen = []
+
+        def handler(e):
+            if e["_id"] == 3 and 3 not in seen:
+                seen.append(3)
+                raise RuntimeError("down")
+            seen.append(e["_id"])
+
+        subscriber = Subscriber("x", handler)
+        stream = [event("a", n=1), event("b", n=2), event("a", n=3)]
+        for user_id, user_events in per_user(stream).items():
+            try:
+                subscriber.deliver(None, user_id, user_events)
+            except RuntimeError:
+                subscriber.deliver(None, user_id, user_events)     # retried: 1 not applied again
+        for user_id, user_events in per_user(stream).items():
+            subscriber.deliver(None, user_id, user_events)         # flush failed: delivered again
+        assert seen == [1, 3, 3, 2]
+        subscriber.handled.clear()                                  # committed, then replayed
+        subscriber.deliver(None, "b", [event("b", n=2)])
+        assert seen == [1, 3, 3, 2, 2]
+
+    def test_registration_idempotent_by_name(self):
+        handler = [].append
+        try:
+            subscribe(handler, name="test")
+            subscribe(handler, name="test")
+            assert list(events._subscribers).count("test") == 1
+        finally:
+            unsubscribe(handler)
+        assert "test" not in events._subscribers
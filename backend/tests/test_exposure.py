@@ -0,0 +1,112 @@
+"""
+Mark-to-Market Test Suite
+Open trade index, vectorized marks, per-user totals and P&L pushes
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exposure import ExposureService, MarkToMarket
+
+
+def trade(trade_id, user="u", symbol="EURUSD", direction="LONG", entry=100.0, size=1.0, **extra):
+    return {"_id": trade_id, "user_id": user, "symbol": symbol, "direction": direction,
+            "entry_price": entry, "position_size": size, "status": "open", **extra}
+
+
+class FakeClient:
+    def __init__(self):
+        self.pending = {}
+
+    def push(self, key, message):
+        self.pending[key] = json.loads(message)
+
+
+class TestIndex:
+    """Tracking open trades"""
+
+    def test_marks_long_and_short_per_user(self):
+        engine = MarkToMarket()
+        engine.track(trade("a", size=2))
+        engine.track(trade("b", direction="SHORT", entry=105))
+        engine.track(trade("c", user="v", symbol="eur/usd", entry=90))
+        engine.on_tick("EURUSD", 102, 1)
+        assert {p["id"]: p["unrealized_pnl"] for p in engine.positions("u")} == {"a": 4, "b": 3}
+        totals = engine.totals("u")
+        assert (totals["unrealized_pnl"], totals["gross_exposure"], totals["net_exposure"]) == (7, 306, 102)
+        assert engine.totals("v")["unrealized_pnl"] == 12
+
+    def test_unmarked_until_first_tick(self):
+        engine = MarkToMarket()
+        engine.track(trade("a"))
+        assert engine.totals("u") == {"unrealized_pnl": 0, "gross_exposure": 0, "net_exposure": 0,
+                                      "open_trades": 1, "unmarked_trades": 1}
+        assert engine.positions("u")[0]["unrealized_pnl"] is None
+
+    def test_untrack_and_closed_or_invalid_trades(self):
+        engine = MarkToMarket()
+        assert not engine.track(trade("a", status="closed", exit_price=101))
+        assert not engine.track(trade("b", symbol="not a symbol!"))
+        engine.track(trade("c"))
+        engine.track(trade("d", entry=99))
+        engine.on_tick("EURUSD", 101, 1)
+        engine.untrack("c")
+        assert engine.totals("u")["unrealized_pnl"] == 2
+        engine.untrack("d")
+        assert "u" not in engine.user_symbols and engine.positions("u") == []
+
+    def test_resync_only_touches_changed_trades(self):
+        engine = MarkToMarket()
+        engine.load([trade("a"), trade("b", user="v")])
+        engine.changed_users.clear()
+        engine.load([trade("a"), trade("c", user="w")])
+        assert engine.changed_users == {"v", "w"}
+        assert set(engine.trades) == {"a", "c"}
+
+
+class TestPush:
+    """Conflated P&L deltas to stream clients"""
+
+    def test_snapshot_then_moved_symbols_only(self):
+        service = ExposureService()
+        engine = service.engine
+        engine.track(trade("a"))
+        engine.track(trade("b", symbol="XAUUSD", entry=2000))
+        engine.on_tick("EURUSD", 101, 1)
+        client = FakeClient()
+        service.subscribe("u", client)
+        message = client.pending[("pnl",)]
+        assert message["full"] and len(message["trades"]) == 2 and message["unmarked_trades"] == 1
+
+        assert service.publish() == 1          # trades added before subscribing: full resend
+        client.pending.clear()
+        assert service.publish() == 0          # nothing moved
+        engine.on_tick("XAUUSD", 2010, 2)
+        engine.on_tick("GBPUSD", 1.3, 2)
+        assert service.publish() == 1
+        message = client.pending[("pnl",)]
+        assert not message["full"] and [t["id"] for t in message["trades"]] == ["b"]
+        assert message["unrealized_pnl"] == pytest.approx(11)
+
+        service.unsubscribe("u", client)
+        engine.on_tick("XAUUSD", 2020, 3)
+        assert service.publish() == 0 and not service.subscribers
+
+    def test_snapshot_documents(self):
+        engine = MarkToMarket()
+        engine.track(trade("a"))
+        engine.track(trade("b", symbol="XAUUSD", entry=2000, direction="SHORT"))
+        engine.track(trade("c", user="v", symbol="BTCUSD"))
+        engine.on_tick("EURUSD", 101, 1)
+        engine.on_tick("XAUUSD", 1990, 1)
+        docs = {d["user_id"]: d for d in engine.snapshot()}
+        assert set(docs) == {"u", "v"}
+        assert docs["u"]["unrealized_pnl"] == 11 and docs["u"]["open_trades"] == 2
+        assert docs["u"]["net_exposure"] == 101 - 1990 and docs["u"]["gross_exposure"] == 101 + 1990
+        assert (docs["v"]["open_trades"], docs["v"]["unrealized_pnl"]) == (1, 0)      # not marked yet
+        engine.untrack("c")
+        assert [d["user_id"] for d in engine.snapshot()] == ["u"]
@@ -0,0 +1,161 @@
+"""
+Market Gateway Test Suite
+Quote/bar state, tick normalization, conflated fan-out and subscriptions
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import gateway as gateway_module
+from utils.feeds import DatagramFeed, feed_from_url
+from utils.gateway import FeedGateway, QuoteBoard
+
+T0 = 1_700_000_040  # on a minute boundary
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, text):
+        self.frames.append(json.loads(text))
+
+    def quotes(self):
+        return [m for frame in self.frames for m in frame if m["type"] == "quote"]
+
+
+def drain(gateway, *clients):
+    """Run the send loops until the clients have nothing pending"""
+    async def run():
+        tasks = [asyncio.create_task(gateway.serve(c)) for c in clients]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+    asyncio.run(run())
+
+
+class TestQuoteBoard:
+    """Last quote and in-progress bar"""
+
+    def test_bar_rolls_over_on_timeframe_boundary(self):
+        board = QuoteBoard("M1")
+        slot = board.slot("EURUSD")
+        for ts, price in [(T0, 1.10), (T0 + 10, 1.12), (T0 + 20, 1.09), (T0 + 59, 1.11)]:
+            assert board.update(slot, price, ts)
+        bar = board.quote(slot)["bar"]
+        assert (bar["time"], bar["open"], bar["high"], bar["low"], bar["close"], bar["ticks"]) == (T0, 1.10, 1.12, 1.09, 1.11, 4)
+        board.update(slot, 1.13, T0 + 60)
+        bar = board.quote(slot)["bar"]
+        assert (bar["time"], bar["open"], bar["high"], bar["low"], bar["ticks"]) == (T0 + 60, 1.13, 1.13, 1.13, 1)
+
+    def test_rejects_invalid_and_late_ticks(self):
+        gateway = FeedGateway()
+        gateway.on_tick("EURUSD", 1.10, T0 + 5)
+        gateway.on_tick("EURUSD", 1.20, T0)            # older than the last tick
+        gateway.on_tick("EURUSD", float("nan"), T0 + 6)
+        gateway.on_tick("EURUSD", -1.0, T0 + 7)
+        assert (gateway.ticks, gateway.rejected) == (1, 3)
+        assert gateway.quotes(["eurusd"])[0]["price"] == 1.10
+
+    def test_listeners_see_accepted_ticks(self):
+        gateway = FeedGateway()
+        seen = []
+        gateway.listeners.append(lambda *tick: seen.append(tick))
+        gateway.on_tick("EURUSD", 1.10, T0)
+        gateway.on_tick("EURUSD", 0.0, T0 + 1)
+        assert seen == [("EURUSD", 1.10, T0)]
+
+
+class TestFanOut:
+    """Conflation and subscriptions"""
+
+    def test_conflates_between_publishes(self):
+        gateway = FeedGateway()
+        socket = FakeSocket()
+        client = gateway.connect(socket.send)
+        assert gateway.subscribe(client, ["eurusd"]) == ["EURUSD"]
+        for i in range(10):
+            gateway.on_tick("EURUSD", 1.10 + i / 1000, T0 + i)
+        gateway.on_tick("GBPUSD", 1.25, T0)     # not subscribed
+        assert gateway.publish() == 1
+        drain(gateway, client)
+        assert [q["price"] for q in socket.quotes()] == [1.109]
+
+        # Slow client: two publishes before it sends, one frame with the latest
+        gateway.on_tick("EURUSD", 1.2, T0 + 20)
+        gateway.publish()
+        gateway.on_tick("EURUSD", 1.3, T0 + 21)
+        gateway.publish()
+        drain(gateway, client)
+        assert [q["price"] for q in socket.quotes()] == [1.109, 1.3]
+        assert len(socket.frames) == 2 and client.sent == 2
+
+    def test_subscribe_sends_snapshot_and_unsubscribe_stops(self):
+        gateway = FeedGateway()
+        gateway.on_tick("XAUUSD", 2000.5, T0)
+        socket = FakeSocket()
+        client = gateway.connect(socket.send)
+        gateway.subscribe(client, ["XAUUSD", "BTCUSD"])
+        drain(gateway, client)
+        assert [q["symbol"] for q in socket.quotes()] == ["XAUUSD"]
+
+        assert gateway.unsubscribe(client, ["xauusd", "ETHUSD"]) == ["XAUUSD"]
+        gateway.on_tick("XAUUSD", 2001, T0 + 1)
+        assert gateway.publish() == 0
+        gateway.disconnect(client)
+        assert not gateway.subscribers and not gateway.clients
+
+    def test_subscription_limit_and_invalid_symbol(self, monkeypatch):
+        monkeypatch.setattr(gateway_module, "MAX_SUBSCRIPTIONS", 2)
+        gateway = FeedGateway()
+        client = gateway.connect(FakeSocket().send)
+        gateway.subscribe(client, ["A", "B"])
+        with pytest.raises(ValueError):
+            gateway.subscribe(client, ["C"])
+        with pytest.raises(ValueError):
+            gateway.subscribe(client, ["not a symbol!"])
+
+    def test_unquoted_symbols_capped(self, monkeypatch):
+        monkeypatch.setattr(gateway_module, "MAX_UNQUOTED", 2)
+        gateway = FeedGateway()
+        gateway.on_tick("EURUSD", 1.1, T0)
+        client = gateway.connect(FakeSocket().send)
+        assert gateway.subscribe(client, ["EURUSD", "AAA", "BBB"]) == ["EURUSD", "AAA", "BBB"]
+        with pytest.raises(ValueError):
+            gateway.subscribe(client, ["CCC"])
+        assert gateway.stats()["symbols"] == 3
+        gateway.on_tick("AAA", 5.0, T0)         # quoted: its reservation is released
+        assert gateway.subscribe(client, ["CCC"]) == ["CCC"]
+
+    def test_one_encoding_shared_by_subscribers(self, monkeypatch):
+        monkeypatch.setattr(gateway_module, "WAKE_BATCH", 2)
+        gateway = FeedGateway()
+        sockets = [FakeSocket() for _ in range(5)]
+        clients = [gateway.connect(s.send) for s in sockets]
+        for client in clients:
+            gateway.subscribe(client, ["EURUSD"])
+        encoded = []
+        monkeypatch.setattr(gateway_module.json, "dumps", lambda obj: encoded.append(obj) or json.JSONEncoder().encode(obj))
+        gateway.on_tick("EURUSD", 1.1, T0)
+
+        async def run():
+            # Wakes are spread over loop iterations, every client still gets the update
+            tasks = [asyncio.create_task(gateway.serve(c)) for c in clients]
+            assert gateway.publish() == 5
+            for _ in range(5):
+                await asyncio.sleep(0)
+            for task in tasks:
+                task.cancel()
+        asyncio.run(run())
+        assert len(encoded) == 1
+        assert all(s.quotes()[0]["price"] == 1.1 for s in sockets)
+
+
+def test_feed_from_url_udp():
+    feed = feed_from_url("udp://127.0.0.1:9200")
+    assert isinstance(feed, DatagramFeed) and feed.port == 9200
@@ -0,0 +1,180 @@
+"""
+Indicator Library Test Suite
+Batch kernels against straightforward reference loops, incremental state
+objects against the batch kernels, and the result cache
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import indicators as ind
+from utils.bar_store import BarStore
+
+
+@pytest.fixture(scope="module")
+def bars():
+    rng = np.random.default_rng(3)
+    n = 3000
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    open_ = np.concatenate(([1.1], close[:-1]))
+    return {
+        "ts": 1_700_000_000 + np.arange(n, dtype=np.int64) * 300,
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.random(n) * 0.0005,
+        "low": np.minimum(open_, close) - rng.random(n) * 0.0005,
+        "close": close,
+        "volume": rng.integers(1, 100, n).astype(np.float64),
+    }
+
+
+def reference_ema(values, period, alpha=None):
+    alpha = alpha or 2 / (period + 1)
+    out = [None] * len(values)
+    value = sum(values[:period]) / period
+    out[period - 1] = value
+    for i in range(period, len(values)):
+        value = alpha * values[i] + (1 - alpha) * value
+        out[i] = value
+    return np.array([np.nan if v is None else v for v in out])
+
+
+def assert_close(actual, expected):
+    assert np.array_equal(np.isnan(actual), np.isnan(expected))
+    assert np.allclose(actual[~np.isnan(actual)], expected[~np.isnan(expected)], rtol=1e-9, atol=1e-12)
+
+
+class TestBatchKernels:
+    """Vectorized kernels match naive loops"""
+
+    @pytest.mark.parametrize("period", [2, 14, 200])
+    def test_ema(self, bars, period):
+        assert_close(ind.ema(bars["close"], period), reference_ema(list(bars["close"]), period))
+
+    def test_sma(self, bars):
+        close = bars["close"]
+        expected = np.array([np.nan] * 19 + [close[i - 19:i + 1].mean() for i in range(19, len(close))])
+        assert_close(ind.sma(close, 20), expected)
+
+    def test_rsi(self, bars):
+        change = np.diff(bars["close"])
+        gain = reference_ema(list(np.maximum(change, 0)), 14, alpha=1 / 14)
+        loss = reference_ema(list(np.maximum(-change, 0)), 14, alpha=1 / 14)
+        expected = np.concatenate(([np.nan], 100 - 100 / (1 + gain / loss)))
+        result = ind.rsi(bars["close"], 14)
+        assert_close(result, expected)
+        assert np.nanmin(result) >= 0 and np.nanmax(result) <= 100
+
+    def test_atr(self, bars):
+        high, low, close = bars["high"], bars["low"], bars["close"]
+        tr = [high[0] - low[0]] + [
+            max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+            for i in range(1, len(close))
+        ]
+        assert_close(ind.atr(high, low, close, 14), reference_ema(tr, 14, alpha=1 / 14))
+
+    def test_bollinger(self, bars):
+        close = bars["close"]
+        result = ind.bollinger(close, 20, 2.0)
+        i = 500
+        window = close[i - 19:i + 1]
+        assert result["upper"][i] == pytest.approx(window.mean() + 2 * window.std())
+        assert result["lower"][i] == pytest.approx(window.mean() - 2 * window.std())
+        assert np.isnan(result["middle"][18]) and not np.isnan(result["middle"][19])
+
+    def test_macd(self, bars):
+        result = ind.macd(bars["close"])
+        line = reference_ema(list(bars["close"]), 12) - reference_ema(list(bars["close"]), 26)
+        assert_close(result["macd"], line)
+        signal = np.full(len(line), np.nan)
+        signal[25:] = reference_ema(list(line[25:]), 9)
+        assert_close(result["signal"], signal)
+
+    def test_vwap_resets_each_session_day(self, bars):
+        result = ind.vwap(bars["high"], bars["low"], bars["close"], bars["volume"], bars["ts"])
+        typical = (bars["high"] + bars["low"] + bars["close"]) / 3
+        days = bars["ts"] // 86400
+        first_of_day = np.flatnonzero(np.diff(days))[0] + 1
+        assert result[first_of_day] == pytest.approx(typical[first_of_day])
+        i = first_of_day + 10
+        day = slice(first_of_day, i + 1)
+        assert result[i] == pytest.approx((typical[day] * bars["volume"][day]).sum() / bars["volume"][day].sum())
+
+    def test_swings(self):
+        high = np.array([1, 2, 5, 3, 2, 4, 4, 3, 1, 2], dtype=float)
+        low = high - 1
+        result = ind.swings(high, low, 2, 2)
+        assert np.flatnonzero(result["swing_high"]).tolist() == [2]  # equal highs at 5/6 are not swings
+        assert np.flatnonzero(result["swing_low"]).tolist() == [4]
+
+
+class TestIncremental:
+    """O(1) state objects reproduce the batch kernels bar by bar"""
+
+    def stream(self, state, columns):
+        out = []
+        for row in zip(*columns):
+            value = state.update(*row)
+            out.append(np.nan if value is None else value)
+        return np.array(out, dtype=float)
+
+    def test_scalar_indicators(self, bars):
+        close, high, low = bars["close"], bars["high"], bars["low"]
+        assert_close(self.stream(ind.SMA(20), [close]), ind.sma(close, 20))
+        assert_close(self.stream(ind.EMA(50), [close]), ind.ema(close, 50))
+        assert_close(self.stream(ind.RSI(14), [close]), ind.rsi(close, 14))
+        assert_close(self.stream(ind.ATR(14), [high, low, close]), ind.atr(high, low, close, 14))
+        vwap = self.stream(ind.VWAP(), [high, low, close, bars["volume"], bars["ts"]])
+        assert_close(vwap, ind.vwap(high, low, close, bars["volume"], bars["ts"]))
+
+    def test_band_indicators(self, bars):
+        close = bars["close"]
+        state, batch = ind.Bollinger(20), ind.bollinger(close, 20)
+        macd_state, macd_batch = ind.MACD(), ind.macd(close)
+        for i, price in enumerate(close):
+            band = state.update(price)
+            line = macd_state.update(price)
+            if band is not None:
+                assert band["upper"] == pytest.approx(batch["upper"][i], rel=1e-9)
+            if line is not None and line["signal"] is not None:
+                assert line["histogram"] == pytest.approx(macd_batch["histogram"][i], abs=1e-12)
+
+    def test_swings(self, bars):
+        state = ind.Swings(3, 2)
+        found = {"high": [], "low": []}
+        for high, low in zip(bars["high"], bars["low"]):
+            for kind, index, _ in state.update(high, low):
+                found[kind].append(index)
+        batch = ind.swings(bars["high"], bars["low"], 3, 2)
+        assert found["high"] == np.flatnonzero(batch["swing_high"]).tolist()
+        assert found["low"] == np.flatnonzero(batch["swing_low"]).tolist()
+
+
+class TestIndicatorCache:
+    """Results are shared until the symbol's data changes"""
+
+    def test_hit_and_invalidation(self, tmp_path, bars):
+        store = BarStore(str(tmp_path / "bars"))
+        store.write("EURUSD", "M5", bars)
+        cache = ind.IndicatorCache(store)
+
+        ts, first = cache.get("EURUSD", "M5", "rsi", (14,))
+        _, again = cache.get("eurusd", "5m", "rsi", ["14"])
+        assert again is first and cache.hits == 1
+        assert len(ts) == len(bars["ts"])
+
+        extra = {name: arr[-1:] + (300 if name == "ts" else 0) for name, arr in bars.items()}
+        store.write("EURUSD", "M5", extra)
+        ts, refreshed = cache.get("EURUSD", "M5", "rsi", (14,))
+        assert refreshed is not first and len(ts) == len(bars["ts"]) + 1
+
+    def test_params_validation(self):
+        assert ind.parse_params("macd", ["10"]) == (10, 26, 9)
+        assert ind.parse_params("bollinger", None) == (20, 2.0)
+        with pytest.raises(ValueError):
+            ind.parse_params("ichimoku")
+        with pytest.raises(ValueError):
+            ind.parse_params("rsi", ["0"])
@@ -0,0 +1,184 @@
+"""
+Paper Trading Test Suite
+Execution model, book matching, OCO brackets and requests applied by the lease holder
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import paper as paper_module
+from utils.paper import ExecutionModel, PaperEngine, PaperOrder, PaperTradingService
+
+T0 = 1_700_000_000
+
+
+def engine(**model):
+    return PaperEngine(ExecutionModel(**{"spread_bps": 0, "slippage_bps": 0, **model}))
+
+
+def order(side="buy", type="market", quantity=1, price=None, stop_loss=None, take_profit=None, user="u", symbol="EURUSD"):
+    return PaperOrder(user, symbol, side, type, quantity, price, stop_loss, take_profit)
+
+
+class TestExecutionModel:
+    """Spread and slippage"""
+
+    def test_quote_and_slippage(self):
+        model = ExecutionModel(spread_bps=2, slippage_bps=1, impact_bps=0.5)
+        bid, ask = model.quote(100)
+        assert (bid, ask) == pytest.approx((99.99, 100.01))
+        assert model.slip(100, "buy", 2) == pytest.approx(100.02)
+        assert model.slip(100, "sell", 2) == pytest.approx(99.98)
+
+    def test_market_order_pays_spread_and_slippage(self):
+        paper = PaperEngine(ExecutionModel(spread_bps=2, slippage_bps=1))
+        paper.on_tick("EURUSD", 100, T0)
+        fill = paper.place(order())[0]
+        assert fill["type"] == "entry" and fill["price"] == pytest.approx(100.01 * 1.0001)
+
+
+class TestMatching:
+    """Resting orders triggered by quotes"""
+
+    def test_limit_and_stop_trigger_sides(self):
+        paper = engine()
+        paper.on_tick("EURUSD", 100, T0)
+        buy_limit = order("buy", "limit", price=99)
+        buy_stop = order("buy", "stop", price=101)
+        sell_limit = order("sell", "limit", price=102)
+        sell_stop = order("sell", "stop", price=98)
+        for o in (buy_limit, buy_stop, sell_limit, sell_stop):
+            assert paper.place(o) == []
+        assert [f["order_id"] for f in paper.on_tick("EURUSD", 101.5, T0 + 1)] == [buy_stop.id]
+        assert [f["order_id"] for f in paper.on_tick("EURUSD", 102, T0 + 2)] == [sell_limit.id]
+        assert paper.on_tick("EURUSD", 99.5, T0 + 3) == []
+        fills = paper.on_tick("EURUSD", 97, T0 + 4)
+        assert {f["order_id"] for f in fills} == {buy_limit.id, sell_stop.id}
+        assert not paper.orders
+
+    def test_limit_fills_at_quote_or_better_and_stop_slips(self):
+        paper = engine(slippage_bps=10)
+        paper.on_tick("EURUSD", 100, T0)
+        paper.place(order("buy", "limit", price=99))
+        paper.place(order("sell", "stop", price=99, user="v"))
+        fills = {f["user_id"]: f["price"] for f in paper.on_tick("EURUSD", 98, T0 + 1)}   # gap through both
+        assert fills["u"] == 98
+        assert fills["v"] == pytest.approx(98 * 0.999)
+
+    def test_marketable_limit_fills_on_placement(self):
+        paper = engine()
+        paper.on_tick("EURUSD", 100, T0)
+        fills = paper.place(order("buy", "limit", price=101))
+        assert fills[0]["price"] == 100
+
+    def test_cancelled_orders_skipped_and_compacted(self, monkeypatch):
+        monkeypatch.setattr(paper_module, "COMPACT_MIN_STALE", 2)
+        paper = engine()
+        paper.on_tick("EURUSD", 100, T0)
+        orders = [order("buy", "limit", price=90 + i) for i in range(6)]
+        for o in orders:
+            paper.place(o)
+        for o in orders[:4]:
+            assert paper.cancel(o.id)
+        assert not paper.cancel(orders[0].id)
+        assert paper.books["EURUSD"].size() == 2
+        fills = paper.on_tick("EURUSD", 80, T0 + 1)
+        assert {f["order_id"] for f in fills} == {orders[4].id, orders[5].id}
+
+    def test_validation(self):
+        paper = engine()
+        with pytest.raises(ValueError, match="Aucun prix"):
+            paper.place(order())
+        paper.on_tick("EURUSD", 100, T0)
+        with pytest.raises(ValueError):
+            paper.place(order(stop_loss=101))
+        with pytest.raises(ValueError):
+            paper.place(order("sell", take_profit=101))
+        with pytest.raises(ValueError):
+            paper.place(order("buy", "limit"))
+        with pytest.raises(ValueError):
+            paper.place(order("hold"))
+
+
+class TestBrackets:
+    """Positions and OCO exits"""
+
+    def test_take_profit_cancels_stop(self):
+        paper = engine()
+        paper.on_tick("EURUSD", 100, T0)
+        entry = paper.place(order(quantity=10, stop_loss=98, take_profit=103))[0]
+        position = paper.positions[entry["trade_id"]]
+        assert len(paper.orders) == 2 and position.direction == "LONG"
+        exit_ = paper.on_tick("EURUSD", 103.5, T0 + 60)[0]
+        assert (exit_["type"], exit_["reason"], exit_["price"], exit_["pnl"]) == ("exit", "take_profit", 103.5, 35)
+        assert not paper.orders and not paper.positions
+        assert paper.on_tick("EURUSD", 90, T0 + 120) == []
+        trade = position.to_trade()
+        assert (trade["status"], trade["pnl"], trade["pnl_percent"], trade["source"]) == ("closed", 35, 3.5, "paper")
+
+    def test_short_stop_loss_and_manual_close(self):
+        paper = engine()
+        paper.on_tick("EURUSD", 100, T0)
+        entry = paper.place(order("sell", "limit", price=101, stop_loss=102))
+        assert entry == []
+        entry = paper.on_tick("EURUSD", 101, T0 + 1)[0]
+        exit_ = paper.on_tick("EURUSD", 102.5, T0 + 2)[0]
+        assert exit_["reason"] == "stop_loss" and exit_["pnl"] == -1.5
+
+        entry = paper.place(order("sell", stop_loss=110))[0]
+        fill = paper.close_position(entry["trade_id"])
+        assert fill["reason"] == "close" and fill["pnl"] == 0 and not paper.orders
+        with pytest.raises(KeyError):
+            paper.close_position(entry["trade_id"])
+
+
+class TestService:
+    """Requests recorded by any worker, applied and written by the lease holder"""
+
+    def service(self):
+        service = PaperTradingService(engine())
+        service.leader = True
+        service.process("EURUSD", 100, T0)
+        return service
+
+    def test_requests_applied(self):
+        service = self.service()
+        market, cancelled, bad = order(stop_loss=98), order("buy", "limit", price=99), order("buy", "limit")
+        docs = [{"_id": o.id, **o.to_doc()} for o in (market, cancelled, bad)]
+        docs[1]["cancel_requested"] = True
+        service.apply(docs, [], [])
+        engine_ = service.engine
+        assert market.id in engine_.positions                   # the trade is the entry order's id
+        assert {o.id: o.status for o in engine_.dirty_orders.values() if o.trade_id is None} == {
+            market.id: "filled", cancelled.id: "cancelled", bad.id: "rejected"}
+        assert engine_.dirty_orders[bad.id].error
+        service.apply([], [], [market.id, "gone"])
+        assert engine_.positions == {} and engine_.dirty_positions[market.id].exit_reason == "close"
+
+    def test_close_without_quote_reported(self):
+        service = self.service()
+        service.apply([{"_id": "t1", **order().to_doc()}], [], [])
+        del service.engine.quotes["EURUSD"]
+        service.apply([], [], ["t1"])
+        assert "t1" in service._close_errors
+
+    def test_failed_write_kept_for_next_flush(self, monkeypatch):
+        service = self.service()
+        service.apply([{"_id": "t1", **order().to_doc()}], [], [])
+
+        def down(*args):
+            raise RuntimeError("down")
+
+        monkeypatch.setattr(service, "_write", down)
+        with pytest.raises(RuntimeError):
+            asyncio.run(service.flush())
+        assert "t1" in service.engine.dirty_orders and "t1" in service.engine.dirty_positions
+
+    def test_quotes_only_when_not_leading(self):
+        service = PaperTradingService(engine())
+        service.process("EURUSD", 100, T0)
+        assert not service.engine.books and service.engine.quotes["EURUSD"] == (100, 100, T0)
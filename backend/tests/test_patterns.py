@@ -0,0 +1,136 @@
+"""
+Pattern Scanner Test Suite
+BOS, FVG, order blocks, support/resistance zones and the per-closed-bar cache
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bar_store import BarStore
+from utils.patterns import (
+    PatternScanner, break_of_structure, describe_patterns, detect_patterns, fair_value_gaps,
+    order_blocks, sr_zones
+)
+
+
+def candles(rows):
+    """rows of (open, high, low, close)"""
+    o, h, l, c = (np.array(col, dtype=np.float64) for col in zip(*rows))
+    return o, h, l, c
+
+
+class TestDetectors:
+    """Each detector on hand-built candles"""
+
+    def test_bos_first_close_beyond_confirmed_swing(self):
+        high = np.array([1, 2, 3, 5, 3, 2, 1, 2, 4, 6, 7, 8], dtype=float)
+        low = high - 0.5
+        close = high - 0.2
+        bos = break_of_structure(high, low, close, size=2)
+        breaks, swings = bos["bullish"]
+        # Swing high at 3 (5.0) confirmed at bar 5; first close above 5 is bar 9
+        assert breaks.tolist() == [9] and swings.tolist() == [3]
+        assert len(bos["bearish"][0]) == 0
+
+    def test_bos_needs_confirmation(self):
+        high = np.array([1, 2, 3, 5, 3, 2, 6], dtype=float)
+        bos = break_of_structure(high, high - 0.5, high - 0.2, size=2)
+        assert bos["bullish"][0].tolist() == [6]
+        # With 3 bars on each side, bar 6 breaks the high before it is a swing
+        bos = break_of_structure(high, high - 0.5, high - 0.2, size=3)
+        assert bos["bullish"][0].tolist() == []
+
+    def test_fair_value_gaps(self):
+        _, high, low, _ = candles([
+            (10, 11, 9, 10.5), (10.5, 13, 10.4, 12.8), (12.8, 14, 12, 13.5),  # bullish gap 11 -> 12
+            (13.5, 13.8, 12.5, 13), (13, 13.2, 11.5, 12), (12, 12.5, 10.5, 11),  # trades back to 10.5
+            (11, 11.6, 10.8, 11), (11, 11.1, 9, 9.5), (9.5, 9.8, 8, 8.5),      # bearish gap 10.8 -> 9.8
+        ])
+        gaps = fair_value_gaps(high, low, np.zeros(len(high)))
+        idx, top, bottom, filled = gaps["bullish"]
+        assert idx.tolist() == [2] and top[0] == 12 and bottom[0] == 11 and filled[0]
+        idx, top, bottom, filled = gaps["bearish"]
+        assert idx.tolist() == [8] and top[0] == 10.8 and bottom[0] == 9.8 and not filled[0]
+        # Gaps below the minimum size are ignored
+        assert len(fair_value_gaps(high, low, np.full(len(high), 5.0))["bullish"][0]) == 0
+
+    def test_order_block_is_last_opposite_candle(self):
+        open_, high, low, close = candles([
+            (10, 10.5, 9.5, 10.2), (10.2, 11, 10, 10.8), (10.8, 12, 10.7, 11.8), (11.8, 11.9, 11, 11.2),
+            (11.2, 11.3, 10.6, 10.7), (10.7, 10.8, 10.2, 10.4), (10.4, 11.5, 10.3, 11.4),
+            (11.4, 12.6, 11.3, 12.5), (12.5, 13, 12.4, 12.9),
+        ])
+        bos = break_of_structure(high, low, close, size=2)
+        assert bos["bullish"][0].tolist() == [7]
+        candle, breaks, mitigated = order_blocks(open_, high, low, close, bos)["bullish"]
+        # The last bearish candle before the break is bar 5
+        assert candle.tolist() == [5] and breaks.tolist() == [7] and not mitigated[0]
+
+    def test_sr_zones_cluster_swings(self):
+        # Three tops near 2.0 and two bottoms near 1.0
+        high = np.array([1.5, 1.8, 2.0, 1.8, 1.5, 1.8, 2.01, 1.8, 1.2, 1.1, 1.2, 1.7, 1.99, 1.6, 1.2, 1.1, 1.3, 1.5])
+        low = high - 0.1
+        bottom, top, mean, touches, last = sr_zones(high, low, tolerance=0.05, size=1)
+        assert touches.tolist() == [2, 3]
+        assert bottom[1] == pytest.approx(1.99) and top[1] == pytest.approx(2.01)
+        assert mean[0] == pytest.approx(1.0)
+        assert last.tolist() == [15, 12]
+
+
+class TestScanner:
+    """Full scan, closed-bar handling and the cache"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        rng = np.random.default_rng(4)
+        n = 3000
+        close = 100 + np.cumsum(rng.normal(0, 0.3, n))
+        open_ = np.concatenate(([100.0], close[:-1]))
+        wick = np.abs(rng.normal(0, 0.2, n))
+        store = BarStore(str(tmp_path / "bars"))
+        store.write("EURUSD", "H1", {
+            "ts": 1_600_000_000 - 1_600_000_000 % 3600 + np.arange(n, dtype=np.int64) * 3600,
+            "open": open_, "high": np.maximum(open_, close) + wick, "low": np.minimum(open_, close) - wick,
+            "close": close, "volume": np.ones(n),
+        })
+        return store
+
+    def test_detect_patterns_shapes(self, store):
+        result = detect_patterns(store.read("EURUSD", "H1"))
+        assert result["trend"] in ("bullish", "bearish")
+        assert result["bos"] and result["fvg"] and result["order_blocks"] and result["zones"]
+        times = [b["time"] for b in result["bos"]]
+        assert times == sorted(times, reverse=True)
+        assert all(z["bottom"] <= z["price"] <= z["top"] for z in result["zones"])
+
+    def test_cache_and_closed_bars(self, store):
+        scanner = PatternScanner(store, workers=1)
+        first = scanner.scan("eurusd", "H1", lookback=200)
+        assert first["bars"] == 200 and first["closed_bar"] == int(store.read("EURUSD", "H1")["ts"][-1])
+        assert scanner.scan("EURUSD", "H1", lookback=200) is first
+        # New data invalidates the cached scan
+        last = store.read("EURUSD", "H1", limit=1)
+        store.write("EURUSD", "H1", {k: v.copy() + (3600 if k == "ts" else 0) for k, v in last.items()})
+        assert scanner.scan("EURUSD", "H1", lookback=200)["closed_bar"] == first["closed_bar"] + 3600
+
+    def test_scan_many_in_worker_processes(self, store):
+        scanner = PatternScanner(store, workers=2)
+        try:
+            results = scanner.scan_many(["EURUSD", "GBPUSD"], ["H1", "H4"], lookback=300)
+        finally:
+            scanner.shutdown()
+        assert [(r["symbol"], r["timeframe"]) for r in results] == [
+            ("EURUSD", "H1"), ("EURUSD", "H4"), ("GBPUSD", "H1"), ("GBPUSD", "H4")
+        ]
+        assert results[0] == detect_patterns(store.read("EURUSD", "H1", limit=300)) | {
+            "symbol": "EURUSD", "timeframe": "H1", "closed_bar": results[0]["closed_bar"]
+        }
+        assert results[1]["bars"] == 300 and results[2]["error"]
+
+    def test_describe_for_prompt(self, store):
+        text = describe_patterns(PatternScanner(store, workers=1).scan("EURUSD", "H1"))
+        assert "Dernier BOS" in text and "bougies H1" in text
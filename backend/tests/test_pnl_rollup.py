@@ -0,0 +1,154 @@
+"""
+P&L Rollup Test Suite
+Daily rollup deltas, rebuilds and the pnl_rollup_gen counter ordering them
+"""
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pnl_rollup
+from utils.pnl_rollup import get_heatmap, invalidate_rollup, rebuild_rollup, record_pnl
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+END = datetime(2026, 1, 31, tzinfo=timezone.utc)
+
+
+class FakeCollection:
+    """The handful of Mongo calls the rollup makes: equality filters, $nin,
+    $gte/$lte, and $inc / $set / $setOnInsert updates"""
+
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+
+    def _matches(self, doc, query):
+        for field, cond in query.items():
+            value = doc.get(field)
+            if isinstance(cond, dict):
+                if "$nin" in cond and value in cond["$nin"]:
+                    return False
+                if "$gte" in cond and not value >= cond["$gte"]:
+                    return False
+                if "$lte" in cond and not value <= cond["$lte"]:
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs.values() if self._matches(doc, query)), None)
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.docs.values() if self._matches(doc, query)]
+
+    def update_one(self, query, update, upsert=False):
+        doc = next((doc for doc in self.docs.values() if self._matches(doc, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs.setdefault(query["_id"], {"_id": query["_id"]})
+            doc.update(update.get("$setOnInsert", {}))
+        doc.update(update.get("$set", {}))
+        for field, step in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + step
+
+    def find_one_and_update(self, query, update, projection=None, return_document=None):
+        self.update_one(query, update)
+        return self.find_one(query)
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            _id = request._filter["_id"]
+            self.docs[_id] = {"_id": _id, **request._doc}
+
+    def delete_many(self, query):
+        for _id in [_id for _id, doc in self.docs.items() if self._matches(doc, query)]:
+            del self.docs[_id]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Users and daily rollup in memory; closed trades as (day, pnl) rows"""
+    state = SimpleNamespace(users=FakeCollection({"_id": "u", "timezone": "UTC"}), daily=FakeCollection(),
+                            trades=[], on_aggregate=None)
+
+    def aggregate(user_id, start, end, tz, bucket):
+        rows = {}
+        for day, pnl in state.trades:
+            row = rows.setdefault(day, {"date": day, "pnl": 0, "trades": 0})
+            row["pnl"] += pnl
+            row["trades"] += 1
+        if state.on_aggregate:
+            state.on_aggregate()
+        return sorted(rows.values(), key=lambda row: row["date"])
+
+    monkeypatch.setattr(pnl_rollup, "users_collection", state.users)
+    monkeypatch.setattr(pnl_rollup, "daily_pnl_collection", state.daily)
+    monkeypatch.setattr(pnl_rollup, "aggregate_heatmap", aggregate)
+    return state
+
+
+def close(db, day, pnl):
+    """A trade closed on `day`: stored, then its delta recorded"""
+    db.trades.append((day, pnl))
+    record_pnl("u", datetime.fromisoformat(day).replace(hour=12), pnl)
+
+
+def heatmap():
+    return {row["date"]: (row["pnl"], row["trades"]) for row in get_heatmap("u", START, END)}
+
+
+class TestRollup:
+    """Deltas on a ready rollup, rebuild when stale"""
+
+    def test_deltas_applied_once_ready(self, db):
+        close(db, "2026-01-05", 100)                  # stale: left to the rebuild
+        assert heatmap() == {"2026-01-05": (100, 1)}
+        assert db.users.docs["u"]["pnl_rollup_ready"]
+        close(db, "2026-01-05", -40)
+        close(db, "2026-01-06", 10)
+        assert heatmap() == {"2026-01-05": (60, 2), "2026-01-06": (10, 1)}
+        assert db.users.docs["u"]["pnl_rollup_gen"] == 2     # stale delta + first rebuild, none since
+
+    def test_rebuild_drops_days_without_trades(self, db):
+        close(db, "2026-01-05", 100)
+        heatmap()
+        db.trades.clear()
+        invalidate_rollup("u")
+        assert heatmap() == {}
+
+
+class TestGeneration:
+    """pnl_rollup_gen keeps deltas that race a rebuild"""
+
+    def test_trade_closed_during_rebuild(self, db):
+        # Closed after the rebuild read the trades: the rollup must stay stale
+        db.on_aggregate = lambda: (setattr(db, "on_aggregate", None), close(db, "2026-01-07", 50))
+        assert heatmap() == {}
+        assert not db.users.docs["u"]["pnl_rollup_ready"]
+        assert heatmap() == {"2026-01-07": (50, 1)}
+
+    def test_invalidate_during_rebuild(self, db):
+        db.on_aggregate = lambda: invalidate_rollup("u")
+        rebuild_rollup("u")
+        assert not db.users.docs["u"]["pnl_rollup_ready"]
+
+    def test_rebuild_started_around_delta(self, db):
+        heatmap()
+        gen = db.users.docs["u"]["pnl_rollup_gen"]
+        update_one = db.daily.update_one
+
+        def racing(*args, **kwargs):
+            update_one(*args, **kwargs)
+            db.users.update_one({"_id": "u"}, {"$inc": {"pnl_rollup_gen": 1}})    # rebuild begins
+
+        db.daily.update_one = racing
+        close(db, "2026-01-08", 20)
+        user = db.users.docs["u"]
+        assert not user["pnl_rollup_ready"] and user["pnl_rollup_gen"] == gen + 2
+        db.daily.update_one = update_one
+        assert heatmap() == {"2026-01-08": (20, 1)}
@@ -0,0 +1,109 @@
+"""
+Portfolio Backtest Test Suite
+Candidate trades, shared capital / position limits, mark-to-market and attribution
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.portfolio import PortfolioConfig, candidate_trades, simulate
+from utils.rules import strategy_signals
+
+
+def make_bars(close, start=1_700_000_000, step=3600, wick=0.0):
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    return {
+        "ts": start + np.arange(n, dtype=np.int64) * step,
+        "open": close, "high": close + wick, "low": close - wick, "close": close,
+        "volume": np.ones(n),
+    }
+
+
+def flags(n, idx):
+    out = np.zeros(n, dtype=bool)
+    out[list(idx)] = True
+    return out
+
+
+@pytest.fixture(scope="module")
+def basket():
+    rng = np.random.default_rng(3)
+    bars, signals = {}, {}
+    for k in range(6):
+        n = 3000 + 100 * k
+        close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+        b = make_bars(close, start=1_700_000_000 + 1800 * k, wick=0.3)
+        bars[f"SYM{k}"] = b
+        signals[f"SYM{k}"] = strategy_signals(["rsi(14) < 35"], ["rsi(14) > 60"], b)
+    return bars, signals
+
+
+class TestCandidates:
+    """Exit resolution for a single symbol"""
+
+    def test_exit_on_signal_stop_and_target(self):
+        config = PortfolioConfig(stop_loss_percent=5, take_profit_percent=5)
+        bars = make_bars([100, 101, 102, 103, 104, 110, 100, 90, 95, 96])
+        trades = candidate_trades(bars, flags(10, [0, 1, 6]), flags(10, [3]), 0, 10, config)
+        # Entry at 0 exits on the signal at 3; entry at 1 overlaps; 6 hits the stop at 7
+        assert [(t[0], t[1], t[4]) for t in trades] == [(0, 3, "signal"), (6, 7, "stop_loss")]
+        assert trades[1][3] == pytest.approx(95.0)
+
+        trades = candidate_trades(bars, flags(10, [4]), flags(10, []), 0, 10, config)
+        assert trades == [(4, 5, 104.0, pytest.approx(109.2), "take_profit")]
+
+    def test_short_and_open_at_end(self):
+        config = PortfolioConfig(stop_loss_percent=0, take_profit_percent=0, direction="short")
+        bars = make_bars([100, 99, 98, 97])
+        assert candidate_trades(bars, flags(4, [1]), flags(4, []), 0, 4, config) == [(1, 3, 99.0, 97.0, "end")]
+
+
+class TestSimulation:
+    """Shared capital, limits and the mark-to-market equity curve"""
+
+    def test_position_limit_and_sizing(self):
+        config = PortfolioConfig(initial_capital=1000, max_positions=1, stop_loss_percent=0,
+                                 take_profit_percent=0, max_position_percent=50)
+        bars = {"A": make_bars([10, 11, 12, 13]), "B": make_bars([20, 22, 24, 26])}
+        signals = {
+            "A": {"entry": flags(4, [0]), "exit": flags(4, [2])},
+            "B": {"entry": flags(4, [1]), "exit": flags(4, [3])},
+        }
+        result = simulate(bars, signals, config)
+        # B's entry is rejected while A holds the only slot
+        assert result["total_trades"] == 1 and result["rejected_signals"] == 1
+        # 50% of 1000 at 10 = 50 units, +2 each
+        assert result["total_pnl"] == pytest.approx(100)
+        assert result["by_symbol"][0] == {
+            "symbol": "A", "trades": 1, "pnl": 100.0, "winrate": 100.0,
+            "contribution_percent": 100.0, "drawdown_contribution": 0.0
+        }
+
+    def test_equity_curve_matches_trades(self, basket):
+        bars, signals = basket
+        config = PortfolioConfig(max_positions=3)
+        result = simulate(bars, signals, config, chunk_bars=700)
+        assert result["total_trades"] > 20 and result["rejected_signals"] > 0
+        assert result["final_capital"] == pytest.approx(config.initial_capital + sum(
+            row["pnl"] for row in result["by_symbol"]), abs=0.05)
+        # Chunking does not change the result
+        assert simulate(bars, signals, config, chunk_bars=10_000) == result
+
+    def test_drawdown_attribution(self, basket):
+        bars, signals = basket
+        result = simulate(bars, signals, PortfolioConfig(max_positions=6))
+        contribution = sum(row["drawdown_contribution"] for row in result["by_symbol"])
+        assert result["max_drawdown"] > 0
+        assert contribution == pytest.approx(-result["max_drawdown"], abs=0.05)
+        assert -1 <= result["correlation"]["average"] <= 1
+
+    def test_date_range(self, basket):
+        bars, signals = basket
+        start = 1_700_000_000 + 1000 * 3600
+        result = simulate(bars, signals, PortfolioConfig(), start_ts=start)
+        assert all(t["entry_time"] >= start for t in result["trades"])
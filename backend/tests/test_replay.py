@@ -0,0 +1,173 @@
+"""
+Bar Replay Test Suite
+Cursor over shared windows, simulated order fills and batched trade writes
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import replay as replay_module
+from utils.bar_store import BarStore
+from utils.replay import ReplayManager, ReplaySession
+
+T0 = 1_704_067_200  # 2024-01-01 00:00 UTC
+
+
+def h1_bars(prices, start=T0):
+    """Bars opening at `open`, trading to high/low, closing at the next open"""
+    n = len(prices) - 1
+    opens, closes = np.array(prices[:-1], float), np.array(prices[1:], float)
+    return {
+        "ts": start + np.arange(n, dtype=np.int64) * 3600,
+        "open": opens, "high": np.maximum(opens, closes) + 1, "low": np.minimum(opens, closes) - 1,
+        "close": closes, "volume": np.ones(n),
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.write("EURUSD", "H1", h1_bars([100, 101, 102, 103, 104, 105, 104, 103, 102, 101, 100]))
+    return store
+
+
+def backtest(**extra):
+    return {"_id": "bt1", "symbol": "EURUSD", "timeframe": "H1", "initial_capital": 10000,
+            "risk_per_trade": 1, "trades": [], **extra}
+
+
+class FakeCollection:
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class TestCursor:
+    """Stepping, windows, seek and end of data"""
+
+    def test_steps_across_windows_and_gaps(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(replay_module, "WINDOW_BARS", 4)
+        store = BarStore(str(tmp_path))
+        first = h1_bars(list(range(100, 110)))
+        later = h1_bars(list(range(200, 205)), start=T0 + 30 * 86400)   # a month-long gap
+        store.write("EURUSD", "H1", {k: np.concatenate([first[k], later[k]]) for k in first})
+        session = ReplaySession(backtest(), "u", store=store)
+        bars, _ = session.advance(20)
+        assert [b[1] for b in bars] == list(range(100, 109)) + list(range(200, 204))
+        assert session.finished
+
+    def test_sessions_share_windows(self, store):
+        a = ReplaySession(backtest(), "u", store=store)
+        b = ReplaySession(backtest(), "v", store=store)
+        a.advance(3)
+        b.advance(1)
+        assert a.bars is b.bars
+
+    def test_start_end_and_resume_cursor(self, store):
+        session = ReplaySession(backtest(start_date="2024-01-01T03:00:00", end_date="2024-01-01T06:00:00"), "u", store=store)
+        bars, _ = session.advance(10)
+        assert [b[0] for b in bars] == [T0 + 3 * 3600, T0 + 4 * 3600, T0 + 5 * 3600]
+        resumed = ReplaySession(backtest(replay={"cursor": T0 + 7 * 3600, "speed": 10}), "u", store=store)
+        assert resumed.advance(1)[0][0][1] == 103 and resumed.speed == 10
+
+    def test_seek_refused_with_open_position(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        session.advance(1)
+        history = session.seek(T0 + 5 * 3600)
+        assert [b[0] for b in history][-1] == T0 + 4 * 3600
+        session.place("buy")
+        with pytest.raises(ValueError):
+            session.seek(T0)
+
+    def test_no_data(self, tmp_path):
+        with pytest.raises(ValueError):
+            ReplaySession(backtest(), "u", store=BarStore(str(tmp_path)))
+
+
+class TestOrders:
+    """Fills against revealed bars"""
+
+    def test_market_fills_next_open_and_take_profit(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        session.advance(1)                                   # bar 100 -> 101
+        session.place("buy", take_profit=103.5, quantity=10)
+        _, events = session.advance(1)
+        assert events[0]["type"] == "fill" and events[0]["price"] == 101
+        _, events = session.advance(2)                       # 102->103 (high 104)
+        trade = events[0]["trade"]
+        assert (trade["exit_price"], trade["pnl"], trade["exit_reason"]) == (103.5, 25.0, "take_profit")
+        assert trade["direction"] == "LONG" and session.equity == 10025
+
+    def test_stop_first_when_one_bar_hits_both(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        session.advance(1)
+        session.place("buy", stop_loss=100.5, take_profit=102.5, quantity=1)
+        _, events = session.advance(1)                       # 101->102: high 103, low 100
+        assert [e["type"] for e in events] == ["fill", "trade"]
+        assert events[1]["trade"]["exit_reason"] == "stop_loss" and events[1]["trade"]["exit_price"] == 100.5
+
+    def test_limit_and_stop_orders(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        session.advance(5)                                   # last close 105
+        session.place("sell", "limit", price=105.5, stop_loss=107, quantity=1)
+        _, events = session.advance(1)                       # 105->104: high 106
+        assert events[0]["price"] == 105.5
+        session.close()
+        _, events = session.advance(1)                       # exit at the next open (104)
+        assert events[0]["trade"]["pnl"] == 1.5 and events[0]["trade"]["direction"] == "SHORT"
+        session.place("buy", "stop", price=110)
+        _, events = session.advance(3)
+        assert events == [] and session.order is not None
+
+    def test_risk_sizing_and_validation(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        session.advance(1)
+        with pytest.raises(ValueError):
+            session.place("buy", stop_loss=120)
+        with pytest.raises(ValueError):
+            session.place("buy", "limit")
+        session.place("buy", stop_loss=99)
+        _, events = session.advance(1)
+        assert events[0]["quantity"] == pytest.approx(10000 * 0.01 / 2)
+        with pytest.raises(ValueError):
+            session.place("sell")
+
+    def test_open_position_closed_at_end(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        session.place("buy", quantity=1)
+        _, events = session.advance(50)
+        assert events[-1]["trade"]["exit_reason"] == "end" and events[-1]["trade"]["exit_price"] == 100
+
+
+class TestPersistence:
+    """Batched writes into the backtest document"""
+
+    def test_flush_appends_trades_and_cursor(self, store):
+        session = ReplaySession(backtest(), "u", store=store)
+        for _ in range(3):
+            session.place("buy", quantity=1)
+            session.advance(1)
+            session.close()
+            session.advance(1)
+        collection = FakeCollection()
+        session.flush(collection)
+        session.flush(collection)        # nothing buffered: no write
+        assert len(collection.updates) == 1
+        query, update = collection.updates[0]
+        assert query == {"_id": "bt1", "user_id": "u"}
+        assert len(update["$push"]["trades"]["$each"]) == 3
+        assert update["$set"]["replay"]["cursor"] == session.next_ts and update["$set"]["status"] == "in_progress"
+
+    def test_sessions_per_user_limit(self, store, monkeypatch):
+        monkeypatch.setattr(replay_module, "MAX_SESSIONS_PER_USER", 1)
+        manager = ReplayManager()
+        manager.open(backtest(), "u", store=store)
+        with pytest.raises(ValueError):
+            manager.open(backtest(), "u", store=store)
+        manager.open(backtest(), "v", store=store)
@@ -0,0 +1,155 @@
+"""
+Resampling Engine Test Suite
+Unit tests for session-aware OHLCV resampling and the persisted tiers
+(no server or database needed)
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bar_store import BarStore
+from utils.resample import resample, build_tiers, read_bars
+
+
+def epoch(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def minute_bars(start: int, minutes: int, seed: int = 0) -> dict:
+    """Continuous M1 random walk starting at `start` (epoch seconds)"""
+    rng = np.random.default_rng(seed)
+    ts = start + np.arange(minutes, dtype=np.int64) * 60
+    close = 100 + np.cumsum(rng.normal(0, 0.1, minutes))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    return {
+        "ts": ts,
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.random(minutes) * 0.05,
+        "low": np.minimum(open_, close) - rng.random(minutes) * 0.05,
+        "close": close,
+        "volume": rng.integers(1, 100, minutes).astype(np.float64),
+    }
+
+
+def as_utc(ts) -> list:
+    return [datetime.fromtimestamp(int(t), tz=timezone.utc).strftime("%Y-%m-%d %H:%M") for t in ts]
+
+
+class TestResample:
+    """Bucket boundaries and OHLCV reductions"""
+
+    @pytest.mark.parametrize("timeframe,rule", [("M5", "5min"), ("M15", "15min"), ("H1", "1h"), ("H4", "4h"), ("D1", "1D")])
+    def test_utc_matches_pandas(self, timeframe, rule):
+        bars = minute_bars(epoch(2024, 3, 1), 5 * 1440)
+        # Drop random minutes: gaps must not shift buckets
+        keep = np.random.default_rng(1).random(len(bars["ts"])) > 0.1
+        bars = {name: arr[keep] for name, arr in bars.items()}
+
+        result = resample(bars, timeframe, "utc")
+
+        frame = pd.DataFrame(bars, index=pd.to_datetime(bars["ts"], unit="s"))
+        expected = frame.resample(rule).agg({
+            "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+        }).dropna()
+        expected_ts = expected.index.to_numpy().astype("datetime64[s]").astype(np.int64)
+        assert np.array_equal(result["ts"], expected_ts)
+        for name in ("open", "high", "low", "close", "volume"):
+            assert np.allclose(result[name], expected[name].to_numpy()), name
+
+    def test_weekly_buckets_start_monday(self):
+        bars = minute_bars(epoch(2024, 1, 3), 14 * 1440)
+        result = resample(bars, "W1", "utc")
+        assert as_utc(result["ts"]) == ["2024-01-01 00:00", "2024-01-08 00:00", "2024-01-15 00:00"]
+        assert result["volume"].sum() == bars["volume"].sum()
+
+    def test_forex_day_starts_at_new_york_close(self):
+        # Summer (EDT): 17:00 New York = 21:00 UTC; winter (EST): 22:00 UTC
+        summer = resample(minute_bars(epoch(2024, 7, 1), 2 * 1440), "D1", "forex")
+        winter = resample(minute_bars(epoch(2024, 1, 15), 2 * 1440), "D1", "forex")
+        assert as_utc(summer["ts"]) == ["2024-06-30 21:00", "2024-07-01 21:00", "2024-07-02 21:00"]
+        assert as_utc(winter["ts"]) == ["2024-01-14 22:00", "2024-01-15 22:00", "2024-01-16 22:00"]
+
+    def test_forex_h4_aligned_to_session(self):
+        result = resample(minute_bars(epoch(2024, 1, 15, 22), 1440), "H4", "forex")
+        assert as_utc(result["ts"])[:3] == ["2024-01-15 22:00", "2024-01-16 02:00", "2024-01-16 06:00"]
+
+    def test_forex_week_spans_sunday_evening_to_friday(self):
+        # Sunday 2024-01-14 22:00 UTC opens the trading week of Monday the 15th
+        bars = minute_bars(epoch(2024, 1, 14, 21), 3 * 60)
+        result = resample(bars, "W1", "forex")
+        assert as_utc(result["ts"]) == ["2024-01-07 22:00", "2024-01-14 22:00"]
+        assert result["volume"][0] == bars["volume"][:60].sum()
+
+    def test_dst_change_inside_bucket(self):
+        # US clocks went back on 2024-11-03 at 02:00 EDT (06:00 UTC)
+        bars = minute_bars(epoch(2024, 11, 2, 12), 2 * 1440)
+        result = resample(bars, "D1", "forex")
+        assert as_utc(result["ts"]) == ["2024-11-01 21:00", "2024-11-02 21:00", "2024-11-03 22:00"]
+        # The day straddling the change has 25 hours of bars
+        assert np.sum((bars["ts"] >= epoch(2024, 11, 2, 21)) & (bars["ts"] < epoch(2024, 11, 3, 22))) == 25 * 60
+        assert result["volume"][1] == bars["volume"][(bars["ts"] >= epoch(2024, 11, 2, 21)) & (bars["ts"] < epoch(2024, 11, 3, 22))].sum()
+
+    def test_exchange_session_filters_and_aligns_to_open(self):
+        # 2024-03-04 is a Monday, NYSE opens 09:30 EST = 14:30 UTC
+        bars = minute_bars(epoch(2024, 3, 4), 1440)
+        result = resample(bars, "H1", "nyse")
+        assert as_utc(result["ts"]) == [f"2024-03-04 {h}:30" for h in range(14, 21)]
+        daily = resample(bars, "D1", "nyse")
+        inside = (bars["ts"] >= epoch(2024, 3, 4, 14, 30)) & (bars["ts"] < epoch(2024, 3, 4, 21))
+        assert daily["volume"].tolist() == [bars["volume"][inside].sum()]
+        assert daily["open"][0] == bars["open"][inside][0]
+        assert daily["close"][0] == bars["close"][inside][-1]
+
+    def test_empty_input(self):
+        empty = {name: np.empty(0) for name in ("ts", "open", "high", "low", "close", "volume")}
+        assert len(resample(empty, "H1", "forex")["ts"]) == 0
+
+
+class TestTiers:
+    """Persisted tiers and on-the-fly fallback"""
+
+    def test_incremental_build_matches_full_build(self, tmp_path):
+        bars = minute_bars(epoch(2023, 12, 20), 30 * 1440)
+        cut = np.searchsorted(bars["ts"], epoch(2024, 1, 10, 13, 17))
+        head = {name: arr[:cut] for name, arr in bars.items()}
+        tail = {name: arr[cut:] for name, arr in bars.items()}
+
+        full = BarStore(str(tmp_path / "full"))
+        full.write("EURUSD", "M1", bars)
+        build_tiers("EURUSD", store=full)
+
+        incremental = BarStore(str(tmp_path / "incremental"))
+        incremental.write("EURUSD", "M1", head)
+        build_tiers("EURUSD", store=incremental)
+        incremental.write("EURUSD", "M1", tail)
+        build_tiers("EURUSD", since=int(tail["ts"][0]), store=incremental)
+
+        for timeframe in ("M5", "H1", "H4", "D1", "W1"):
+            a = full.read("EURUSD", timeframe)
+            b = incremental.read("EURUSD", timeframe)
+            for name in a:
+                assert np.array_equal(a[name], b[name]), (timeframe, name)
+
+    def test_read_bars_resamples_missing_tier(self, tmp_path):
+        store = BarStore(str(tmp_path / "bars"))
+        store.write("EURUSD", "M1", minute_bars(epoch(2024, 2, 1), 10 * 1440))
+        build_tiers("EURUSD", store=store, timeframes=("H1",))
+
+        stored = read_bars("EURUSD", "H1", store=store)
+        direct = resample(store.read("EURUSD", "M1"), "H4", "forex")
+        fallback = read_bars("EURUSD", "H4", store=store)
+        assert len(stored["ts"]) > 0
+        for name in direct:
+            assert np.allclose(fallback[name], direct[name]), name
+
+        window = read_bars("EURUSD", "H4", start=epoch(2024, 2, 5), end=epoch(2024, 2, 6), store=store)
+        assert as_utc(window["ts"]) == ["2024-02-05 02:00", "2024-02-05 06:00", "2024-02-05 10:00",
+                                        "2024-02-05 14:00", "2024-02-05 18:00", "2024-02-05 22:00"]
+        latest = read_bars("EURUSD", "H4", limit=3, store=store)
+        assert np.array_equal(latest["ts"], direct["ts"][-3:])
@@ -0,0 +1,141 @@
+"""
+Rule DSL Test Suite
+Parsing, error reporting, vectorized evaluation and plan sharing/caching
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import indicators as ind
+from utils.rules import compile_rules, parse_rule, strategy_signals, Plan, RuleError
+
+
+@pytest.fixture(scope="module")
+def bars():
+    rng = np.random.default_rng(11)
+    n = 5000
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        "ts": np.arange(n, dtype=np.int64) * 60,
+        "open": np.concatenate(([100.0], close[:-1])),
+        "high": close + rng.random(n),
+        "low": close - rng.random(n),
+        "close": close,
+        "volume": rng.random(n) * 100,
+    }
+
+
+def evaluate(rule, bars):
+    return Plan([rule]).evaluate(bars)[0]
+
+
+class TestParser:
+    """Valid syntax, precedence and error reporting"""
+
+    def test_case_and_whitespace_insensitive(self):
+        assert parse_rule("RSI(14) < 30 AND close > EMA(200)") == parse_rule("rsi( 14 )<30 and close>ema(200)")
+
+    def test_default_params(self):
+        assert parse_rule("rsi < 30") == parse_rule("rsi(14) < 30")
+
+    def test_french_keywords(self):
+        assert parse_rule("close > open et non close > high") == parse_rule("close > open and not close > high")
+
+    @pytest.mark.parametrize("rule,message,position", [
+        ("Attendre un BOS sur H1", "inconnue 'attendre'", 0),
+        ("rsi(14) <", "Expression attendue", 9),
+        ("close", "doit être une condition", 0),
+        ("close > open and 5", "condition est attendue", 13),
+        ("(close > open) + 1 > 2", "valeur numérique", 15),
+        ("ichimoku(9) > close", "inconnue 'ichimoku'", 0),
+        ("rsi(0) < 30", "Paramètres invalides", 0),
+        ("close[1.5] > open", "Décalage entier", 6),
+        ("close > open $", "Caractère inattendu", 13),
+        ("ema(20) crosses ema(50)", "crosses above", 16),
+    ])
+    def test_errors(self, rule, message, position):
+        with pytest.raises(RuleError) as error:
+            parse_rule(rule)
+        assert message in str(error.value)
+        assert error.value.position == position
+
+    def test_unsupported_rules_are_reported_not_raised(self, bars):
+        plan = compile_rules(["close > open", "Entrer après un pullback sur le FVG"])
+        assert [r["supported"] for r in plan.rules] == [True, False]
+        results = plan.evaluate(bars)
+        assert results[1] is None and results[0].dtype == bool
+
+
+class TestEvaluation:
+    """Vectorized results match direct NumPy computations"""
+
+    def test_comparison_and_logic(self, bars):
+        expected = (ind.rsi(bars["close"], 14) < 30) & (bars["close"] > ind.ema(bars["close"], 200))
+        assert np.array_equal(evaluate("RSI(14) < 30 and close > EMA(200)", bars), expected)
+
+    def test_nan_warmup_is_false(self, bars):
+        result = evaluate("close > sma(50) or close <= sma(50)", bars)
+        assert not result[:49].any() and result[49:].all()
+
+    def test_crossovers(self, bars):
+        fast, slow = ind.ema(bars["close"], 10), ind.ema(bars["close"], 30)
+        above = evaluate("ema(10) crosses above ema(30)", bars)
+        below = evaluate("ema(10) crosses below ema(30)", bars)
+        idx = np.flatnonzero(above)
+        assert len(idx) > 0
+        assert (fast[idx] > slow[idx]).all() and (fast[idx - 1] <= slow[idx - 1]).all()
+        assert not (above & below).any()
+        assert np.array_equal(evaluate("ema(10) crosses above 100", bars)[1:],
+                              (fast[1:] > 100) & (fast[:-1] <= 100))
+
+    def test_lookback_and_windows(self, bars):
+        close, high = bars["close"], bars["high"]
+        result = evaluate("close > highest(high, 20)[1]", bars)
+        expected = np.zeros(len(close), dtype=bool)
+        for i in range(20, len(close)):
+            expected[i] = close[i] > high[i - 20:i].max()
+        assert np.array_equal(result, expected)
+
+    def test_arithmetic_and_derived_indicators(self, bars):
+        volume = bars["volume"]
+        assert np.array_equal(evaluate("volume > sma(volume, 20) * 1.5", bars),
+                              volume > ind.sma(volume, 20) * 1.5)
+        change = bars["close"] - np.concatenate(([np.nan] * 5, bars["close"][:-5]))
+        assert np.array_equal(evaluate("abs(change(close, 5)) > -(-2)", bars), np.abs(change) > 2)
+
+
+class TestPlans:
+    """Shared subexpressions and the plan cache"""
+
+    def test_shared_subexpressions_compile_once(self):
+        shared = Plan(["close > ema(200)", "ema(200) > sma(50)", "close > ema(200) and rsi < 70"])
+        assert len([step for step in shared.steps if step[0] == "ind"]) == 3  # ema(200), sma(50), rsi(14)
+        # The third rule reuses the first rule's comparison step
+        op, left, _ = shared.steps[shared.outputs[2]]
+        assert op == "and" and left == shared.outputs[0]
+
+    def test_indicator_outputs_share_one_computation(self, bars):
+        calls = []
+
+        def provider(name, params):
+            calls.append((name, params))
+            return ind.INDICATORS[name][0](bars, *params)
+
+        Plan(["bb_upper(20, 2) > close", "bb_lower(20, 2) < close", "macd > macd_signal"]).evaluate(bars, provider)
+        assert sorted(calls) == [("bollinger", (20, 2.0)), ("macd", (12, 26, 9))]
+
+    def test_plan_cache(self):
+        first = compile_rules(["RSI(14) < 30", "close > EMA(200)"])
+        assert compile_rules(["rsi(14)  <  30", "close > ema(200)"]) is first
+        assert compile_rules(["close > EMA(200)", "RSI(14) < 30"]) is not first
+
+    def test_strategy_signals(self, bars):
+        signals = strategy_signals(["rsi < 40", "close > sma(100)", "buy the dip"], ["rsi > 60"], bars)
+        rsi = ind.rsi(bars["close"], 14)
+        assert np.array_equal(signals["entry"], (rsi < 40) & (bars["close"] > ind.sma(bars["close"], 100)))
+        assert np.array_equal(signals["exit"], rsi > 60)
+        assert [r["supported"] for r in signals["entry_rules"]] == [True, True, False]
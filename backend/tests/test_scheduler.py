@@ -0,0 +1,48 @@
+"""
+Scheduler Test Suite
+Cron parsing and next occurrences
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.scheduler import Cron, parse_field
+
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestParse:
+    """Fields: lists, ranges, steps, bounds"""
+
+    def test_fields(self):
+        assert parse_field("*/15", 0, 59) == [0, 15, 30, 45]
+        assert parse_field("1-5,10", 0, 23) == [1, 2, 3, 4, 5, 10]
+        assert parse_field("10/20", 0, 59) == [10, 30, 50]
+        assert Cron("0 0 * * 7").weekdays == {0}
+
+    def test_invalid(self):
+        for expr in ("* * * *", "60 * * * *", "* 5-2 * * *", "*/0 * * * *"):
+            with pytest.raises(ValueError):
+                Cron(expr)
+
+
+class TestNext:
+    """Next occurrence, strictly after the given time"""
+
+    def test_minutes_and_hours(self):
+        assert Cron("*/5 * * * *").next(at(2026, 10, 19, 6, 7, 30)) == at(2026, 10, 19, 6, 10)
+        assert Cron("1 * * * *").next(at(2026, 10, 19, 6, 1)) == at(2026, 10, 19, 7, 1)
+        assert Cron("17 */6 * * *").next(at(2026, 10, 19, 19, 0)) == at(2026, 10, 20, 0, 17)
+
+    def test_days(self):
+        assert Cron("@monthly").next(at(2026, 12, 15)) == at(2027, 1, 1)
+        assert Cron("30 6 * * 1-5").next(at(2026, 10, 16, 7)) == at(2026, 10, 19, 6, 30)     # Friday -> Monday
+        # day of month and weekday both restricted: either matches
+        assert Cron("0 0 13 * 5").next(at(2026, 10, 10)) == at(2026, 10, 13)
+        assert Cron("0 0 31 2 *").matches_day(at(2026, 2, 28).date()) is False
@@ -0,0 +1,126 @@
+"""
+Screenshot Preprocessing Test Suite
+Effective resolution, margin cropping, re-encoding and the content cache
+"""
+import asyncio
+import base64
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.screenshots import ScreenshotProcessor, content_box, effective_size, preprocess, target_size, vision_tokens
+
+BACKGROUND = (19, 23, 34)
+
+
+def chart(width: int, height: int, margin: int = 0, fmt: str = "PNG") -> bytes:
+    """A candle chart drawn inside `margin` px of plain background"""
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((margin, margin, width - margin - 1, height - margin - 1), fill=(48, 54, 68))
+    step = max(4, (width - 2 * margin) // 120)
+    for i, x in enumerate(range(margin + step, width - margin - step, step)):
+        y = margin + (height - 2 * margin) // 2 + (i * 37 % 101 - 50) * (height - 2 * margin) // 300
+        color = (38, 166, 154) if i % 3 else (239, 83, 80)
+        draw.rectangle((x, y - 20, x + step // 2, y + 20), fill=color)
+    out = io.BytesIO()
+    image.save(out, fmt)
+    return out.getvalue()
+
+
+def decoded(result: dict):
+    return Image.open(io.BytesIO(base64.b64decode(result["data"])))
+
+
+class TestEffectiveSize:
+    """Fitted in 2048 px, short side at most 768, never upscaled"""
+
+    def test_sizes(self):
+        assert effective_size(3840, 2160) == (1365, 768)
+        assert effective_size(4000, 1000) == (2048, 512)
+        assert effective_size(640, 480) == (640, 480)
+
+    def test_tokens(self):
+        assert vision_tokens(3840, 2160) == 85 + 170 * 3 * 2
+        assert vision_tokens(512, 512) == 85 + 170
+
+    def test_crop_keeps_tile_grid(self):
+        # 1600 x 900 of chart in a 1920 x 1080 capture: 1365 px wide at the
+        # effective resolution -> 3 x 2 tiles, not 4 x 2
+        assert effective_size(1600, 900) == (1365, 768)
+        assert target_size(1760, 800, (1920, 1080)) == (1536, 698)
+        assert vision_tokens(*target_size(1760, 800, (1920, 1080))) == vision_tokens(1920, 1080)
+
+
+class TestPreprocess:
+    """4K captures come out cropped, downscaled and smaller"""
+
+    def test_downscaled_and_cropped(self):
+        raw = chart(3840, 2160, margin=300)
+        result = preprocess(raw)
+        assert result["media_type"] == "image/webp"
+        assert result["height"] <= 768 and result["width"] <= 2048
+        assert result["bytes_out"] < result["bytes_in"]
+        # margins cropped: 3240 x 1560 of chart (plus padding) instead of 16:9
+        assert result["width"] / result["height"] > 2.0
+        assert decoded(result).size == (result["width"], result["height"])
+
+    def test_small_upload_kept(self):
+        raw = chart(320, 200, fmt="JPEG")
+        result = preprocess(raw)
+        if result["media_type"] == "image/jpeg":
+            assert base64.b64decode(result["data"]) == raw
+        assert result["bytes_out"] <= len(raw)
+
+    def test_margin_box(self):
+        image = Image.open(io.BytesIO(chart(1600, 1000, margin=120)))
+        left, top, right, bottom = content_box(image.convert("RGB"))
+        assert 100 <= left <= 120 and 100 <= top <= 120
+        assert 1480 <= right <= 1500 and 880 <= bottom <= 900
+        assert content_box(Image.new("RGB", (800, 600), BACKGROUND)) is None
+
+    def test_rejects_garbage(self):
+        with pytest.raises(ValueError):
+            preprocess(b"not an image")
+
+
+class TestProcessorCache:
+    """Same content, same result, one processing"""
+
+    def test_hit_by_content(self):
+        processor = ScreenshotProcessor()
+        payload = base64.b64encode(chart(1920, 1080, margin=50, fmt="JPEG")).decode()
+        first = processor.process(payload)
+        again = processor.process(f"data:image/jpeg;base64,{payload}")
+        assert again is first
+        assert (processor.hits, processor.misses) == (1, 1)
+        stats = processor.stats()
+        assert stats["bytes_in"] > stats["bytes_out"] and stats["saved_ratio"] > 0
+
+    def test_bounded_in_bytes(self):
+        processor = ScreenshotProcessor(max_bytes=1)
+        for width in (800, 900, 1000):
+            processor.process(base64.b64encode(chart(width, 600)).decode())
+        assert processor.stats()["cached"] == 1
+
+    def test_prepare_off_loop(self):
+        processor = ScreenshotProcessor(workers=2)
+        payloads = [base64.b64encode(chart(w, 900, margin=40)).decode() for w in (1600, 1700)]
+
+        async def run():
+            return await asyncio.gather(*(processor.prepare(p) for p in payloads))
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            processor.shutdown()
+        assert all(r["height"] <= 768 for r in results)
+
+    def test_invalid_base64(self):
+        with pytest.raises(ValueError):
+            ScreenshotProcessor().process("@@@")
@@ -0,0 +1,43 @@
+"""
+Season Lifecycle Test Suite
+Monthly seasons, rank reward tiers and archived standings
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.seasons import DEFAULT_REWARDS, reward_for, season_doc, standing
+
+
+class TestSeasonDoc:
+    """The season of a month"""
+
+    def test_month_bounds(self):
+        season = season_doc(datetime(2026, 10, 19, 6, 30, tzinfo=timezone.utc))
+        assert season["_id"] == "season_2026_10"
+        assert season["name"] == "Saison Octobre 2026"
+        assert season["start_date"] == "2026-10-01T00:00:00+00:00"
+        assert season["end_date"] == "2026-11-01T00:00:00+00:00"
+
+    def test_december_rolls_into_next_year(self):
+        season = season_doc(datetime(2026, 12, 31, 23, 59, tzinfo=timezone.utc))
+        assert season["end_date"] == "2027-01-01T00:00:00+00:00"
+
+
+class TestRewards:
+    """Rank tiers of the seeded rewards"""
+
+    def test_tiers(self):
+        titles = {rank: (reward_for(DEFAULT_REWARDS, rank) or {}).get("title") for rank in (1, 2, 3, 4, 10, 11, 50, 51)}
+        assert titles == {1: "Champion de la Saison", 2: "Vice-Champion", 3: "Médaille de Bronze", 4: "Top 10",
+                          10: "Top 10", 11: "Top 50", 50: "Top 50", 51: None}
+
+    def test_standing_document(self):
+        row = {"_id": "u", "name": "Ana", "level": 3, "total_pnl": 1234.567, "trades_count": 8, "wins": 5}
+        doc = standing("season_2026_10", 2, row, DEFAULT_REWARDS)
+        assert doc["_id"] == "season_2026_10:u" and doc["rank"] == 2
+        assert doc["total_pnl"] == 1234.57 and doc["winrate"] == 62.5
+        assert doc["reward"] == {"title": "Vice-Champion", "xp_bonus": 3000, "badge": "season_silver"}
+        assert "reward" not in standing("season_2026_10", 60, row, DEFAULT_REWARDS)
@@ -0,0 +1,67 @@
+"""
+Streak Tracker Test Suite
+Local day boundaries, bitmaps and same-day events kept off the database
+"""
+import os
+import sys
+import time
+from datetime import date, datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pnl_rollup
+from utils.streaks import ZONE_TTL, StreakTracker, effective_streak, local_date, month_days, streak_update
+
+# 23:30 UTC on Oct 12 is already Oct 13 in Paris
+LATE = datetime(2026, 10, 12, 23, 30, tzinfo=timezone.utc).timestamp()
+
+
+class TestDays:
+    """Timezone boundaries and calendar bitmaps"""
+
+    def test_local_day(self):
+        assert local_date(LATE, "UTC") == date(2026, 10, 12)
+        assert local_date(LATE, "Europe/Paris") == date(2026, 10, 13)
+        assert local_date(LATE, "America/New_York") == date(2026, 10, 12)
+
+    def test_month_days(self):
+        assert month_days(0) == []
+        assert month_days(1 | 1 << 4 | 1 << 30) == [1, 5, 31]
+
+    def test_broken_streak_reads_zero(self):
+        today = date(2026, 10, 13)
+        doc = {"current_streak": 4, "last_day": today.toordinal() - 1}
+        assert effective_streak(doc, today) == 4
+        assert effective_streak({**doc, "last_day": today.toordinal() - 2}, today) == 0
+        assert effective_streak(None, today) == 0
+
+
+class TestTracker:
+    """One write per user and local day"""
+
+    def test_update_targets_day_bit(self):
+        day = date(2026, 10, 5)
+        first, second = streak_update("u", day, "UTC", datetime.now(timezone.utc))
+        assert "months.2026-10" in first["$set"]
+        assert first["$set"]["months.2026-10"]["$cond"][2]["$add"][1] == 1 << 4
+        assert second["$set"]["last_day"] == {"$max": [{"$ifNull": ["$last_day", 0]}, day.toordinal()]}
+
+    def test_same_day_and_other_events_skipped(self):
+        tracker = StreakTracker()
+        tracker.zones["u"] = ("Europe/Paris", time.monotonic())
+        tracker.seen["u"] = date(2026, 10, 13).toordinal()
+        tracker.handle({"type": "trade_created", "user_id": "u", "ts": LATE})
+        tracker.handle({"type": "post_liked", "user_id": "v", "ts": LATE})
+        assert tracker.updates == 0 and "v" not in tracker.zones
+
+    def test_zone_read_again_after_ttl(self, monkeypatch):
+        zones = {"u": "Europe/Paris"}
+        monkeypatch.setattr(pnl_rollup, "user_timezone", lambda user_id: zones[user_id])
+        tracker = StreakTracker()
+        assert tracker.zone("u") == "Europe/Paris"
+        tracker.seen["u"] = date(2026, 10, 13).toordinal()
+        zones["u"] = "America/New_York"                 # changed on another worker
+        assert tracker.zone("u") == "Europe/Paris"      # cached
+        tracker.zones["u"] = ("Europe/Paris", time.monotonic() - ZONE_TTL - 1)
+        assert tracker.zone("u") == "America/New_York"
+        assert "u" not in tracker.seen
@@ -0,0 +1,135 @@
+"""
+Trade Import Test Suite
+CSV / MT4 / MT5 statement parsing, vectorized P&L and broker id dedup
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routers.trades import calculate_pnl
+from utils import trade_import as import_module
+from utils.trade_import import _normalize_chunk, build_trades, detect_format, run_import
+
+CSV = """symbol;direction;entry_price;exit_price;position_size;entry_time;exit_time;followed_plan
+eurusd;buy;1.1000;1.1050;2;2026-01-05T09:00:00Z;2026-01-05T11:30:00Z;oui
+XAUUSD;Sell;2000;2010;0.5;2026-01-06T14:00:00Z;2026-01-06T15:00:00Z;false
+GBPUSD;long;1.2500;;1;2026-01-07T08:00:00Z;;
+;buy;1.0;1.1;1;;;
+"""
+
+MT4 = """Ticket,Open Time,Type,Size,Item,Price,S / L,T / P,Close Time,Price,Commission,Profit
+1001,2026.01.05 09:00:00,buy,1.00,eurusd,1.10000,1.09000,1.12000,2026.01.05 10:00:00,1.10500,0,500
+1002,2026.01.05 11:00:00,sell,0.50,gbpusd,1.25000,0,0,2026.01.05 12:00:00,1.26000,0,-500
+"""
+
+MT5 = """Time,Position,Symbol,Type,Volume,Price,S / L,T / P,Time,Price,Commission,Swap,Profit
+2026.01.05 09:00:00,7001,USDJPY,sell,1,150.00,,,2026.01.05 09:30:00,149.50,0,0,500
+"""
+
+
+def read(path):
+    return pd.read_csv(path, sep=import_module.sniff_delimiter(path), dtype=str, skipinitialspace=True)
+
+
+def parse(tmp_path, text, name="statement.csv"):
+    path = tmp_path / name
+    path.write_text(text)
+    chunk = read(str(path))
+    fmt = detect_format(chunk.columns)
+    documents, errors = build_trades(_normalize_chunk(chunk, fmt), "u", "imp")
+    return fmt, documents, errors
+
+
+class FakeTrades:
+    """insert_many with the unique (user_id, broker_trade_id) index"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def insert_many(self, documents, ordered=False):
+        errors, inserted = [], 0
+        for i, doc in enumerate(documents):
+            key = (doc["user_id"], doc["broker_trade_id"])
+            if key in self.docs:
+                errors.append({"index": i, "code": 11000})
+            else:
+                self.docs[key] = doc
+                inserted += 1
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+        return type("Result", (), {"inserted_ids": [doc["_id"] for doc in documents]})()
+
+
+class TestParse:
+    """Statement formats mapped onto trade fields"""
+
+    def test_csv(self, tmp_path):
+        fmt, documents, errors = parse(tmp_path, CSV)
+        assert fmt == "csv" and errors == [(3, "symbol, direction, entry_price et position_size requis")]
+        eur, xau, gbp = documents
+        assert (eur["symbol"], eur["direction"], eur["status"], eur["followed_plan"]) == ("EURUSD", "LONG", "closed", True)
+        assert eur["entry_time"] == datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+        assert eur["exit_time"] == datetime(2026, 1, 5, 11, 30, tzinfo=timezone.utc)
+        assert (xau["direction"], xau["followed_plan"]) == ("SHORT", False)
+        assert (gbp["status"], gbp["exit_price"], gbp["pnl"], gbp["exit_time"]) == ("open", None, None, None)
+
+    def test_mt4_close_leg_columns(self, tmp_path):
+        fmt, documents, errors = parse(tmp_path, MT4)
+        assert fmt == "mt4" and not errors
+        first = documents[0]
+        assert (first["broker_trade_id"], first["symbol"], first["entry_price"], first["exit_price"]) == ("1001", "EURUSD", 1.1, 1.105)
+        assert (first["stop_loss"], first["take_profit"]) == (1.09, 1.12)
+        assert first["exit_time"] == datetime(2026, 1, 5, 10, tzinfo=timezone.utc)
+
+    def test_mt5(self, tmp_path):
+        fmt, documents, errors = parse(tmp_path, MT5)
+        assert fmt == "mt5" and not errors
+        (trade,) = documents
+        assert (trade["broker_trade_id"], trade["direction"], trade["entry_price"], trade["exit_price"]) == ("7001", "SHORT", 150.0, 149.5)
+        assert trade["entry_time"] == datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+
+
+class TestPnl:
+    """Vectorized P&L matches the per-trade formula"""
+
+    def test_matches_calculate_pnl(self, tmp_path):
+        for text in (CSV, MT4, MT5):
+            _, documents, _ = parse(tmp_path, text)
+            for doc in documents:
+                if doc["status"] != "closed":
+                    continue
+                expected = calculate_pnl(doc["entry_price"], doc["exit_price"], doc["direction"], doc["position_size"])
+                assert doc["pnl"] == pytest.approx(expected)
+                sign = 1 if doc["direction"] == "LONG" else -1
+                assert doc["pnl_percent"] == round((doc["exit_price"] - doc["entry_price"]) * sign / doc["entry_price"] * 100, 2)
+
+
+class TestDedup:
+    """Re-importing a statement adds nothing"""
+
+    def test_rows_without_ticket_hash_stably(self, tmp_path):
+        _, first, _ = parse(tmp_path, CSV)
+        _, again, _ = parse(tmp_path, CSV)
+        assert [d["broker_trade_id"] for d in first] == [d["broker_trade_id"] for d in again]
+        assert len({d["broker_trade_id"] for d in first}) == len(first)
+
+    def test_reimport_counts_duplicates(self, tmp_path, monkeypatch):
+        trades = FakeTrades()
+        monkeypatch.setattr(import_module, "trades_collection", trades)
+        jobs = import_module.trade_imports_collection
+        completed = []
+        for _ in range(2):
+            path = tmp_path / "mt4.csv"
+            path.write_text(MT4)
+            jobs.reset_mock()
+            run_import("imp", "u", str(path), on_complete=completed.append)
+            final = jobs.update_one.call_args_list[-1].args[1]["$set"]
+            assert final["status"] == "completed" and not path.exists()
+        assert (final["imported"], final["duplicates"]) == (0, 2)
+        assert len(trades.docs) == 2 and completed == ["u"]
@@ -0,0 +1,59 @@
+"""
+XP Ledger Test Suite
+Level curve and coalesced, capped activity XP
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.xp import ACTIVITY_DAILY_CAP, ACTIVITY_XP, LevelCurve, XpService
+
+DAY = 86400
+NOON = datetime(2026, 10, 12, 12, tzinfo=timezone.utc).timestamp()
+
+
+def event(type="trade_created", user="u", ts=NOON):
+    return {"type": type, "user_id": user, "ts": ts}
+
+
+class TestLevelCurve:
+    """Thresholds, levels and progress"""
+
+    def test_default_curve(self):
+        curve = LevelCurve()
+        assert curve.thresholds[:4] == [0, 1000, 3000, 6000]
+        assert [curve.level_for(xp) for xp in (0, 999, 1000, 2999, 3000)] == [1, 1, 2, 2, 3]
+        assert curve.progress(1500) == {"level": 2, "xp_into_level": 500, "xp_for_next_level": 2000, "xp_progress_percent": 25.0}
+
+    def test_configurable_and_capped(self):
+        curve = LevelCurve(base=100, exponent=2, max_level=4)
+        assert curve.thresholds == [0, 100, 500, 1400]
+        assert curve.level_for(10 ** 9) == 4
+        assert curve.progress(2000)["xp_for_next_level"] == 0
+
+
+class TestActivity:
+    """High-frequency XP coalesced per user, capped per day"""
+
+    def test_coalesced_per_user(self):
+        service = XpService(curve=LevelCurve())
+        for _ in range(3):
+            service.handle(event())
+        service.handle(event("setup_analyzed"))
+        service.handle(event("briefing_viewed"))
+        service.handle(event(user="v"))
+        entries = {e["user_id"]: e for e in service.take_activity()}
+        assert entries["u"]["amount"] == 3 * ACTIVITY_XP["trade_created"] + ACTIVITY_XP["setup_analyzed"]
+        assert entries["u"]["events"] == {"trade_created": 3, "setup_analyzed": 1}
+        assert entries["u"]["ref"] != entries["v"]["ref"]
+        assert service.take_activity() == []
+
+    def test_daily_cap_resets_next_day(self):
+        service = XpService(curve=LevelCurve())
+        for _ in range(100):
+            service.handle(event())
+        assert service.take_activity()[0]["amount"] == ACTIVITY_DAILY_CAP
+        service.handle(event(ts=NOON + DAY))
+        assert service.take_activity()[0]["amount"] == ACTIVITY_XP["trade_created"]
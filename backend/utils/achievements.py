@@ -0,0 +1,323 @@
+"""
+Achievements - unlocked from per-user counters, never by rescanning trades.
+
+Domain events (utils/events.py) become increments of counters kept in
+`user_counters` (trades, closed_trades, wins, analyses, ...); best_streak
+follows the streak tracker (utils/streaks.py) as a `$max`. Achievements
+carry a `rule` of minimum counter values (see scripts/seed_gamification.py);
+"winrate" is derived from wins / closed_trades:
+{"closed_trades": 20, "winrate": 50}.
+
+Increments are coalesced in memory and written every second in one bulk
+`$inc`; then only the achievements reading a counter that moved are
+checked for the users concerned. Unlocks are inserted with a deterministic
+_id under a unique (user_id, achievement_id) index, so a replayed batch or
+a concurrent backfill can neither unlock nor pay xp_reward twice.
+
+backfill() recounts every user from the source collections and evaluates
+all achievements, in parallel batches (scripts/backfill_achievements.py).
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from utils.database import (
+    achievements_collection, ai_conversations_collection, backtests_collection, community_comments_collection,
+    community_likes_collection, community_posts_collection, insert_new, setups_collection, streaks_collection,
+    trades_collection, user_achievements_collection, user_counters_collection, users_collection
+)
+
+COUNTERS = (
+    "trades", "closed_trades", "wins", "analyses", "coachings", "backtests",
+    "posts", "likes_received", "comments_given", "best_streak"
+)
+# Derived inputs: name -> (counters read, value)
+DERIVED = {
+    "winrate": (("wins", "closed_trades"),
+                lambda c: c.get("wins", 0) / c["closed_trades"] * 100 if c.get("closed_trades") else 0),
+}
+# Events worth one on a counter of their user
+EVENT_COUNTERS = {
+    "trade_created": "trades",
+    "setup_analyzed": "analyses",
+    "coaching_received": "coachings",
+    "backtest_completed": "backtests",
+    "post_created": "posts",
+    "post_liked": "likes_received",
+}
+FLUSH_INTERVAL = 1.0
+BACKFILL_BATCH = 500
+BACKFILL_WORKERS = 4
+
+def counter_increments(event: dict) -> dict:
+    """Counters moved by one event: {counter: increment}"""
+    kind = event["type"]
+    if kind in EVENT_COUNTERS:
+        return {EVENT_COUNTERS[kind]: 1}
+    if kind == "trade_closed":
+        return {"closed_trades": 1, "wins": 1} if event.get("win") else {"closed_trades": 1}
+    if kind == "comment_created" and not event.get("own_post"):
+        return {"comments_given": 1}
+    return {}
+
+class Achievement:
+    __slots__ = ("id", "title", "xp_reward", "rule", "inputs")
+
+    def __init__(self, doc: dict):
+        self.id = str(doc["_id"])
+        self.title = doc.get("title", self.id)
+        self.xp_reward = doc.get("xp_reward", 0)
+        self.rule = dict(doc["rule"])
+        self.inputs = set()
+        for name in self.rule:
+            if name in DERIVED:
+                self.inputs.update(DERIVED[name][0])
+            elif name in COUNTERS:
+                self.inputs.add(name)
+            else:
+                raise ValueError(f"Compteur de badge inconnu: {name}")
+
+    def met(self, counters: dict) -> bool:
+        for name, minimum in self.rule.items():
+            value = DERIVED[name][1](counters) if name in DERIVED else counters.get(name, 0)
+            if value < minimum:
+                return False
+        return True
+
+class AchievementEngine:
+    def __init__(self):
+        self.achievements = {}
+        self.by_input = defaultdict(list)   # counter -> achievements reading it
+        self.checks = 0
+
+    def load(self, achievements):
+        self.achievements, self.by_input = {}, defaultdict(list)
+        for doc in achievements:
+            if not doc.get("rule"):
+                continue                    # awarded elsewhere (early adopter, leaderboard...)
+            achievement = Achievement(doc)
+            self.achievements[achievement.id] = achievement
+            for name in achievement.inputs:
+                self.by_input[name].append(achievement)
+
+    def candidates(self, changed) -> list:
+        found = {}
+        for name in changed:
+            for achievement in self.by_input.get(name, ()):
+                found[achievement.id] = achievement
+        return list(found.values())
+
+    def evaluate(self, counters: dict, unlocked: set, changed=None) -> list:
+        """Achievements newly met: those reading a changed counter, all of them when changed is None"""
+        pool = self.achievements.values() if changed is None else self.candidates(changed)
+        found = []
+        for achievement in pool:
+            if achievement.id in unlocked:
+                continue
+            self.checks += 1
+            if achievement.met(counters):
+                found.append(achievement)
+        return found
+
+def compute_counters(user_ids: list) -> dict:
+    """Counters of a batch of users recounted from the source collections"""
+    counters = {u: dict.fromkeys(COUNTERS, 0) for u in user_ids}
+    match = {"user_id": {"$in": user_ids}}
+    closed = {"$eq": ["$status", "closed"]}
+    for row in trades_collection.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$user_id",
+            "trades": {"$sum": 1},
+            "closed_trades": {"$sum": {"$cond": [closed, 1, 0]}},
+            "wins": {"$sum": {"$cond": [{"$and": [closed, {"$gt": [{"$ifNull": ["$pnl", 0]}, 0]}]}, 1, 0]}}
+        }}
+    ]):
+        counters[row["_id"]].update(trades=row["trades"], closed_trades=row["closed_trades"], wins=row["wins"])
+
+    def count(collection, name, query=None):
+        for row in collection.aggregate([{"$match": {**match, **(query or {})}}, {"$group": {"_id": "$user_id", "n": {"$sum": 1}}}]):
+            counters[row["_id"]][name] = row["n"]
+
+    count(setups_collection, "analyses")
+    count(ai_conversations_collection, "coachings", {"type": "coaching"})
+    count(backtests_collection, "backtests", {"status": "completed"})
+    count(community_posts_collection, "posts")
+
+    # Likes on the batch's posts and comments on other traders' posts
+    authors = {p["_id"]: p["user_id"] for p in community_posts_collection.find(match, {"user_id": 1})}
+    for like in community_likes_collection.find({"post_id": {"$in": list(authors)}}, {"post_id": 1, "user_id": 1}):
+        author = authors[like["post_id"]]
+        if like["user_id"] != author:
+            counters[author]["likes_received"] += 1
+    comments = list(community_comments_collection.find(match, {"post_id": 1, "user_id": 1}))
+    commented = {p["_id"]: p["user_id"] for p in community_posts_collection.find(
+        {"_id": {"$in": list({c["post_id"] for c in comments})}}, {"user_id": 1}
+    )}
+    for comment in comments:
+        if commented.get(comment["post_id"], comment["user_id"]) != comment["user_id"]:
+            counters[comment["user_id"]]["comments_given"] += 1
+
+    for streak in streaks_collection.find(match, {"user_id": 1, "current_streak": 1, "longest_streak": 1}):
+        counters[streak["user_id"]]["best_streak"] = max(streak.get("longest_streak", 0), streak.get("current_streak", 0))
+    return counters
+
+class AchievementService:
+    """Counts events, writes counters in batches and unlocks what they reach"""
+
+    def __init__(self, engine: AchievementEngine = None, flush_interval: float = FLUSH_INTERVAL):
+        self.engine = engine or AchievementEngine()
+        self.flush_interval = flush_interval
+        self.pending = defaultdict(lambda: defaultdict(int))    # user_id -> counter -> increment
+        self.maxima = defaultdict(dict)                         # user_id -> counter -> new maximum
+        self.checks = defaultdict(set)                          # user_id -> counters to check
+        self._notify = []                                       # (user_id, Achievement) unlocked off the loop
+        self._lock = threading.Lock()                           # events are handled on the dispatch thread
+        self._tasks = []
+
+    def load(self):
+        self.engine.load(achievements_collection.find())
+
+    def handle(self, event: dict):
+        with self._lock:
+            if event["type"] == "streak_updated":
+                maxima = self.maxima[event["user_id"]]
+                maxima["best_streak"] = max(maxima.get("best_streak", 0), event["streak"])
+                return
+            increments = counter_increments(event)
+            if increments:
+                pending = self.pending[event["user_id"]]
+                for name, n in increments.items():
+                    pending[name] += n
+
+    def _unlocked(self, user_ids: list) -> dict:
+        unlocked = {u: set() for u in user_ids}
+        for doc in user_achievements_collection.find({"user_id": {"$in": user_ids}}, {"user_id": 1, "achievement_id": 1}):
+            unlocked[doc["user_id"]].add(str(doc["achievement_id"]))
+        return unlocked
+
+    def _unlock(self, found: list) -> list:
+        """Insert unlocks [(user_id, Achievement)] and credit their XP; returns the ones that were new"""
+        if not found:
+            return []
+        from utils.xp import xp_service
+
+        now = datetime.now(timezone.utc)
+        duplicates = insert_new(user_achievements_collection, [
+            {"_id": f"{u}:{a.id}", "user_id": u, "achievement_id": a.id, "unlocked_at": now} for u, a in found
+        ])
+        awarded = [pair for i, pair in enumerate(found) if i not in duplicates]
+        xp_service.credit([
+            {"user_id": u, "amount": a.xp_reward, "source": "achievement", "ref": f"{u}:{a.id}"} for u, a in awarded
+        ])
+        return awarded
+
+    def _check(self, checks: dict) -> list:
+        users = list(checks)
+        counters = {doc["_id"]: doc for doc in user_counters_collection.find({"_id": {"$in": users}})}
+        unlocked = self._unlocked(users)
+        found = [(u, a) for u in users for a in self.engine.evaluate(counters.get(u, {}), unlocked[u], checks[u])]
+        return self._unlock(found)
+
+    async def flush(self):
+        with self._lock:
+            pending, self.pending = self.pending, defaultdict(lambda: defaultdict(int))
+            maxima, self.maxima = self.maxima, defaultdict(dict)
+        if pending or maxima:
+            from pymongo import UpdateOne
+
+            updates = defaultdict(dict)
+            for u, increments in pending.items():
+                updates[u]["$inc"] = dict(increments)
+            for u, values in maxima.items():
+                updates[u]["$max"] = values
+            try:
+                user_counters_collection.bulk_write([
+                    UpdateOne({"_id": u}, update, upsert=True) for u, update in updates.items()
+                ], ordered=False)
+            except Exception:
+                with self._lock:
+                    for u, increments in pending.items():
+                        for name, n in increments.items():
+                            self.pending[u][name] += n
+                    for u, values in maxima.items():
+                        for name, n in values.items():
+                            self.maxima[u][name] = max(self.maxima[u].get(name, 0), n)
+                raise
+            for u, update in updates.items():
+                for counters in update.values():
+                    self.checks[u].update(counters)
+        checks, self.checks = self.checks, defaultdict(set)
+        if checks:
+            try:
+                self._notify.extend(self._check(checks))
+            except Exception:
+                for u, names in checks.items():
+                    self.checks[u].update(names)
+                raise
+        if self._notify:
+            from routers.push import notify_achievement_unlocked
+
+            notify, self._notify = self._notify, []
+            for u, achievement in notify:
+                await notify_achievement_unlocked(u, achievement.title)
+
+    def _backfill_batch(self, user_ids: list) -> list:
+        from pymongo import UpdateOne
+
+        counters = compute_counters(user_ids)
+        user_counters_collection.bulk_write([
+            UpdateOne({"_id": u}, {"$set": c}, upsert=True) for u, c in counters.items()
+        ], ordered=False)
+        unlocked = self._unlocked(user_ids)
+        return self._unlock([(u, a) for u in user_ids for a in self.engine.evaluate(counters[u], unlocked[u])])
+
+    def backfill(self, batch_size: int = BACKFILL_BATCH, workers: int = BACKFILL_WORKERS) -> dict:
+        """Recount and evaluate every user; unlocks pay XP but are not pushed"""
+        user_ids = [doc["_id"] for doc in users_collection.find({}, {"_id": 1})]
+        batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            unlocked = sum(len(awarded) for awarded in pool.map(self._backfill_batch, batches))
+        return {"users": len(user_ids), "batches": len(batches), "unlocked": unlocked}
+
+    def award(self, achievement_id: str, user_ids: list) -> list:
+        """Unlock an achievement that has no counter rule (season top 10...); pushed with the next flush"""
+        doc = achievements_collection.find_one({"_id": achievement_id})
+        if not doc or not user_ids:
+            return []
+        achievement = Achievement({**doc, "rule": {}})
+        awarded = self._unlock([(u, achievement) for u in user_ids])
+        self._notify.extend(awarded)
+        return awarded
+
+    def refresh_user(self, user_id: str):
+        """Recount one user after a bulk import; unlocks are pushed with the next flush"""
+        self._notify.extend(self._backfill_batch([user_id]))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print("⚠️ Achievement flush failed:", repr(e))
+
+    def start(self):
+        from utils.events import subscribe
+
+        self.load()
+        subscribe(self.handle, name="achievements", flush=self.flush)
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+
+    async def stop(self):
+        from utils.events import unsubscribe
+
+        unsubscribe(self.handle)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+achievement_service = AchievementService()
@@ -0,0 +1,355 @@
+"""
+Price alerts - per-symbol sorted thresholds evaluated on every tick.
+
+Each symbol keeps two sorted threshold lists: "up" levels fire when the
+price rises to them, "down" levels when it falls to them. Every armed level
+is on the far side of the current price, so a tick fires exactly a prefix
+of "up" or a suffix of "down": one bisect plus the k triggered alerts,
+O(log n + k), however many alerts are active.
+
+Alert types map onto those lists:
+- above / below: one up / down level (fires at once if already beyond);
+- cross: one level on the far side of the current price;
+- percent: an up and a down level around a reference price (the price at
+  creation, then at each trigger).
+
+Deleted or re-armed alerts leave stale entries that are skipped when
+reached (generation check) and compacted away when they pile up. Repeating
+alerts re-arm after their cool-down, measured in tick time.
+
+Every worker runs its own engine, so the same trigger can fire in several
+processes: each one is claimed by a conditional update on user_alerts
+before it is delivered, and a worker that loses the claim resyncs its copy
+from the stored alert (deleted, spent, or cooling down since last_tick).
+"""
+import asyncio
+import heapq
+import itertools
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from utils.database import alerts_collection, user_alerts_collection
+
+ALERT_TYPES = ("above", "below", "cross", "percent")
+FLUSH_INTERVAL = 0.5        # seconds between delivery batches
+COMPACT_MIN_STALE = 1024
+
+class Alert:
+    __slots__ = ("id", "user_id", "symbol", "type", "price", "percent", "repeat", "cooldown",
+                 "note", "generation", "armed", "reference", "active")
+
+    def __init__(self, id, user_id, symbol, type, price=None, percent=None, repeat=False,
+                 cooldown=3600, note=None, reference=None):
+        self.id = id
+        self.user_id = user_id
+        self.symbol = symbol
+        self.type = type
+        self.price = price
+        self.percent = percent
+        self.repeat = repeat
+        self.cooldown = cooldown
+        self.note = note
+        self.reference = reference
+        self.generation = 0
+        self.armed = 0
+        self.active = True
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "Alert":
+        return cls(
+            str(doc["_id"]), doc["user_id"], doc["symbol"], doc["type"], doc.get("price"), doc.get("percent"),
+            doc.get("repeat", False), doc.get("cooldown_minutes", 60) * 60, doc.get("note"), doc.get("reference")
+        )
+
+class _Book:
+    """Armed thresholds of one symbol: parallel level/entry lists per side"""
+    __slots__ = ("up_levels", "up_entries", "down_levels", "down_entries", "pending", "stale")
+
+    def __init__(self):
+        self.up_levels, self.up_entries = [], []
+        self.down_levels, self.down_entries = [], []
+        self.pending = []   # cross/percent alerts waiting for a first price
+        self.stale = 0
+
+    def size(self) -> int:
+        return len(self.up_levels) + len(self.down_levels)
+
+class AlertEngine:
+    """In-memory alert index; on_tick() returns the alerts a tick triggers"""
+
+    def __init__(self):
+        self.alerts = {}
+        self.books = defaultdict(_Book)
+        self.last_price = {}
+        self._cooling = []          # (rearm_ts, seq, alert, generation)
+        self._seq = itertools.count()
+
+    # --- arming ---
+
+    def _insert(self, levels: list, entries: list, level: float, entry, bulk: bool):
+        if bulk:
+            levels.append(level)
+            entries.append(entry)
+        else:
+            i = bisect_right(levels, level)
+            levels.insert(i, level)
+            entries.insert(i, entry)
+
+    def _arm(self, alert: Alert, bulk: bool = False):
+        book = self.books[alert.symbol]
+        last = self.last_price.get(alert.symbol)
+        entry = (alert, alert.generation)
+        if alert.type == "above":
+            sides = [("up", alert.price)]
+        elif alert.type == "below":
+            sides = [("down", alert.price)]
+        elif last is None and alert.reference is None:
+            book.pending.append(alert)
+            return
+        elif alert.type == "cross":
+            sides = [("up", alert.price)] if last < alert.price else [("down", alert.price)]
+        else:
+            reference = alert.reference if alert.reference is not None else last
+            alert.reference = reference
+            sides = [("up", reference * (1 + alert.percent / 100)), ("down", reference * (1 - alert.percent / 100))]
+        for side, level in sides:
+            if side == "up":
+                self._insert(book.up_levels, book.up_entries, level, entry, bulk)
+            else:
+                self._insert(book.down_levels, book.down_entries, level, entry, bulk)
+        alert.armed = len(sides)
+
+    def add(self, alert: Alert, rearm_at: float = None):
+        """Arm now, or once tick time reaches rearm_at"""
+        self.alerts[alert.id] = alert
+        if rearm_at is None:
+            self._arm(alert)
+        else:
+            heapq.heappush(self._cooling, (rearm_at, next(self._seq), alert, alert.generation))
+
+    def load(self, alerts):
+        """Bulk add: append everything, then sort each book once"""
+        touched = set()
+        for alert in alerts:
+            self.alerts[alert.id] = alert
+            self._arm(alert, bulk=True)
+            touched.add(alert.symbol)
+        for symbol in touched:
+            self._rebuild(self.books[symbol])
+
+    def _rebuild(self, book: _Book):
+        """Sort both sides and drop stale entries"""
+        for levels_name, entries_name in (("up_levels", "up_entries"), ("down_levels", "down_entries")):
+            levels, entries = getattr(book, levels_name), getattr(book, entries_name)
+            if book.stale:
+                live = [i for i, (alert, gen) in enumerate(entries) if alert.active and alert.generation == gen]
+                levels, entries = [levels[i] for i in live], [entries[i] for i in live]
+            # Stable index sort: equal levels keep their insertion order
+            order = sorted(range(len(levels)), key=levels.__getitem__)
+            setattr(book, entries_name, [entries[i] for i in order])
+            setattr(book, levels_name, [levels[i] for i in order])
+        book.stale = 0
+
+    def _invalidate(self, alert: Alert):
+        alert.generation += 1
+        book = self.books[alert.symbol]
+        book.stale += alert.armed
+        alert.armed = 0
+        if book.stale > COMPACT_MIN_STALE and book.stale * 2 > book.size():
+            self._rebuild(book)
+
+    def remove(self, alert_id: str) -> bool:
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return False
+        alert.active = False
+        if alert in self.books[alert.symbol].pending:
+            self.books[alert.symbol].pending.remove(alert)
+        self._invalidate(alert)
+        return True
+
+    # --- evaluation ---
+
+    def on_tick(self, symbol: str, price: float, ts: float) -> list:
+        """Alerts triggered by this tick (each at most once)"""
+        while self._cooling and self._cooling[0][0] <= ts:
+            _, _, alert, generation = heapq.heappop(self._cooling)
+            if alert.active and alert.generation == generation:
+                self._arm(alert)
+        self.last_price[symbol] = price
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        fired = []
+        k = bisect_right(book.up_levels, price)
+        if k:
+            fired.extend(book.up_entries[:k])
+            del book.up_levels[:k], book.up_entries[:k]
+        k = bisect_left(book.down_levels, price)
+        if k < len(book.down_levels):
+            fired.extend(book.down_entries[k:])
+            del book.down_levels[k:], book.down_entries[k:]
+        if book.pending:
+            # The first price is their reference: armed after this tick's check
+            pending, book.pending = book.pending, []
+            for alert in pending:
+                self._arm(alert)
+        if not fired:
+            return []
+
+        triggered = []
+        for alert, generation in fired:
+            if not alert.active or alert.generation != generation:
+                book.stale -= 1
+                continue
+            alert.armed -= 1
+            triggered.append(alert)
+            if alert.repeat:
+                alert.reference = price if alert.type == "percent" else alert.reference
+                self._invalidate(alert)
+                heapq.heappush(self._cooling, (ts + alert.cooldown, next(self._seq), alert, alert.generation))
+            else:
+                alert.active = False
+                self.alerts.pop(alert.id, None)
+                self._invalidate(alert)
+        return triggered
+
+    def stats(self) -> dict:
+        return {
+            "alerts": len(self.alerts),
+            "symbols": sum(1 for book in self.books.values() if book.size() or book.pending),
+            "armed_levels": sum(book.size() for book in self.books.values()),
+            "cooling": len(self._cooling)
+        }
+
+# ============== SERVICE ==============
+
+def describe_alert(alert: Alert, price: float) -> str:
+    if alert.type == "above":
+        text = f"{alert.symbol} au-dessus de {alert.price} ({price})"
+    elif alert.type == "below":
+        text = f"{alert.symbol} en dessous de {alert.price} ({price})"
+    elif alert.type == "cross":
+        text = f"{alert.symbol} a croisé {alert.price} ({price})"
+    else:
+        text = f"{alert.symbol} a bougé de {alert.percent}% ({price})"
+    return f"{text} - {alert.note}" if alert.note else text
+
+class AlertService:
+    """Runs the engine on a price feed and delivers triggers in batches:
+    each trigger claimed in user_alerts_collection (trigger count, one-shot
+    deactivation), history in alerts_collection, then one push per user and
+    symbol per batch."""
+
+    def __init__(self, engine: AlertEngine = None, flush_interval: float = FLUSH_INTERVAL):
+        self.engine = engine or AlertEngine()
+        self.flush_interval = flush_interval
+        self.ticks = 0
+        self.lost_claims = 0
+        self._pending = []
+        self._claimed = []          # claimed triggers whose history write failed
+        self._tasks = []
+
+    def load(self):
+        self.engine.load(Alert.from_doc(doc) for doc in user_alerts_collection.find({"active": True}))
+
+    def process(self, symbol: str, price: float, ts: float):
+        self.ticks += 1
+        for alert in self.engine.on_tick(symbol, price, ts):
+            self._pending.append((alert, price, ts))
+
+    async def run(self, feed):
+        async for symbol, price, ts in feed:
+            self.process(symbol, price, ts)
+
+    def _claim(self, alert: Alert, price: float, ts: float):
+        """(True, None) if this process delivers the trigger, else (False, stored alert or None).
+        last_tick dedups the same tick seen by several workers and enforces the
+        cool-down across them."""
+        update = {"$inc": {"trigger_count": 1},
+                  "$set": {"last_triggered_at": datetime.now(timezone.utc), "last_tick": ts}}
+        if not alert.repeat:
+            update["$set"]["active"] = False
+        elif alert.type == "percent":
+            update["$set"]["reference"] = price
+        claim = user_alerts_collection.update_one(
+            {"_id": alert.id, "active": True, "last_tick": {"$not": {"$gt": ts - alert.cooldown}, "$ne": ts}},
+            update
+        )
+        if claim.modified_count:
+            return True, None
+        return False, user_alerts_collection.find_one({"_id": alert.id})
+
+    def _resync(self, alert: Alert, doc: dict):
+        """Replace the local copy of an alert another worker triggered or deleted"""
+        self.engine.remove(alert.id)
+        if doc is not None and doc.get("active", True):
+            fresh = Alert.from_doc(doc)
+            last_tick = doc.get("last_tick")
+            self.engine.add(fresh, None if last_tick is None else last_tick + fresh.cooldown)
+
+    async def flush(self):
+        if not self._pending and not self._claimed:
+            return
+        from routers.push import notify_price_alert
+
+        batch, self._pending = self._pending, []
+        for i, (alert, price, ts) in enumerate(batch):
+            try:
+                won, doc = await asyncio.to_thread(self._claim, alert, price, ts)
+            except Exception:
+                self._pending[:0] = batch[i:]
+                raise
+            if won:
+                self._claimed.append((alert, price, ts))
+            else:
+                self.lost_claims += 1
+                self._resync(alert, doc)
+
+        claimed, self._claimed = self._claimed, []
+        if not claimed:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            await asyncio.to_thread(alerts_collection.insert_many, [
+                {
+                    "alert_id": alert.id, "user_id": alert.user_id, "symbol": alert.symbol, "type": alert.type,
+                    "level": alert.price, "percent": alert.percent, "price": price,
+                    "tick_time": datetime.fromtimestamp(ts, timezone.utc), "triggered_at": now
+                }
+                for alert, price, ts in claimed
+            ])
+        except Exception:
+            self._claimed[:0] = claimed
+            raise
+
+        # Dedup: one notification per user and symbol for the whole batch
+        grouped = defaultdict(list)
+        for alert, price, _ in claimed:
+            grouped[(alert.user_id, alert.symbol)].append(describe_alert(alert, price))
+        for (user_id, symbol), lines in grouped.items():
+            await notify_price_alert(user_id, symbol, list(dict.fromkeys(lines)))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print("⚠️ Price alert delivery failed:", repr(e))
+
+    def start(self, feed=None):
+        """Without a feed, ticks come from process() (market gateway listener)"""
+        self.load()
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+        if feed is not None:
+            self._tasks.append(asyncio.create_task(self.run(feed)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+alert_service = AlertService()
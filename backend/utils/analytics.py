@@ -0,0 +1,216 @@
+"""
+Portfolio analytics - vectorized metrics over a user's closed trades
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.database import trades_collection, users_collection
+
+# Only the fields the analytics need are read from Mongo
+ANALYTICS_PROJECTION = {
+    "_id": 0, "pnl": 1, "pnl_percent": 1, "entry_price": 1, "stop_loss": 1,
+    "position_size": 1, "symbol": 1, "setup_type": 1, "emotions": 1,
+    "followed_plan": 1, "created_at": 1
+}
+
+WEEKDAYS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+TRADING_DAYS_PER_YEAR = 252
+
+CACHE_MAX_USERS = 1024
+
+def load_columns(user_id: str) -> dict:
+    """Columnar extract of a user's closed trades, oldest first"""
+    cursor = trades_collection.find(
+        {"user_id": user_id, "status": "closed"}, ANALYTICS_PROJECTION
+    ).sort("created_at", 1).batch_size(5000)
+    fields = [f for f in ANALYTICS_PROJECTION if f != "_id"]
+    columns = {field: [] for field in fields}
+    for trade in cursor:
+        for field in fields:
+            columns[field].append(trade.get(field))
+    return columns
+
+def _float_array(values) -> np.ndarray:
+    # numpy maps None to NaN for float dtype
+    return np.array(values, dtype=float)
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return round(float(numerator / denominator), 2) if denominator else 0
+
+def _streaks(wins: np.ndarray, losses: np.ndarray) -> dict:
+    """Longest and current runs of consecutive wins/losses via run-length encoding"""
+    def runs(mask):
+        if not mask.any():
+            return 0, 0
+        padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(padded))
+        lengths = edges[1::2] - edges[::2]
+        current = int(lengths[-1]) if mask[-1] else 0
+        return int(lengths.max()), current
+
+    max_wins, current_wins = runs(wins)
+    max_losses, current_losses = runs(losses)
+    return {
+        "max_consecutive_wins": max_wins,
+        "max_consecutive_losses": max_losses,
+        "current_win_streak": current_wins,
+        "current_loss_streak": current_losses
+    }
+
+def _drawdown(pnl: np.ndarray, timestamps: np.ndarray) -> dict:
+    """Max drawdown of the cumulative P&L curve and the longest time under water"""
+    equity = np.cumsum(pnl)
+    peaks = np.maximum.accumulate(np.maximum(equity, 0))
+    drawdowns = peaks - equity
+    max_dd = float(drawdowns.max()) if len(drawdowns) else 0.0
+    trough = int(drawdowns.argmax()) if len(drawdowns) else 0
+    peak_value = float(peaks[trough]) if len(peaks) else 0.0
+
+    # Index of the last new high at or before each trade (-1 before the first high)
+    is_high = drawdowns == 0
+    last_high = np.maximum.accumulate(np.where(is_high, np.arange(len(pnl)), -1))
+    underwater_trades = np.arange(len(pnl)) - last_high
+    longest = int(underwater_trades.max()) if len(pnl) else 0
+
+    duration_days = 0.0
+    if longest:
+        end = int(underwater_trades.argmax())
+        start = last_high[end]
+        start_time = timestamps[start] if start >= 0 else timestamps[0]
+        duration_days = float((timestamps[end] - start_time) / np.timedelta64(1, "D"))
+
+    return {
+        "max_drawdown": round(max_dd, 2),
+        "max_drawdown_percent_of_peak": round(max_dd / peak_value * 100, 2) if peak_value > 0 else 0,
+        "max_drawdown_duration_trades": longest,
+        "max_drawdown_duration_days": round(duration_days, 1)
+    }
+
+def _breakdown(keys, pnl: np.ndarray, wins: np.ndarray, r_multiples: np.ndarray, labels=None) -> list:
+    """Per-key counts, P&L and winrate using factorize + bincount (one pass per key)"""
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object), use_na_sentinel=False)
+    n = len(uniques)
+    counts = np.bincount(codes, minlength=n)
+    pnl_sums = np.bincount(codes, weights=pnl, minlength=n)
+    win_counts = np.bincount(codes, weights=wins, minlength=n)
+    has_r = ~np.isnan(r_multiples)
+    r_sums = np.bincount(codes, weights=np.where(has_r, r_multiples, 0), minlength=n)
+    r_counts = np.bincount(codes, weights=has_r, minlength=n)
+
+    result = []
+    for i, key in enumerate(uniques):
+        if isinstance(key, np.generic):
+            key = key.item()
+        if key is None or (isinstance(key, float) and np.isnan(key)):
+            key = None
+        result.append({
+            "key": labels[key] if labels is not None and key is not None else key,
+            "trades": int(counts[i]),
+            "total_pnl": round(float(pnl_sums[i]), 2),
+            "avg_pnl": round(float(pnl_sums[i] / counts[i]), 2),
+            "winrate": round(float(win_counts[i] / counts[i] * 100), 2),
+            "avg_r_multiple": round(float(r_sums[i] / r_counts[i]), 2) if r_counts[i] else None
+        })
+    result.sort(key=lambda row: row["total_pnl"], reverse=True)
+    return result
+
+def compute_analytics(columns: dict) -> dict:
+    """Compute portfolio analytics from columnar trade data (see load_columns)"""
+    pnl = np.nan_to_num(_float_array(columns["pnl"]))
+    total = len(pnl)
+    if total == 0:
+        return {"total_trades": 0}
+
+    pnl_percent = np.nan_to_num(_float_array(columns["pnl_percent"]))
+    entry = _float_array(columns["entry_price"])
+    stop = _float_array(columns["stop_loss"])
+    size = _float_array(columns["position_size"])
+    # Naive UTC datetime64 (Mongo returns naive UTC datetimes)
+    timestamps = pd.DatetimeIndex(pd.to_datetime(pd.Series(columns["created_at"]), utc=True)).tz_convert(None).to_numpy()
+
+    wins = pnl > 0
+    losses = pnl < 0
+    total_wins = pnl[wins].sum()
+    total_losses = -pnl[losses].sum()
+    winrate = wins.mean()
+    avg_win = pnl[wins].mean() if wins.any() else 0.0
+    avg_loss = -pnl[losses].mean() if losses.any() else 0.0
+
+    # R-multiples: P&L relative to the risk defined by the stop loss
+    risk = np.abs(entry - stop) * size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_multiples = np.where(risk > 0, pnl / risk, np.nan)
+    has_r = ~np.isnan(r_multiples)
+
+    # Sharpe / Sortino on daily returns (sum of pnl_percent per calendar day)
+    days = timestamps.astype("datetime64[D]")
+    unique_days, day_codes = np.unique(days, return_inverse=True)
+    daily_returns = np.bincount(day_codes, weights=pnl_percent, minlength=len(unique_days))
+    daily_std = daily_returns.std(ddof=1) if len(daily_returns) > 1 else 0.0
+    downside = np.minimum(daily_returns, 0)
+    downside_dev = np.sqrt((downside ** 2).mean())
+    annualize = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    day_index = pd.DatetimeIndex(timestamps)
+
+    return {
+        "total_trades": total,
+        "winning_trades": int(wins.sum()),
+        "losing_trades": int(losses.sum()),
+        "winrate": round(float(winrate * 100), 2),
+        "total_pnl": round(float(pnl.sum()), 2),
+        "avg_win": round(float(avg_win), 2),
+        "avg_loss": round(float(avg_loss), 2),
+        "profit_factor": _ratio(total_wins, total_losses),
+        "payoff_ratio": _ratio(avg_win, avg_loss),
+        "expectancy": round(float(pnl.mean()), 2),
+        "expectancy_r": round(float(r_multiples[has_r].mean()), 2) if has_r.any() else None,
+        "avg_r_multiple_win": round(float(r_multiples[has_r & wins].mean()), 2) if (has_r & wins).any() else None,
+        "avg_r_multiple_loss": round(float(r_multiples[has_r & losses].mean()), 2) if (has_r & losses).any() else None,
+        "trades_with_stop_loss": int(has_r.sum()),
+        "sharpe_ratio": round(float(daily_returns.mean() / daily_std * annualize), 2) if daily_std > 0 else 0,
+        "sortino_ratio": round(float(daily_returns.mean() / downside_dev * annualize), 2) if downside_dev > 0 else 0,
+        "trading_days": int(len(unique_days)),
+        **_drawdown(pnl, timestamps),
+        **_streaks(wins, losses),
+        "by_symbol": _breakdown(columns["symbol"], pnl, wins, r_multiples),
+        "by_setup_type": _breakdown(columns["setup_type"], pnl, wins, r_multiples),
+        "by_emotions": _breakdown(columns["emotions"], pnl, wins, r_multiples),
+        "by_followed_plan": _breakdown(columns["followed_plan"], pnl, wins, r_multiples),
+        "by_weekday": _breakdown(day_index.weekday.to_numpy(), pnl, wins, r_multiples, labels=WEEKDAYS),
+        "by_hour": _breakdown(day_index.hour.to_numpy(), pnl, wins, r_multiples)
+    }
+
+# ============== CACHE ==============
+# Results are cached per user and keyed by the user's `trades_version`, which
+# every trade mutation bumps, so all workers see invalidations.
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def invalidate_analytics(user_id: str):
+    """Mark cached analytics for a user as stale (call on every trade mutation)"""
+    users_collection.update_one({"_id": user_id}, {"$inc": {"trades_version": 1}})
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+def get_analytics(user_id: str) -> dict:
+    """Analytics for a user, served from cache while their trades are unchanged"""
+    user = users_collection.find_one({"_id": user_id}, {"trades_version": 1})
+    version = (user or {}).get("trades_version", 0)
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached and cached[0] == version:
+            _cache.move_to_end(user_id)
+            return cached[1]
+
+    result = compute_analytics(load_columns(user_id))
+    with _cache_lock:
+        _cache[user_id] = (version, result)
+        _cache.move_to_end(user_id)
+        while len(_cache) > CACHE_MAX_USERS:
+            _cache.popitem(last=False)
+    return result
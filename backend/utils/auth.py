@@ -1,11 +1,15 @@
 """
 Authentication utilities - JWT token handling
 """
+import os
 from datetime import datetime, timezone, timedelta
-from fastapi import HTTPException, Header
+from fastapi import Depends, HTTPException, Header
 from jose import jwt, JWTError
 from utils.database import JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRATION_HOURS, users_collection
 
+# Users allowed on the system endpoints (comma-separated user ids)
+ADMIN_USER_IDS = {u.strip() for u in os.environ.get("ADMIN_USER_IDS", "").split(",") if u.strip()}
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
@@ -31,6 +35,12 @@ async def get_current_user(authorization: str = Header(None)) -> dict:
     except JWTError:
         raise HTTPException(status_code=401, detail="Token expiré ou invalide")
 
+async def get_admin_user(user: dict = Depends(get_current_user)) -> dict:
+    """Current user, if listed in ADMIN_USER_IDS"""
+    if user["id"] not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    return user
+
 def get_optional_user(authorization: str = Header(None)) -> dict:
     """Get user if authenticated, None otherwise"""
     if not authorization or not authorization.startswith("Bearer "):
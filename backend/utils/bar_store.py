@@ -0,0 +1,289 @@
+"""
+OHLCV bar store - columnar .npy files partitioned by symbol/timeframe/year,
+read through memory maps so range queries only touch the pages they need.
+
+Layout: {BAR_STORE_DIR}/{SYMBOL}/{TIMEFRAME}/{YEAR}/{column}.npy
+Timestamps are int64 epoch seconds (UTC, bar open time), sorted and unique.
+"""
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+BAR_STORE_DIR = os.environ.get(
+    "BAR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bars")
+)
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+DTYPES = {"ts": np.int64, "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64, "volume": np.float64}
+
+TIMEFRAME_SECONDS = {
+    "M1": 60, "M5": 300, "M15": 900, "M30": 1800,
+    "H1": 3600, "H4": 14400, "D1": 86400, "W1": 604800,
+}
+
+# Common spellings ("15m", "1h", "daily"...) mapped to canonical names
+_TIMEFRAME_ALIASES = {"1D": "D1", "DAILY": "D1", "1W": "W1", "WEEKLY": "W1"}
+
+MAX_OPEN_PARTITIONS = int(os.environ.get("BAR_STORE_MAX_OPEN_PARTITIONS", "256"))
+
+def normalize_timeframe(timeframe: str) -> str:
+    """Canonical timeframe name, e.g. '15m' -> 'M15', '1h' -> 'H1'"""
+    tf = timeframe.strip().upper()
+    if tf in TIMEFRAME_SECONDS:
+        return tf
+    if tf in _TIMEFRAME_ALIASES:
+        return _TIMEFRAME_ALIASES[tf]
+    match = re.fullmatch(r"(\d+)\s*(M|MIN|H|D|W)", tf)
+    if match:
+        unit = {"MIN": "M"}.get(match.group(2), match.group(2))
+        candidate = f"{unit}{int(match.group(1))}"
+        if candidate in TIMEFRAME_SECONDS:
+            return candidate
+    raise ValueError(f"Timeframe inconnu: {timeframe}")
+
+def normalize_symbol(symbol: str) -> str:
+    symbol = symbol.strip().upper().replace("/", "")
+    if not re.fullmatch(r"[A-Z0-9._-]{1,20}", symbol):
+        raise ValueError(f"Symbole invalide: {symbol}")
+    return symbol
+
+def to_epoch(value) -> int:
+    """datetime / ISO string / epoch seconds -> int epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def _year_of(ts: np.ndarray) -> np.ndarray:
+    return ts.astype("datetime64[s]").astype("datetime64[Y]").astype(int) + 1970
+
+class BarStore:
+    """Memory-mapped bar store with an LRU of open partitions.
+
+    Open partitions are shared by every request in the process, so concurrent
+    readers of the same data share one set of mappings (and the OS page cache).
+    """
+
+    def __init__(self, root: str = BAR_STORE_DIR, max_open_partitions: int = MAX_OPEN_PARTITIONS):
+        self.root = root
+        self.max_open_partitions = max_open_partitions
+        self._partitions = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    # ----- paths -----
+
+    def _series_dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, normalize_symbol(symbol), normalize_timeframe(timeframe))
+
+    def _partition_dir(self, symbol: str, timeframe: str, year: int) -> str:
+        return os.path.join(self._series_dir(symbol, timeframe), str(year))
+
+    def symbols(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def timeframes(self, symbol: str) -> list:
+        path = os.path.join(self.root, normalize_symbol(symbol))
+        if not os.path.isdir(path):
+            return []
+        return sorted((d for d in os.listdir(path) if d in TIMEFRAME_SECONDS), key=TIMEFRAME_SECONDS.get)
+
+    def years(self, symbol: str, timeframe: str) -> list:
+        path = self._series_dir(symbol, timeframe)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(d) for d in os.listdir(path) if d.isdigit())
+
+    def version(self, symbol: str) -> int:
+        """Changes whenever any partition of the symbol is rewritten (for cache keys)"""
+        path = os.path.join(self.root, normalize_symbol(symbol))
+        latest = 0
+        for timeframe in self.timeframes(symbol):
+            for year in self.years(symbol, timeframe):
+                try:
+                    latest = max(latest, os.stat(os.path.join(path, timeframe, str(year), "ts.npy")).st_mtime_ns)
+                except FileNotFoundError:
+                    continue
+        return latest
+
+    # ----- reading -----
+
+    def _open_partition(self, symbol: str, timeframe: str, year: int):
+        """Memory-mapped columns of one partition (cached, reopened if rewritten)"""
+        path = self._partition_dir(symbol, timeframe, year)
+        ts_path = os.path.join(path, "ts.npy")
+        try:
+            mtime = os.stat(ts_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (path, mtime)
+        with self._lock:
+            cached = self._partitions.get(path)
+            if cached and cached[0] == key:
+                self._partitions.move_to_end(path)
+                return cached[1]
+        columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in COLUMNS
+        }
+        with self._lock:
+            self._partitions[path] = (key, columns)
+            self._partitions.move_to_end(path)
+            while len(self._partitions) > self.max_open_partitions:
+                self._partitions.popitem(last=False)
+        return columns
+
+    def read(self, symbol: str, timeframe: str, start=None, end=None, columns=COLUMNS,
+             limit: int = None, newest: bool = True) -> dict:
+        """Bars with start <= ts < end as a dict of arrays.
+
+        A range inside one yearly partition returns read-only views on the
+        memory map (zero copy); ranges spanning years are concatenated.
+        `limit` keeps the most recent bars of the range (the oldest ones
+        when `newest` is False).
+        """
+        start_ts = to_epoch(start)
+        end_ts = to_epoch(end)
+        years = self.years(symbol, timeframe)
+        if start_ts is not None:
+            years = [y for y in years if y >= _year_of(np.array([start_ts]))[0]]
+        if end_ts is not None:
+            years = [y for y in years if y <= _year_of(np.array([end_ts]))[0]]
+
+        pieces = []
+        for year in years:
+            part = self._open_partition(symbol, timeframe, year)
+            if part is None:
+                continue
+            ts = part["ts"]
+            lo = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, side="left"))
+            hi = len(ts) if end_ts is None else int(np.searchsorted(ts, end_ts, side="left"))
+            if hi > lo:
+                pieces.append({name: part[name][lo:hi] for name in columns})
+
+        if limit is not None:
+            kept, remaining = [], limit
+            for piece in (reversed(pieces) if newest else pieces):
+                if remaining <= 0:
+                    break
+                n = len(piece[columns[0]])
+                window = slice(max(0, n - remaining), n) if newest else slice(0, remaining)
+                kept.append({name: arr[window] for name, arr in piece.items()})
+                remaining -= n
+            pieces = kept[::-1] if newest else kept
+
+        if not pieces:
+            return {name: np.empty(0, dtype=DTYPES[name]) for name in columns}
+        if len(pieces) == 1:
+            return pieces[0]
+        return {name: np.concatenate([p[name] for p in pieces]) for name in columns}
+
+    def bounds(self, symbol: str, timeframe: str):
+        """(first_ts, last_ts, bar_count) for a series, or None when empty"""
+        years = self.years(symbol, timeframe)
+        first = last = None
+        count = 0
+        for year in years:
+            part = self._open_partition(symbol, timeframe, year)
+            if part is None or not len(part["ts"]):
+                continue
+            first = int(part["ts"][0]) if first is None else first
+            last = int(part["ts"][-1])
+            count += len(part["ts"])
+        return (first, last, count) if count else None
+
+    # ----- writing -----
+
+    def write(self, symbol: str, timeframe: str, bars: dict) -> int:
+        """Merge bars into the store (later writes win on duplicate timestamps).
+
+        Each touched yearly partition is rewritten to a temp directory and
+        swapped in, so readers never see a half-written partition.
+        """
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        if not len(ts):
+            return 0
+        new = {name: np.asarray(bars[name], dtype=DTYPES[name]) for name in COLUMNS}
+        years = _year_of(ts)
+        written = 0
+        with self._write_lock:
+            for year in np.unique(years):
+                mask = years == year
+                chunk = {name: arr[mask] for name, arr in new.items()}
+                existing = self._open_partition(symbol, timeframe, int(year))
+                if existing is not None:
+                    chunk = {name: np.concatenate([np.asarray(existing[name]), chunk[name]]) for name in COLUMNS}
+                # Stable sort then keep the last occurrence of each timestamp
+                order = np.argsort(chunk["ts"], kind="stable")
+                sorted_ts = chunk["ts"][order]
+                keep = np.append(sorted_ts[1:] != sorted_ts[:-1], True)
+                merged = {name: arr[order][keep] for name, arr in chunk.items()}
+                self._replace_partition(symbol, timeframe, int(year), merged)
+                written += int(mask.sum())
+        return written
+
+    def _replace_partition(self, symbol: str, timeframe: str, year: int, columns: dict):
+        final = self._partition_dir(symbol, timeframe, year)
+        tmp = f"{final}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp, exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(columns[name]))
+        old = None
+        if os.path.isdir(final):
+            old = f"{final}.old-{os.getpid()}-{threading.get_ident()}"
+            os.rename(final, old)
+        os.rename(tmp, final)
+        if old:
+            # Existing memory maps keep the unlinked files alive until released
+            shutil.rmtree(old, ignore_errors=True)
+        with self._lock:
+            self._partitions.pop(final, None)
+
+def bars_from_csv(path: str, chunksize: int = 1_000_000):
+    """Yield bar column dicts from an OHLCV CSV (time,open,high,low,close[,volume]).
+
+    The time column may be named time/timestamp/date/datetime and hold ISO
+    dates, 'YYYY.MM.DD HH:MM' (MetaTrader) or epoch seconds.
+    """
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk.columns = [str(c).strip().lower().strip("<>") for c in chunk.columns]
+        if "date" in chunk and "time" in chunk:
+            chunk["time"] = chunk["date"].astype(str) + " " + chunk["time"].astype(str)
+        time_col = next((c for c in ("time", "timestamp", "datetime", "date") if c in chunk), None)
+        if time_col is None:
+            raise ValueError("Colonne de date introuvable (time, timestamp, datetime, date)")
+        raw = chunk[time_col]
+        if pd.api.types.is_numeric_dtype(raw):
+            ts = raw.to_numpy(dtype=np.int64)
+        else:
+            # MetaTrader exports dates as 2024.01.31
+            text = raw.astype(str).str.replace(r"^(\d{4})\.(\d{2})\.(\d{2})", r"\1-\2-\3", regex=True)
+            parsed = pd.to_datetime(text, utc=True, format="mixed").dt.tz_convert(None)
+            ts = parsed.to_numpy().astype("datetime64[s]").astype(np.int64)
+        volume_col = next((c for c in ("volume", "tick_volume", "tickvol", "vol") if c in chunk), None)
+        yield {
+            "ts": ts,
+            "open": chunk["open"].to_numpy(dtype=np.float64),
+            "high": chunk["high"].to_numpy(dtype=np.float64),
+            "low": chunk["low"].to_numpy(dtype=np.float64),
+            "close": chunk["close"].to_numpy(dtype=np.float64),
+            "volume": chunk[volume_col].to_numpy(dtype=np.float64) if volume_col else np.zeros(len(chunk)),
+        }
+
+# Process-wide store shared by routers and background jobs
+bar_store = BarStore()
@@ -0,0 +1,230 @@
+"""
+Daily briefings - generated ahead of the market open instead of on the
+first dashboard load.
+
+pregenerate() runs on the scheduler (BRIEFING_CRON). For each timezone
+whose local open (BRIEFING_LOCAL_OPEN) is less than LEAD_MINUTES away,
+it takes the active users of that timezone (activity in the last
+ACTIVE_DAYS days, from the streaks collection) in batches of BATCH:
+- each user is reduced to a bucket of what the briefing depends on
+  (style, level, markets, recent result and winrate band), so users with
+  the same bucket share one model call;
+- the missing buckets are generated in parallel, at most CONCURRENCY at
+  a time and RATE_PER_MINUTE calls per minute;
+- one document per user (_id = user id) holds the day's text, with a TTL.
+The endpoint reads that document by _id; a user without one (new,
+inactive, failed batch) gets it generated on demand through the same
+buckets. Mongo reads and writes run in a thread, off the event loop.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from pymongo import ReplaceOne
+
+from utils.database import daily_briefings_collection, streaks_collection, trades_collection, users_collection
+from utils.pnl_rollup import user_timezone
+
+BRIEFING_CRON = "*/15 * * * *"
+LOCAL_OPEN = os.environ.get("BRIEFING_LOCAL_OPEN", "08:00")
+LEAD_MINUTES = 60
+ACTIVE_DAYS = 7
+BATCH = 500
+CONCURRENCY = int(os.environ.get("BRIEFING_CONCURRENCY", 4))
+RATE_PER_MINUTE = int(os.environ.get("BRIEFING_RATE_PER_MINUTE", 60))
+RECENT_TRADES = 10
+RECENT_DAYS = 90
+WINRATE_BAND = 20
+TTL = timedelta(hours=36)
+PROFILE_FIELDS = {"trading_style": 1, "experience_level": 1, "preferred_markets": 1}
+REPORT = ("timezones", "users", "generated", "shared", "failed")
+
+def due_day(now: datetime, tz: str, local_open: str = LOCAL_OPEN, lead: int = LEAD_MINUTES):
+    """The local day whose open is less than `lead` minutes away in tz, else None"""
+    local = now.astimezone(ZoneInfo(tz))
+    hour, minute = (int(v) for v in local_open.split(":"))
+    until_open = local.replace(hour=hour, minute=minute, second=0, microsecond=0) - local
+    return local.date() if timedelta(0) < until_open <= timedelta(minutes=lead) else None
+
+def profile_bucket(user: dict, pnls: list) -> dict:
+    """What a briefing depends on, coarse enough to be shared between users"""
+    total = sum(pnls)
+    winrate = sum(1 for p in pnls if p > 0) / len(pnls) * 100 if pnls else None
+    return {
+        "style": user.get("trading_style") or "day trading",
+        "level": user.get("experience_level") or "intermédiaire",
+        "markets": sorted(user.get("preferred_markets") or ["forex"]),
+        "result": "aucun trade" if not pnls else "en gain" if total > 0 else "en perte" if total < 0 else "à l'équilibre",
+        "winrate": None if winrate is None else min(int(winrate) // WINRATE_BAND * WINRATE_BAND, 100 - WINRATE_BAND)
+    }
+
+def bucket_key(bucket: dict) -> str:
+    return hashlib.sha1(json.dumps(bucket, sort_keys=True).encode()).hexdigest()[:16]
+
+def briefing_context(bucket: dict) -> str:
+    winrate = (f"entre {bucket['winrate']} et {bucket['winrate'] + WINRATE_BAND}%"
+               if bucket["winrate"] is not None else "non disponible")
+    return f"""Tu es un coach de trading personnel. Génère un briefing quotidien pour un trader:
+
+Style: {bucket['style']}
+Niveau: {bucket['level']}
+Marchés: {', '.join(bucket['markets'])}
+
+Performance récente ({RECENT_TRADES} derniers trades):
+- Résultat: {bucket['result']}
+- Winrate: {winrate}
+
+Le briefing doit inclure:
+1. Rappel du plan de trading
+2. Points de vigilance du jour
+3. Motivation personnalisée
+4. Conseil du jour
+
+Ne cite ni nom ni chiffre exact. Sois concis, pratique et motivant. Réponds en français."""
+
+class BriefingService:
+    def __init__(self):
+        self.generated = 0
+        self.shared = 0
+        self._next_call = 0.0
+        self._semaphore = asyncio.Semaphore(CONCURRENCY)
+        self._inflight = {}             # bucket key -> generation under way
+
+    def cached(self, user_id: str):
+        """Today's briefing of the user, if already generated"""
+        doc = daily_briefings_collection.find_one({"_id": user_id})
+        if doc and doc["date"] == datetime.now(ZoneInfo(doc["timezone"])).date().isoformat():
+            return doc["briefing"]
+        return None
+
+    async def for_user(self, user_id: str, generate) -> str:
+        """On-demand fallback: the user's bucket text, generated if no one has it yet"""
+        tz = await asyncio.to_thread(user_timezone, user_id)
+        day = datetime.now(ZoneInfo(tz)).date()
+        docs = await self._build([user_id], tz, day, generate, dict.fromkeys(REPORT, 0))
+        if not docs:
+            raise RuntimeError("Briefing non généré")
+        return docs[0]["briefing"]
+
+    async def pregenerate(self, generate, now: datetime = None) -> dict:
+        """Scheduled job: briefings of the active users whose local open is near"""
+        now = now or datetime.now(timezone.utc)
+        report = dict.fromkeys(REPORT, 0)
+        for tz in await asyncio.to_thread(streaks_collection.distinct, "timezone"):
+            day = due_day(now, tz)
+            if day is None:
+                continue
+            report["timezones"] += 1
+            user_ids = await asyncio.to_thread(self.active_users, tz, day)
+            for start in range(0, len(user_ids), BATCH):
+                await self._build(user_ids[start:start + BATCH], tz, day, generate, report)
+        return report
+
+    def active_users(self, tz: str, day: date) -> list:
+        """Ids of the users of tz active in the ACTIVE_DAYS before day"""
+        cursor = streaks_collection.find(
+            {"timezone": tz, "last_day": {"$gte": day.toordinal() - ACTIVE_DAYS}}, {"_id": 1}, batch_size=BATCH
+        )
+        return [doc["_id"] for doc in cursor]
+
+    def profiles(self, user_ids: list, day_key: str) -> dict:
+        """user_id -> bucket, for the users without a briefing for day_key"""
+        done = {d["_id"] for d in daily_briefings_collection.find({"_id": {"$in": user_ids}, "date": day_key}, {"_id": 1})}
+        todo = [u for u in user_ids if u not in done]
+        if not todo:
+            return {}
+        pnls = self.recent_pnls(todo)
+        return {u["_id"]: profile_bucket(u, pnls.get(u["_id"], []))
+                for u in users_collection.find({"_id": {"$in": todo}}, PROFILE_FIELDS)}
+
+    async def _build(self, user_ids: list, tz: str, day: date, generate, report: dict) -> list:
+        """Store the day's briefing of the users that have none yet; returns the documents written"""
+        day_key = day.isoformat()
+        buckets = await asyncio.to_thread(self.profiles, user_ids, day_key)
+        if not buckets:
+            return []
+        texts = await self._texts(day_key, {bucket_key(b): b for b in buckets.values()}, generate, report)
+
+        now = datetime.now(timezone.utc)
+        docs = [{
+            "_id": user_id, "date": day_key, "timezone": tz, "bucket": bucket_key(bucket),
+            "briefing": texts[bucket_key(bucket)], "generated_at": now, "expires_at": now + TTL
+        } for user_id, bucket in buckets.items() if bucket_key(bucket) in texts]
+        if docs:
+            await asyncio.to_thread(daily_briefings_collection.bulk_write,
+                                    [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False)
+        report["users"] += len(docs)
+        return docs
+
+    async def _texts(self, day_key: str, buckets: dict, generate, report: dict) -> dict:
+        """bucket key -> text: reused from today's briefings, generated otherwise"""
+        texts = await asyncio.to_thread(self.shared_texts, day_key, list(buckets))
+        self.shared += len(texts)
+        report["shared"] += len(texts)
+        missing = [key for key in buckets if key not in texts]
+
+        async def one(key):
+            try:
+                return key, await self._generate(key, briefing_context(buckets[key]), generate)
+            except Exception as e:
+                print("⚠️ Briefing generation failed:", repr(e))
+                report["failed"] += 1
+                return key, None
+
+        for key, text in await asyncio.gather(*(one(key) for key in missing)):
+            if text:
+                texts[key] = text
+                report["generated"] += 1
+        return texts
+
+    async def _generate(self, key: str, context: str, generate) -> str:
+        """One model call per bucket: concurrent requests for it share the call"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(context, generate))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _call(self, context: str, generate) -> str:
+        async with self._semaphore:
+            await self._throttle()
+            if inspect.iscoroutinefunction(generate):
+                text = await generate(context)
+            else:
+                text = await asyncio.to_thread(generate, context)
+        self.generated += 1
+        return text
+
+    async def _throttle(self):
+        """Space the model calls RATE_PER_MINUTE apart"""
+        now = time.monotonic()
+        wait = self._next_call - now
+        self._next_call = max(now, self._next_call) + 60 / RATE_PER_MINUTE
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def shared_texts(self, day_key: str, keys: list) -> dict:
+        """bucket key -> text of a briefing already stored for day_key"""
+        return {d["_id"]: d["briefing"] for d in daily_briefings_collection.aggregate([
+            {"$match": {"date": day_key, "bucket": {"$in": keys}}},
+            {"$group": {"_id": "$bucket", "briefing": {"$first": "$briefing"}}}
+        ])}
+
+    def recent_pnls(self, user_ids: list) -> dict:
+        """user_id -> P&L of the last RECENT_TRADES closed trades (last RECENT_DAYS days)"""
+        rows = trades_collection.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}, "status": "closed",
+                        "created_at": {"$gte": datetime.now(timezone.utc) - timedelta(days=RECENT_DAYS)}}},
+            {"$group": {"_id": "$user_id", "pnls": {"$topN": {
+                "n": RECENT_TRADES, "sortBy": {"created_at": -1}, "output": {"$ifNull": ["$pnl", 0]}
+            }}}}
+        ])
+        return {row["_id"]: row["pnls"] for row in rows}
+
+briefing_service = BriefingService()
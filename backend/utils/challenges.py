@@ -0,0 +1,296 @@
+"""
+Challenge progress - domain events (utils/events.py) advance the challenges
+users joined.
+
+Challenges carry a machine-readable `rule` (see scripts/seed_gamification.py):
+{"event": type or [types], "where": {field: value}, "mode": ..., "field": ..., "min_events": n}
+- count (default): +1 per matching event;
+- streak: +1 while the event's `field` is true, back to 0 when it is false
+  (consecutive trades following the plan);
+- ratio: percentage of matching events with `field` true, once `min_events`
+  have been seen (winrate);
+- days: consecutive days with a matching event.
+
+Events go through an index event type -> challenges -> joined users, so an
+event only touches the participations it can move. Joining emits
+challenge_joined: the dispatching process reads the participation (and the
+challenge, if created since it loaded) from Mongo, so a join served by any
+worker counts from the user's next event. Progress is kept in
+memory and written in batches: one coalesced `$inc` per participation for
+counts, a `$set` after a window reset or for the stateful modes. Progress
+starts over when an event falls in a new daily / weekly / monthly window
+of the user's timezone (users.timezone, cached by the streak tracker);
+xp_reward is awarded once per window by a conditional update on
+`rewarded_window` and credited to the XP ledger (utils/xp.py), so a
+replayed batch cannot pay twice.
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from utils.database import challenges_collection, user_challenges_collection
+from utils.streaks import streak_tracker
+
+RULE_MODES = ("count", "streak", "ratio", "days")
+FLUSH_INTERVAL = 1.0
+
+def window_key(kind: str, ts: float, tz: str = "UTC") -> str:
+    """Window of a challenge type containing ts, in the user's timezone; keys
+    sort chronologically"""
+    day = datetime.fromtimestamp(ts, ZoneInfo(tz)).date()
+    if kind == "daily":
+        return day.isoformat()
+    if kind == "weekly":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if kind == "monthly":
+        return f"{day.year}-{day.month:02d}"
+    return "all"
+
+class Challenge:
+    __slots__ = ("id", "title", "kind", "target", "xp_reward", "events", "where", "mode", "field", "min_events", "participants")
+
+    def __init__(self, doc: dict):
+        rule = doc["rule"]
+        events = rule["event"]
+        self.id = str(doc["_id"])
+        self.title = doc.get("title", self.id)
+        self.kind = doc.get("type", "weekly")
+        self.target = doc["target"]
+        self.xp_reward = doc.get("xp_reward", 0)
+        self.events = [events] if isinstance(events, str) else list(events)
+        self.where = rule.get("where") or {}
+        self.mode = rule.get("mode", "count")
+        self.field = rule.get("field")
+        self.min_events = rule.get("min_events", 0)
+        self.participants = {}          # user_id -> Participation
+        if self.mode not in RULE_MODES:
+            raise ValueError(f"Mode de challenge inconnu: {self.mode}")
+
+class Participation:
+    __slots__ = ("id", "user_id", "challenge", "window", "progress", "state", "completed", "inc", "reset")
+
+    def __init__(self, doc: dict, challenge: Challenge):
+        self.id = str(doc["_id"])
+        self.user_id = doc["user_id"]
+        self.challenge = challenge
+        self.window = doc.get("window")
+        self.progress = doc.get("progress", 0)
+        self.state = doc.get("state") or {}
+        self.completed = doc.get("completed", False)
+        self.inc = 0                    # unwritten increments
+        self.reset = False              # needs a full $set
+
+class ChallengeEngine:
+    def __init__(self):
+        self.challenges = {}
+        self.by_event = defaultdict(list)
+        self.dirty = {}                 # participation id -> Participation
+        self.completions = []           # (Participation, window) not awarded yet
+        self.events = 0
+        self.applied = 0
+
+    def load(self, challenges, participations=()):
+        self.challenges, self.by_event = {}, defaultdict(list)
+        for doc in challenges:
+            self.add(doc)
+        for doc in participations:
+            self.join(doc)
+
+    def add(self, doc: dict):
+        """Index an active challenge with a rule"""
+        if not doc.get("rule") or not doc.get("active", True) or str(doc["_id"]) in self.challenges:
+            return
+        challenge = Challenge(doc)
+        self.challenges[challenge.id] = challenge
+        for event in challenge.events:
+            self.by_event[event].append(challenge)
+
+    def join(self, doc: dict):
+        challenge = self.challenges.get(str(doc["challenge_id"]))
+        if challenge is not None:
+            challenge.participants[doc["user_id"]] = Participation(doc, challenge)
+
+    def concerns(self, event: dict) -> bool:
+        """Whether the event can move a participation"""
+        return any(event["user_id"] in c.participants for c in self.by_event.get(event["type"], ()))
+
+    def handle(self, event: dict, tz: str = "UTC"):
+        """Apply one event: {"type", "user_id", "ts", ...fields}; windows and
+        days are cut in the user's timezone `tz`"""
+        self.events += 1
+        user_id = event["user_id"]
+        for challenge in self.by_event.get(event["type"], ()):
+            participation = challenge.participants.get(user_id)
+            if participation is not None:
+                self._apply(participation, event, tz)
+
+    def _apply(self, p: Participation, event: dict, tz: str):
+        ch = p.challenge
+        ts = event.get("ts") or time.time()
+        window = window_key(ch.kind, ts, tz)
+        if p.window is not None and window < p.window:
+            return                          # late event from a closed window
+        if window != p.window:
+            p.window, p.progress, p.state, p.completed = window, 0, {}, False
+            p.inc, p.reset = 0, True
+        if any(event.get(k) != v for k, v in ch.where.items()):
+            self.dirty[p.id] = p
+            return
+        self.applied += 1
+
+        if ch.mode == "count":
+            p.progress += 1
+            p.inc += 1
+        elif ch.mode == "streak":
+            p.progress = p.progress + 1 if event.get(ch.field) else 0
+        elif ch.mode == "ratio":
+            hits = p.state.get("hits", 0) + (1 if event.get(ch.field) else 0)
+            seen = p.state.get("events", 0) + 1
+            p.state = {"hits": hits, "events": seen}
+            p.progress = round(hits / seen * 100, 1) if seen >= ch.min_events else 0
+        else:
+            day = datetime.fromtimestamp(ts, ZoneInfo(tz)).date()
+            last = p.state.get("last_day")
+            if last != day.isoformat():
+                consecutive = last is not None and date.fromisoformat(last) == day - timedelta(days=1)
+                p.progress = p.progress + 1 if consecutive else 1
+                p.state = {"last_day": day.isoformat()}
+        if not p.completed and p.progress >= ch.target:
+            p.completed = True
+            self.completions.append((p, window))
+        self.dirty[p.id] = p
+
+    def take_writes(self):
+        """Coalesced progress updates since the last call: [(participation, update)]"""
+        dirty, self.dirty = self.dirty, {}
+        writes = []
+        for p in dirty.values():
+            if p.reset or p.challenge.mode != "count":
+                update = {"$set": {"progress": p.progress, "window": p.window, "state": p.state, "completed": p.completed}}
+            elif p.inc:
+                update = {"$inc": {"progress": p.inc}, "$set": {"completed": p.completed}}
+            else:
+                continue
+            p.inc, p.reset = 0, False
+            writes.append((p, update))
+        return writes
+
+    def requeue(self, writes: list, completions: list):
+        """Give back a batch that could not be written: progress is rewritten
+        in full from memory, rewards are guarded against double payment"""
+        for p, _ in writes:
+            p.reset = True
+            self.dirty[p.id] = p
+        self.completions[:0] = completions
+
+    def stats(self) -> dict:
+        return {
+            "challenges": len(self.challenges),
+            "participations": sum(len(ch.participants) for ch in self.challenges.values()),
+            "events": self.events, "applied": self.applied,
+            "pending_writes": len(self.dirty), "pending_rewards": len(self.completions)
+        }
+
+class ChallengeService:
+    """Feeds events to the engine and writes progress and rewards in batches"""
+
+    def __init__(self, engine: ChallengeEngine = None, flush_interval: float = FLUSH_INTERVAL):
+        self.engine = engine or ChallengeEngine()
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()       # events are handled on the dispatch thread
+        self._tasks = []
+
+    def load(self):
+        challenges = list(challenges_collection.find({"active": True}))
+        ids = [c["_id"] for c in challenges if c.get("rule")]
+        participations = list(user_challenges_collection.find({"challenge_id": {"$in": ids}}))
+        with self._lock:
+            self.engine.load(challenges, participations)
+
+    def handle(self, event: dict):
+        if event["type"] == "challenge_joined":
+            self.join(event["user_id"], event["challenge_id"])
+            return
+        tz = streak_tracker.zone(event["user_id"]) if self.engine.concerns(event) else "UTC"
+        with self._lock:
+            self.engine.handle(event, tz)
+
+    def join(self, user_id: str, challenge_id: str):
+        """A participation created on any worker, read from Mongo"""
+        challenge = self.engine.challenges.get(str(challenge_id))
+        if challenge is not None and user_id in challenge.participants:
+            return                          # delivered again
+        if challenge is None:
+            doc = challenges_collection.find_one({"_id": challenge_id, "active": True})
+            if doc is None:
+                return
+            with self._lock:
+                self.engine.add(doc)
+        participation = user_challenges_collection.find_one({"user_id": user_id, "challenge_id": challenge_id})
+        if participation is not None:
+            with self._lock:
+                self.engine.join(participation)
+
+    async def flush(self):
+        engine = self.engine
+        with self._lock:
+            writes = engine.take_writes()
+            completions, engine.completions = engine.completions, []
+        if not writes and not completions:
+            return
+        from pymongo import UpdateOne
+        from routers.push import notify_challenge_completed
+        from utils.xp import xp_service
+
+        awarded = []
+        try:
+            if writes:
+                user_challenges_collection.bulk_write([UpdateOne({"_id": p.id}, update) for p, update in writes], ordered=False)
+            now = datetime.now(timezone.utc)
+            for p, window in completions:
+                result = user_challenges_collection.update_one(
+                    {"_id": p.id, "rewarded_window": {"$ne": window}},
+                    {"$set": {"rewarded_window": window, "completed_at": now}}
+                )
+                if result.modified_count:
+                    awarded.append((p, window))
+            xp_service.credit([
+                {"user_id": p.user_id, "amount": p.challenge.xp_reward, "source": "challenge", "ref": f"{p.id}:{window}"}
+                for p, window in awarded
+            ])
+        except Exception:
+            with self._lock:
+                engine.requeue(writes, completions)
+            raise
+        for p, _ in awarded:
+            await notify_challenge_completed(p.user_id, p.challenge.title, p.challenge.xp_reward)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print("⚠️ Challenge progress flush failed:", repr(e))
+
+    def start(self):
+        from utils.events import subscribe
+
+        self.load()
+        subscribe(self.handle, name="challenges", flush=self.flush, reload=self.load)
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+
+    async def stop(self):
+        from utils.events import unsubscribe
+
+        unsubscribe(self.handle)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+challenge_service = ChallengeService()
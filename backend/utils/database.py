@@ -2,7 +2,8 @@ import os
 import certifi
 from datetime import datetime, timezone
 
-from pymongo import MongoClient
+from pymongo import InsertOne, MongoClient
+from pymongo.errors import BulkWriteError
 from passlib.context import CryptContext
 
 # =====================================================
@@ -75,6 +76,7 @@ user_badges_collection = db["user_badges"]
 
 achievements_collection = db["achievements"]
 user_achievements_collection = db["user_achievements"]
+user_counters_collection = db["user_counters"]
 
 rewards_collection = db["rewards"]
 user_rewards_collection = db["user_rewards"]
@@ -84,12 +86,14 @@ leaderboard_collection = db["leaderboard"]
 
 streaks_collection = db["streaks"]
 seasons_collection = db["seasons"]
+season_standings_collection = db["season_standings"]
 
 # =====================================================
 # AI COLLECTIONS
 # =====================================================
 ai_conversations_collection = db["ai_conversations"]
 ai_messages_collection = db["ai_messages"]
+daily_briefings_collection = db["daily_briefings"]
 
 # =====================================================
 # TRADING / MARKET / DATA COLLECTIONS
@@ -103,6 +107,10 @@ watchlists_collection = db["watchlists"]
 user_watchlists_collection = db["user_watchlists"]
 backtests_collection = db["backtests"]
 strategies_collection = db["strategies"]
+trade_imports_collection = db["trade_imports"]
+daily_pnl_collection = db["daily_pnl"]
+paper_orders_collection = db["paper_orders"]
+exposure_snapshots_collection = db["exposure_snapshots"]
 
 # =====================================================
 # SYSTEM / OTHER COLLECTIONS
@@ -111,9 +119,29 @@ tickets_collection = db["tickets"]
 push_subscriptions_collection = db["push_subscriptions"]
 notifications_collection = db["notifications"]
 payments_collection = db["payments"]
+outbox_collection = db["outbox"]
+event_offsets_collection = db["event_offsets"]
+event_failures_collection = db["event_failures"]
+scheduler_jobs_collection = db["scheduler_jobs"]
+scheduler_runs_collection = db["scheduler_runs"]
+leases_collection = db["leases"]
 
 # =====================================================
 # UTIL
 # =====================================================
 def now_utc():
     return datetime.now(timezone.utc)
+
+def insert_new(collection, docs: list) -> set:
+    """Bulk insert skipping documents whose key already exists; returns the
+    indexes of the documents that were duplicates"""
+    if not docs:
+        return set()
+    try:
+        collection.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        return {err["index"] for err in errors}
+    return set()
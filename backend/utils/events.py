@@ -0,0 +1,286 @@
+"""
+Domain events - what users do (trade recorded or closed, setup analyzed,
+post published...), delivered to the services that react to it.
+
+Routers call emit() right after the write the event describes: it appends
+the event to the outbox collection and returns, so a request pays one
+insert and none of the side effects. The dispatcher reads the outbox in
+_id order (ObjectIds are the offsets) and hands it to the subscribers in
+per-user batches, each user's events in order:
+- every subscriber has its own committed offset (event_offsets), moved
+  only once its handler and its flush went through: delivery is
+  at-least-once, so handlers are idempotent (keyed writes, recomputes) or
+  repaired by the reconcile / backfill jobs;
+- until its offset is committed, a subscriber remembers the last event
+  handled for each user and skips it when it comes again (a failed flush
+  keeps its writes for the next one: the events are not applied twice);
+- a user batch still failing after MAX_ATTEMPTS is parked in
+  event_failures and skipped, so one bad event does not stall the others;
+- events younger than SETTLE are left for the next round (ObjectIds of
+  different processes are only ordered across seconds);
+- one process dispatches at a time (lease in event_offsets); a process
+  taking the lease over first calls the subscribers' reload(), so state
+  they keep in memory is read again from what the previous holder wrote;
+- replay() moves subscribers back to an offset to deliver again.
+A round runs in a thread (pymongo and the handlers are blocking);
+coroutine handlers and flushes are run on the event loop from there.
+emit() returns False when the event could not be recorded.
+The outbox keeps RETENTION_DAYS of events (TTL index).
+"""
+import asyncio
+import inspect
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from utils.database import event_failures_collection, event_offsets_collection, outbox_collection
+
+EVENT_TYPES = (
+    "trade_created", "trade_closed", "trade_updated", "trade_deleted", "setup_analyzed", "coaching_received",
+    "briefing_viewed", "post_created", "post_liked", "comment_created", "backtest_completed", "streak_updated",
+    "ticket_replied", "challenge_joined"
+)
+BATCH = 500
+SETTLE = 2                  # seconds
+DISPATCH_INTERVAL = 1
+MAX_ATTEMPTS = 3
+LEASE = "_lease"
+LEASE_TTL = 30
+RETENTION_DAYS = 7
+
+def call(loop, func, *args):
+    """func(*args) from a dispatch thread; a coroutine result is run on `loop`"""
+    result = func(*args)
+    if inspect.iscoroutine(result):
+        result = asyncio.run_coroutine_threadsafe(result, loop).result()
+    return result
+
+class Subscriber:
+    """handler(event) per event, or handler(user_id, events) with batch=True;
+    either may be a coroutine. flush() runs after each delivery round,
+    reload() when this process takes the dispatch lease."""
+
+    def __init__(self, name: str, handler, flush=None, batch: bool = False, reload=None):
+        self.name = name
+        self.handler = handler
+        self.flush = flush
+        self.batch = batch
+        self.reload = reload
+        self.handled = {}               # user_id -> last event handled since the last commit
+
+    def deliver(self, loop, user_id: str, events: list):
+        last = self.handled.get(user_id)
+        if last is not None:
+            events = [e for e in events if e["_id"] > last]
+        if not events:
+            return
+        if self.batch:
+            call(loop, self.handler, user_id, events)
+            self.handled[user_id] = events[-1]["_id"]
+            return
+        for event in events:
+            call(loop, self.handler, event)
+            self.handled[user_id] = event["_id"]
+
+_subscribers = {}
+
+def subscribe(handler, name: str = None, flush=None, batch: bool = False, reload=None):
+    name = name or handler.__qualname__
+    if name not in _subscribers:
+        _subscribers[name] = Subscriber(name, handler, flush, batch, reload)
+
+def unsubscribe(handler):
+    for name, subscriber in list(_subscribers.items()):
+        if subscriber.handler == handler:
+            del _subscribers[name]
+
+def emit(user_id: str, type: str, **fields) -> bool:
+    """Record a domain event happening now: {"type", "user_id", "ts", ...fields};
+    False if it could not be recorded"""
+    try:
+        outbox_collection.insert_one({
+            "type": type, "user_id": user_id, "ts": time.time(), **fields,
+            "created_at": datetime.now(timezone.utc)
+        })
+    except Exception as e:
+        print(f"⚠️ Event {type} of {user_id} not recorded:", repr(e))
+        return False
+    return True
+
+def per_user(events: list) -> dict:
+    """user_id -> that user's events, in order"""
+    groups = {}
+    for event in events:
+        groups.setdefault(event["user_id"], []).append(event)
+    return groups
+
+def as_offset(value):
+    """An ObjectId offset from an ObjectId, its hex string or a datetime"""
+    from bson import ObjectId
+
+    if isinstance(value, datetime):
+        return ObjectId.from_datetime(value)
+    return ObjectId(value)
+
+class Dispatcher:
+    def __init__(self):
+        self.owner = uuid.uuid4().hex
+        self.leader = False
+        self.rounds = 0
+        self.delivered = {}             # subscriber -> events delivered
+        self.parked = {}                # subscriber -> user batches parked
+        self.delay = 0.0                # age of the newest event of the last round, seconds
+        self._tasks = []
+
+    def _lease(self) -> bool:
+        """Take or renew the dispatch lease"""
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        try:
+            event_offsets_collection.update_one(
+                {"_id": LEASE, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=LEASE_TTL)}},
+                upsert=True
+            )
+            self.leader = True
+        except DuplicateKeyError:
+            self.leader = False         # held by another process
+        return self.leader
+
+    def offsets(self, names: list) -> dict:
+        """Committed offset of each subscriber; a new one starts with the slowest"""
+        from bson import ObjectId
+
+        offsets = {d["_id"]: d["offset"] for d in event_offsets_collection.find({"_id": {"$in": names}})}
+        missing = [n for n in names if n not in offsets]
+        if missing:
+            start = min(offsets.values(), default=ObjectId("0" * 24))
+            for name in missing:
+                event_offsets_collection.update_one({"_id": name}, {"$setOnInsert": {"offset": start}}, upsert=True)
+            offsets.update({d["_id"]: d["offset"] for d in event_offsets_collection.find({"_id": {"$in": missing}})})
+        return offsets
+
+    async def dispatch(self) -> int:
+        """One round, in a thread: deliver the settled events past each
+        subscriber's offset; returns the number of events read"""
+        return await asyncio.to_thread(self._dispatch, asyncio.get_running_loop())
+
+    def _dispatch(self, loop) -> int:
+        from bson import ObjectId
+
+        subscribers = list(_subscribers.values())
+        if not subscribers:
+            return 0
+        offsets = self.offsets([s.name for s in subscribers])
+        horizon = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=SETTLE))
+        events = list(outbox_collection.find({"_id": {"$gt": min(offsets.values()), "$lt": horizon}})
+                      .sort("_id", 1).limit(BATCH))
+        if not events:
+            return 0
+        for subscriber in subscribers:
+            offset = offsets[subscriber.name]
+            pending = [e for e in events if e["_id"] > offset]
+            if not pending:
+                continue
+            for user_id, user_events in per_user(pending).items():
+                self._deliver(loop, subscriber, user_id, user_events)
+            if subscriber.flush:
+                try:
+                    call(loop, subscriber.flush)
+                except Exception as e:
+                    print(f"⚠️ Event subscriber {subscriber.name} flush failed:", repr(e))
+                    continue            # offset kept: delivered again next round, handled events skipped
+            self._commit(subscriber.name, offset, pending[-1]["_id"])
+            subscriber.handled.clear()
+            self.delivered[subscriber.name] = self.delivered.get(subscriber.name, 0) + len(pending)
+        self.rounds += 1
+        self.delay = time.time() - events[-1]["ts"]
+        return len(events)
+
+    def _deliver(self, loop, subscriber: Subscriber, user_id: str, events: list):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                subscriber.deliver(loop, user_id, events)
+                return
+            except Exception as e:
+                error = e
+                time.sleep(0.2 * attempt)
+        print(f"⚠️ Events of {user_id} parked for {subscriber.name}:", repr(error))
+        event_failures_collection.insert_one({
+            "subscriber": subscriber.name, "user_id": user_id, "events": [e["_id"] for e in events],
+            "error": repr(error), "failed_at": datetime.now(timezone.utc)
+        })
+        self.parked[subscriber.name] = self.parked.get(subscriber.name, 0) + 1
+
+    def _commit(self, name: str, offset, new_offset):
+        """Move the offset unless replay() moved it meanwhile"""
+        event_offsets_collection.update_one(
+            {"_id": name, "offset": offset}, {"$set": {"offset": new_offset, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+    def replay(self, offset, names: list = None) -> int:
+        """Deliver again every event after `offset` (ObjectId, hex or datetime)
+        to the given subscribers (all by default)"""
+        query = {"_id": {"$in": names}} if names else {"_id": {"$ne": LEASE}}
+        return event_offsets_collection.update_many(
+            query, {"$set": {"offset": as_offset(offset), "updated_at": datetime.now(timezone.utc)}}
+        ).matched_count
+
+    def stats(self) -> dict:
+        """Per subscriber offset, lag (events and seconds behind) and counters"""
+        now = datetime.now(timezone.utc)
+        subscribers = {}
+        for name, offset in self.offsets(list(_subscribers)).items():
+            oldest = outbox_collection.find_one({"_id": {"$gt": offset}}, {"_id": 1}, sort=[("_id", 1)])
+            subscribers[name] = {
+                "offset": str(offset),
+                "lag_events": outbox_collection.count_documents({"_id": {"$gt": offset}}, limit=100000),
+                "lag_seconds": round((now - oldest["_id"].generation_time).total_seconds(), 1) if oldest else 0,
+                "delivered": self.delivered.get(name, 0),
+                "parked": self.parked.get(name, 0)
+            }
+        return {"leader": self.leader, "rounds": self.rounds, "delay_seconds": round(self.delay, 1),
+                "subscribers": subscribers}
+
+    async def _reload(self):
+        """Taking the lease over: subscribers read their state again"""
+        for subscriber in list(_subscribers.values()):
+            subscriber.handled.clear()
+            if subscriber.reload:
+                await asyncio.to_thread(subscriber.reload)
+
+    async def _run(self):
+        while True:
+            try:
+                was_leader = self.leader
+                if await asyncio.to_thread(self._lease):
+                    if not was_leader:
+                        try:
+                            await self._reload()
+                        except Exception:
+                            self.leader = False     # reloaded again before dispatching
+                            raise
+                    while await self.dispatch() >= BATCH:
+                        pass
+            except Exception as e:
+                print("⚠️ Event dispatch failed:", repr(e))
+            await asyncio.sleep(DISPATCH_INTERVAL)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.leader:
+            try:
+                await self.dispatch()
+                event_offsets_collection.update_one({"_id": LEASE, "owner": self.owner},
+                                                    {"$set": {"expires_at": datetime.now(timezone.utc)}})
+            except Exception as e:
+                print("⚠️ Event dispatch failed:", repr(e))
+            self.leader = False
+
+event_dispatcher = Dispatcher()
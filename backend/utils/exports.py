@@ -0,0 +1,158 @@
+"""
+Streaming trade exports - CSV, NDJSON and Parquet writers over a Mongo cursor
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+# Fields written to exports (screenshots are never exported)
+EXPORT_FIELDS = [
+    "id", "symbol", "direction", "entry_price", "exit_price", "stop_loss",
+    "take_profit", "position_size", "pnl", "pnl_percent", "status",
+    "setup_type", "emotions", "followed_plan", "notes", "entry_time", "exit_time",
+    "created_at", "updated_at"
+]
+
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != "id"}
+
+EXPORT_FORMATS = {
+    "csv": {"media_type": "text/csv", "extension": "csv"},
+    "ndjson": {"media_type": "application/x-ndjson", "extension": "ndjson"},
+    "parquet": {"media_type": "application/vnd.apache.parquet", "extension": "parquet"},
+}
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_BATCH_SIZE = 10000
+
+# Flush the text buffer to the client once it holds roughly this many bytes
+FLUSH_BYTES = 64 * 1024
+
+def _row(trade: dict) -> dict:
+    """Flatten a trade document into an export row"""
+    row = {field: trade.get(field) for field in EXPORT_FIELDS}
+    row["id"] = str(trade["_id"])
+    for field in ("entry_time", "exit_time", "created_at", "updated_at"):
+        if isinstance(row[field], datetime):
+            row[field] = row[field].isoformat()
+    return row
+
+def iter_csv(cursor):
+    """Yield CSV bytes in ~FLUSH_BYTES chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for trade in cursor:
+        row = _row(trade)
+        writer.writerow([row[field] for field in EXPORT_FIELDS])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_ndjson(cursor):
+    """Yield newline-delimited JSON bytes in ~FLUSH_BYTES chunks"""
+    lines = []
+    size = 0
+    for trade in cursor:
+        line = json.dumps(_row(trade), ensure_ascii=False)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= FLUSH_BYTES:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+            size = 0
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after each row group"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_parquet(cursor, row_group_size: int = DEFAULT_BATCH_SIZE):
+    """Yield a Parquet file, one row group per `row_group_size` trades"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("symbol", pa.string()),
+        ("direction", pa.string()),
+        ("entry_price", pa.float64()),
+        ("exit_price", pa.float64()),
+        ("stop_loss", pa.float64()),
+        ("take_profit", pa.float64()),
+        ("position_size", pa.float64()),
+        ("pnl", pa.float64()),
+        ("pnl_percent", pa.float64()),
+        ("status", pa.string()),
+        ("setup_type", pa.string()),
+        ("emotions", pa.string()),
+        ("followed_plan", pa.bool_()),
+        ("notes", pa.string()),
+        ("entry_time", pa.string()),
+        ("exit_time", pa.string()),
+        ("created_at", pa.string()),
+        ("updated_at", pa.string()),
+    ])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    columns = {field: [] for field in EXPORT_FIELDS}
+    count = 0
+
+    def flush():
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    try:
+        for trade in cursor:
+            row = _row(trade)
+            for field in EXPORT_FIELDS:
+                columns[field].append(row[field])
+            count += 1
+            if count % row_group_size == 0:
+                flush()
+                yield sink.drain()
+        if count % row_group_size or count == 0:
+            flush()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def gzip_stream(chunks, level: int = 6):
+    """Compress a byte stream on the fly into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(cursor, fmt: str, compress: bool = False, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Build the byte generator for an export format"""
+    if fmt == "csv":
+        chunks = iter_csv(cursor)
+    elif fmt == "ndjson":
+        chunks = iter_ndjson(cursor)
+    else:
+        chunks = iter_parquet(cursor, row_group_size=batch_size)
+    return gzip_stream(chunks) if compress else chunks
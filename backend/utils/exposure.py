@@ -0,0 +1,344 @@
+"""
+Mark-to-market - unrealized P&L of open journal trades on live prices.
+
+Open trades are indexed in memory by symbol as numpy columns, loaded once
+and then kept in step by the trades routes (with a periodic resync for
+imports and other workers). A tick re-marks every open trade of its symbol
+in one vectorized pass and sums them per user with a bincount: no
+database access per tick. A user's totals are the sum of their per-symbol
+sums, computed when read.
+
+Stream clients subscribed to their P&L get conflated deltas (the trades
+of the symbols that moved) at the gateway publish rate; aggregate
+exposure per user is snapshotted into exposure_snapshots every minute, by
+one worker (scheduler job, SNAPSHOT_CRON).
+"""
+import asyncio
+import json
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.bar_store import normalize_symbol
+from utils.database import exposure_snapshots_collection, trades_collection
+
+PUBLISH_RATE = 4            # pushes per second at most, as the quote stream
+PUSH_BATCH = 200            # users encoded per loop iteration
+SNAPSHOT_CRON = "* * * * *"
+RESYNC_INTERVAL = 300       # seconds between reloads of the open trades
+OPEN_TRADE_PROJECTION = {"user_id": 1, "symbol": 1, "direction": 1, "entry_price": 1, "position_size": 1}
+
+class _SymbolBook:
+    """Open trades of one symbol; columns rebuilt lazily after changes"""
+    __slots__ = ("rows", "price", "seq", "stale", "trade_ids", "users", "slots", "user_index", "entry", "qty",
+                 "order", "starts", "abs_qty", "net_qty", "counts", "global_index", "pnl", "user_pnl")
+
+    def __init__(self):
+        self.rows = {}              # trade_id -> (user_id, entry_price, signed size)
+        self.price = None
+        self.seq = 0                # bumped on every mark
+        self.stale = True
+
+    def _build(self):
+        self.trade_ids = list(self.rows)
+        self.slots = {}
+        index = [self.slots.setdefault(self.rows[t][0], len(self.slots)) for t in self.trade_ids]
+        self.users = list(self.slots)
+        self.user_index = np.array(index, dtype=np.int64)
+        self.entry = np.array([self.rows[t][1] for t in self.trade_ids], dtype=np.float64)
+        self.qty = np.array([self.rows[t][2] for t in self.trade_ids], dtype=np.float64)
+        # Rows of user i: order[starts[i]:starts[i + 1]]
+        self.order = np.argsort(self.user_index, kind="stable")
+        self.starts = np.searchsorted(self.user_index[self.order], np.arange(len(self.users) + 1))
+        n = len(self.users)
+        self.abs_qty = np.bincount(self.user_index, np.abs(self.qty), minlength=n)
+        self.net_qty = np.bincount(self.user_index, self.qty, minlength=n)
+        self.counts = np.bincount(self.user_index, minlength=n)
+        self.global_index = None        # into MarkToMarket.user_names, set by snapshot()
+        self.stale = False
+
+    def mark(self, price: float = None):
+        if price is not None:
+            self.price = price
+            self.seq += 1
+        if self.stale:
+            self._build()
+        if self.price is not None:
+            self.pnl = (self.price - self.entry) * self.qty
+            self.user_pnl = np.bincount(self.user_index, self.pnl, minlength=len(self.users))
+
+    def user_rows(self, user_id: str):
+        if self.stale:
+            self.mark()
+        i = self.slots.get(user_id)
+        return () if i is None else self.order[self.starts[i]:self.starts[i + 1]]
+
+class MarkToMarket:
+    """In-memory open positions by symbol, re-marked on each tick"""
+
+    def __init__(self):
+        self.books = defaultdict(_SymbolBook)
+        self.trades = {}                            # trade_id -> (symbol, user_id)
+        self.user_symbols = defaultdict(Counter)    # user -> open trades per symbol
+        self.changed_users = set()                  # trade set changed since the last push
+        self.user_slots = {}                        # user -> row in the snapshot arrays
+        self.user_names = []
+
+    @staticmethod
+    def _row(trade: dict):
+        """(symbol, user_id, entry_price, signed size) of an open trade, None if it cannot be marked"""
+        if trade.get("status", "open") != "open" or trade.get("exit_price") is not None:
+            return None
+        try:
+            symbol = normalize_symbol(trade["symbol"])
+            entry, size = float(trade["entry_price"]), float(trade["position_size"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        sign = -1 if str(trade.get("direction", "LONG")).upper() == "SHORT" else 1
+        return symbol, trade["user_id"], entry, size * sign
+
+    def track(self, trade: dict) -> bool:
+        """Add or update an open trade; returns False if it cannot be marked"""
+        trade_id = str(trade["_id"])
+        self.untrack(trade_id)
+        row = self._row(trade)
+        if row is None:
+            return False
+        symbol, user_id, entry, qty = row
+        book = self.books[symbol]
+        book.rows[trade_id] = (user_id, entry, qty)
+        book.stale = True
+        self.trades[trade_id] = (symbol, user_id)
+        self.user_symbols[user_id][symbol] += 1
+        self.changed_users.add(user_id)
+        return True
+
+    def untrack(self, trade_id: str):
+        entry = self.trades.pop(trade_id, None)
+        if entry is None:
+            return
+        symbol, user_id = entry
+        book = self.books[symbol]
+        del book.rows[trade_id]
+        book.stale = True
+        symbols = self.user_symbols[user_id]
+        symbols[symbol] -= 1
+        if not symbols[symbol]:
+            del symbols[symbol]
+        if not symbols:
+            del self.user_symbols[user_id]
+        self.changed_users.add(user_id)
+
+    def load(self, trades):
+        """Replace the index with these open trades (startup and resync);
+        trades that did not change are left alone"""
+        fresh = {str(trade["_id"]): trade for trade in trades}
+        for trade_id in self.trades.keys() - fresh.keys():
+            self.untrack(trade_id)
+        for trade_id, trade in fresh.items():
+            known = self.trades.get(trade_id)
+            row = self._row(trade)
+            if known is not None and row is not None and known[0] == row[0] \
+                    and self.books[row[0]].rows[trade_id] == row[1:]:
+                continue
+            self.track(trade)
+
+    def on_tick(self, symbol: str, price: float, ts: float = None):
+        book = self.books.get(symbol)
+        if book is not None and book.rows:
+            book.mark(price)
+
+    def positions(self, user_id: str, symbols=None) -> list:
+        out = []
+        for symbol in symbols if symbols is not None else self.user_symbols.get(user_id, ()):
+            book = self.books[symbol]
+            rows = book.user_rows(user_id)
+            if not len(rows):
+                continue
+            pnls = book.pnl[rows].tolist() if book.price is not None else [None] * len(rows)
+            ids = book.trade_ids
+            out.extend({"id": ids[row], "symbol": symbol, "mark": book.price, "unrealized_pnl": pnl}
+                       for row, pnl in zip(rows.tolist(), pnls))
+        return out
+
+    def totals(self, user_id: str) -> dict:
+        unrealized = gross = net = 0.0
+        open_trades = unmarked = 0
+        for symbol, count in self.user_symbols.get(user_id, {}).items():
+            book = self.books[symbol]
+            open_trades += count
+            if book.price is None:
+                unmarked += count
+                continue
+            if book.stale:
+                book.mark()
+            i = book.slots[user_id]
+            unrealized += book.user_pnl[i]
+            gross += book.price * book.abs_qty[i]
+            net += book.price * book.net_qty[i]
+        return {"unrealized_pnl": float(unrealized), "gross_exposure": float(gross), "net_exposure": float(net),
+                "open_trades": open_trades, "unmarked_trades": unmarked}
+
+    def snapshot(self) -> list:
+        """Aggregate exposure of every user with open trades, summed over the
+        symbols with numpy (one document per user, no per-trade loop)"""
+        marked = []
+        for book in self.books.values():
+            if not book.rows:
+                continue
+            if book.stale:
+                book.mark()
+            if book.global_index is None:
+                book.global_index = np.array([self._user_slot(u) for u in book.users], dtype=np.int64)
+            marked.append(book)
+        n = len(self.user_names)
+        counts, pnl, gross, net = np.zeros(n, dtype=np.int64), np.zeros(n), np.zeros(n), np.zeros(n)
+        for book in marked:
+            index = book.global_index          # users are unique within a book
+            counts[index] += book.counts
+            if book.price is not None:
+                pnl[index] += book.user_pnl
+                gross[index] += book.price * book.abs_qty
+                net[index] += book.price * book.net_qty
+        now = datetime.now(timezone.utc)
+        users = np.flatnonzero(counts)
+        names = self.user_names
+        return [
+            {"user_id": names[i], "time": now, "unrealized_pnl": p, "gross_exposure": g, "net_exposure": x, "open_trades": c}
+            for i, p, g, x, c in zip(users.tolist(), pnl[users].tolist(), gross[users].tolist(),
+                                     net[users].tolist(), counts[users].tolist())
+        ]
+
+    def _user_slot(self, user_id: str) -> int:
+        slot = self.user_slots.get(user_id)
+        if slot is None:
+            slot = self.user_slots[user_id] = len(self.user_names)
+            self.user_names.append(user_id)
+        return slot
+
+class ExposureService:
+    """Runs the index on market gateway ticks, pushes P&L to subscribed
+    stream clients and writes the periodic snapshots"""
+
+    def __init__(self, engine: MarkToMarket = None, max_rate: float = PUBLISH_RATE):
+        self.engine = engine or MarkToMarket()
+        self.max_rate = max_rate
+        self.subscribers = defaultdict(set)     # user_id -> stream clients
+        self._sent = {}                         # user_id -> {symbol: seq pushed}
+        self._tasks = []
+        self._loop = None
+
+    async def load(self):
+        """Resync the index with the open trades (read in a thread, applied on the loop)"""
+        trades = await asyncio.to_thread(lambda: list(trades_collection.find({"status": "open"}, OPEN_TRADE_PROJECTION)))
+        self.engine.load(trades)
+
+    def refresh_user(self, user_id: str):
+        """Reload one user's open trades after a bulk import. Imports run in
+        a worker thread: the index itself is only changed on the event loop."""
+        trades = list(trades_collection.find({"user_id": user_id, "status": "open"}, OPEN_TRADE_PROJECTION))
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._replace_user, user_id, trades)
+        else:
+            self._replace_user(user_id, trades)
+
+    def _replace_user(self, user_id: str, trades: list):
+        for trade_id, (_, owner) in list(self.engine.trades.items()):
+            if owner == user_id:
+                self.engine.untrack(trade_id)
+        for trade in trades:
+            self.engine.track(trade)
+
+    def process(self, symbol: str, price: float, ts: float):
+        self.engine.on_tick(symbol, price, ts)
+
+    # --- stream ---
+
+    def subscribe(self, user_id: str, client):
+        self.subscribers[user_id].add(client)
+        client.push(("pnl",), json.dumps(self._message(user_id, full=True)))
+
+    def unsubscribe(self, user_id: str, client):
+        clients = self.subscribers.get(user_id)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del self.subscribers[user_id]
+                self._sent.pop(user_id, None)
+
+    def _message(self, user_id: str, full: bool = False) -> dict:
+        engine = self.engine
+        symbols = engine.user_symbols.get(user_id, {})
+        sent = self._sent.setdefault(user_id, {})
+        if full:
+            moved = list(symbols)
+        else:
+            moved = [s for s in symbols if engine.books[s].seq != sent.get(s)]
+        for symbol in moved:
+            sent[symbol] = engine.books[symbol].seq
+        return {"type": "pnl", "full": full, **engine.totals(user_id), "trades": engine.positions(user_id, moved)}
+
+    def publish(self) -> int:
+        """Push the P&L of every subscribed user whose marks or trades
+        changed; returns the number of users pushed to"""
+        engine = self.engine
+        changed, engine.changed_users = engine.changed_users, set()
+        due = []
+        for user_id in self.subscribers:
+            if user_id in changed:
+                due.append((user_id, True))
+                continue
+            sent = self._sent.get(user_id, {})
+            if any(engine.books[s].seq != sent.get(s) for s in engine.user_symbols.get(user_id, ())):
+                due.append((user_id, False))
+        self._push(due)
+        return len(due)
+
+    def _push(self, due: list, start: int = 0):
+        """Encode and push a batch per loop iteration, as the gateway wakes
+        its clients: thousands of users at once would stall the loop"""
+        for user_id, full in due[start:start + PUSH_BATCH]:
+            clients = self.subscribers.get(user_id)
+            if not clients:
+                continue
+            message = json.dumps(self._message(user_id, full))
+            for client in clients:
+                client.push(("pnl",), message)
+        if start + PUSH_BATCH < len(due):
+            asyncio.get_running_loop().call_soon(self._push, due, start + PUSH_BATCH)
+
+    # --- loops ---
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(1 / self.max_rate)
+            self.publish()
+
+    async def snapshot(self) -> int:
+        """Scheduled job: write the users' aggregate exposure; returns the
+        number of documents"""
+        docs = self.engine.snapshot()
+        if docs:
+            await asyncio.to_thread(exposure_snapshots_collection.insert_many, docs, ordered=False)
+        return len(docs)
+
+    async def _resync_loop(self):
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                print("⚠️ Open trades resync failed:", repr(e))
+            await asyncio.sleep(RESYNC_INTERVAL)
+
+    def start(self):
+        """Ticks come from process() (market gateway listener)"""
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(loop()) for loop in (self._publish_loop, self._resync_loop)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+exposure_service = ExposureService()
@@ -0,0 +1,154 @@
+"""
+Price feeds - pluggable tick sources for the real-time services.
+
+A feed is an async iterable of (symbol, price, ts) ticks (ts = epoch seconds):
+- ReplayFeed: a CSV file of ticks (ts, symbol, price or bid/ask), replayed
+  as fast as possible or at a multiple of real time;
+- SocketFeed: a local TCP server accepting newline-delimited ticks
+  ("EURUSD 1.08512 [ts]"), a stand-in for a broker connection;
+- DatagramFeed: the same lines over UDP, one or more per datagram.
+
+feed_from_url("replay:/data/ticks.csv?speed=10"), ("tcp://127.0.0.1:9100")
+or ("udp://127.0.0.1:9101") builds one from configuration.
+"""
+import asyncio
+import csv
+import time
+from urllib.parse import urlparse, parse_qs
+
+from utils.bar_store import normalize_symbol, to_epoch
+
+YIELD_EVERY = 1000  # ticks between event-loop yields when replaying flat out
+
+def _timestamp(value) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return float(to_epoch(value.strip()))
+
+def parse_tick(line: str):
+    """'SYMBOL PRICE [TS]' (space, comma or semicolon separated) -> tick or None"""
+    parts = line.replace(",", " ").replace(";", " ").split()
+    if len(parts) < 2:
+        return None
+    try:
+        price = float(parts[1])
+        ts = _timestamp(parts[2]) if len(parts) > 2 else time.time()
+        return normalize_symbol(parts[0]), price, ts
+    except ValueError:
+        return None
+
+class ReplayFeed:
+    """Ticks from a CSV file with a header naming ts/time/timestamp, symbol
+    and price (or bid and ask, replayed as the mid). speed=0 replays as fast
+    as possible, otherwise `speed` x the recorded pace."""
+
+    def __init__(self, path: str, speed: float = 0.0):
+        self.path = path
+        self.speed = speed
+
+    async def __aiter__(self):
+        with open(self.path, newline="") as f:
+            reader = csv.reader(f)
+            header = [h.strip().lower() for h in next(reader)]
+            ts_col = next(header.index(h) for h in ("ts", "time", "timestamp", "date") if h in header)
+            symbol_col = header.index("symbol")
+            if "price" in header:
+                price_cols = (header.index("price"),)
+            else:
+                price_cols = (header.index("bid"), header.index("ask"))
+            previous = None
+            for count, row in enumerate(reader, 1):
+                if not row:
+                    continue
+                ts = _timestamp(row[ts_col])
+                price = sum(float(row[c]) for c in price_cols) / len(price_cols)
+                if self.speed and previous is not None and ts > previous:
+                    await asyncio.sleep((ts - previous) / self.speed)
+                elif count % YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+                previous = ts
+                yield normalize_symbol(row[symbol_col]), price, ts
+
+class SocketFeed:
+    """Local TCP server; every connected client may push ticks, one per line.
+    A bounded queue keeps a stalled consumer from growing memory: when it is
+    full the oldest tick is dropped (`dropped` counts them)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100, max_queue: int = 100_000):
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._server = None
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                tick = parse_tick(line.decode(errors="ignore"))
+                if tick is None:
+                    continue
+                if self._queue.full():
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                self._queue.put_nowait(tick)
+        finally:
+            writer.close()
+
+    async def __aiter__(self):
+        self._queue = asyncio.Queue(self.max_queue)
+        self._server = await asyncio.start_server(self._client, self.host, self.port)
+        try:
+            while True:
+                yield await self._queue.get()
+        finally:
+            self._server.close()
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, feed: "DatagramFeed"):
+        self.feed = feed
+
+    def datagram_received(self, data: bytes, addr):
+        for line in data.decode(errors="ignore").splitlines():
+            tick = parse_tick(line)
+            if tick is not None:
+                self.feed._put(tick)
+
+class DatagramFeed:
+    """Local UDP listener, ticks one per line; same drop-oldest queue as
+    SocketFeed (a lost datagram is no worse than a dropped tick)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9101, max_queue: int = 100_000):
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.dropped = 0
+
+    def _put(self, tick):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(tick)
+
+    async def __aiter__(self):
+        self._queue = asyncio.Queue(self.max_queue)
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramProtocol(self), local_addr=(self.host, self.port)
+        )
+        try:
+            while True:
+                yield await self._queue.get()
+        finally:
+            transport.close()
+
+def feed_from_url(url: str):
+    """replay:<path>[?speed=N], tcp://host:port or udp://host:port"""
+    parsed = urlparse(url)
+    if parsed.scheme == "replay":
+        speed = float(parse_qs(parsed.query).get("speed", ["0"])[0])
+        return ReplayFeed(parsed.path or parsed.netloc, speed)
+    if parsed.scheme == "tcp":
+        return SocketFeed(parsed.hostname or "127.0.0.1", parsed.port or 9100)
+    if parsed.scheme == "udp":
+        return DatagramFeed(parsed.hostname or "127.0.0.1", parsed.port or 9101)
+    raise ValueError(f"Flux de prix inconnu: {url}")
@@ -0,0 +1,269 @@
+"""
+Market data gateway - one price feed in, live quotes out to WebSocket clients.
+
+Ticks from a feed (utils.feeds) are normalized (finite positive price, no
+going back in time per symbol) and folded into per-symbol state held in
+parallel typed arrays indexed by a slot number: last price and time, and
+the in-progress bar of the gateway timeframe. Slots are never freed, so
+clients may only reserve MAX_UNQUOTED slots for symbols the feed has not
+quoted yet. Other services (price alerts)
+register as tick listeners rather than reading the feed themselves.
+
+Fan-out is conflated: every 1/max_rate seconds the symbols that changed are
+encoded once and their subscribers woken. Each client's send loop then
+picks the latest message of every symbol published since its previous
+frame, so a client gets at most max_rate updates per second per symbol and
+a slow socket skips intermediate updates instead of queueing them: nothing
+per update is stored per client.
+"""
+import asyncio
+import json
+import math
+from array import array
+from collections import defaultdict
+
+from utils.bar_store import TIMEFRAME_SECONDS, normalize_symbol, normalize_timeframe
+
+PUBLISH_RATE = 4            # updates per second per symbol per client
+MAX_SUBSCRIPTIONS = 50      # symbols per client
+MAX_UNQUOTED = 1000         # slots reserved by subscriptions, not quoted yet
+WAKE_BATCH = 500            # clients woken per event-loop iteration
+
+class QuoteBoard:
+    """Last quote and in-progress bar of every symbol, one slot per symbol"""
+
+    def __init__(self, timeframe: str = "M1"):
+        self.timeframe = normalize_timeframe(timeframe)
+        self.step = TIMEFRAME_SECONDS[self.timeframe]
+        self.slots = {}
+        self.symbols = []
+        self.unquoted = set()
+        self.price, self.ts = array("d"), array("d")
+        self.open, self.high, self.low = array("d"), array("d"), array("d")
+        self.bar_start, self.ticks = array("q"), array("q")
+
+    def slot(self, symbol: str, reserve: bool = False) -> int:
+        """Slot of a symbol, allocated on first use; reserve=True (a
+        subscription, not a tick) counts against MAX_UNQUOTED"""
+        slot = self.slots.get(symbol)
+        if slot is None:
+            if reserve and len(self.unquoted) >= MAX_UNQUOTED:
+                raise ValueError(f"Aucune cotation pour {symbol}")
+            slot = self.slots[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            for column in (self.price, self.open, self.high, self.low):
+                column.append(0.0)
+            self.ts.append(-math.inf)
+            self.bar_start.append(-1)
+            self.ticks.append(0)
+            if reserve:
+                self.unquoted.add(slot)
+        return slot
+
+    def update(self, slot: int, price: float, ts: float) -> bool:
+        """Fold a tick in; False (and no change) for an invalid or late tick"""
+        if not (0 < price < math.inf) or ts < self.ts[slot]:
+            return False
+        start = int(ts // self.step) * self.step
+        if start != self.bar_start[slot]:
+            self.bar_start[slot] = start
+            self.open[slot] = self.high[slot] = self.low[slot] = price
+            self.ticks[slot] = 1
+        else:
+            if price > self.high[slot]:
+                self.high[slot] = price
+            elif price < self.low[slot]:
+                self.low[slot] = price
+            self.ticks[slot] += 1
+        self.price[slot] = price
+        self.ts[slot] = ts
+        self.unquoted.discard(slot)
+        return True
+
+    def has_quote(self, slot: int) -> bool:
+        return self.ticks[slot] > 0
+
+    def quote(self, slot: int) -> dict:
+        return {
+            "type": "quote",
+            "symbol": self.symbols[slot],
+            "price": self.price[slot],
+            "time": self.ts[slot],
+            "bar": {
+                "timeframe": self.timeframe,
+                "time": self.bar_start[slot],
+                "open": self.open[slot],
+                "high": self.high[slot],
+                "low": self.low[slot],
+                "close": self.price[slot],
+                "ticks": self.ticks[slot]
+            }
+        }
+
+class StreamClient:
+    """One connection: its subscriptions, the publish cycle it has sent up
+    to, and one-off messages (snapshots, control replies) not sent yet"""
+    __slots__ = ("send", "slots", "cycle", "pending", "wake", "sent")
+
+    def __init__(self, send, cycle: int = 0):
+        self.send = send            # async callable(str)
+        self.slots = set()
+        self.cycle = cycle
+        self.pending = {}
+        self.wake = asyncio.Event()
+        self.sent = 0
+
+    def push(self, key, message: str):
+        self.pending[key] = message
+        self.wake.set()
+
+class FeedGateway:
+    def __init__(self, timeframe: str = "M1", max_rate: float = PUBLISH_RATE):
+        self.board = QuoteBoard(timeframe)
+        self.max_rate = max_rate
+        self.listeners = []                 # callables(symbol, price, ts), e.g. price alerts
+        self.subscribers = defaultdict(set)
+        self.clients = set()
+        self.ticks = 0
+        self.rejected = 0
+        self.cycle = 0
+        self.messages = {}                  # slot -> last published message
+        self.published = {}                 # slot -> cycle of that message
+        self._dirty = set()
+        self._tasks = []
+
+    # --- ingestion ---
+
+    def on_tick(self, symbol: str, price: float, ts: float):
+        slot = self.board.slot(symbol)
+        if not self.board.update(slot, price, ts):
+            self.rejected += 1
+            return
+        self.ticks += 1
+        self._dirty.add(slot)
+        for listener in self.listeners:
+            listener(symbol, price, ts)
+
+    async def run(self, feed):
+        async for symbol, price, ts in feed:
+            self.on_tick(symbol, price, ts)
+
+    # --- fan-out ---
+
+    def publish(self) -> int:
+        """Encode every changed symbol once and wake its subscribers; returns
+        the number of updates made available"""
+        dirty, self._dirty = self._dirty, set()
+        self.cycle += 1
+        handed = 0
+        woken = set()
+        for slot in dirty:
+            clients = self.subscribers.get(slot)
+            if not clients:
+                continue
+            self.messages[slot] = json.dumps(self.board.quote(slot))
+            self.published[slot] = self.cycle
+            woken |= clients
+            handed += len(clients)
+        self._wake(list(woken))
+        return handed
+
+    def _wake(self, clients: list, start: int = 0):
+        """Wake send loops a batch per loop iteration: waking thousands at
+        once would run all their sends before the loop polls I/O again"""
+        for client in clients[start:start + WAKE_BATCH]:
+            client.wake.set()
+        if start + WAKE_BATCH < len(clients):
+            asyncio.get_running_loop().call_soon(self._wake, clients, start + WAKE_BATCH)
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(1 / self.max_rate)
+            self.publish()
+
+    async def serve(self, client: StreamClient):
+        """Send loop of one client: one frame (a JSON list) per wake-up with
+        the latest message of every symbol published since its last frame.
+        The per-update work happens here, spread over the clients' tasks."""
+        published, messages = self.published, self.messages
+        while True:
+            await client.wake.wait()
+            client.wake.clear()
+            since, client.cycle = client.cycle, self.cycle
+            batch, client.pending = client.pending, {}
+            for slot in client.slots:
+                if published.get(slot, 0) > since:
+                    batch[slot] = messages[slot]
+            if batch:
+                await client.send("[" + ",".join(batch.values()) + "]")
+                client.sent += len(batch)
+
+    def connect(self, send) -> StreamClient:
+        client = StreamClient(send, self.cycle)
+        self.clients.add(client)
+        return client
+
+    def disconnect(self, client: StreamClient):
+        for slot in client.slots:
+            self.subscribers[slot].discard(client)
+            if not self.subscribers[slot]:
+                del self.subscribers[slot]
+        client.slots.clear()
+        self.clients.discard(client)
+
+    def subscribe(self, client: StreamClient, symbols: list) -> list:
+        """Subscribe to (normalized) symbols; the current quote is sent at once"""
+        added = []
+        for symbol in [normalize_symbol(s) for s in symbols]:
+            slot = self.board.slot(symbol, reserve=True)
+            if slot in client.slots:
+                continue
+            if len(client.slots) >= MAX_SUBSCRIPTIONS:
+                raise ValueError(f"Maximum {MAX_SUBSCRIPTIONS} symboles par connexion")
+            client.slots.add(slot)
+            self.subscribers[slot].add(client)
+            added.append(symbol)
+            if self.board.has_quote(slot):
+                client.push(slot, json.dumps(self.board.quote(slot)))
+        return added
+
+    def unsubscribe(self, client: StreamClient, symbols: list) -> list:
+        removed = []
+        for symbol in symbols:
+            slot = self.board.slots.get(normalize_symbol(symbol))
+            if slot is None or slot not in client.slots:
+                continue
+            client.slots.discard(slot)
+            client.pending.pop(slot, None)
+            self.subscribers[slot].discard(client)
+            if not self.subscribers[slot]:
+                del self.subscribers[slot]
+            removed.append(self.board.symbols[slot])
+        return removed
+
+    def quotes(self, symbols: list) -> list:
+        slots = (self.board.slots.get(normalize_symbol(s)) for s in symbols)
+        return [self.board.quote(slot) for slot in slots if slot is not None and self.board.has_quote(slot)]
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self.board.symbols),
+            "unquoted": len(self.board.unquoted),
+            "ticks": self.ticks,
+            "rejected": self.rejected,
+            "clients": len(self.clients),
+            "cycle": self.cycle,
+            "sent": sum(c.sent for c in self.clients)
+        }
+
+    # --- lifecycle ---
+
+    def start(self, feed):
+        self._tasks = [asyncio.create_task(self.run(feed)), asyncio.create_task(self._publish_loop())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+market_gateway = FeedGateway()
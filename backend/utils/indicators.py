@@ -0,0 +1,416 @@
+"""
+Technical indicators - batch NumPy kernels over full arrays, O(1) incremental
+state objects for live feeds, and a result cache shared by charts/backtests.
+
+Batch kernels return float arrays aligned with the input, NaN during warm-up.
+Conventions follow the usual charting defaults: EMA is seeded with the SMA of
+its first `period` values, RSI/ATR use Wilder smoothing (alpha = 1/period),
+Bollinger uses the population standard deviation.
+"""
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from utils.bar_store import bar_store, BarStore, normalize_symbol, normalize_timeframe
+
+# ============== BATCH KERNELS ==============
+
+def _recursive_smooth(x: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * x[t] with y[-1] = seed, vectorized.
+
+    Within a block, y[k] = d^(k+1) * y0 + alpha * d^k * cumsum(x[j] * d^-j)
+    with d = 1 - alpha. Blocks are sized so d^-j stays far from overflow.
+    """
+    decay = 1.0 - alpha
+    out = np.empty(len(x))
+    if decay <= 0:
+        out[:] = x
+        return out
+    block = max(1, min(len(x), int(200 / -np.log(decay))))
+    k = np.arange(block, dtype=np.float64)
+    powers = decay ** k
+    inverse = decay ** -k
+    prev = seed
+    for lo in range(0, len(x), block):
+        chunk = x[lo:lo + block]
+        n = len(chunk)
+        acc = np.cumsum(chunk * inverse[:n])
+        out[lo:lo + n] = powers[:n] * decay * prev + alpha * powers[:n] * acc
+        prev = out[lo + n - 1]
+    return out
+
+def _first_valid(x: np.ndarray) -> int:
+    if len(x) and not np.isnan(x[0]):
+        return 0
+    valid = np.flatnonzero(~np.isnan(x))
+    return int(valid[0]) if len(valid) else len(x)
+
+def sma(values, period: int) -> np.ndarray:
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        csum = np.cumsum(np.concatenate(([0.0], x)))
+        out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+def _smooth(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """SMA-seeded recursive smoothing, skipping leading NaNs"""
+    out = np.full(len(x), np.nan)
+    start = _first_valid(x)
+    if len(x) - start < period:
+        return out
+    seed_end = start + period
+    seed = x[start:seed_end].mean()
+    out[seed_end - 1] = seed
+    out[seed_end:] = _recursive_smooth(x[seed_end:], alpha, seed)
+    return out
+
+def ema(values, period: int) -> np.ndarray:
+    return _smooth(np.asarray(values, dtype=np.float64), period, 2.0 / (period + 1))
+
+def wilder(values, period: int) -> np.ndarray:
+    return _smooth(np.asarray(values, dtype=np.float64), period, 1.0 / period)
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    change = np.diff(close)
+    avg_gain = wilder(np.maximum(change, 0), period)
+    avg_loss = wilder(np.maximum(-change, 0), period)
+    # 100 - 100 / (1 + gain / loss), without the division by a zero loss
+    total = avg_gain + avg_loss
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = np.where(total > 0, 100 * avg_gain / total, 50.0)
+    out[1:][np.isnan(avg_gain)] = np.nan
+    return out
+
+def true_range(high, low, close) -> np.ndarray:
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    ranges = np.stack([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    return np.nanmax(ranges, axis=0) if len(close) else np.empty(0)
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    return wilder(true_range(high, low, close), period)
+
+def rolling_std(values, period: int, block: int = 2048) -> np.ndarray:
+    """Population std over a sliding window.
+
+    Sum-of-squares over the whole series cancels catastrophically on prices,
+    so the running sums restart every `block` bars around a local reference.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    for lo in range(period - 1, len(x), block):
+        segment = x[lo - period + 1:lo + block]
+        y = segment - segment[period - 1]
+        s1 = np.cumsum(np.concatenate(([0.0], y)))
+        s2 = np.cumsum(np.concatenate(([0.0], y * y)))
+        mean = (s1[period:] - s1[:-period]) / period
+        var = (s2[period:] - s2[:-period]) / period - mean * mean
+        out[lo:lo + len(var)] = np.sqrt(np.maximum(var, 0))
+    return out
+
+def bollinger(close, period: int = 20, width: float = 2.0) -> dict:
+    close = np.asarray(close, dtype=np.float64)
+    middle = sma(close, period)
+    std = rolling_std(close, period)
+    return {"middle": middle, "upper": middle + width * std, "lower": middle - width * std}
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> dict:
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+def vwap(high, low, close, volume, ts=None, session: str = "utc") -> np.ndarray:
+    """Volume-weighted average price, reset at each trading day of the session
+    (cumulative over the whole array when `ts` is not given)"""
+    typical = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64)
+               + np.asarray(close, dtype=np.float64)) / 3
+    volume = np.asarray(volume, dtype=np.float64)
+    pv = np.cumsum(typical * volume)
+    vol = np.cumsum(volume)
+    if ts is not None and len(volume):
+        from utils.resample import trading_clock, DAY
+
+        days = trading_clock(np.asarray(ts, dtype=np.int64), session) // DAY
+        starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+        lengths = np.diff(np.append(starts, len(days)))
+        # Subtract the running totals as of the end of the previous day
+        pv_base = np.repeat(np.concatenate(([0.0], pv[starts[1:] - 1])), lengths)
+        vol_base = np.repeat(np.concatenate(([0.0], vol[starts[1:] - 1])), lengths)
+        pv, vol = pv - pv_base, vol - vol_base
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(vol > 0, pv / vol, np.nan)
+
+def swings(high, low, left: int = 2, right: int = 2) -> dict:
+    """Swing highs/lows (fractals): the strict extreme of `left` bars before
+    and `right` bars after. A swing at bar i is only known at bar i + right."""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    swing_high = np.zeros(n, dtype=bool)
+    swing_low = np.zeros(n, dtype=bool)
+    if n >= left + right + 1:
+        # Strictly above/below every neighbour, one shifted comparison each
+        centre = slice(left, n - right)
+        is_high = np.ones(n - left - right, dtype=bool)
+        is_low = np.ones(n - left - right, dtype=bool)
+        for offset in [-k for k in range(1, left + 1)] + list(range(1, right + 1)):
+            other = slice(left + offset, n - right + offset)
+            is_high &= high[centre] > high[other]
+            is_low &= low[centre] < low[other]
+        swing_high[centre] = is_high
+        swing_low[centre] = is_low
+    return {"swing_high": swing_high, "swing_low": swing_low}
+
+# ============== INCREMENTAL STATE ==============
+# update() consumes one bar and returns the current value (None during
+# warm-up). Values match the batch kernels bar for bar.
+
+class SMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, value: float):
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        return self.total / self.period if len(self.window) == self.period else None
+
+class EMA:
+    def __init__(self, period: int, alpha: float = None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.seed_sum = 0.0
+        self.count = 0
+        self.value = None
+
+    def update(self, value: float):
+        if self.value is not None:
+            self.value += self.alpha * (value - self.value)
+            return self.value
+        self.count += 1
+        self.seed_sum += value
+        if self.count == self.period:
+            self.value = self.seed_sum / self.period
+        return self.value
+
+class Wilder(EMA):
+    def __init__(self, period: int):
+        super().__init__(period, alpha=1.0 / period)
+
+class RSI:
+    def __init__(self, period: int = 14):
+        self.gain = Wilder(period)
+        self.loss = Wilder(period)
+        self.prev = None
+
+    def update(self, close: float):
+        if self.prev is None:
+            self.prev = close
+            return None
+        change = close - self.prev
+        self.prev = close
+        gain = self.gain.update(max(change, 0.0))
+        loss = self.loss.update(max(-change, 0.0))
+        if gain is None:
+            return None
+        if loss == 0:
+            return 50.0 if gain == 0 else 100.0
+        return 100 - 100 / (1 + gain / loss)
+
+class ATR:
+    def __init__(self, period: int = 14):
+        self.smooth = Wilder(period)
+        self.prev_close = None
+
+    def update(self, high: float, low: float, close: float):
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.smooth.update(tr)
+
+class Bollinger:
+    """Running sums are kept relative to the first value to limit cancellation"""
+
+    def __init__(self, period: int = 20, width: float = 2.0):
+        self.period = period
+        self.width = width
+        self.window = deque()
+        self.ref = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, close: float):
+        if self.ref is None:
+            self.ref = close
+        x = close - self.ref
+        self.window.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        if len(self.window) < self.period:
+            return None
+        mean = self.total / self.period
+        std = max(self.total_sq / self.period - mean * mean, 0.0) ** 0.5
+        middle = mean + self.ref
+        return {"middle": middle, "upper": middle + self.width * std, "lower": middle - self.width * std}
+
+class MACD:
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float):
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if fast is None or slow is None:
+            return None
+        line = fast - slow
+        signal = self.signal.update(line)
+        return {
+            "macd": line,
+            "signal": signal,
+            "histogram": line - signal if signal is not None else None
+        }
+
+class VWAP:
+    def __init__(self, session: str = "utc"):
+        self.session = session
+        self.day = None
+        self.pv = 0.0
+        self.volume = 0.0
+
+    def update(self, high: float, low: float, close: float, volume: float, ts: int = None):
+        if ts is not None:
+            from utils.resample import trading_clock, DAY
+
+            day = int(trading_clock(np.array([ts], dtype=np.int64), self.session)[0] // DAY)
+            if day != self.day:
+                self.day, self.pv, self.volume = day, 0.0, 0.0
+        self.pv += (high + low + close) / 3 * volume
+        self.volume += volume
+        return self.pv / self.volume if self.volume > 0 else None
+
+class Swings:
+    """Emits ("high"|"low", index, price) once a swing is confirmed `right` bars later"""
+
+    def __init__(self, left: int = 2, right: int = 2):
+        self.left = left
+        self.right = right
+        self.highs = deque(maxlen=left + right + 1)
+        self.lows = deque(maxlen=left + right + 1)
+        self.index = -1
+
+    def update(self, high: float, low: float):
+        self.index += 1
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return []
+        found = []
+        centre = self.left
+        h, l = self.highs[centre], self.lows[centre]
+        if all(v < h for i, v in enumerate(self.highs) if i != centre):
+            found.append(("high", self.index - self.right, h))
+        if all(v > l for i, v in enumerate(self.lows) if i != centre):
+            found.append(("low", self.index - self.right, l))
+        return found
+
+# ============== REGISTRY & CACHE ==============
+
+def _ohlc(fn):
+    return lambda bars, *params: fn(bars["high"], bars["low"], bars["close"], *params)
+
+# name -> (kernel over a bars dict, default params)
+INDICATORS = {
+    "sma": (lambda bars, period: sma(bars["close"], period), (20,)),
+    "ema": (lambda bars, period: ema(bars["close"], period), (20,)),
+    "rsi": (lambda bars, period: rsi(bars["close"], period), (14,)),
+    "atr": (_ohlc(atr), (14,)),
+    "bollinger": (lambda bars, period, width: bollinger(bars["close"], period, width), (20, 2.0)),
+    "macd": (lambda bars, fast, slow, signal: macd(bars["close"], fast, slow, signal), (12, 26, 9)),
+    "vwap": (lambda bars: vwap(bars["high"], bars["low"], bars["close"], bars["volume"], bars["ts"]), ()),
+    "swings": (lambda bars, left, right: swings(bars["high"], bars["low"], left, right), (2, 2)),
+}
+
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def parse_params(name: str, params=None) -> tuple:
+    """Validate an indicator name and fill in default params"""
+    if name not in INDICATORS:
+        raise ValueError(f"Indicateur inconnu: {name} ({', '.join(INDICATORS)})")
+    defaults = INDICATORS[name][1]
+    params = tuple(params or ())
+    if len(params) > len(defaults):
+        raise ValueError(f"{name} accepte au plus {len(defaults)} paramètre(s)")
+    merged = params + defaults[len(params):]
+    try:
+        merged = tuple(type(default)(value) for value, default in zip(merged, defaults))
+    except (TypeError, ValueError):
+        raise ValueError(f"Paramètres invalides pour {name}: {params}")
+    if any(value <= 0 for value in merged):
+        raise ValueError(f"Paramètres invalides pour {name}: {params}")
+    return merged
+
+class IndicatorCache:
+    """LRU of full-series indicator outputs keyed by
+    (symbol, timeframe, name, params, data version), bounded in bytes.
+
+    Indicators are computed over the whole stored series (so warm-up does not
+    depend on the requested window) and sliced per request.
+    """
+
+    def __init__(self, store: BarStore = bar_store, max_bytes: int = CACHE_MAX_BYTES):
+        self.store = store
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symbol: str, timeframe: str, name: str, params=None):
+        """(ts, outputs) where outputs maps output name -> array"""
+        from utils.resample import read_bars
+
+        symbol = normalize_symbol(symbol)
+        timeframe = normalize_timeframe(timeframe)
+        params = parse_params(name, params)
+        key = (symbol, timeframe, name, params, self.store.version(symbol))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        bars = read_bars(symbol, timeframe, store=self.store)
+        result = INDICATORS[name][0](bars, *params)
+        outputs = result if isinstance(result, dict) else {name: result}
+        entry = (np.asarray(bars["ts"]), outputs)
+        size = sum(arr.nbytes for arr in outputs.values())
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old) = self._entries.popitem(last=False)
+                self._bytes -= sum(arr.nbytes for arr in old.values())
+        return entry
+
+indicator_cache = IndicatorCache()
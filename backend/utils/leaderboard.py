@@ -0,0 +1,108 @@
+"""
+Leaderboards - closed-trade P&L rankings per period, kept in the
+leaderboard collection instead of being aggregated on every request.
+
+Trade events mark the rankings stale; they are recomputed at most every
+REFRESH_INTERVAL seconds by the process dispatching events, and a period
+that rolled over (new day, week, month) is recomputed on first read.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from utils.database import leaderboard_collection, trades_collection
+
+PERIODS = ("daily", "weekly", "monthly", "all_time")
+LEADERBOARD_EVENTS = ("trade_closed", "trade_updated", "trade_deleted")
+LEADERBOARD_SIZE = 50
+REFRESH_INTERVAL = 10
+
+def period_key(period: str) -> str:
+    return period if period in PERIODS else "all_time"
+
+def period_start(period: str, now: datetime) -> datetime:
+    midnight = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "daily":
+        return midnight
+    if period == "weekly":
+        return midnight - timedelta(days=midnight.weekday())
+    if period == "monthly":
+        return midnight.replace(day=1)
+    return datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+class LeaderboardService:
+    def __init__(self):
+        self.stale = False
+        self.refreshes = 0
+        self._tasks = []
+
+    def handle(self, event: dict):
+        if event["type"] in LEADERBOARD_EVENTS:
+            self.stale = True
+
+    def compute(self, period: str, now: datetime = None) -> dict:
+        from utils.seasons import standings_pipeline
+
+        start = period_start(period, now or datetime.now(timezone.utc))
+        rows = trades_collection.aggregate(standings_pipeline(start, limit=LEADERBOARD_SIZE))
+        doc = {
+            "_id": period,
+            "start_date": start,
+            "entries": [{
+                "rank": rank,
+                "user_id": row["_id"],
+                "name": row["name"],
+                "level": row["level"],
+                "total_pnl": round(row["total_pnl"], 2),
+                "trades_count": row["trades_count"],
+                "winrate": round(row["wins"] / row["trades_count"] * 100, 1) if row["trades_count"] else 0
+            } for rank, row in enumerate(rows, 1)],
+            "updated_at": datetime.now(timezone.utc)
+        }
+        leaderboard_collection.replace_one({"_id": period}, doc, upsert=True)
+        return doc
+
+    def refresh(self):
+        self.stale = False
+        try:
+            for period in PERIODS:
+                self.compute(period)
+        except Exception:
+            self.stale = True
+            raise
+        self.refreshes += 1
+
+    def get(self, period: str) -> list:
+        now = datetime.now(timezone.utc)
+        doc = leaderboard_collection.find_one({"_id": period})
+        start = doc and doc["start_date"]
+        if start and start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if start != period_start(period, now):
+            doc = self.compute(period, now)
+        return doc["entries"]
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL)
+            if not self.stale:
+                continue
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print("⚠️ Leaderboard refresh failed:", repr(e))
+
+    def start(self):
+        from utils.events import subscribe
+
+        subscribe(self.handle, name="leaderboard")
+        self._tasks = [asyncio.create_task(self._refresh_loop())]
+
+    async def stop(self):
+        from utils.events import unsubscribe
+
+        unsubscribe(self.handle)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+leaderboard_service = LeaderboardService()
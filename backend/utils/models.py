@@ -1,6 +1,7 @@
 """
 Pydantic models for the API
 """
+from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
 
@@ -22,6 +23,9 @@ class QuestionnaireData(BaseModel):
     risk_tolerance: str
     available_hours: str
 
+class TimezoneUpdate(BaseModel):
+    timezone: str
+
 # Trade models
 class TradeCreate(BaseModel):
     symbol: str
@@ -36,9 +40,12 @@ class TradeCreate(BaseModel):
     setup_type: Optional[str] = None
     emotions: Optional[str] = None
     followed_plan: Optional[bool] = None
+    entry_time: Optional[datetime] = None
+    exit_time: Optional[datetime] = None
 
 class TradeUpdate(BaseModel):
     exit_price: Optional[float] = None
+    exit_time: Optional[datetime] = None
     notes: Optional[str] = None
     emotions: Optional[str] = None
     followed_plan: Optional[bool] = None
@@ -49,11 +56,35 @@ class AIMessage(BaseModel):
     context: Optional[str] = None
 
 class SetupAnalysis(BaseModel):
-    screenshot_base64: str
+    screenshot_base64: Optional[str] = None  # optional when the symbol has market data
     symbol: Optional[str] = None
     timeframe: Optional[str] = None
     notes: Optional[str] = None
 
+class WatchlistCreate(BaseModel):
+    name: str
+    symbols: List[str]
+    timeframes: List[str] = ["H1"]
+
+class AlertCreate(BaseModel):
+    symbol: str
+    type: str                           # above / below / cross / percent
+    price: Optional[float] = None       # level for above / below / cross
+    percent: Optional[float] = None     # move size for percent
+    repeat: bool = False
+    cooldown_minutes: int = Field(60, ge=1)
+    note: Optional[str] = None
+
+class PaperOrderCreate(BaseModel):
+    symbol: str
+    side: str                           # buy / sell
+    type: str = "market"                # market / limit / stop
+    quantity: float = Field(..., gt=0)
+    price: Optional[float] = None       # level for limit / stop
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    notes: Optional[str] = None
+
 # Community models
 class CommunityPostCreate(BaseModel):
     title: str
@@ -108,6 +139,26 @@ class BacktestTrade(BaseModel):
     pnl_percent: float
     notes: Optional[str] = None
 
+class RulesValidate(BaseModel):
+    rules: List[str]
+
+class PortfolioBacktestCreate(BaseModel):
+    name: str
+    strategy_description: str = ""
+    symbols: List[str]
+    timeframe: str
+    start_date: str
+    end_date: str
+    initial_capital: float = 10000.0
+    risk_per_trade: float = 1.0
+    entry_rules: List[str]
+    exit_rules: List[str]
+    stop_loss_value: float = 1.0        # % from entry, 0 = none
+    take_profit_value: float = 2.0      # % from entry, 0 = none
+    max_positions: int = 5
+    max_position_percent: float = 20.0
+    direction: str = "long"             # long / short
+
 class BacktestResults(BaseModel):
     backtest_id: str
     trades: List[BacktestTrade]
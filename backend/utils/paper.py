@@ -0,0 +1,593 @@
+"""
+Paper trading - simulated order execution on live quotes.
+
+Resting orders sit in a per-symbol book of four price-sorted lists, by the
+direction that triggers them and the quote side they execute on:
+- up / ask: buy stops (the ask rises to them);
+- up / bid: sell limits (the bid rises to them);
+- down / ask: buy limits;
+- down / bid: sell stops.
+A quote fires a prefix of each "up" list and a suffix of each "down" list,
+found by bisection: O(log n + k) per tick however many orders rest.
+Cancelled orders leave stale entries that are skipped by a generation
+check and compacted when they pile up, as in utils.alerts.
+
+Execution model: bid/ask around the feed's mid price (spread_bps). Limit
+orders fill at the quote, never worse than their price; market and
+triggered stop orders pay slippage (slippage_bps, plus impact_bps per unit
+of quantity). An entry with stop_loss / take_profit opens a position with
+an OCO bracket: whichever exit fills first cancels the other. Positions
+are journal trades (source "paper", _id the entry order's id, so a fill
+written twice is the same trade), written in batches.
+
+One process matches, the holder of the "paper" lease (leases collection):
+routers record new orders as "pending" and cancel / close requests on the
+order / trade documents; the lease holder applies them on its next poll
+(every FLUSH_INTERVAL) and the request waits for the outcome. A process
+taking the lease over reads the working orders and open positions again.
+"""
+import asyncio
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from utils.database import leases_collection, paper_orders_collection, trades_collection
+from utils.events import emit
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_TYPES = ("market", "limit", "stop")
+FLUSH_INTERVAL = 0.5        # seconds between polls of the requests and journal writes
+LEASE = "paper"
+LEASE_TTL = 15              # seconds
+WAIT_TIMEOUT = 3.0          # seconds a request waits for the lease holder
+COMPACT_MIN_STALE = 1024
+MAX_WORKING_ORDERS = 100    # per user
+EXIT_REASONS = {"stop": "stop_loss", "limit": "take_profit", "market": "close"}
+
+@dataclass
+class ExecutionModel:
+    spread_bps: float = 1.0         # full bid/ask spread around the mid
+    slippage_bps: float = 0.5       # market and triggered stop orders
+    impact_bps: float = 0.0         # extra slippage per unit of quantity
+
+    def quote(self, mid: float):
+        half = mid * self.spread_bps / 20000
+        return mid - half, mid + half
+
+    def slip(self, price: float, side: str, quantity: float) -> float:
+        slip = price * (self.slippage_bps + self.impact_bps * quantity) / 10000
+        return price + slip if side == "buy" else price - slip
+
+class PaperOrder:
+    __slots__ = ("id", "user_id", "symbol", "side", "type", "quantity", "price", "stop_loss", "take_profit",
+                 "trade_id", "oco", "status", "fill_price", "filled_ts", "created_ts", "notes", "error", "generation")
+
+    def __init__(self, user_id, symbol, side, type, quantity, price=None, stop_loss=None, take_profit=None,
+                 trade_id=None, notes=None, id=None, created_ts=None):
+        self.id = id or str(uuid.uuid4())
+        self.user_id = user_id
+        self.symbol = symbol
+        self.side = side
+        self.type = type
+        self.quantity = quantity
+        self.price = price
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trade_id = trade_id        # set on bracket exits
+        self.oco = None
+        self.status = "working"
+        self.fill_price = None
+        self.filled_ts = None
+        self.created_ts = created_ts
+        self.notes = notes
+        self.error = None               # why the order was rejected
+        self.generation = 0
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "PaperOrder":
+        order = cls(
+            doc["user_id"], doc["symbol"], doc["side"], doc["type"], doc["quantity"], doc.get("price"),
+            doc.get("stop_loss"), doc.get("take_profit"), doc.get("trade_id"), doc.get("notes"),
+            str(doc["_id"]), doc.get("created_ts")
+        )
+        order.oco = doc.get("oco")
+        return order
+
+    def to_doc(self) -> dict:
+        return {
+            "user_id": self.user_id, "symbol": self.symbol, "side": self.side, "type": self.type,
+            "quantity": self.quantity, "price": self.price, "stop_loss": self.stop_loss,
+            "take_profit": self.take_profit, "trade_id": self.trade_id, "oco": self.oco,
+            "status": self.status, "fill_price": self.fill_price, "filled_ts": self.filled_ts,
+            "created_ts": self.created_ts, "notes": self.notes, "error": self.error
+        }
+
+class Position:
+    __slots__ = ("trade_id", "user_id", "symbol", "direction", "quantity", "entry_price", "entry_ts",
+                 "stop_loss", "take_profit", "order_id", "notes", "exit_price", "exit_ts", "exit_reason")
+
+    def __init__(self, trade_id, user_id, symbol, direction, quantity, entry_price, entry_ts,
+                 stop_loss=None, take_profit=None, order_id=None, notes=None):
+        self.trade_id = trade_id
+        self.user_id = user_id
+        self.symbol = symbol
+        self.direction = direction
+        self.quantity = quantity
+        self.entry_price = entry_price
+        self.entry_ts = entry_ts
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.order_id = order_id
+        self.notes = notes
+        self.exit_price = None
+        self.exit_ts = None
+        self.exit_reason = None
+
+    @classmethod
+    def from_trade(cls, doc: dict) -> "Position":
+        entry = doc["entry_time"]
+        if entry.tzinfo is None:
+            entry = entry.replace(tzinfo=timezone.utc)
+        return cls(
+            str(doc["_id"]), doc["user_id"], doc["symbol"], doc["direction"], doc["position_size"],
+            doc["entry_price"], entry.timestamp(), doc.get("stop_loss"), doc.get("take_profit"),
+            doc.get("order_id"), doc.get("notes")
+        )
+
+    def pnl(self) -> float:
+        sign = 1 if self.direction == "LONG" else -1
+        return (self.exit_price - self.entry_price) * self.quantity * sign
+
+    def to_trade(self) -> dict:
+        """Journal trade fields (as created by POST /api/trades)"""
+        closed = self.exit_price is not None
+        pnl = self.pnl() if closed else None
+        return {
+            "user_id": self.user_id, "symbol": self.symbol, "direction": self.direction,
+            "entry_price": self.entry_price, "exit_price": self.exit_price,
+            "stop_loss": self.stop_loss, "take_profit": self.take_profit, "position_size": self.quantity,
+            "pnl": pnl, "pnl_percent": round(pnl / (self.entry_price * self.quantity) * 100, 2) if closed else None,
+            "status": "closed" if closed else "open", "notes": self.notes,
+            "entry_time": datetime.fromtimestamp(self.entry_ts, timezone.utc),
+            "exit_time": datetime.fromtimestamp(self.exit_ts, timezone.utc) if closed else None,
+            "source": "paper", "order_id": self.order_id, "exit_reason": self.exit_reason
+        }
+
+class _Levels:
+    __slots__ = ("levels", "entries")
+
+    def __init__(self):
+        self.levels, self.entries = [], []
+
+    def insert(self, level: float, entry):
+        i = bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.entries.insert(i, entry)
+
+class _Book:
+    """Resting orders of one symbol"""
+    __slots__ = ("up_ask", "up_bid", "down_ask", "down_bid", "stale")
+
+    def __init__(self):
+        self.up_ask, self.up_bid, self.down_ask, self.down_bid = _Levels(), _Levels(), _Levels(), _Levels()
+        self.stale = 0
+
+    def sides(self):
+        return (self.up_ask, self.up_bid, self.down_ask, self.down_bid)
+
+    def size(self) -> int:
+        return sum(len(side.levels) for side in self.sides())
+
+    def side_for(self, order: PaperOrder) -> _Levels:
+        if order.side == "buy":
+            return self.up_ask if order.type == "stop" else self.down_ask
+        return self.down_bid if order.type == "stop" else self.up_bid
+
+class PaperEngine:
+    """Order book and positions of every user; on_tick() returns the fills"""
+
+    def __init__(self, model: ExecutionModel = None):
+        self.model = model or ExecutionModel()
+        self.orders = {}                # working orders by id
+        self.positions = {}             # open positions by trade id
+        self.books = defaultdict(_Book)
+        self.quotes = {}                # symbol -> (bid, ask, ts)
+        self.dirty_orders = {}          # changed since the last flush
+        self.dirty_positions = {}
+
+    # --- book ---
+
+    def _rest(self, order: PaperOrder):
+        self.orders[order.id] = order
+        self.dirty_orders[order.id] = order
+        book = self.books[order.symbol]
+        book.side_for(order).insert(order.price, (order, order.generation))
+
+    def _retire(self, order: PaperOrder, status: str):
+        self.orders.pop(order.id, None)
+        order.status = status
+        order.generation += 1
+        self.dirty_orders[order.id] = order
+        if order.type == "market":
+            return
+        book = self.books[order.symbol]
+        book.stale += 1
+        if book.stale > COMPACT_MIN_STALE and book.stale * 2 > book.size():
+            for side in book.sides():
+                live = [i for i, (o, gen) in enumerate(side.entries) if o.status == "working" and o.generation == gen]
+                side.levels = [side.levels[i] for i in live]
+                side.entries = [side.entries[i] for i in live]
+            book.stale = 0
+
+    # --- orders ---
+
+    def _check_bracket(self, side: str, reference: float, stop_loss, take_profit):
+        long = side == "buy"
+        if stop_loss is not None and (stop_loss >= reference if long else stop_loss <= reference):
+            raise ValueError("Stop loss du mauvais côté du prix")
+        if take_profit is not None and (take_profit <= reference if long else take_profit >= reference):
+            raise ValueError("Take profit du mauvais côté du prix")
+
+    def place(self, order: PaperOrder, ts: float = None) -> list:
+        """Market orders fill at once; others rest (and fill at once if the
+        current quote already reaches them)"""
+        if order.side not in ORDER_SIDES:
+            raise ValueError(f"Sens invalide ({', '.join(ORDER_SIDES)})")
+        if order.type not in ORDER_TYPES:
+            raise ValueError(f"Type d'ordre invalide ({', '.join(ORDER_TYPES)})")
+        if not order.quantity or order.quantity <= 0:
+            raise ValueError("Quantité invalide")
+        quote = self.quotes.get(order.symbol)
+        if order.type == "market":
+            if quote is None:
+                raise ValueError(f"Aucun prix disponible pour {order.symbol}")
+            reference = quote[1] if order.side == "buy" else quote[0]
+        else:
+            if not order.price or order.price <= 0:
+                raise ValueError("Prix requis pour un ordre limit ou stop")
+            reference = order.price
+        self._check_bracket(order.side, reference, order.stop_loss, order.take_profit)
+        order.created_ts = order.created_ts or ts or (quote[2] if quote else None)
+
+        if order.type == "market":
+            self.dirty_orders[order.id] = order
+            bid, ask, quote_ts = quote
+            return [self._fill(order, self._price(order, bid, ask), ts or quote_ts)]
+        if quote is not None:
+            bid, ask, quote_ts = quote
+            # Only the new order can have become marketable: check it alone
+            quote_price = ask if order.side == "buy" else bid
+            up = (order.type == "stop") == (order.side == "buy")
+            if quote_price >= order.price if up else quote_price <= order.price:
+                self.dirty_orders[order.id] = order
+                return [self._fill(order, self._price(order, bid, ask), ts or quote_ts)]
+        self._rest(order)
+        return []
+
+    def cancel(self, order_id: str) -> bool:
+        order = self.orders.get(order_id)
+        if order is None:
+            return False
+        self._retire(order, "cancelled")
+        return True
+
+    def close_position(self, trade_id: str, ts: float = None) -> dict:
+        """Exit a position at market (its bracket is cancelled)"""
+        position = self.positions.get(trade_id)
+        if position is None:
+            raise KeyError(trade_id)
+        quote = self.quotes.get(position.symbol)
+        if quote is None:
+            raise ValueError(f"Aucun prix disponible pour {position.symbol}")
+        exit_ = PaperOrder(position.user_id, position.symbol, "sell" if position.direction == "LONG" else "buy",
+                           "market", position.quantity, trade_id=trade_id, created_ts=ts or quote[2])
+        for order in [o for o in self.orders.values() if o.trade_id == trade_id]:
+            self._retire(order, "cancelled")
+        self.dirty_orders[exit_.id] = exit_
+        bid, ask, quote_ts = quote
+        return self._fill(exit_, self._price(exit_, bid, ask), ts or quote_ts)
+
+    # --- matching ---
+
+    def on_tick(self, symbol: str, price: float, ts: float) -> list:
+        bid, ask = self.model.quote(price)
+        return self.on_quote(symbol, bid, ask, ts)
+
+    def on_quote(self, symbol: str, bid: float, ask: float, ts: float) -> list:
+        """Fills triggered by a quote"""
+        self.quotes[symbol] = (bid, ask, ts)
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        fired = []
+        for side, price in ((book.up_ask, ask), (book.up_bid, bid)):
+            k = bisect_right(side.levels, price)
+            if k:
+                fired.extend(side.entries[:k])
+                del side.levels[:k], side.entries[:k]
+        for side, price in ((book.down_ask, ask), (book.down_bid, bid)):
+            k = bisect_left(side.levels, price)
+            if k < len(side.levels):
+                fired.extend(side.entries[k:])
+                del side.levels[k:], side.entries[k:]
+        if not fired:
+            return []
+
+        fills = []
+        for order, generation in fired:
+            if order.status != "working" or order.generation != generation:
+                book.stale -= 1
+                continue
+            fills.append(self._fill(order, self._price(order, bid, ask), ts))
+        return fills
+
+    def _price(self, order: PaperOrder, bid: float, ask: float) -> float:
+        """Limits fill at the quote or better, market and stop orders slip"""
+        if order.type == "limit":
+            return min(ask, order.price) if order.side == "buy" else max(bid, order.price)
+        return self.model.slip(ask if order.side == "buy" else bid, order.side, order.quantity)
+
+    def _fill(self, order: PaperOrder, price: float, ts: float) -> dict:
+        self.orders.pop(order.id, None)
+        order.status, order.fill_price, order.filled_ts = "filled", price, ts
+        order.generation += 1
+        self.dirty_orders[order.id] = order
+        if order.trade_id is None:
+            return self._open(order, price, ts)
+
+        position = self.positions.pop(order.trade_id)
+        sibling = self.orders.get(order.oco) if order.oco else None
+        if sibling is not None:
+            self._retire(sibling, "cancelled")
+        position.exit_price, position.exit_ts, position.exit_reason = price, ts, EXIT_REASONS[order.type]
+        self.dirty_positions[position.trade_id] = position
+        return {"type": "exit", "order_id": order.id, "trade_id": position.trade_id, "user_id": order.user_id,
+                "symbol": order.symbol, "price": price, "time": ts, "pnl": position.pnl(), "reason": position.exit_reason}
+
+    def _open(self, order: PaperOrder, price: float, ts: float) -> dict:
+        position = Position(
+            order.id, order.user_id, order.symbol, "LONG" if order.side == "buy" else "SHORT",
+            order.quantity, price, ts, order.stop_loss, order.take_profit, order.id, order.notes
+        )
+        self.positions[position.trade_id] = position
+        self.dirty_positions[position.trade_id] = position
+        exit_side = "sell" if order.side == "buy" else "buy"
+        bracket = []
+        if order.stop_loss is not None:
+            bracket.append(PaperOrder(order.user_id, order.symbol, exit_side, "stop", order.quantity,
+                                      order.stop_loss, trade_id=position.trade_id, created_ts=ts))
+        if order.take_profit is not None:
+            bracket.append(PaperOrder(order.user_id, order.symbol, exit_side, "limit", order.quantity,
+                                      order.take_profit, trade_id=position.trade_id, created_ts=ts))
+        if len(bracket) == 2:
+            bracket[0].oco, bracket[1].oco = bracket[1].id, bracket[0].id
+        for child in bracket:
+            self._rest(child)
+        return {"type": "entry", "order_id": order.id, "trade_id": position.trade_id, "user_id": order.user_id,
+                "symbol": order.symbol, "price": price, "time": ts}
+
+    def working_count(self, user_id: str) -> int:
+        return sum(1 for o in self.orders.values() if o.user_id == user_id and o.trade_id is None)
+
+    def stats(self) -> dict:
+        return {
+            "working_orders": len(self.orders),
+            "open_positions": len(self.positions),
+            "symbols": len({o.symbol for o in self.orders.values()}),
+            "quotes": len(self.quotes)
+        }
+
+# ============== SERVICE ==============
+
+class PaperTradingService:
+    """Runs the engine on market gateway ticks in the lease holder and writes
+    orders and journal trades in batches, off the event loop: one bulk
+    upsert per collection per flush, then the journal side effects of the
+    trades opened and closed (trade events, P&L rollup, analytics)."""
+
+    def __init__(self, engine: PaperEngine = None, flush_interval: float = FLUSH_INTERVAL):
+        self.engine = engine or PaperEngine()
+        self.flush_interval = flush_interval
+        self.owner = uuid.uuid4().hex
+        self.leader = False
+        self._renewed = 0.0
+        self._close_errors = {}         # trade_id -> why a close request failed
+        self._tasks = []
+
+    def _lease(self) -> bool:
+        """Take or renew the matching lease"""
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        try:
+            leases_collection.update_one(
+                {"_id": LEASE, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=LEASE_TTL)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False                # held by another process
+
+    def load(self) -> PaperEngine:
+        """A new engine with the open positions and working orders (blocking reads)"""
+        engine = PaperEngine(self.engine.model)
+        for doc in trades_collection.find({"source": "paper", "status": "open"}):
+            position = Position.from_trade(doc)
+            engine.positions[position.trade_id] = position
+        orphans = []
+        for doc in paper_orders_collection.find({"status": "working"}):
+            order = PaperOrder.from_doc(doc)
+            if order.trade_id is None or order.trade_id in engine.positions:
+                engine._rest(order)
+            else:
+                order.status = "cancelled"      # exit of a position closed meanwhile
+                orphans.append(order)
+        engine.dirty_orders = {o.id: o for o in orphans}
+        return engine
+
+    async def _hold_lease(self) -> bool:
+        if time.monotonic() - self._renewed < LEASE_TTL / 3:
+            return self.leader
+        if not await asyncio.to_thread(self._lease):
+            if self.leader:
+                self.leader = False     # taken over: drop the state, keep the quotes
+                self.engine = PaperEngine(self.engine.model)
+            self._renewed = 0.0
+            return False
+        self._renewed = time.monotonic()
+        if not self.leader:
+            engine = await asyncio.to_thread(self.load)
+            engine.quotes.update(self.engine.quotes)
+            self.engine, self.leader = engine, True
+        return True
+
+    def process(self, symbol: str, price: float, ts: float):
+        if self.leader:
+            self.engine.on_tick(symbol, price, ts)
+        else:
+            self.engine.quotes[symbol] = (*self.engine.model.quote(price), ts)
+
+    def _requests(self) -> tuple:
+        """New orders, cancel requests and close requests (blocking reads)"""
+        return (
+            list(paper_orders_collection.find({"status": "pending"}).sort("created_ts", 1)),
+            [d["_id"] for d in paper_orders_collection.find({"status": "working", "cancel_requested": True}, {"_id": 1})],
+            [d["_id"] for d in trades_collection.find({"source": "paper", "status": "open", "close_requested": True}, {"_id": 1})]
+        )
+
+    def apply(self, pending: list, cancels: list, closes: list):
+        """Apply the requests read by _requests() to the engine"""
+        engine = self.engine
+        for doc in pending:
+            order = PaperOrder.from_doc(doc)
+            if doc.get("cancel_requested"):
+                order.status = "cancelled"
+                engine.dirty_orders[order.id] = order
+                continue
+            try:
+                engine.place(order)
+            except ValueError as e:
+                order.status, order.error = "rejected", str(e)
+                engine.dirty_orders[order.id] = order
+        for order_id in cancels:
+            engine.cancel(str(order_id))        # unknown: filled, written with the next flush
+        for trade_id in closes:
+            try:
+                engine.close_position(str(trade_id))
+            except KeyError:
+                pass                            # closed, written with the next flush
+            except ValueError as e:
+                self._close_errors[str(trade_id)] = str(e)
+
+    async def flush(self):
+        """Write what changed in a thread; a failed write is retried with the next flush"""
+        engine = self.engine
+        if not engine.dirty_orders and not engine.dirty_positions and not self._close_errors:
+            return
+        orders, engine.dirty_orders = engine.dirty_orders, {}
+        positions, engine.dirty_positions = engine.dirty_positions, {}
+        errors, self._close_errors = self._close_errors, {}
+        order_docs = [o.to_doc() | {"_id": o.id} for o in orders.values()]
+        trades = {p.trade_id: p.to_trade() for p in positions.values()}
+        try:
+            await asyncio.to_thread(self._write, order_docs, trades, errors)
+        except Exception:
+            for order_id, order in orders.items():
+                engine.dirty_orders.setdefault(order_id, order)
+            for trade_id, position in positions.items():
+                engine.dirty_positions.setdefault(trade_id, position)
+            for trade_id, error in errors.items():
+                self._close_errors.setdefault(trade_id, error)
+            raise
+        from utils.exposure import exposure_service
+        for trade_id, trade in trades.items():
+            if trade["status"] == "open":
+                exposure_service.engine.track({"_id": trade_id, **trade})
+            else:
+                exposure_service.engine.untrack(trade_id)
+
+    def _write(self, order_docs: list, trades: dict, errors: dict):
+        from pymongo import UpdateOne
+
+        now = datetime.now(timezone.utc)
+        if order_docs:
+            paper_orders_collection.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {**doc, "updated_at": now}, "$setOnInsert": {"created_at": now}}, upsert=True)
+                for doc in order_docs
+            ], ordered=False)
+        for trade_id, error in errors.items():
+            trades_collection.update_one({"_id": trade_id}, {"$set": {"close_error": error}, "$unset": {"close_requested": ""}})
+        if not trades:
+            return
+        closing = [trade_id for trade_id, trade in trades.items() if trade["status"] == "closed"]
+        closed_before = {d["_id"] for d in trades_collection.find({"_id": {"$in": closing}, "status": "closed"}, {"_id": 1})} if closing else set()
+        ids = list(trades)
+        result = trades_collection.bulk_write([
+            UpdateOne({"_id": trade_id}, {
+                "$set": {**trade, "updated_at": now},
+                "$setOnInsert": {"created_at": trade["entry_time"]},
+                **({"$unset": {"close_requested": ""}} if trade["status"] == "closed" else {})
+            }, upsert=True)
+            for trade_id, trade in trades.items()
+        ], ordered=False)
+        opened = {ids[i] for i in result.upserted_ids}
+        try:
+            self._journal(trades, opened, [t for t in closing if t not in closed_before])
+        except Exception as e:
+            print("⚠️ Paper trade journaling failed:", repr(e))
+
+    def _journal(self, trades: dict, opened: set, closed: list):
+        """Side effects of new and newly closed trades, as for trades entered by hand"""
+        from utils.analytics import invalidate_analytics
+        from utils.pnl_rollup import record_pnl
+
+        for trade_id in opened:
+            emit(trades[trade_id]["user_id"], "trade_created", journaled=False)
+        for trade_id in closed:
+            trade = trades[trade_id]
+            emit(trade["user_id"], "trade_closed", followed_plan=False, win=trade["pnl"] > 0)
+            record_pnl(trade["user_id"], trade["entry_time"], trade["pnl"])
+            invalidate_analytics(trade["user_id"])
+
+    async def wait(self, collection, query: dict, timeout: float = WAIT_TIMEOUT):
+        """The document matching `query` once the lease holder has applied a
+        request, or None after `timeout`"""
+        deadline = time.monotonic() + timeout
+        while True:
+            doc = await asyncio.to_thread(collection.find_one, query)
+            if doc is not None or time.monotonic() >= deadline:
+                return doc
+            await asyncio.sleep(self.flush_interval / 2)
+
+    async def _run(self):
+        while True:
+            try:
+                if await self._hold_lease():
+                    self.apply(*await asyncio.to_thread(self._requests))
+                    await self.flush()
+            except Exception as e:
+                print("⚠️ Paper trading flush failed:", repr(e))
+            await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        """Ticks come from process() (market gateway listener)"""
+        self._tasks = [asyncio.create_task(self._run())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.leader:
+            try:
+                await self.flush()
+                await asyncio.to_thread(leases_collection.update_one, {"_id": LEASE, "owner": self.owner},
+                                        {"$set": {"expires_at": datetime.now(timezone.utc)}})
+            except Exception as e:
+                print("⚠️ Paper trading flush failed:", repr(e))
+            self.leader = False
+
+paper_service = PaperTradingService()
@@ -0,0 +1,342 @@
+"""
+Pattern scanner - market structure detected deterministically from bars:
+break of structure (BOS), fair value gaps (FVG), order blocks and
+support/resistance zones.
+
+Detectors are vectorized over the last `lookback` closed bars. Results are
+cached per (symbol, timeframe, closed bar, bar store version), and whole
+watchlists are scanned in a pool of worker processes that read the
+memory-mapped bar store themselves.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.bar_store import bar_store, BarStore, normalize_symbol, normalize_timeframe, TIMEFRAME_SECONDS
+from utils.indicators import atr, swings
+
+DEFAULT_LOOKBACK = 500
+MAX_LOOKBACK = 5000
+SWING_SIZE = 3              # bars on each side of a swing point
+FVG_MIN_ATR = 0.1           # ignore gaps smaller than this fraction of ATR(14)
+ZONE_ATR = 0.5              # swing prices closer than this x ATR form one zone
+MAX_ITEMS = 5               # most recent items returned per pattern type
+PATTERN_WORKERS = int(os.environ.get("PATTERN_WORKERS", min(4, os.cpu_count() or 1)))
+
+# ============== DETECTORS ==============
+
+def _last_index(mask: np.ndarray) -> np.ndarray:
+    """For each bar, index of the latest True at or before it (-1 if none)"""
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+def _suffix_min(values: np.ndarray) -> np.ndarray:
+    return np.minimum.accumulate(values[::-1])[::-1]
+
+def _suffix_max(values: np.ndarray) -> np.ndarray:
+    return np.maximum.accumulate(values[::-1])[::-1]
+
+def _after(suffix: np.ndarray, idx: np.ndarray, empty: float) -> np.ndarray:
+    """suffix[idx + 1], `empty` when idx is the last bar"""
+    nxt = idx + 1
+    out = np.full(len(idx), empty)
+    inside = nxt < len(suffix)
+    out[inside] = suffix[nxt[inside]]
+    return out
+
+def break_of_structure(high, low, close, size: int = SWING_SIZE) -> dict:
+    """First close beyond the latest confirmed swing high (bullish) or swing
+    low (bearish). Swings are confirmed `size` bars after the extreme."""
+    n = len(close)
+    pivots = swings(high, low, size, size)
+    out = {}
+    for direction, key, prices, beyond in (
+        ("bullish", "swing_high", high, np.greater),
+        ("bearish", "swing_low", low, np.less),
+    ):
+        swing_idx = np.flatnonzero(pivots[key])
+        # Latest confirmed swing at each bar (swings confirm in index order)
+        latest = np.full(n, -1)
+        latest[swing_idx + size] = swing_idx
+        latest = np.maximum.accumulate(latest) if n else latest
+        valid = latest >= 0
+        broken = np.zeros(n, dtype=bool)
+        broken[valid] = beyond(close[valid], prices[latest[valid]])
+        bars = np.flatnonzero(broken)
+        ids = latest[bars]
+        first = np.concatenate(([True], ids[1:] != ids[:-1])) if len(ids) else np.empty(0, dtype=bool)
+        out[direction] = (bars[first], ids[first])
+    return out
+
+def fair_value_gaps(high, low, min_size: np.ndarray) -> dict:
+    """Three-candle imbalances: low[i] > high[i-2] (bullish) or
+    high[i] < low[i-2] (bearish), flagged filled once price trades back
+    through the whole gap."""
+    out = {}
+    if len(high) < 3:
+        return {d: (np.empty(0, int), np.empty(0), np.empty(0), np.empty(0, bool)) for d in ("bullish", "bearish")}
+    i = np.arange(2, len(high))
+    up = low[2:] - high[:-2]
+    down = low[:-2] - high[2:]
+    for direction, gap, top, bottom, suffix, is_filled in (
+        ("bullish", up, low[2:], high[:-2], _suffix_min(low), lambda s, b, t: s <= b),
+        ("bearish", down, low[:-2], high[2:], _suffix_max(high), lambda s, b, t: s >= t),
+    ):
+        keep = (gap > 0) & (gap >= min_size[2:])
+        idx = i[keep]
+        later = _after(suffix, idx, np.inf if direction == "bullish" else -np.inf)
+        out[direction] = (idx, top[keep], bottom[keep], is_filled(later, bottom[keep], top[keep]))
+    return out
+
+def order_blocks(open_, high, low, close, bos: dict) -> dict:
+    """Last opposite candle before each BOS: the last bearish candle before a
+    bullish break and vice versa. Mitigated once price trades back into it."""
+    last_down = _last_index(close < open_)
+    last_up = _last_index(close > open_)
+    out = {}
+    for direction, last, suffix, empty in (
+        ("bullish", last_down, _suffix_min(low), np.inf),
+        ("bearish", last_up, _suffix_max(high), -np.inf),
+    ):
+        breaks, _ = bos[direction]
+        candle = last[np.maximum(breaks - 1, 0)] if len(breaks) else np.empty(0, int)
+        keep = candle >= 0
+        breaks, candle = breaks[keep], candle[keep]
+        later = _after(suffix, breaks, empty)
+        mitigated = later <= high[candle] if direction == "bullish" else later >= low[candle]
+        out[direction] = (candle, breaks, mitigated)
+    return out
+
+def sr_zones(high, low, tolerance: float, size: int = SWING_SIZE, min_touches: int = 2):
+    """Clusters of swing highs/lows no wider than `tolerance` (greedy from the
+    lowest price, so a trend of swings does not chain into one wide zone).
+    Returns (bottom, top, mean price, touches, last touch index) arrays."""
+    pivots = swings(high, low, size, size)
+    idx = np.concatenate((np.flatnonzero(pivots["swing_high"]), np.flatnonzero(pivots["swing_low"])))
+    prices = np.concatenate((high[pivots["swing_high"]], low[pivots["swing_low"]]))
+    if len(prices) < min_touches:
+        return (np.empty(0),) * 3 + (np.empty(0, int),) * 2
+    order = np.argsort(prices, kind="stable")
+    prices, idx = prices[order], idx[order]
+    starts = [0]
+    while True:
+        nxt = int(np.searchsorted(prices, prices[starts[-1]] + tolerance, side="right"))
+        if nxt >= len(prices):
+            break
+        starts.append(nxt)
+    starts = np.array(starts)
+    touches = np.diff(np.append(starts, len(prices)))
+    bottom = prices[starts]
+    top = np.maximum.reduceat(prices, starts)
+    mean = np.add.reduceat(prices, starts) / touches
+    last = np.maximum.reduceat(idx, starts)
+    keep = touches >= min_touches
+    return bottom[keep], top[keep], mean[keep], touches[keep], last[keep]
+
+# ============== SCAN ==============
+
+def _price(value) -> float:
+    return float(f"{float(value):.6g}")
+
+def detect_patterns(bars: dict) -> dict:
+    """All patterns over `bars` (closed bars only), most recent first"""
+    ts = bars["ts"]
+    open_, high, low, close = (np.asarray(bars[c], dtype=np.float64) for c in ("open", "high", "low", "close"))
+    n = len(ts)
+    result = {"bars": int(n), "last_close": _price(close[-1]) if n else None, "trend": None,
+              "bos": [], "fvg": [], "order_blocks": [], "zones": []}
+    if n < 2 * SWING_SIZE + 2:
+        return result
+    volatility = atr(high, low, close, 14)
+    volatility = np.where(np.isnan(volatility), np.nanmean(high - low), volatility)
+
+    bos = break_of_structure(high, low, close)
+    events = [
+        {"direction": d, "time": int(ts[b]), "level": _price((high if d == "bullish" else low)[s]), "swing_time": int(ts[s])}
+        for d, (breaks, swing_ids) in bos.items() for b, s in zip(breaks.tolist(), swing_ids.tolist())
+    ]
+    events.sort(key=lambda e: e["time"], reverse=True)
+    result["bos"] = events[:MAX_ITEMS]
+    if events:
+        result["trend"] = events[0]["direction"]
+
+    gaps = [
+        {"direction": d, "time": int(ts[i - 1]), "top": _price(top), "bottom": _price(bottom), "filled": bool(filled)}
+        for d, arrays in fair_value_gaps(high, low, FVG_MIN_ATR * volatility).items()
+        for i, top, bottom, filled in zip(*(a.tolist() for a in arrays))
+    ]
+    # Open gaps first, then by recency
+    gaps.sort(key=lambda g: (g["filled"], -g["time"]))
+    result["fvg"] = gaps[:MAX_ITEMS]
+
+    blocks = [
+        {"direction": d, "time": int(ts[c]), "bos_time": int(ts[b]), "top": _price(high[c]),
+         "bottom": _price(low[c]), "mitigated": bool(m)}
+        for d, arrays in order_blocks(open_, high, low, close, bos).items()
+        for c, b, m in zip(*(a.tolist() for a in arrays))
+    ]
+    blocks.sort(key=lambda o: (o["mitigated"], -o["time"]))
+    result["order_blocks"] = blocks[:MAX_ITEMS]
+
+    last_close = close[-1]
+    zones = [
+        {"type": "support" if mean < last_close else "resistance", "price": _price(mean),
+         "top": _price(top), "bottom": _price(bottom), "touches": int(t), "last_touch": int(ts[last])}
+        for bottom, top, mean, t, last in zip(*(a.tolist() for a in sr_zones(high, low, ZONE_ATR * volatility[-1])))
+    ]
+    # Nearest zones to the current price
+    zones.sort(key=lambda z: abs(z["price"] - last_close))
+    result["zones"] = zones[:2 * MAX_ITEMS]
+    return result
+
+_stores = {}
+
+def _store_at(root: str):
+    """The process's BarStore for `root` (workers open their own mappings)"""
+    if root == bar_store.root:
+        return bar_store
+    if root not in _stores:
+        _stores[root] = BarStore(root)
+    return _stores[root]
+
+def _closed_bars(store, symbol: str, timeframe: str, lookback: int, now: float) -> dict:
+    from utils.resample import read_bars
+
+    bars = read_bars(symbol, timeframe, limit=lookback + 1, newest=True, store=store)
+    if len(bars["ts"]) and bars["ts"][-1] + TIMEFRAME_SECONDS[timeframe] > now:
+        bars = {name: arr[:-1] for name, arr in bars.items()}  # still forming
+    else:
+        bars = {name: arr[-lookback:] for name, arr in bars.items()}
+    return bars
+
+def _scan_job(root: str, symbol: str, timeframe: str, lookback: int, now: float) -> dict:
+    """One symbol/timeframe; runs in a worker process for watchlist scans"""
+    bars = _closed_bars(_store_at(root), symbol, timeframe, lookback, now)
+    result = detect_patterns(bars)
+    result.update({
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "closed_bar": int(bars["ts"][-1]) if len(bars["ts"]) else None
+    })
+    return result
+
+class PatternScanner:
+    """Cached scans and a lazily started pool of worker processes.
+
+    A cached result stays valid until a new bar closes or the symbol's data
+    is rewritten (bar store version), whichever comes first.
+    """
+
+    def __init__(self, store=bar_store, max_entries: int = 4096, workers: int = PATTERN_WORKERS):
+        self.store = store
+        self.max_entries = max_entries
+        self.workers = workers
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _key(self, symbol: str, timeframe: str, lookback: int, now: float):
+        return (symbol, timeframe, lookback, self.store.version(symbol), int(now // TIMEFRAME_SECONDS[timeframe]))
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _put(self, key, result: dict):
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: the server process holds threads and DB connections
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def scan(self, symbol: str, timeframe: str, lookback: int = DEFAULT_LOOKBACK) -> dict:
+        return self.scan_many([symbol], [timeframe], lookback)[0]
+
+    def scan_many(self, symbols: list, timeframes: list, lookback: int = DEFAULT_LOOKBACK) -> list:
+        """Scan every symbol x timeframe; cache misses run in worker processes"""
+        now = time.time()
+        jobs = [
+            (normalize_symbol(s), normalize_timeframe(tf))
+            for s in dict.fromkeys(symbols) for tf in dict.fromkeys(timeframes)
+        ]
+        results, missing = {}, []
+        for job in jobs:
+            if not self.store.timeframes(job[0]):
+                results[job] = {"symbol": job[0], "timeframe": job[1], "error": "Aucune donnée de marché"}
+                continue
+            key = self._key(*job, lookback, now)
+            cached = self._cached(key)
+            if cached is not None:
+                results[job] = cached
+            else:
+                missing.append((job, key))
+
+        if len(missing) > 1 and self.workers > 1:
+            futures = [self._get_pool().submit(_scan_job, self.store.root, *job, lookback, now) for job, _ in missing]
+            computed = [f.result() for f in futures]
+        else:
+            computed = [_scan_job(self.store.root, *job, lookback, now) for job, _ in missing]
+        for (job, key), result in zip(missing, computed):
+            self._put(key, result)
+            results[job] = result
+        return [results[job] for job in jobs]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+pattern_scanner = PatternScanner()
+
+# ============== AI PROMPT ==============
+
+def _fmt_time(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+def describe_patterns(result: dict) -> str:
+    """French summary of a scan for the AI prompts"""
+    direction = {"bullish": "haussier", "bearish": "baissier"}
+    lines = [f"Dernière clôture: {result['last_close']} ({result['bars']} bougies {result['timeframe']} analysées)"]
+    if result["bos"]:
+        b = result["bos"][0]
+        lines.append(f"- Dernier BOS {direction[b['direction']]}: cassure de {b['level']} le {_fmt_time(b['time'])}")
+    open_gaps = [g for g in result["fvg"] if not g["filled"]]
+    for g in open_gaps:
+        lines.append(f"- FVG {direction[g['direction']]} non comblé: {g['bottom']} - {g['top']} ({_fmt_time(g['time'])})")
+    if not open_gaps:
+        lines.append("- Aucun FVG ouvert")
+    for o in (o for o in result["order_blocks"] if not o["mitigated"]):
+        lines.append(f"- Order block {direction[o['direction']]} non mitigé: {o['bottom']} - {o['top']} ({_fmt_time(o['time'])})")
+    supports = [z for z in result["zones"] if z["type"] == "support"][:3]
+    resistances = [z for z in result["zones"] if z["type"] == "resistance"][:3]
+    if supports:
+        lines.append("- Supports: " + ", ".join(f"{z['bottom']}-{z['top']} ({z['touches']} touches)" for z in supports))
+    if resistances:
+        lines.append("- Résistances: " + ", ".join(f"{z['bottom']}-{z['top']} ({z['touches']} touches)" for z in resistances))
+    return "\n".join(lines)
+
+def setup_patterns(symbol: str, timeframe: str) -> str:
+    """Prompt block for analyze_setup, or None without market data"""
+    if not symbol:
+        return None
+    try:
+        result = pattern_scanner.scan(symbol, timeframe or "H1")
+    except ValueError:
+        return None
+    if result.get("error") or not result.get("bars"):
+        return None
+    return describe_patterns(result)
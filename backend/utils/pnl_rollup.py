@@ -0,0 +1,151 @@
+"""
+P&L heatmap - Mongo-side bucketing by timezone and a per-user daily P&L rollup
+"""
+from collections import defaultdict
+from datetime import datetime, timezone, date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException
+from pymongo import ReplaceOne, ReturnDocument
+
+from utils.database import trades_collection, users_collection, daily_pnl_collection
+
+BUCKET_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+
+def get_zone(name: str) -> ZoneInfo:
+    """Validate an IANA timezone name"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(400, f"Fuseau horaire invalide: {name}")
+
+def user_timezone(user_id: str) -> str:
+    user = users_collection.find_one({"_id": user_id}, {"timezone": 1})
+    return (user or {}).get("timezone") or "UTC"
+
+def local_day(created_at: datetime, tz: str) -> str:
+    """Calendar day of a (naive UTC or aware) timestamp in a timezone"""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(ZoneInfo(tz)).strftime("%Y-%m-%d")
+
+def aggregate_heatmap(user_id: str, start: datetime, end: datetime, tz: str, bucket: str) -> list:
+    """Sum closed-trade P&L per bucket with $dateToString, reading only created_at/pnl"""
+    pipeline = [
+        {"$match": {
+            "user_id": user_id,
+            "status": "closed",
+            "created_at": {"$gte": start, "$lte": end}
+        }},
+        {"$project": {"_id": 0, "created_at": 1, "pnl": 1}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": BUCKET_FORMATS[bucket], "date": "$created_at", "timezone": tz}},
+            "pnl": {"$sum": {"$ifNull": ["$pnl", 0]}},
+            "trades": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    return [
+        {"date": row["_id"], "pnl": round(row["pnl"], 2), "trades": row["trades"]}
+        for row in trades_collection.aggregate(pipeline)
+    ]
+
+# ============== DAILY ROLLUP ==============
+# One document per user and local day ({user_id, date, pnl, trades}) in the
+# user's configured timezone. Trade close/delete apply $inc deltas; bulk
+# changes (imports, timezone change) mark the rollup stale and the next
+# heatmap read rebuilds it with one aggregation.
+# users.pnl_rollup_gen orders the two: a rebuild bumps it and only marks the
+# rollup ready if nothing bumped it meanwhile; a delta that may have raced a
+# rebuild (stale rollup, or generation changed around the $inc) bumps it too,
+# so the rollup stays stale and the next read rebuilds it.
+
+def rebuild_rollup(user_id: str, tz: str = None):
+    tz = tz or user_timezone(user_id)
+    user = users_collection.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"pnl_rollup_gen": 1}, "$set": {"pnl_rollup_ready": False}},
+        projection={"pnl_rollup_gen": 1}, return_document=ReturnDocument.AFTER
+    )
+    rows = aggregate_heatmap(
+        user_id, datetime(1970, 1, 1, tzinfo=timezone.utc), datetime.now(timezone.utc), tz, "day"
+    )
+    ids = [f"{user_id}:{row['date']}" for row in rows]
+    if rows:
+        daily_pnl_collection.bulk_write([
+            ReplaceOne({"_id": _id}, {"user_id": user_id, **row}, upsert=True) for _id, row in zip(ids, rows)
+        ], ordered=False)
+    daily_pnl_collection.delete_many({"user_id": user_id, "_id": {"$nin": ids}})
+    users_collection.update_one(
+        {"_id": user_id, "pnl_rollup_gen": (user or {}).get("pnl_rollup_gen")},
+        {"$set": {"pnl_rollup_ready": True, "pnl_rollup_timezone": tz}}
+    )
+
+def invalidate_rollup(user_id: str):
+    """Mark the rollup stale, including against a rebuild under way"""
+    users_collection.update_one({"_id": user_id}, {"$set": {"pnl_rollup_ready": False}, "$inc": {"pnl_rollup_gen": 1}})
+
+def record_pnl(user_id: str, created_at: datetime, pnl: float, trades: int = 1):
+    """Apply a closed-trade P&L delta to the rollup (left to the rebuild while it is stale)"""
+    fields = {"pnl_rollup_ready": 1, "pnl_rollup_timezone": 1, "pnl_rollup_gen": 1}
+    user = users_collection.find_one({"_id": user_id}, fields)
+    if not user:
+        return
+    if not user.get("pnl_rollup_ready"):
+        invalidate_rollup(user_id)      # a rebuild may have read the trades before this one
+        return
+    day = local_day(created_at, user.get("pnl_rollup_timezone") or "UTC")
+    daily_pnl_collection.update_one(
+        {"_id": f"{user_id}:{day}"},
+        {
+            "$inc": {"pnl": pnl or 0, "trades": trades},
+            "$setOnInsert": {"user_id": user_id, "date": day}
+        },
+        upsert=True
+    )
+    if not users_collection.find_one({"_id": user_id, "pnl_rollup_ready": True,
+                                      "pnl_rollup_gen": user.get("pnl_rollup_gen")}, {"_id": 1}):
+        invalidate_rollup(user_id)      # a rebuild started around the $inc
+
+def _bucket_key(day: str, bucket: str) -> str:
+    if bucket == "day":
+        return day
+    if bucket == "month":
+        return day[:7]
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def rollup_heatmap(user_id: str, start: datetime, end: datetime, tz: str, bucket: str) -> list:
+    """Heatmap from the daily rollup (tz must be the rollup timezone)"""
+    docs = daily_pnl_collection.find(
+        {"user_id": user_id, "date": {"$gte": local_day(start, tz), "$lte": local_day(end, tz)}},
+        {"_id": 0, "date": 1, "pnl": 1, "trades": 1}
+    )
+    buckets = defaultdict(lambda: [0.0, 0])
+    for doc in docs:
+        if not doc.get("trades"):
+            continue
+        entry = buckets[_bucket_key(doc["date"], bucket)]
+        entry[0] += doc["pnl"]
+        entry[1] += doc["trades"]
+    return [
+        {"date": key, "pnl": round(pnl, 2), "trades": trades}
+        for key, (pnl, trades) in sorted(buckets.items())
+    ]
+
+def get_heatmap(user_id: str, start: datetime, end: datetime, tz: str = None, bucket: str = "day") -> list:
+    """Heatmap buckets, served from the rollup when it matches the requested timezone"""
+    if bucket not in BUCKET_FORMATS:
+        raise HTTPException(400, "Bucket invalide (day, week, month)")
+    user = users_collection.find_one(
+        {"_id": user_id}, {"timezone": 1, "pnl_rollup_ready": 1, "pnl_rollup_timezone": 1}
+    ) or {}
+    user_tz = user.get("timezone") or "UTC"
+    tz = tz or user_tz
+    get_zone(tz)
+
+    if tz != user_tz:
+        return aggregate_heatmap(user_id, start, end, tz, bucket)
+    if not user.get("pnl_rollup_ready") or user.get("pnl_rollup_timezone") != tz:
+        rebuild_rollup(user_id, tz)
+    return rollup_heatmap(user_id, start, end, tz, bucket)
@@ -0,0 +1,416 @@
+"""
+Portfolio backtesting - one strategy run over a basket of symbols with shared
+capital, position limits and per-symbol attribution.
+
+1. Per symbol, entry/exit signals (rule DSL) become candidate trades:
+   entry at the signal bar close, exit on the first of stop loss, take
+   profit (intrabar, stop first when both are touched) or exit signal.
+2. One pass over all candidates in time order applies the shared capital
+   and the position limits (only trade events are visited, not every bar).
+3. Accepted positions are marked to market on the union timeline of all
+   symbols, in chunks of bars, to build the equity curve, the drawdown and
+   its per-symbol attribution, and the daily P&L correlation.
+"""
+import heapq
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+from fastapi import HTTPException
+
+from utils.database import backtests_collection
+from utils.bar_store import bar_store, normalize_symbol, normalize_timeframe, to_epoch
+from utils.indicators import indicator_cache
+from utils.resample import read_bars
+from utils.rules import strategy_signals
+
+CHUNK_BARS = 20_000
+MAX_EQUITY_POINTS = 500
+MAX_TRADES_RETURNED = 1000
+
+@dataclass
+class PortfolioConfig:
+    initial_capital: float = 10000.0
+    risk_per_trade: float = 1.0          # % of equity risked at the stop
+    stop_loss_percent: float = 1.0       # distance from entry, 0 = no stop
+    take_profit_percent: float = 2.0     # distance from entry, 0 = no target
+    max_positions: int = 5               # open positions across the basket
+    max_position_percent: float = 20.0   # max notional per position, % of equity
+    direction: str = "long"
+
+# ============== CANDIDATE TRADES ==============
+
+def _first_exit(high, low, start: int, end: int, stop: float, target: float, long: bool):
+    """First bar in [start, end] touching the stop or target, scanning in
+    growing chunks so long holds do not cost a full-array pass per trade"""
+    chunk = 256
+    while start <= end:
+        stop_at = min(end + 1, start + chunk)
+        h, l = high[start:stop_at], low[start:stop_at]
+        hit_stop = (l <= stop) if long else (h >= stop)
+        hit_target = (h >= target) if long else (l <= target)
+        hits = hit_stop | hit_target
+        if hits.any():
+            k = int(hits.argmax())
+            return start + k, ("stop_loss", stop) if hit_stop[k] else ("take_profit", target)
+        start, chunk = stop_at, chunk * 2
+    return None, None
+
+def candidate_trades(bars: dict, entry: np.ndarray, exit_: np.ndarray, lo: int, hi: int,
+                     config: PortfolioConfig) -> list:
+    """Non-overlapping trades of one symbol for signal bars in [lo, hi)"""
+    long = config.direction == "long"
+    sign = 1 if long else -1
+    close, high, low = bars["close"], bars["high"], bars["low"]
+    entries = np.flatnonzero(entry[lo:hi]) + lo
+    exits = np.flatnonzero(exit_[lo:hi]) + lo
+    last = hi - 1
+    trades = []
+    next_free = lo
+    # Next exit signal after each entry, looked up once for all entries
+    next_exit = np.append(exits, last)[np.searchsorted(exits, entries + 1)].tolist()
+    for i, signal_exit in zip(entries.tolist(), next_exit):
+        if i < next_free or i >= last:
+            continue
+        price = float(close[i])
+        stop = price * (1 - sign * config.stop_loss_percent / 100) if config.stop_loss_percent else -sign * np.inf
+        target = price * (1 + sign * config.take_profit_percent / 100) if config.take_profit_percent else sign * np.inf
+        j, hit = _first_exit(high, low, i + 1, signal_exit, stop, target, long)
+        if j is None:
+            j, exit_price = signal_exit, float(close[signal_exit])
+            reason = "signal" if exit_[signal_exit] else "end"
+        else:
+            reason, exit_price = hit
+        trades.append((i, int(j), price, float(exit_price), reason))
+        next_free = j + 1
+    return trades
+
+# ============== SIMULATION ==============
+
+def _align(bars_by_symbol: dict, lo_hi: dict):
+    """Union timeline of all symbols over their ranges and, per symbol, the
+    grid row of each of its bars"""
+    # Concatenated sorted runs: a stable (merge) sort is far cheaper than np.unique
+    stamps = np.sort(np.concatenate([
+        bars["ts"][lo_hi[symbol][0]:lo_hi[symbol][1]] for symbol, bars in bars_by_symbol.items()
+    ]), kind="stable")
+    grid = stamps[np.concatenate(([True], stamps[1:] != stamps[:-1]))] if len(stamps) else stamps
+    rows = {
+        symbol: np.searchsorted(grid, bars["ts"])
+        for symbol, bars in bars_by_symbol.items()
+    }
+    return grid, rows
+
+def _mark_to_market(grid, closes, events, fixes, initial_capital: float, chunk_bars: int):
+    """Equity per grid row, per-symbol daily P&L and per-symbol P&L over the
+    worst drawdown (peak to trough), processed `chunk_bars` rows at a time.
+
+    events: (rows, columns, quantity deltas) - the position held at the close
+    of a row changes, so it earns the move of the following rows;
+    fixes: (rows, columns, pnl) - exit fills away from the close.
+    """
+    n_rows, n_symbols = closes.shape
+    days, day_index = np.unique(grid // 86400, return_inverse=True)
+    daily = np.zeros((len(days), n_symbols))
+    equity = np.empty(n_rows)
+
+    ev_rows, ev_cols, ev_qty = events
+    fx_rows, fx_cols, fx_pnl = fixes
+    holdings = np.zeros(n_symbols)
+    cumulative = np.zeros(n_symbols)
+    prev_close = closes[0]
+    # Running peak (value and per-symbol P&L there) and worst drawdown so far
+    peak, at_peak = initial_capital, np.zeros(n_symbols)
+    worst, drawdown_by_symbol = 0.0, np.zeros(n_symbols)
+
+    for a in range(0, n_rows, chunk_bars):
+        b = min(a + chunk_bars, n_rows)
+        delta = np.zeros((b - a, n_symbols))
+        mask = (ev_rows >= a) & (ev_rows < b)
+        np.add.at(delta, (ev_rows[mask] - a, ev_cols[mask]), ev_qty[mask])
+        held = holdings + np.cumsum(delta, axis=0)
+        block = closes[a:b]
+        moves = np.diff(np.vstack((prev_close, block)), axis=0)
+        # A row's move is earned by the position held at the previous close
+        before = np.vstack((holdings, held[:-1]))
+        row_pnl = np.nan_to_num(before * moves)
+        mask = (fx_rows >= a) & (fx_rows < b)
+        np.add.at(row_pnl, (fx_rows[mask] - a, fx_cols[mask]), fx_pnl[mask])
+
+        np.add.at(daily, day_index[a:b], row_pnl)
+        running = cumulative + np.cumsum(row_pnl, axis=0)
+        chunk_equity = initial_capital + running.sum(axis=1)
+        equity[a:b] = chunk_equity
+
+        peaks = np.maximum.accumulate(np.maximum(chunk_equity, peak))
+        drawdowns = peaks - chunk_equity
+        k = int(drawdowns.argmax())
+        if drawdowns[k] > worst:
+            worst = float(drawdowns[k])
+            new_peaks = np.flatnonzero(chunk_equity[:k] >= peaks[k])
+            start = running[new_peaks[-1]] if len(new_peaks) else at_peak
+            drawdown_by_symbol = running[k] - start
+        if peaks[-1] > peak:
+            peak = float(peaks[-1])
+            at_peak = running[np.flatnonzero(chunk_equity >= peak)[-1]].copy()
+
+        cumulative = running[-1]
+        holdings = held[-1]
+        prev_close = block[-1]
+    return equity, daily, drawdown_by_symbol
+
+def simulate(bars_by_symbol: dict, signals_by_symbol: dict, config: PortfolioConfig,
+             start_ts: int = None, end_ts: int = None, chunk_bars: int = CHUNK_BARS) -> dict:
+    """Portfolio backtest over pre-computed signals (see run_portfolio_backtest)"""
+    symbols = list(bars_by_symbol)
+    long = config.direction == "long"
+    lo_hi = {}
+    for symbol, bars in bars_by_symbol.items():
+        lo = 0 if start_ts is None else int(np.searchsorted(bars["ts"], start_ts))
+        hi = len(bars["ts"]) if end_ts is None else int(np.searchsorted(bars["ts"], end_ts))
+        lo_hi[symbol] = (lo, hi)
+    grid, rows = _align(bars_by_symbol, lo_hi)
+    if not len(grid):
+        return {"total_trades": 0, "by_symbol": []}
+
+    # Candidates from every symbol, in entry time order
+    candidates = []
+    for col, symbol in enumerate(symbols):
+        signals = signals_by_symbol[symbol]
+        lo, hi = lo_hi[symbol]
+        trades = candidate_trades(bars_by_symbol[symbol], signals["entry"], signals["exit"], lo, hi, config)
+        if not trades:
+            continue
+        entry_rows = rows[symbol][[t[0] for t in trades]].tolist()
+        exit_rows = rows[symbol][[t[1] for t in trades]].tolist()
+        candidates.extend(
+            (entry_row, exit_row, col) + trade
+            for entry_row, exit_row, trade in zip(entry_rows, exit_rows, trades)
+        )
+    candidates.sort()
+
+    # Shared capital and limits: equity is realized P&L, positions are sized
+    # from it when they open and released when they close
+    equity = config.initial_capital
+    open_heap = []
+    accepted, rejected = [], 0
+    for entry_row, exit_row, col, i, j, entry_price, exit_price, reason in candidates:
+        while open_heap and open_heap[0][0] <= entry_row:
+            equity += heapq.heappop(open_heap)[1]
+        if len(open_heap) >= config.max_positions or equity <= 0:
+            rejected += 1
+            continue
+        notional_cap = equity * config.max_position_percent / 100
+        if config.stop_loss_percent:
+            quantity = min(equity * config.risk_per_trade / config.stop_loss_percent, notional_cap) / entry_price
+        else:
+            quantity = notional_cap / entry_price
+        signed = quantity if long else -quantity
+        pnl = signed * (exit_price - entry_price)
+        heapq.heappush(open_heap, (exit_row, pnl))
+        accepted.append((col, entry_row, exit_row, i, j, entry_price, exit_price, signed, pnl, reason))
+
+    # Mark to market on the union timeline
+    closes = np.full((len(grid), len(symbols)), np.nan)
+    for col, symbol in enumerate(symbols):
+        lo, hi = lo_hi[symbol]
+        closes[rows[symbol][lo:hi], col] = bars_by_symbol[symbol]["close"][lo:hi]
+    # Forward fill so symbols without a bar on a row do not move
+    filled = np.where(np.isnan(closes), 0, np.arange(len(grid))[:, None])
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    closes = closes[filled, np.arange(len(symbols))]
+
+    # Entries fill at the signal close; exits at stop/target need a correction
+    cols, entry_rows, exit_rows = (np.array([t[k] for t in accepted], dtype=np.int64) for k in range(3))
+    signed = np.array([t[7] for t in accepted], dtype=np.float64)
+    exit_prices = np.array([t[6] for t in accepted], dtype=np.float64)
+    events = (np.concatenate((entry_rows, exit_rows)), np.concatenate((cols, cols)), np.concatenate((signed, -signed)))
+    fixes = (exit_rows, cols, signed * (exit_prices - closes[exit_rows, cols]))
+
+    equity_curve, daily, drawdown_by_symbol = _mark_to_market(
+        grid, closes, events, fixes, config.initial_capital, chunk_bars
+    )
+    peaks = np.maximum.accumulate(np.maximum(equity_curve, config.initial_capital))
+    drawdowns = peaks - equity_curve
+    trough = int(drawdowns.argmax())
+
+    return _report(symbols, grid, config, accepted, rejected, equity_curve, drawdowns, trough,
+                   drawdown_by_symbol, daily, bars_by_symbol)
+
+def _report(symbols, grid, config, accepted, rejected, equity_curve, drawdowns, trough,
+            drawdown_by_symbol, daily, bars_by_symbol) -> dict:
+    pnl = np.array([t[8] for t in accepted]) if accepted else np.empty(0)
+    cols = np.array([t[0] for t in accepted], dtype=int) if accepted else np.empty(0, int)
+    n = len(symbols)
+    counts = np.bincount(cols, minlength=n)
+    pnl_sums = np.bincount(cols, weights=pnl, minlength=n)
+    win_counts = np.bincount(cols, weights=pnl > 0, minlength=n)
+    total_pnl = float(equity_curve[-1] - config.initial_capital)
+
+    # Daily returns of the portfolio and P&L correlation between traded symbols
+    daily_equity = config.initial_capital + np.cumsum(daily.sum(axis=1))
+    daily_returns = np.diff(np.concatenate(([config.initial_capital], daily_equity))) / np.concatenate(([config.initial_capital], daily_equity[:-1]))
+    sharpe = float(daily_returns.mean() / daily_returns.std(ddof=1) * np.sqrt(252)) if len(daily_returns) > 1 and daily_returns.std(ddof=1) > 0 else 0
+    traded = np.flatnonzero((daily != 0).any(axis=0))
+    correlation = {"average": None, "top_pairs": []}
+    if len(traded) > 1:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matrix = np.corrcoef(daily[:, traded].T)
+        upper = np.triu_indices(len(traded), 1)
+        values = matrix[upper]
+        valid = ~np.isnan(values)
+        if valid.any():
+            correlation["average"] = round(float(values[valid].mean()), 3)
+            order = np.argsort(-np.where(valid, values, -np.inf))[:5]
+            correlation["top_pairs"] = [
+                {"symbols": [symbols[traded[upper[0][k]]], symbols[traded[upper[1][k]]]], "correlation": round(float(values[k]), 3)}
+                for k in order if valid[k]
+            ]
+
+    max_dd = float(drawdowns[trough])
+    step = max(1, len(equity_curve) // MAX_EQUITY_POINTS)
+    by_symbol = [
+        {
+            "symbol": symbols[c],
+            "trades": int(counts[c]),
+            "pnl": round(float(pnl_sums[c]), 2),
+            "winrate": round(float(win_counts[c] / counts[c] * 100), 2) if counts[c] else 0,
+            "contribution_percent": round(float(pnl_sums[c] / total_pnl * 100), 2) if total_pnl else 0,
+            "drawdown_contribution": round(float(drawdown_by_symbol[c]), 2),
+        }
+        for c in range(n)
+    ]
+    by_symbol.sort(key=lambda row: row["pnl"], reverse=True)
+
+    trades = [
+        {
+            "symbol": symbols[col],
+            "direction": "LONG" if signed > 0 else "SHORT",
+            "entry_time": int(bars_by_symbol[symbols[col]]["ts"][i]),
+            "exit_time": int(bars_by_symbol[symbols[col]]["ts"][j]),
+            "entry_price": round(entry_price, 6),
+            "exit_price": round(exit_price, 6),
+            "quantity": round(abs(signed), 6),
+            "pnl": round(trade_pnl, 2),
+            "exit_reason": reason
+        }
+        for col, _, _, i, j, entry_price, exit_price, signed, trade_pnl, reason in accepted[:MAX_TRADES_RETURNED]
+    ]
+
+    return {
+        "symbols_count": len(symbols),
+        "bars": int(len(grid)),
+        "total_trades": len(accepted),
+        "rejected_signals": rejected,
+        "winning_trades": int((pnl > 0).sum()),
+        "losing_trades": int((pnl < 0).sum()),
+        "winrate": round(float((pnl > 0).mean() * 100), 2) if len(pnl) else 0,
+        "total_pnl": round(total_pnl, 2),
+        "initial_capital": config.initial_capital,
+        "final_capital": round(float(equity_curve[-1]), 2),
+        "roi": round(total_pnl / config.initial_capital * 100, 2),
+        "max_drawdown": round(max_dd, 2),
+        "max_drawdown_percent": round(max_dd / float(equity_curve[trough] + max_dd) * 100, 2) if max_dd else 0,
+        "max_drawdown_time": int(grid[trough]) if max_dd else None,
+        "sharpe_ratio": round(sharpe, 2),
+        "correlation": correlation,
+        "by_symbol": by_symbol,
+        "equity_curve": [
+            {"t": int(grid[k]), "equity": round(float(equity_curve[k]), 2)}
+            for k in range(0, len(equity_curve), step)
+        ],
+        "trades": trades
+    }
+
+def run_portfolio_backtest(symbols: list, timeframe: str, start_date, end_date, entry_rules: list,
+                           exit_rules: list, config: PortfolioConfig) -> dict:
+    """Load each symbol's bars from the bar store, evaluate the rules with the
+    IndicatorCache and simulate. Raises ValueError on a bad timeframe/date;
+    symbols without stored data are skipped and listed in missing_symbols."""
+    timeframe = normalize_timeframe(timeframe)
+    start, end = to_epoch(start_date), to_epoch(end_date)
+    if end is not None and len(str(end_date)) == 10:
+        end += 86400  # a date-only end_date includes that day
+
+    bars_by_symbol, signals_by_symbol, missing = {}, {}, []
+    for symbol in dict.fromkeys(normalize_symbol(s) for s in symbols):
+        if not bar_store.timeframes(symbol):
+            missing.append(symbol)
+            continue
+        bars = read_bars(symbol, timeframe)
+        bars_by_symbol[symbol] = bars
+        signals_by_symbol[symbol] = strategy_signals(
+            entry_rules, exit_rules, bars,
+            provider=lambda name, params, symbol=symbol: indicator_cache.get(symbol, timeframe, name, params)[1]
+        )
+    if not bars_by_symbol:
+        return None
+
+    result = simulate(bars_by_symbol, signals_by_symbol, config, start, end)
+    first = next(iter(signals_by_symbol.values()))
+    result.update({
+        "timeframe": timeframe,
+        "missing_symbols": missing,
+        "entry_rules": first["entry_rules"],
+        "exit_rules": first["exit_rules"]
+    })
+    return result
+
+def create_portfolio_backtest(data, user_id: str) -> dict:
+    """Run a PortfolioBacktestCreate request and store it as a completed backtest"""
+    if not data.symbols:
+        raise HTTPException(400, "Ajoutez au moins un symbole")
+    if data.direction not in ("long", "short"):
+        raise HTTPException(400, "Direction invalide (long ou short)")
+    if data.max_positions < 1:
+        raise HTTPException(400, "max_positions doit être au moins 1")
+    config = PortfolioConfig(
+        initial_capital=data.initial_capital,
+        risk_per_trade=data.risk_per_trade,
+        stop_loss_percent=data.stop_loss_value,
+        take_profit_percent=data.take_profit_value,
+        max_positions=data.max_positions,
+        max_position_percent=data.max_position_percent,
+        direction=data.direction
+    )
+    try:
+        results = run_portfolio_backtest(
+            data.symbols, data.timeframe, data.start_date, data.end_date,
+            data.entry_rules, data.exit_rules, config
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if results is None:
+        raise HTTPException(404, f"Aucune donnée de marché pour {', '.join(data.symbols)}")
+
+    backtest_id = str(uuid.uuid4())
+    backtests_collection.insert_one({
+        "_id": backtest_id,
+        "user_id": user_id,
+        "type": "portfolio",
+        "name": data.name,
+        "strategy_description": data.strategy_description,
+        "symbol": ", ".join(row["symbol"] for row in results["by_symbol"]),
+        "symbols": [row["symbol"] for row in results["by_symbol"]],
+        "timeframe": results["timeframe"],
+        "start_date": data.start_date,
+        "end_date": data.end_date,
+        "initial_capital": data.initial_capital,
+        "risk_per_trade": data.risk_per_trade,
+        "entry_rules": data.entry_rules,
+        "exit_rules": data.exit_rules,
+        "stop_loss_type": "percent",
+        "stop_loss_value": data.stop_loss_value,
+        "take_profit_type": "percent",
+        "take_profit_value": data.take_profit_value,
+        "max_positions": data.max_positions,
+        "max_position_percent": data.max_position_percent,
+        "direction": data.direction,
+        "status": "completed",
+        "trades": [],
+        "results": results,
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
+    })
+    return {"id": backtest_id, "results": results}
@@ -0,0 +1,479 @@
+"""
+Bar replay - practice trading on historical bars, streamed over WebSocket.
+
+A session walks a backtest's symbol/timeframe from a cursor, one bar at a
+time: play at 1x-1000x real time, step, pause, seek. Bars come from aligned
+windows of WINDOW_BARS bars held in a process-wide LRU, so every session
+replaying the same data shares the same arrays (views on the bar store's
+memory maps for stored timeframes). A session only keeps a few scalars,
+its current window, one pending order, the open position and the trades
+not yet written.
+
+Simulated orders fill on bars revealed after they were placed (no
+look-ahead):
+- market: next bar's open;
+- limit / stop: first bar trading through the price, at the price (or at
+  the open when the bar gaps beyond it);
+- stop loss / take profit of the position, the stop first when one bar
+  reaches both.
+Closed trades are appended to the backtest document in batches, together
+with the cursor so that a later session resumes where this one stopped.
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.bar_store import TIMEFRAME_SECONDS, bar_store, normalize_symbol, normalize_timeframe, to_epoch
+from utils.database import backtests_collection
+from utils.resample import read_bars
+
+WINDOW_BARS = 512
+MAX_WINDOWS = 256           # windows cached for all the sessions of the process
+HISTORY_BARS = 200          # context sent on connect and after a seek
+MIN_SPEED, MAX_SPEED = 1, 1000
+FRAME_INTERVAL = 0.05       # seconds; faster replays send several bars per frame
+MAX_STEP = 500
+FLUSH_TRADES = 20
+FLUSH_INTERVAL = 10         # seconds
+MAX_SESSIONS_PER_USER = 3
+ORDER_TYPES = ("market", "limit", "stop")
+EXIT_REASONS = {"stop_loss": "stop loss", "take_profit": "take profit", "close": "clôture manuelle", "end": "fin du replay"}
+
+_windows = OrderedDict()
+_windows_lock = threading.Lock()
+
+def _window(store, symbol: str, timeframe: str, k: int, version: int) -> dict:
+    """Bars with k*span <= ts < (k+1)*span, shared by every session"""
+    key = (store.root, symbol, timeframe, k, version)
+    with _windows_lock:
+        bars = _windows.get(key)
+        if bars is not None:
+            _windows.move_to_end(key)
+            return bars
+    span = WINDOW_BARS * TIMEFRAME_SECONDS[timeframe]
+    bars = read_bars(symbol, timeframe, start=k * span, end=(k + 1) * span, store=store)
+    with _windows_lock:
+        _windows[key] = bars
+        while len(_windows) > MAX_WINDOWS:
+            _windows.popitem(last=False)
+    return bars
+
+def _data_range(store, symbol: str, timeframe: str):
+    """(first_ts, last_ts) of the series, or of the tier it is resampled from"""
+    stored = store.timeframes(symbol)
+    if timeframe not in stored:
+        finer = [tf for tf in stored if TIMEFRAME_SECONDS[tf] < TIMEFRAME_SECONDS[timeframe]]
+        if not finer:
+            return None
+        timeframe = finer[-1]   # read_bars resamples from the coarsest finer tier
+    bounds = store.bounds(symbol, timeframe)
+    return (bounds[0], bounds[1]) if bounds else None
+
+def _date(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+def _bar(bars: dict, i: int) -> tuple:
+    return (int(bars["ts"][i]), float(bars["open"][i]), float(bars["high"][i]),
+            float(bars["low"][i]), float(bars["close"][i]), float(bars["volume"][i]))
+
+def _fill_price(order: dict, open_: float, high: float, low: float):
+    """Fill price of a pending entry order on a bar, None if not reached"""
+    price, buy = order["price"], order["side"] == "buy"
+    if order["type"] == "market":
+        return open_
+    if order["type"] == "limit":
+        if buy and low <= price:
+            return min(open_, price)
+        if not buy and high >= price:
+            return max(open_, price)
+    else:
+        if buy and high >= price:
+            return max(open_, price)
+        if not buy and low <= price:
+            return min(open_, price)
+    return None
+
+class ReplaySession:
+    __slots__ = ("id", "user_id", "backtest_id", "symbol", "timeframe", "step", "store", "version",
+                 "end_ts", "risk_per_trade", "equity", "speed", "next_ts", "time", "last_close",
+                 "bars", "i", "finished", "order", "position", "close_requested",
+                 "buffer", "flushed_at", "player")
+
+    def __init__(self, backtest: dict, user_id: str, start=None, store=bar_store):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.backtest_id = backtest["_id"]
+        self.symbol = normalize_symbol(backtest["symbol"])
+        self.timeframe = normalize_timeframe(backtest["timeframe"])
+        self.step = TIMEFRAME_SECONDS[self.timeframe]
+        self.store = store
+        data = _data_range(store, self.symbol, self.timeframe)
+        if data is None:
+            raise ValueError(f"Aucune donnée de marché pour {self.symbol}")
+        self.version = store.version(self.symbol)
+
+        end_ts = to_epoch(backtest.get("end_date")) if backtest.get("end_date") else None
+        if end_ts is not None and len(str(backtest["end_date"])) == 10:
+            end_ts += 86400  # a date-only end_date includes that day
+        self.end_ts = min(data[1] + 1, end_ts) if end_ts is not None else data[1] + 1
+        if start is None:
+            start = (backtest.get("replay") or {}).get("cursor") or backtest.get("start_date")
+        start_ts = to_epoch(start) if start is not None else data[0]
+        self.next_ts = min(max(data[0], start_ts), self.end_ts)
+
+        self.risk_per_trade = backtest.get("risk_per_trade") or 1
+        self.equity = (backtest.get("initial_capital") or 10000) + sum(t.get("pnl", 0) for t in backtest.get("trades", []))
+        self.speed = (backtest.get("replay") or {}).get("speed") or 60
+        self.time = None
+        self.last_close = None
+        self.bars, self.i = None, 0
+        self.finished = False
+        self.order = None
+        self.position = None
+        self.close_requested = False
+        self.buffer = []
+        self.flushed_at = time.monotonic()
+        self.player = None
+
+    # --- cursor ---
+
+    def _load(self, ts: int) -> bool:
+        """Position on the first bar at or after ts"""
+        span = WINDOW_BARS * self.step
+        k = ts // span
+        while k * span < self.end_ts:
+            bars = _window(self.store, self.symbol, self.timeframe, k, self.version)
+            i = int(np.searchsorted(bars["ts"], ts))
+            if i < len(bars["ts"]):
+                self.bars, self.i = bars, i
+                return True
+            k += 1
+        self.bars = None
+        return False
+
+    def advance(self, n: int = 1):
+        """Reveal up to n bars; returns (bars, events)"""
+        revealed, events = [], []
+        while len(revealed) < n and not self.finished:
+            if self.bars is None or self.i >= len(self.bars["ts"]):
+                if not self._load(self.next_ts):
+                    self._finish(events)
+                    break
+            bar = _bar(self.bars, self.i)
+            if bar[0] >= self.end_ts:
+                self._finish(events)
+                break
+            self.i += 1
+            self.next_ts = bar[0] + 1
+            events.extend(self._match(bar))
+            self.time, self.last_close = bar[0], bar[4]
+            revealed.append(bar)
+        return revealed, events
+
+    def _finish(self, events: list):
+        self.finished = True
+        self.order = None
+        if self.position:
+            events.append(self._exit(self.last_close, self.time, "end"))
+
+    def history(self) -> list:
+        """Bars before the cursor; the last one is the reference price until the next step"""
+        bars = read_bars(self.symbol, self.timeframe, end=self.next_ts, limit=HISTORY_BARS, store=self.store)
+        history = [_bar(bars, i) for i in range(len(bars["ts"]))]
+        if history and self.time is None:
+            self.time, self.last_close = history[-1][0], history[-1][4]
+        return history
+
+    def seek(self, when) -> list:
+        if self.position or self.order:
+            raise ValueError("Clôturez la position et annulez l'ordre avant de vous déplacer")
+        ts = int(when) if isinstance(when, (int, float)) else to_epoch(when)
+        self.next_ts = min(max(ts, 0), self.end_ts)
+        self.bars, self.finished = None, False
+        self.time = self.last_close = None
+        return self.history()
+
+    def set_speed(self, speed: float):
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            raise ValueError(f"Vitesse entre {MIN_SPEED}x et {MAX_SPEED}x")
+        self.speed = speed
+
+    # --- orders ---
+
+    def place(self, side: str, type: str = "market", price: float = None, stop_loss: float = None,
+              take_profit: float = None, quantity: float = None) -> dict:
+        if self.finished:
+            raise ValueError("Replay terminé")
+        if self.position or self.order:
+            raise ValueError("Une position ou un ordre est déjà en cours")
+        if side not in ("buy", "sell"):
+            raise ValueError("Sens invalide (buy, sell)")
+        if type not in ORDER_TYPES:
+            raise ValueError(f"Type d'ordre invalide ({', '.join(ORDER_TYPES)})")
+        if type != "market" and not (price and price > 0):
+            raise ValueError("Prix requis pour un ordre limit ou stop")
+        if quantity is not None and quantity <= 0:
+            raise ValueError("Quantité invalide")
+        reference = price if type != "market" else self.last_close
+        self._check_protection(side == "buy", reference, stop_loss, take_profit)
+        self.order = {
+            "id": str(uuid.uuid4())[:8], "side": side, "type": type, "price": price,
+            "stop_loss": stop_loss, "take_profit": take_profit, "quantity": quantity
+        }
+        return self.order
+
+    def _check_protection(self, long: bool, reference, stop_loss, take_profit):
+        if reference is None:
+            return
+        if stop_loss is not None and (stop_loss >= reference if long else stop_loss <= reference):
+            raise ValueError("Stop loss du mauvais côté du prix")
+        if take_profit is not None and (take_profit <= reference if long else take_profit >= reference):
+            raise ValueError("Take profit du mauvais côté du prix")
+
+    def protect(self, stop_loss: float = None, take_profit: float = None):
+        if not self.position:
+            raise ValueError("Aucune position ouverte")
+        self._check_protection(self.position["direction"] == "LONG", self.last_close, stop_loss, take_profit)
+        self.position["stop_loss"], self.position["take_profit"] = stop_loss, take_profit
+
+    def cancel(self):
+        if not self.order:
+            raise ValueError("Aucun ordre en attente")
+        self.order = None
+
+    def close(self):
+        if not self.position:
+            raise ValueError("Aucune position ouverte")
+        self.close_requested = True     # at the next bar's open
+
+    def _match(self, bar: tuple) -> list:
+        ts, open_, high, low = bar[:4]
+        events = []
+        if self.position and self.close_requested:
+            events.append(self._exit(open_, ts, "close"))
+        if self.order and not self.position:
+            price = _fill_price(self.order, open_, high, low)
+            if price is not None:
+                events.append(self._enter(price, ts))
+        position = self.position
+        if position:
+            long = position["direction"] == "LONG"
+            sl, tp = position["stop_loss"], position["take_profit"]
+            if sl is not None and (low <= sl if long else high >= sl):
+                events.append(self._exit(min(open_, sl) if long else max(open_, sl), ts, "stop_loss"))
+            elif tp is not None and (high >= tp if long else low <= tp):
+                events.append(self._exit(max(open_, tp) if long else min(open_, tp), ts, "take_profit"))
+        return events
+
+    def _enter(self, price: float, ts: int) -> dict:
+        order, self.order = self.order, None
+        if order["quantity"]:
+            quantity = order["quantity"]
+        elif order["stop_loss"] is not None and order["stop_loss"] != price:
+            quantity = self.equity * self.risk_per_trade / 100 / abs(price - order["stop_loss"])
+        else:
+            quantity = self.equity / price
+        self.position = {
+            "direction": "LONG" if order["side"] == "buy" else "SHORT", "entry_price": price, "entry_ts": ts,
+            "quantity": quantity, "stop_loss": order["stop_loss"], "take_profit": order["take_profit"]
+        }
+        return {"type": "fill", "order_id": order["id"], "price": price, "time": ts, "quantity": quantity}
+
+    def _exit(self, price: float, ts: int, reason: str) -> dict:
+        position, self.position = self.position, None
+        self.close_requested = False
+        sign = 1 if position["direction"] == "LONG" else -1
+        pnl = (price - position["entry_price"]) * position["quantity"] * sign
+        trade = {
+            "id": str(uuid.uuid4()),
+            "entry_date": _date(position["entry_ts"]),
+            "exit_date": _date(ts),
+            "direction": position["direction"],
+            "entry_price": position["entry_price"],
+            "exit_price": price,
+            "pnl": round(pnl, 2),
+            "pnl_percent": round(pnl / self.equity * 100, 2) if self.equity else 0,
+            "notes": f"Replay - {EXIT_REASONS[reason]}",
+            "quantity": position["quantity"],
+            "exit_reason": reason,
+            "source": "replay",
+            "added_at": datetime.now(timezone.utc).isoformat()
+        }
+        self.equity += pnl
+        self.buffer.append(trade)
+        return {"type": "trade", "trade": trade}
+
+    # --- persistence ---
+
+    def flush(self, collection=None, force: bool = False):
+        """Append buffered trades (and the cursor) to the backtest document"""
+        if not self.buffer and not force:
+            return
+        if collection is None:
+            collection = backtests_collection
+        trades, self.buffer = self.buffer, []
+        update = {"$set": {
+            "replay": {"cursor": self.next_ts, "speed": self.speed},
+            "updated_at": datetime.now(timezone.utc)
+        }}
+        if trades:
+            update["$push"] = {"trades": {"$each": trades}}
+            update["$set"]["status"] = "in_progress"
+        collection.update_one({"_id": self.backtest_id, "user_id": self.user_id}, update)
+        self.flushed_at = time.monotonic()
+
+    def state(self) -> dict:
+        return {
+            "type": "state", "symbol": self.symbol, "timeframe": self.timeframe, "time": self.time,
+            "playing": bool(self.player and not self.player.done()), "speed": self.speed,
+            "finished": self.finished, "equity": round(self.equity, 2),
+            "position": self.position, "order": self.order
+        }
+
+    # --- playback ---
+
+    async def play(self, send):
+        """Reveal bars at `speed` x real time until paused (cancelled) or finished"""
+        while not self.finished:
+            delay = self.step / self.speed
+            per_frame = max(1, math.ceil(FRAME_INTERVAL / delay))
+            bars, events = self.advance(per_frame)
+            await send({"type": "bars", "bars": bars, "events": events})
+            if len(self.buffer) >= FLUSH_TRADES or (self.buffer and time.monotonic() - self.flushed_at > FLUSH_INTERVAL):
+                self.flush()
+            await asyncio.sleep(delay * per_frame)
+        self.player = None
+        self.flush()
+        await send(self.state())
+
+class ReplayManager:
+    """Open sessions of this worker"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def open(self, backtest: dict, user_id: str, start=None, store=bar_store) -> ReplaySession:
+        if sum(1 for s in self.sessions.values() if s.user_id == user_id) >= MAX_SESSIONS_PER_USER:
+            raise ValueError(f"Maximum {MAX_SESSIONS_PER_USER} sessions de replay simultanées")
+        session = ReplaySession(backtest, user_id, start, store)
+        self.sessions[session.id] = session
+        return session
+
+    def close(self, session: ReplaySession):
+        self.sessions.pop(session.id, None)
+        if session.player:
+            session.player.cancel()
+        session.flush(force=True)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self.sessions), "windows": len(_windows)}
+
+replay_manager = ReplayManager()
+
+def _handle(session: ReplaySession, message: dict, send):
+    """Apply one client message; returns the frames to send back"""
+    action = message.get("action")
+    if action in ("pause", "step", "seek") and session.player:
+        session.player.cancel()
+        session.player = None
+        session.flush()
+    if action == "play":
+        if session.finished:
+            raise ValueError("Replay terminé")
+        if message.get("speed") is not None:
+            session.set_speed(float(message["speed"]))
+        if session.player:
+            session.player.cancel()
+        session.player = asyncio.create_task(session.play(send))
+        return [session.state()]
+    if action == "speed":
+        session.set_speed(float(message["speed"]))
+        if session.player:
+            session.player.cancel()
+            session.player = asyncio.create_task(session.play(send))
+        return [session.state()]
+    if action == "pause":
+        return [session.state()]
+    if action == "step":
+        bars, events = session.advance(max(1, min(int(message.get("bars", 1)), MAX_STEP)))
+        return [{"type": "bars", "bars": bars, "events": events}, session.state()]
+    if action == "seek":
+        return [{"type": "history", "bars": session.seek(message["time"])}, session.state()]
+    if action == "order":
+        session.place(
+            message.get("side"), message.get("order_type", "market"), message.get("price"),
+            message.get("stop_loss"), message.get("take_profit"), message.get("quantity")
+        )
+        return [session.state()]
+    if action == "protect":
+        session.protect(message.get("stop_loss"), message.get("take_profit"))
+        return [session.state()]
+    if action == "cancel":
+        session.cancel()
+        return [session.state()]
+    if action == "close":
+        session.close()
+        return [session.state()]
+    raise ValueError("Action inconnue (play, pause, speed, step, seek, order, protect, cancel, close)")
+
+async def serve_replay(websocket, backtest_id: str, token: str = None, start: str = None):
+    """WebSocket endpoint body shared by the backtest routers. Client
+    messages are JSON objects with an "action"; the server sends history,
+    bars (with fills and closed trades as events), state and error frames."""
+    from fastapi import HTTPException
+    from starlette.websockets import WebSocketDisconnect
+
+    from utils.auth import get_current_user
+
+    try:
+        user = await get_current_user(f"Bearer {token}" if token else None)
+    except HTTPException as e:
+        await websocket.close(code=4401, reason=e.detail)
+        return
+    backtest = backtests_collection.find_one({"_id": backtest_id, "user_id": user["id"]})
+    if not backtest:
+        await websocket.close(code=4404, reason="Backtest non trouvé")
+        return
+    try:
+        session = replay_manager.open(backtest, user["id"], start)
+    except ValueError as e:
+        await websocket.close(code=4400, reason=str(e))
+        return
+    await websocket.accept()
+
+    lock = asyncio.Lock()
+
+    async def send(message: dict):
+        async with lock:
+            await websocket.send_text(json.dumps(message))
+
+    try:
+        await send({"type": "history", "bars": session.history()})
+        await send(session.state())
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                replies = [{"type": "error", "detail": "Message invalide"}]
+            else:
+                try:
+                    replies = _handle(session, message, send)
+                except ValueError as e:
+                    replies = [{"type": "error", "detail": str(e)}]
+                except (TypeError, KeyError):
+                    replies = [{"type": "error", "detail": "Message invalide"}]
+            for reply in replies:
+                await send(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        replay_manager.close(session)
@@ -0,0 +1,203 @@
+"""
+Multi-timeframe resampling - higher-timeframe OHLCV from base bars with
+session/timezone-aware boundaries, and pre-aggregated tiers in the bar store.
+
+A session maps each bar to a "trading clock" (local time minus the session's
+day start), so buckets line up with the trading day rather than UTC midnight:
+forex days start at 17:00 New York (H4 bars open at 17:00, 21:00, 01:00...),
+exchange sessions start at the open (NYSE H1 bars open at 09:30, 10:30...).
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils.bar_store import (
+    bar_store, BarStore, COLUMNS, TIMEFRAME_SECONDS, normalize_symbol, normalize_timeframe, to_epoch
+)
+
+DAY = 86400
+
+# tz: wall clock of the session, day_start: local time the trading day starts
+# (negative = previous evening), length: session duration (None = around the clock)
+SESSIONS = {
+    "utc": {"tz": "UTC", "day_start": 0, "length": None},
+    "forex": {"tz": "America/New_York", "day_start": -7 * 3600, "length": None},
+    "nyse": {"tz": "America/New_York", "day_start": 9 * 3600 + 1800, "length": 6 * 3600 + 1800},
+    "lse": {"tz": "Europe/London", "day_start": 8 * 3600, "length": 8 * 3600 + 1800},
+}
+
+TIER_TIMEFRAMES = ("M5", "M15", "M30", "H1", "H4", "D1", "W1")
+BASE_TIMEFRAME = "M1"
+
+CRYPTO_PREFIXES = ("BTC", "ETH", "SOL", "XRP", "LTC", "ADA", "DOGE", "BNB")
+
+def session_for(symbol: str) -> str:
+    """Default session of a symbol: crypto trades on UTC days, the rest on the forex day"""
+    symbol = normalize_symbol(symbol)
+    if symbol.startswith(CRYPTO_PREFIXES) or symbol.endswith("USDT"):
+        return "utc"
+    return "forex"
+
+def _get_session(session: str) -> dict:
+    if session not in SESSIONS:
+        raise ValueError(f"Session inconnue: {session} ({', '.join(SESSIONS)})")
+    return SESSIONS[session]
+
+def trading_clock(ts: np.ndarray, session: str) -> np.ndarray:
+    """Seconds on the session's trading clock for each UTC epoch timestamp"""
+    conf = _get_session(session)
+    if conf["tz"] == "UTC":
+        return ts - conf["day_start"]
+    # UTC offsets only change on the hour, so convert one timestamp per run
+    # of bars in the same UTC hour and broadcast the offset
+    hours = ts // 3600
+    runs = np.flatnonzero(np.concatenate(([True], hours[1:] != hours[:-1])))
+    hour_starts = hours[runs] * 3600
+    index = pd.DatetimeIndex(hour_starts.astype("datetime64[s]")).tz_localize("UTC").tz_convert(conf["tz"])
+    offsets = index.tz_localize(None).to_numpy().astype("datetime64[s]").astype(np.int64) - hour_starts
+    return ts + np.repeat(offsets, np.diff(np.append(runs, len(ts)))) - conf["day_start"]
+
+def _bucket_keys(clock: np.ndarray, timeframe: str) -> np.ndarray:
+    """Bucket start on the trading clock (weeks start on the Monday trading day)"""
+    if timeframe == "W1":
+        days = clock // DAY
+        # Epoch day 0 (1970-01-01) was a Thursday
+        return (days - (days + 3) % 7) * DAY
+    step = TIMEFRAME_SECONDS[timeframe]
+    return clock // step * step
+
+def resample(bars: dict, timeframe: str, session: str = "utc") -> dict:
+    """Aggregate sorted OHLCV arrays into `timeframe` bars.
+
+    Buckets are runs of consecutive bars sharing a bucket key, reduced with
+    ufunc.reduceat. Each output bar is stamped with the UTC time of its
+    bucket start (derived from the first bar's UTC offset, so buckets that
+    straddle a DST change stay correct). Bars outside the session's hours
+    are dropped.
+    """
+    timeframe = normalize_timeframe(timeframe)
+    conf = _get_session(session)
+    ts = np.asarray(bars["ts"], dtype=np.int64)
+    if not len(ts):
+        return {name: np.asarray(bars[name])[:0] for name in COLUMNS}
+
+    clock = trading_clock(ts, session)
+    columns = {name: np.asarray(bars[name]) for name in COLUMNS}
+    if conf["length"] is not None:
+        inside = clock % DAY < conf["length"]
+        if not inside.all():
+            clock = clock[inside]
+            columns = {name: arr[inside] for name, arr in columns.items()}
+            if not len(clock):
+                return {name: arr[:0] for name, arr in columns.items()}
+
+    keys = _bucket_keys(clock, timeframe)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(keys)) - 1
+    first_ts = columns["ts"][starts]
+    return {
+        "ts": first_ts - (clock[starts] - keys[starts]),
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+
+# ============== PRE-AGGREGATED TIERS ==============
+# Higher timeframes are persisted in the bar store next to the base data, so
+# a request for years of H4 reads H4 partitions only. tiers.json records the
+# session each symbol's tiers were built with.
+
+def _tiers_path(store: BarStore, symbol: str) -> str:
+    return os.path.join(store.root, normalize_symbol(symbol), "tiers.json")
+
+def tier_info(symbol: str, store: BarStore = bar_store) -> dict:
+    try:
+        with open(_tiers_path(store, symbol)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def build_tiers(symbol: str, since=None, session: str = None, store: BarStore = bar_store,
+                timeframes=TIER_TIMEFRAMES) -> dict:
+    """(Re)build the higher-timeframe tiers of a symbol from its M1 bars.
+
+    With `since`, only buckets from that point on are recomputed: base data
+    is read from two weeks earlier and the first (possibly partial) bucket of
+    each tier is skipped, so existing complete bars are never overwritten
+    with partial ones. Changing the session forces a full rebuild.
+    """
+    symbol = normalize_symbol(symbol)
+    info = tier_info(symbol, store)
+    session = session or (info or {}).get("session") or session_for(symbol)
+    _get_session(session)
+    if info is None or info.get("session") != session:
+        since = None
+
+    read_from = None if since is None else to_epoch(since) - 14 * DAY
+    base = store.read(symbol, BASE_TIMEFRAME, start=read_from)
+    partial_head = read_from is not None and len(store.read(symbol, BASE_TIMEFRAME, end=read_from, limit=1)["ts"]) > 0
+    counts = {}
+    for timeframe in timeframes:
+        bars = resample(base, timeframe, session)
+        if partial_head:
+            bars = {name: arr[1:] for name, arr in bars.items()}
+        counts[timeframe] = store.write(symbol, timeframe, bars)
+
+    os.makedirs(os.path.dirname(_tiers_path(store, symbol)), exist_ok=True)
+    with open(_tiers_path(store, symbol), "w") as f:
+        json.dump({
+            "session": session,
+            "base": BASE_TIMEFRAME,
+            "timeframes": list(timeframes),
+            "built_at": datetime.now(timezone.utc).isoformat()
+        }, f)
+    return counts
+
+def read_bars(symbol: str, timeframe: str, start=None, end=None, limit: int = None,
+              newest: bool = True, store: BarStore = bar_store) -> dict:
+    """Bars for any timeframe: the stored tier when present, otherwise
+    resampled on the fly from the coarsest stored timeframe below it."""
+    symbol = normalize_symbol(symbol)
+    timeframe = normalize_timeframe(timeframe)
+    if store.years(symbol, timeframe):
+        return store.read(symbol, timeframe, start=start, end=end, limit=limit, newest=newest)
+
+    step = TIMEFRAME_SECONDS[timeframe]
+    finer = [tf for tf in store.timeframes(symbol) if TIMEFRAME_SECONDS[tf] < step]
+    if not finer:
+        return store.read(symbol, timeframe, start=start, end=end)
+    source = max(finer, key=TIMEFRAME_SECONDS.get)
+    info = tier_info(symbol, store)
+    session = (info or {}).get("session") or session_for(symbol)
+
+    start_ts, end_ts = to_epoch(start), to_epoch(end)
+    ratio = step // TIMEFRAME_SECONDS[source]
+    # Widen the read so the buckets at both edges are complete
+    margin = (7 * DAY if timeframe == "W1" else step) + DAY
+    capped = limit is not None and (start_ts is None or end_ts is None)
+    base = store.read(
+        symbol, source,
+        start=None if start_ts is None else start_ts - margin,
+        end=None if end_ts is None else end_ts + margin,
+        limit=(limit + 2) * ratio if capped else None,
+        newest=newest
+    )
+    bars = resample(base, timeframe, session)
+    if capped and len(base["ts"]) == (limit + 2) * ratio:
+        # The bucket at the cut is partial
+        bars = {name: (arr[1:] if newest else arr[:-1]) for name, arr in bars.items()}
+    keep = np.ones(len(bars["ts"]), dtype=bool)
+    if start_ts is not None:
+        keep &= bars["ts"] >= start_ts
+    if end_ts is not None:
+        keep &= bars["ts"] < end_ts
+    bars = {name: arr[keep] for name, arr in bars.items()}
+    if limit is not None:
+        window = slice(max(0, len(bars["ts"]) - limit), None) if newest else slice(0, limit)
+        bars = {name: arr[window] for name, arr in bars.items()}
+    return bars
@@ -0,0 +1,487 @@
+"""
+Backtest rule DSL - parses entry/exit rules such as
+    "RSI(14) < 30 and close > EMA(200)"
+    "EMA(20) crosses above EMA(50)"
+    "close > highest(high, 20)[1]"
+and compiles them into a flat plan of vectorized NumPy steps.
+
+Identical subexpressions are compiled to a single step, so indicators shared
+by several rules of a strategy are computed once per evaluation. Compiled
+plans are cached by rule hash. Rules that are not valid DSL (free-text rules
+meant for the AI) are reported with the reason instead of failing the batch.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import indicators as ind
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+# DSL function -> (indicator, output, default params, accepts a source series)
+INDICATOR_FUNCTIONS = {
+    "sma": ("sma", "sma", (20,), True),
+    "ema": ("ema", "ema", (20,), True),
+    "rsi": ("rsi", "rsi", (14,), True),
+    "atr": ("atr", "atr", (14,), False),
+    "bb_upper": ("bollinger", "upper", (20, 2.0), False),
+    "bb_middle": ("bollinger", "middle", (20, 2.0), False),
+    "bb_lower": ("bollinger", "lower", (20, 2.0), False),
+    "macd": ("macd", "macd", (12, 26, 9), False),
+    "macd_signal": ("macd", "signal", (12, 26, 9), False),
+    "macd_hist": ("macd", "histogram", (12, 26, 9), False),
+    "vwap": ("vwap", "vwap", (), False),
+}
+# Series functions: name -> number of integer params after the series
+SERIES_FUNCTIONS = {"highest": 1, "lowest": 1, "change": 1, "abs": 0}
+
+KEYWORDS = {"and": "and", "et": "and", "or": "or", "ou": "or", "not": "not", "non": "not"}
+COMPARISONS = {"<", "<=", ">", ">=", "==", "!="}
+
+PLAN_CACHE_SIZE = 512
+
+_TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d+)?)|([A-Za-z_][A-Za-z0-9_]*)|(<=|>=|==|!=|[<>+\-*/()\[\],]))")
+
+class RuleError(ValueError):
+    def __init__(self, message: str, position: int = None):
+        super().__init__(message)
+        self.position = position
+
+def normalize_rule(rule: str) -> str:
+    return " ".join(rule.strip().lower().split())
+
+# ============== PARSER ==============
+
+def _tokenize(text: str) -> list:
+    tokens, pos = [], 0
+    while pos < len(text):
+        if text[pos:].strip() == "":
+            break
+        match = _TOKEN.match(text, pos)
+        if not match:
+            offset = len(text[pos:]) - len(text[pos:].lstrip())
+            raise RuleError(f"Caractère inattendu '{text[pos + offset]}'", pos + offset)
+        number, name, op = match.groups()
+        start = match.start(match.lastindex)
+        if number is not None:
+            tokens.append(("num", float(number), start))
+        elif name is not None:
+            tokens.append(("name", name.lower(), start))
+        else:
+            tokens.append(("op", op, start))
+        pos = match.end()
+    tokens.append(("end", None, len(text)))
+    return tokens
+
+class _Parser:
+    """Recursive descent; nodes are hashable tuples tagged with their type
+    ('num' or 'bool') so invalid rules fail at compile time."""
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self, offset: int = 0):
+        return self.tokens[min(self.i + offset, len(self.tokens) - 1)]
+
+    def take(self):
+        token = self.tokens[self.i]
+        self.i += 1
+        return token
+
+    def expect(self, value):
+        token = self.take()
+        if token[1] != value:
+            found = "la fin de la règle" if token[0] == "end" else f"'{token[1]}'"
+            raise RuleError(f"'{value}' attendu, {found} trouvé", token[2])
+        return token
+
+    def is_keyword(self, keyword: str) -> bool:
+        token = self.peek()
+        return token[0] == "name" and KEYWORDS.get(token[1]) == keyword
+
+    def parse(self):
+        node = self.parse_or()
+        token = self.peek()
+        if token[0] != "end":
+            raise RuleError(f"'{token[1]}' inattendu", token[2])
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.is_keyword("or"):
+            position = self.take()[2]
+            node = ("bool", "or", self._bool(node, position), self._bool(self.parse_and(), position))
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.is_keyword("and"):
+            position = self.take()[2]
+            node = ("bool", "and", self._bool(node, position), self._bool(self.parse_not(), position))
+        return node
+
+    def parse_not(self):
+        if self.is_keyword("not"):
+            position = self.take()[2]
+            return ("bool", "not", self._bool(self.parse_not(), position))
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_sum()
+        token = self.peek()
+        if token[0] == "op" and token[1] in COMPARISONS:
+            self.take()
+            right = self.parse_sum()
+            return ("bool", token[1], self._num(left, token[2]), self._num(right, token[2]))
+        if token[0] == "name" and token[1] in ("crosses", "cross"):
+            self.take()
+            direction = self.take()
+            if direction[1] not in ("above", "below"):
+                raise RuleError("'crosses above' ou 'crosses below' attendu", direction[2])
+            right = self.parse_sum()
+            return ("bool", "cross_" + direction[1], self._num(left, token[2]), self._num(right, token[2]))
+        return left
+
+    def parse_sum(self):
+        node = self.parse_product()
+        while self.peek()[1] in ("+", "-") and self.peek()[0] == "op":
+            _, op, position = self.take()
+            node = ("num", op, self._num(node, position), self._num(self.parse_product(), position))
+        return node
+
+    def parse_product(self):
+        node = self.parse_unary()
+        while self.peek()[1] in ("*", "/") and self.peek()[0] == "op":
+            _, op, position = self.take()
+            node = ("num", op, self._num(node, position), self._num(self.parse_unary(), position))
+        return node
+
+    def parse_unary(self):
+        if self.peek()[0] == "op" and self.peek()[1] == "-":
+            position = self.take()[2]
+            node = self.parse_unary()
+            if node[1] == "const":
+                return ("num", "const", -node[2])
+            return ("num", "neg", self._num(node, position))
+        return self.parse_postfix()
+
+    def parse_postfix(self):
+        node = self.parse_primary()
+        while self.peek()[0] == "op" and self.peek()[1] == "[":
+            self.take()
+            offset = self._int(self.take(), "Décalage")
+            self.expect("]")
+            if offset:
+                node = (node[0], "shift", node, offset)
+        return node
+
+    def parse_primary(self):
+        token = self.take()
+        kind, value, position = token
+        if kind == "num":
+            return ("num", "const", value)
+        if kind == "op" and value == "(":
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        if kind == "name":
+            if value in COLUMNS:
+                return ("num", "col", value)
+            if value == "price":
+                return ("num", "col", "close")
+            if value in INDICATOR_FUNCTIONS or value in SERIES_FUNCTIONS:
+                return self.parse_call(value, position)
+            if value in KEYWORDS or value in ("crosses", "cross"):
+                raise RuleError(f"'{value}' inattendu", position)
+            raise RuleError(f"Fonction ou série inconnue '{value}'", position)
+        found = "la fin de la règle" if kind == "end" else f"'{value}'"
+        raise RuleError(f"Expression attendue, {found} trouvé", position)
+
+    def parse_args(self) -> list:
+        args = []
+        if self.peek()[0] == "op" and self.peek()[1] == "(":
+            self.take()
+            if not (self.peek()[0] == "op" and self.peek()[1] == ")"):
+                args.append(self.parse_sum())
+                while self.peek()[0] == "op" and self.peek()[1] == ",":
+                    self.take()
+                    args.append(self.parse_sum())
+            self.expect(")")
+        return args
+
+    def parse_call(self, name: str, position: int):
+        args = self.parse_args()
+        if name in SERIES_FUNCTIONS:
+            expected = SERIES_FUNCTIONS[name]
+            if name == "change" and len(args) == 1:
+                args.append(("num", "const", 1.0))
+            if len(args) != expected + 1:
+                raise RuleError(f"{name}() attend une série et {expected} paramètre(s)", position)
+            params = tuple(self._int_node(arg, name, position) for arg in args[1:])
+            return ("num", name, self._num(args[0], position), *params)
+
+        indicator, output, defaults, accepts_source = INDICATOR_FUNCTIONS[name]
+        source = None
+        if accepts_source and args and args[0][1] != "const":
+            source = self._num(args[0], position)
+            args = args[1:]
+        if any(arg[1] != "const" for arg in args):
+            raise RuleError(f"Les paramètres de {name}() doivent être des nombres", position)
+        try:
+            params = ind.parse_params(indicator, [arg[2] for arg in args])
+        except ValueError as e:
+            raise RuleError(str(e), position)
+        if source is not None and source != ("num", "col", "close"):
+            return ("num", "derived", indicator, output, params, source)
+        return ("num", "ind", indicator, output, params)
+
+    def _int(self, token, label: str) -> int:
+        if token[0] != "num" or token[1] != int(token[1]):
+            raise RuleError(f"{label} entier attendu", token[2])
+        return int(token[1])
+
+    def _int_node(self, node, name: str, position: int) -> int:
+        if node[1] != "const" or node[2] != int(node[2]) or node[2] <= 0:
+            raise RuleError(f"{name}() attend une période entière positive", position)
+        return int(node[2])
+
+    def _num(self, node, position: int):
+        if node[0] != "num":
+            raise RuleError("Une valeur numérique est attendue ici, pas une condition", position)
+        return node
+
+    def _bool(self, node, position: int):
+        if node[0] != "bool":
+            raise RuleError("Une condition est attendue ici (comparaison, croisement...)", position)
+        return node
+
+def parse_rule(rule: str):
+    node = _Parser(normalize_rule(rule)).parse()
+    if node[0] != "bool":
+        raise RuleError("La règle doit être une condition (ex: RSI(14) < 30)", 0)
+    return node
+
+# ============== PLAN ==============
+
+def _shift(values: np.ndarray, offset: int) -> np.ndarray:
+    out = np.empty_like(values)
+    fill = False if values.dtype == bool else np.nan
+    out[:offset] = fill
+    out[offset:] = values[:-offset]
+    return out
+
+def _rolling(values: np.ndarray, period: int, ufunc) -> np.ndarray:
+    """Rolling max/min in O(n log period): extremes over doubling windows,
+    then two overlapping power-of-two windows cover each period."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < period:
+        return out
+    span, current = 1, values
+    while span * 2 <= period:
+        # current[i] = extreme of values[i - 2*span + 1 .. i]
+        current = np.concatenate((current[:span], ufunc(current[span:], current[:-span])))
+        span *= 2
+    out[period - 1:] = ufunc(current[period - 1:], current[span - 1:n - period + span])
+    return out
+
+_BINARY = {
+    "+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide,
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal, "and": np.logical_and, "or": np.logical_or,
+}
+
+class Plan:
+    """Compiled rules: a topologically ordered list of unique steps.
+
+    `rules` reports, per input rule, whether it compiled and why not.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = []
+        self.steps = []
+        self._index = {}
+        self.outputs = []
+        for rule in rules:
+            try:
+                node = parse_rule(rule)
+            except RuleError as e:
+                self.rules.append({"rule": rule, "supported": False, "error": str(e), "position": e.position})
+                self.outputs.append(None)
+                continue
+            self.rules.append({"rule": rule, "supported": True, "error": None, "position": None})
+            self.outputs.append(self._add(node))
+
+    def _add(self, node) -> int:
+        """Post-order insert with hash-consing: equal subtrees share one step"""
+        if node in self._index:
+            return self._index[node]
+        op = node[1]
+        if op in ("const", "col", "ind"):
+            step = (op, node[2:])
+        elif op == "derived":
+            step = (op, node[2:5], self._add(node[5]))
+        elif op in ("shift", "highest", "lowest", "change"):
+            step = (op, self._add(node[2]), node[3])
+        elif op in ("neg", "abs", "not"):
+            step = (op, self._add(node[2]))
+        else:
+            step = (op, self._add(node[2]), self._add(node[3]))
+        self.steps.append(step)
+        self._index[node] = len(self.steps) - 1
+        return self._index[node]
+
+    def evaluate(self, bars: dict, provider=None) -> list:
+        """Boolean arrays per rule (None for unsupported rules).
+
+        `provider(indicator, params)` may return precomputed indicator outputs
+        (e.g. from the IndicatorCache); otherwise they are computed here, once
+        per (indicator, params) even when several outputs are used.
+        """
+        n = len(bars["close"])
+        computed = {}
+
+        def indicator(name, params):
+            key = (name, params)
+            if key not in computed:
+                if provider is not None:
+                    result = provider(name, params)
+                else:
+                    result = ind.INDICATORS[name][0](bars, *params)
+                computed[key] = result if isinstance(result, dict) else {name: result}
+            return computed[key]
+
+        values = []
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for step in self.steps:
+                op = step[0]
+                if op == "const":
+                    values.append(np.float64(step[1][0]))
+                elif op == "col":
+                    values.append(np.asarray(bars[step[1][0]], dtype=np.float64))
+                elif op == "ind":
+                    name, output, params = step[1]
+                    values.append(indicator(name, params)[output])
+                elif op == "derived":
+                    # Indicator over a computed series, e.g. SMA(volume, 20)
+                    name, _, params = step[1]
+                    source = np.broadcast_to(values[step[2]], (n,))
+                    values.append(ind.INDICATORS[name][0]({"close": source}, *params))
+                elif op == "shift":
+                    values.append(_shift(np.broadcast_to(values[step[1]], (n,)), step[2]))
+                elif op == "highest":
+                    values.append(_rolling(np.broadcast_to(values[step[1]], (n,)), step[2], np.maximum))
+                elif op == "lowest":
+                    values.append(_rolling(np.broadcast_to(values[step[1]], (n,)), step[2], np.minimum))
+                elif op == "change":
+                    series = np.broadcast_to(values[step[1]], (n,))
+                    values.append(series - _shift(series, step[2]))
+                elif op == "neg":
+                    values.append(-values[step[1]])
+                elif op == "abs":
+                    values.append(np.abs(values[step[1]]))
+                elif op == "not":
+                    values.append(~values[step[1]])
+                elif op in ("cross_above", "cross_below"):
+                    a = np.broadcast_to(values[step[1]], (n,))
+                    b = np.broadcast_to(values[step[2]], (n,))
+                    above = a > b if op == "cross_above" else a < b
+                    values.append(above & _shift(a <= b if op == "cross_above" else a >= b, 1))
+                else:
+                    values.append(_BINARY[op](values[step[1]], values[step[2]]))
+
+        return [
+            None if index is None else np.broadcast_to(values[index], (n,))
+            for index in self.outputs
+        ]
+
+# ============== PLAN CACHE ==============
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+def rules_hash(rules: list) -> str:
+    return hashlib.sha1("\n".join(normalize_rule(r) for r in rules).encode()).hexdigest()
+
+def compile_rules(rules: list) -> Plan:
+    """Compiled plan for a list of rules, cached by their normalized hash"""
+    key = rules_hash(rules)
+    with _plans_lock:
+        if key in _plans:
+            _plans.move_to_end(key)
+            return _plans[key]
+    plan = Plan(list(rules))
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+def strategy_signals(entry_rules: list, exit_rules: list, bars: dict, provider=None) -> dict:
+    """Entry = all supported entry rules true, exit = any supported exit rule true.
+
+    Entry and exit rules are compiled into one plan so indicators they share
+    are computed once.
+    """
+    plan = compile_rules(list(entry_rules) + list(exit_rules))
+    results = plan.evaluate(bars, provider)
+    n = len(bars["close"])
+    entry_results = [r for r in results[:len(entry_rules)] if r is not None]
+    exit_results = [r for r in results[len(entry_rules):] if r is not None]
+    entry = np.logical_and.reduce(entry_results) if entry_results else np.zeros(n, dtype=bool)
+    exit_ = np.logical_or.reduce(exit_results) if exit_results else np.zeros(n, dtype=bool)
+    return {
+        "entry": entry,
+        "exit": exit_,
+        "entry_rules": plan.rules[:len(entry_rules)],
+        "exit_rules": plan.rules[len(entry_rules):],
+    }
+
+def backtest_signals(backtest: dict, max_signals: int = 500) -> dict:
+    """Evaluate a backtest's rules on stored market data over its date range.
+
+    Rules are evaluated on the whole series (so indicator warm-up does not
+    depend on the range) with indicators served from the IndicatorCache.
+    """
+    from fastapi import HTTPException
+
+    from utils.bar_store import bar_store, normalize_symbol, normalize_timeframe, to_epoch
+    from utils.indicators import indicator_cache
+    from utils.resample import read_bars
+
+    try:
+        symbol = normalize_symbol(backtest["symbol"])
+        timeframe = normalize_timeframe(backtest["timeframe"])
+        start, end = to_epoch(backtest["start_date"]), to_epoch(backtest["end_date"])
+        if len(str(backtest["end_date"])) == 10:
+            end += 86400  # a date-only end_date includes that day
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not bar_store.timeframes(symbol):
+        raise HTTPException(404, f"Aucune donnée de marché pour {symbol}")
+
+    bars = read_bars(symbol, timeframe)
+    signals = strategy_signals(
+        backtest.get("entry_rules", []), backtest.get("exit_rules", []), bars,
+        provider=lambda name, params: indicator_cache.get(symbol, timeframe, name, params)[1]
+    )
+    lo, hi = np.searchsorted(bars["ts"], [start, end])
+    ts = bars["ts"][lo:hi]
+    entries = ts[signals["entry"][lo:hi]]
+    exits = ts[signals["exit"][lo:hi]]
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "bars": int(hi - lo),
+        "entry_rules": signals["entry_rules"],
+        "exit_rules": signals["exit_rules"],
+        "entry_signals": int(len(entries)),
+        "exit_signals": int(len(exits)),
+        "entries": entries[:max_signals].tolist(),
+        "exits": exits[:max_signals].tolist()
+    }
@@ -0,0 +1,214 @@
+"""
+Scheduler - periodic jobs on cron expressions, one run per occurrence
+across all the server processes.
+
+Every process registers the same jobs. When an occurrence is due (plus a
+random jitter, so the processes do not all wake at once) each process
+tries to claim it with one conditional update of the job's document in
+scheduler_jobs: the claim only succeeds if that occurrence was not run yet
+and no earlier run still holds the lease. The winner renews the lease
+while the job runs, then records the run in scheduler_runs (history, TTL)
+and its outcome on the job document, which the status endpoint reads.
+An occurrence missed while every process was down is not caught up.
+"""
+import asyncio
+import inspect
+import os
+import random
+import socket
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from utils.database import scheduler_jobs_collection, scheduler_runs_collection
+
+ALIASES = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@weekly": "0 0 * * 0", "@monthly": "0 0 1 * *"}
+FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+LEASE = 600                 # seconds, renewed while the job runs
+RUN_HISTORY_DAYS = 30
+
+def parse_field(field: str, low: int, high: int) -> list:
+    values = set()
+    for part in field.split(","):
+        span, _, step = part.partition("/")
+        if span == "*":
+            start, end = low, high
+        elif "-" in span:
+            start, end = (int(v) for v in span.split("-", 1))
+        else:
+            start = int(span)
+            end = high if step else start
+        step = int(step) if step else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Champ cron invalide: {field}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+class Cron:
+    """Five-field cron expression (minute hour day-of-month month day-of-week,
+    Sunday = 0 or 7), evaluated in UTC"""
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        parts = ALIASES.get(expr.strip(), expr).split()
+        if len(parts) != 5:
+            raise ValueError(f"Expression cron invalide: {expr}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_field(part, low, high) for part, (low, high) in zip(parts, FIELDS)
+        )
+        self.weekdays = {d % 7 for d in weekdays}
+        self.any_day, self.any_weekday = parts[2] == "*", parts[4] == "*"
+
+    def matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = day.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week          # both restricted: either one (cron semantics)
+
+    def next(self, after: datetime) -> datetime:
+        """First occurrence strictly after `after`"""
+        t = after.astimezone(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 5):
+            if self.matches_day(t.date()):
+                for hour in self.hours:
+                    if hour < t.hour:
+                        continue
+                    for minute in self.minutes:
+                        if hour > t.hour or minute >= t.minute:
+                            return t.replace(hour=hour, minute=minute)
+            t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f"Expression cron sans occurrence: {self.expr}")
+
+class Job:
+    def __init__(self, name: str, cron: str, func, jitter: float = 0, lease: int = LEASE):
+        self.name = name
+        self.cron = Cron(cron)
+        self.func = func
+        self.jitter = jitter
+        self.lease = lease
+        self.next_run = None
+
+class Scheduler:
+    def __init__(self):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs = {}
+        self._tasks = []
+
+    def add(self, name: str, cron: str, func, jitter: float = 0, lease: int = LEASE):
+        """Run func (sync functions in a thread) on every occurrence of cron,
+        up to `jitter` seconds late"""
+        self.jobs[name] = Job(name, cron, func, jitter, lease)
+
+    def _claim(self, job: Job, slot: datetime) -> bool:
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        try:
+            scheduler_jobs_collection.update_one(
+                {"_id": job.name, "$and": [
+                    {"$or": [{"slot": {"$lt": slot}}, {"slot": {"$exists": False}}]},
+                    {"$or": [{"locked_until": {"$lt": now}}, {"locked_until": {"$exists": False}}]}
+                ]},
+                {"$set": {"slot": slot, "worker": self.worker, "locked_until": now + timedelta(seconds=job.lease)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False                # run (or running) elsewhere
+
+    async def _heartbeat(self, job: Job):
+        while True:
+            await asyncio.sleep(job.lease / 3)
+            await asyncio.to_thread(
+                scheduler_jobs_collection.update_one,
+                {"_id": job.name, "worker": self.worker},
+                {"$set": {"locked_until": datetime.now(timezone.utc) + timedelta(seconds=job.lease)}}
+            )
+
+    async def run(self, job: Job, slot: datetime) -> dict:
+        """Run one claimed occurrence and record it"""
+        started, start = datetime.now(timezone.utc), time.perf_counter()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        result, error = None, None
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                result = await job.func()
+            else:
+                result = await asyncio.to_thread(job.func)
+        except Exception as e:
+            error = repr(e)
+            print(f"⚠️ Job {job.name} failed:", error)
+        finally:
+            heartbeat.cancel()
+        finished = datetime.now(timezone.utc)
+        run = {
+            "job": job.name,
+            "slot": slot,
+            "worker": self.worker,
+            "started_at": started,
+            "finished_at": finished,
+            "duration": round(time.perf_counter() - start, 3),
+            "status": "error" if error else "ok",
+            "error": error,
+            "result": result if isinstance(result, (int, float, str, list, dict)) else None
+        }
+        scheduler_runs_collection.insert_one(run)
+        scheduler_jobs_collection.update_one({"_id": job.name, "worker": self.worker}, {"$set": {
+            "locked_until": finished,
+            "last_run": {k: run[k] for k in ("started_at", "duration", "status", "error")}
+        }})
+        return run
+
+    async def _job_loop(self, job: Job):
+        while True:
+            slot = job.cron.next(datetime.now(timezone.utc))
+            job.next_run = slot
+            delay = (slot - datetime.now(timezone.utc)).total_seconds() + random.uniform(0, job.jitter)
+            await asyncio.sleep(max(delay, 0))
+            try:
+                if await asyncio.to_thread(self._claim, job, slot):
+                    await self.run(job, slot)
+            except Exception as e:
+                print(f"⚠️ Job {job.name} not run:", repr(e))
+
+    def status(self) -> list:
+        """Every job with its schedule, next run and last run"""
+        now = datetime.now(timezone.utc)
+        docs = {d["_id"]: d for d in scheduler_jobs_collection.find({"_id": {"$in": list(self.jobs)}})}
+        result = []
+        for name, job in self.jobs.items():
+            doc = docs.get(name, {})
+            locked_until = doc.get("locked_until")
+            if locked_until and locked_until.tzinfo is None:
+                locked_until = locked_until.replace(tzinfo=timezone.utc)
+            last_run = doc.get("last_run")
+            result.append({
+                "name": name,
+                "cron": job.cron.expr,
+                "next_run": (job.next_run or job.cron.next(now)).isoformat(),
+                "running": bool(locked_until and locked_until > now),    # the lease is released when a run ends
+                "worker": doc.get("worker"),
+                "last_run": last_run and {
+                    "started_at": last_run["started_at"].isoformat(),
+                    "duration": last_run["duration"],
+                    "status": last_run["status"],
+                    "error": last_run["error"]
+                }
+            })
+        return result
+
+    def history(self, name: str, limit: int = 20) -> list:
+        runs = scheduler_runs_collection.find({"job": name}, {"_id": 0}).sort("started_at", -1).limit(limit)
+        return [{**run, **{k: run[k].isoformat() for k in ("slot", "started_at", "finished_at")}} for run in runs]
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._job_loop(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+scheduler = Scheduler()
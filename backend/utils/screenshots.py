@@ -0,0 +1,200 @@
+"""
+Screenshot preprocessing - chart captures reduced to what the vision model
+actually sees before they are uploaded.
+
+The model never looks at more than its effective resolution: an image is
+fitted in a MAX_SIDE square, then its short side brought down to
+SHORT_SIDE, and billed per 512 px tile. process() does that on our side,
+so a 4K capture no longer costs a multi-megabyte upload:
+1. decode (encoded size and pixel count checked first);
+2. crop the uniform margins around the chart (empty background, borders),
+   found against the corner colour with a small tolerance;
+3. downscale to the effective resolution (never upscale), within the tile
+   grid of the uncropped capture: a crop changes the aspect ratio and must
+   not cost more tiles than it saves;
+4. re-encode as WebP, unless the upload was already smaller.
+Results are cached by hash of the uploaded content in an LRU bounded in
+bytes (the same screenshot is often analyzed again with other notes).
+prepare() runs the work on a small thread pool - Pillow releases the GIL
+while decoding, resizing and encoding - off the event loop.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_SIDE = 2048
+SHORT_SIDE = 768
+TILE = 512
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_PIXELS = 50_000_000
+MARGIN_TOLERANCE = 12           # per channel, against the corner colour
+MARGIN_PAD = 8                  # px kept around the chart
+WEBP_QUALITY = 80
+WEBP_METHOD = 2                 # 4+ saves ~15% more bytes for 2-3x the time
+MARGIN_SCAN_REDUCE = 4          # margins found on a reduced copy
+KEPT_FORMATS = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "GIF": "image/gif"}
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+SCREENSHOT_WORKERS = int(os.environ.get("SCREENSHOT_WORKERS", min(4, os.cpu_count() or 1)))
+
+def effective_size(width: int, height: int) -> tuple:
+    """Size the model works at: fitted in MAX_SIDE, short side at most SHORT_SIDE"""
+    scale = min(1.0, MAX_SIDE / max(width, height), SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def tiles(width: int, height: int) -> tuple:
+    """Columns and rows of TILE px tiles the model splits an image in"""
+    width, height = effective_size(width, height)
+    return -(-width // TILE), -(-height // TILE)
+
+def target_size(width: int, height: int, frame: tuple) -> tuple:
+    """Effective size of a crop, kept within the tile grid of the full frame"""
+    width, height = effective_size(width, height)
+    cols, rows = tiles(*frame)
+    scale = min(1.0, cols * TILE / width, rows * TILE / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def vision_tokens(width: int, height: int) -> int:
+    """Input tokens of an image in high detail (85 + 170 per tile)"""
+    cols, rows = tiles(width, height)
+    return 85 + 170 * cols * rows
+
+def strip_data_url(data: str) -> str:
+    """The base64 payload of a data URL or of bare base64"""
+    return data.split(",", 1)[1] if data.startswith("data:") else data
+
+def content_box(image, tolerance: int = MARGIN_TOLERANCE, pad: int = MARGIN_PAD, reduce: int = MARGIN_SCAN_REDUCE):
+    """Box of the content inside uniform margins (corner colour), or None"""
+    from PIL import Image, ImageChops
+
+    scan = image.reduce(reduce) if reduce > 1 and min(image.size) >= reduce * 64 else image
+    factor = image.width / scan.width
+    background = Image.new(scan.mode, scan.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(scan, background).convert("L").point(lambda v: 255 if v > tolerance else 0)
+    box = diff.getbbox()
+    if box is None:
+        return None
+    left, top, right, bottom = (round(v * factor) for v in box)
+    return (max(0, left - pad), max(0, top - pad), min(image.width, right + pad), min(image.height, bottom + pad))
+
+def preprocess(raw: bytes) -> dict:
+    """Crop, downscale and re-encode one screenshot:
+    {"data" (base64), "media_type", "width", "height", "bytes_in", "bytes_out"}"""
+    from PIL import Image
+
+    if len(raw) > MAX_UPLOAD_BYTES:
+        raise ValueError("Screenshot trop volumineux")
+    try:
+        image = Image.open(io.BytesIO(raw))
+        source_format = image.format
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError("Screenshot trop grand")
+        image.draft("RGB", effective_size(*image.size))     # JPEG: decode at a reduced scale
+        image = image.convert("RGB")
+    except ValueError:
+        raise
+    except Exception:
+        raise ValueError("Screenshot illisible")
+
+    frame = image.size
+    box = content_box(image)
+    if box and box != (0, 0, image.width, image.height):
+        image = image.crop(box)
+    size = target_size(*image.size, frame)
+    if size != image.size:
+        # integer box reduction first, Lanczos for the rest
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=1.0)
+
+    out = io.BytesIO()
+    image.save(out, "WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD)
+    encoded, media_type = out.getvalue(), "image/webp"
+    if len(raw) <= len(encoded) and source_format in KEPT_FORMATS:
+        encoded, media_type = raw, KEPT_FORMATS[source_format]
+    return {
+        "data": base64.b64encode(encoded).decode(),
+        "media_type": media_type,
+        "width": image.width,
+        "height": image.height,
+        "bytes_in": len(raw),
+        "bytes_out": len(encoded)
+    }
+
+class ScreenshotProcessor:
+    """Cached preprocessing and a lazily started thread pool"""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, workers: int = SCREENSHOT_WORKERS):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+        self.processed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="screenshot")
+        return self._pool
+
+    def process(self, data: str) -> dict:
+        """Preprocessed screenshot from base64 (or a data URL); ValueError if unusable"""
+        payload = strip_data_url(data).strip()
+        key = hashlib.sha256(payload.encode()).hexdigest()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        start = time.perf_counter()
+        try:
+            raw = base64.b64decode(payload)
+        except ValueError:
+            raise ValueError("Screenshot illisible")
+        result = preprocess(raw)
+        with self._lock:
+            self.processed += 1
+            self.seconds += time.perf_counter() - start
+            self.bytes_in += result["bytes_in"]
+            self.bytes_out += result["bytes_out"]
+            if key not in self._entries:
+                self._entries[key] = result
+                self._bytes += len(result["data"])
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= len(old["data"])
+        return result
+
+    async def prepare(self, data: str) -> dict:
+        """process() on the thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), self.process, data)
+
+    def stats(self) -> dict:
+        """Cache counters, bytes saved and mean processing time"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached": len(self._entries),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "saved_ratio": round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0,
+            "mean_ms": round(self.seconds / self.processed * 1000, 1) if self.processed else 0
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+screenshot_processor = ScreenshotProcessor()
@@ -0,0 +1,175 @@
+"""
+Seasons - monthly competitions, rolled automatically.
+
+roll() runs on the scheduler (ROLL_CRON): it closes every active season
+whose end_date has passed and opens the season of the current month.
+Closing a season:
+1. claims it (active -> status "closing", one conditional update, so a
+   single worker closes it);
+2. computes the final standings with one aggregation over the season's
+   closed trades (P&L per user, sorted, name and level joined with
+   $lookup) and archives them in season_standings in bulk batches;
+3. freezes the top 50 in the season document and pays the rank rewards:
+   xp_bonus through the XP ledger and badges in user_badges, in bulk and
+   keyed by season and user, so a retried close pays nothing twice. The
+   final top 10 also unlocks the "Top 10" achievement.
+Past seasons are then read from season_standings without touching trades.
+"""
+from datetime import datetime, timedelta, timezone
+
+from utils.database import (
+    insert_new, season_standings_collection, seasons_collection, trades_collection,
+    user_badges_collection
+)
+
+MONTHS = ["Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
+          "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
+DEFAULT_REWARDS = [
+    {"rank": 1, "title": "Champion de la Saison", "xp_bonus": 5000, "badge": "season_champion"},
+    {"rank": 2, "title": "Vice-Champion", "xp_bonus": 3000, "badge": "season_silver"},
+    {"rank": 3, "title": "Médaille de Bronze", "xp_bonus": 2000, "badge": "season_bronze"},
+    {"rank_range": [4, 10], "title": "Top 10", "xp_bonus": 1000, "badge": "season_top10"},
+    {"rank_range": [11, 50], "title": "Top 50", "xp_bonus": 500, "badge": "season_top50"}
+]
+FROZEN_RANKS = 50
+TOP10_ACHIEVEMENT = "ach_leaderboard_top10"
+STANDINGS_BATCH = 1000
+ROLL_CRON = "*/5 * * * *"
+STALE_CLOSE = timedelta(hours=1)    # a close interrupted longer ago is retried
+
+def season_doc(now: datetime, rewards: list = None) -> dict:
+    """The season of the month containing now"""
+    start = now.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return {
+        "_id": f"season_{start:%Y_%m}",
+        "name": f"Saison {MONTHS[start.month - 1]} {start.year}",
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "active": True,
+        "status": "active",
+        "rewards": rewards or DEFAULT_REWARDS
+    }
+
+def reward_for(rewards: list, rank: int):
+    for reward in rewards:
+        low, high = reward.get("rank_range") or (reward.get("rank"), reward.get("rank"))
+        if low is not None and low <= rank <= high:
+            return reward
+    return None
+
+def standings_pipeline(start: datetime, end: datetime = None, limit: int = None) -> list:
+    """Ranking: closed-trade P&L per user since start (until end), best first,
+    with name and level"""
+    created = {"$gte": start, "$lt": end} if end else {"$gte": start}
+    return [
+        {"$match": {"status": "closed", "created_at": created}},
+        {"$group": {
+            "_id": "$user_id",
+            "total_pnl": {"$sum": {"$ifNull": ["$pnl", 0]}},
+            "trades_count": {"$sum": 1},
+            "wins": {"$sum": {"$cond": [{"$gt": [{"$ifNull": ["$pnl", 0]}, 0]}, 1, 0]}}
+        }},
+        {"$sort": {"total_pnl": -1, "trades_count": -1, "_id": 1}},
+        *([{"$limit": limit}] if limit else []),
+        {"$lookup": {"from": "users", "localField": "_id", "foreignField": "_id", "as": "user"}},
+        {"$unwind": "$user"},
+        {"$project": {
+            "total_pnl": 1, "trades_count": 1, "wins": 1,
+            "name": {"$ifNull": ["$user.name", "Anonyme"]}, "level": {"$ifNull": ["$user.level", 1]}
+        }}
+    ]
+
+def standing(season_id: str, rank: int, row: dict, rewards: list) -> dict:
+    doc = {
+        "_id": f"{season_id}:{row['_id']}",
+        "season_id": season_id,
+        "user_id": row["_id"],
+        "rank": rank,
+        "name": row["name"],
+        "level": row["level"],
+        "total_pnl": round(row["total_pnl"], 2),
+        "trades_count": row["trades_count"],
+        "winrate": round(row["wins"] / row["trades_count"] * 100, 1) if row["trades_count"] else 0
+    }
+    reward = reward_for(rewards, rank)
+    if reward:
+        doc["reward"] = {k: reward[k] for k in ("title", "xp_bonus", "badge") if k in reward}
+    return doc
+
+class SeasonService:
+    def roll(self, now: datetime = None) -> list:
+        """Close the seasons that ended, open the current one; returns the ids closed"""
+        now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        closed = []
+        for season in seasons_collection.find({"active": True, "end_date": {"$lte": now.isoformat()}}, {"_id": 1}):
+            if self.close(season["_id"], now):
+                closed.append(season["_id"])
+        for season in seasons_collection.find({"status": "closing", "closing_at": {"$lt": now - STALE_CLOSE}}, {"_id": 1}):
+            self._finalize(seasons_collection.find_one({"_id": season["_id"]}), now)
+            closed.append(season["_id"])
+
+        current = season_doc(now)
+        if not seasons_collection.find_one({"_id": current["_id"]}, {"_id": 1}):
+            previous = seasons_collection.find_one({}, {"rewards": 1}, sort=[("start_date", -1)])
+            current["rewards"] = (previous or {}).get("rewards") or DEFAULT_REWARDS
+            seasons_collection.update_one({"_id": current["_id"]}, {"$setOnInsert": current}, upsert=True)
+        return closed
+
+    def close(self, season_id: str, now: datetime = None) -> bool:
+        from pymongo import ReturnDocument
+
+        now = now or datetime.now(timezone.utc)
+        season = seasons_collection.find_one_and_update(
+            {"_id": season_id, "active": True},
+            {"$set": {"active": False, "status": "closing", "closing_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if season is None:
+            return False                    # closed by another worker
+        self._finalize(season, now)
+        return True
+
+    def _finalize(self, season: dict, now: datetime):
+        from pymongo import ReplaceOne
+
+        season_id, rewards = season["_id"], season.get("rewards") or DEFAULT_REWARDS
+        start, end = datetime.fromisoformat(season["start_date"]), datetime.fromisoformat(season["end_date"])
+        cursor = trades_collection.aggregate(standings_pipeline(start, end), allowDiskUse=True, batchSize=STANDINGS_BATCH)
+        top, batch, rank = [], [], 0
+        for row in cursor:
+            rank += 1
+            doc = standing(season_id, rank, row, rewards)
+            batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            if rank <= FROZEN_RANKS:
+                top.append(doc)
+            if len(batch) >= STANDINGS_BATCH:
+                season_standings_collection.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            season_standings_collection.bulk_write(batch, ordered=False)
+
+        self._reward(season_id, top, now)
+        seasons_collection.update_one({"_id": season_id}, {"$set": {
+            "status": "closed",
+            "participants": rank,
+            "final_leaderboard": [{k: v for k, v in doc.items() if k not in ("_id", "season_id")} for doc in top],
+            "closed_at": now
+        }})
+
+    def _reward(self, season_id: str, top: list, now: datetime):
+        from utils.achievements import achievement_service
+        from utils.xp import xp_service
+
+        rewarded = [doc for doc in top if doc.get("reward")]
+        xp_service.credit([
+            {"user_id": doc["user_id"], "amount": doc["reward"]["xp_bonus"], "source": "season", "ref": doc["_id"]}
+            for doc in rewarded if doc["reward"].get("xp_bonus")
+        ])
+        insert_new(user_badges_collection, [{
+            "_id": doc["_id"], "user_id": doc["user_id"], "badge": doc["reward"]["badge"], "title": doc["reward"].get("title"),
+            "season_id": season_id, "rank": doc["rank"], "awarded_at": now
+        } for doc in rewarded if doc["reward"].get("badge")])
+        achievement_service.award(TOP10_ACHIEVEMENT, [doc["user_id"] for doc in top if doc["rank"] <= 10])
+
+season_service = SeasonService()
@@ -0,0 +1,139 @@
+"""
+Activity streaks - maintained on write.
+
+Qualifying domain events mark the user's local day (users.timezone) as
+active (the timezone is cached ZONE_TTL seconds, so a change made on any
+worker applies within that delay). The first event of a day costs one
+conditional pipeline update on
+streaks_collection: the streak goes on from yesterday or restarts at 1
+after a gap, and the day's bit is set in a per-month bitmap
+(`months.YYYY-MM`, bit d-1 for day d). Later events of the same day are
+dropped in memory; after a restart the update itself is a no-op for a day
+already counted.
+
+sweep() resets the streaks broken since (last active day before yesterday
+in the user's timezone) with one bulk write of an update_many per
+timezone. It runs every hour on the scheduler (SWEEP_CRON), so each
+timezone is swept right after its own midnight; reads also treat a broken
+streak as 0 until then.
+"""
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from utils.database import streaks_collection
+
+STREAK_EVENTS = (
+    "trade_created", "trade_closed", "setup_analyzed", "coaching_received", "briefing_viewed",
+    "post_created", "comment_created", "backtest_completed"
+)
+SWEEP_CRON = "1 * * * *"
+ZONE_TTL = 60               # seconds a user's timezone is cached
+
+def local_date(ts: float, tz: str) -> date:
+    return datetime.fromtimestamp(ts, ZoneInfo(tz)).date()
+
+def month_days(bitmap: int) -> list:
+    """Days of the month set in a bitmap"""
+    return [d + 1 for d in range(31) if bitmap >> d & 1]
+
+def effective_streak(doc: dict, today: date) -> int:
+    """Current streak, 0 once a day has been missed (before the sweep ran)"""
+    if not doc or doc.get("last_day", 0) < today.toordinal() - 1:
+        return 0
+    return doc.get("current_streak", 0)
+
+def streak_update(user_id: str, day: date, tz: str, now: datetime) -> list:
+    """Pipeline update marking `day` active; a no-op for a day already counted"""
+    today = day.toordinal()
+    month = f"months.{day:%Y-%m}"
+    bit = 1 << (day.day - 1)
+    bitmap = {"$ifNull": [f"${month}", 0]}
+    counted = {"$gte": [{"$ifNull": ["$last_day", 0]}, today]}
+    return [
+        {"$set": {
+            "user_id": user_id,
+            "timezone": tz,
+            "current_streak": {"$switch": {
+                "branches": [
+                    {"case": counted, "then": "$current_streak"},
+                    {"case": {"$eq": ["$last_day", today - 1]}, "then": {"$add": ["$current_streak", 1]}}
+                ],
+                "default": 1
+            }},
+            month: {"$cond": [
+                {"$eq": [{"$mod": [{"$floor": {"$divide": [bitmap, bit]}}, 2]}, 1]}, bitmap, {"$add": [bitmap, bit]}
+            ]},
+            "last_activity": {"$cond": [counted, "$last_activity", now]}
+        }},
+        {"$set": {
+            "longest_streak": {"$max": [{"$ifNull": ["$longest_streak", 0]}, "$current_streak"]},
+            "last_day": {"$max": [{"$ifNull": ["$last_day", 0]}, today]}
+        }}
+    ]
+
+class StreakTracker:
+    def __init__(self):
+        self.zones = {}                 # user_id -> (timezone, read at)
+        self.seen = {}                  # user_id -> last local day ordinal written
+        self.updates = 0
+
+    def zone(self, user_id: str) -> str:
+        cached = self.zones.get(user_id)
+        now = time.monotonic()
+        if cached is None or now - cached[1] > ZONE_TTL:
+            from utils.pnl_rollup import user_timezone
+
+            tz = user_timezone(user_id)
+            if cached is not None and cached[0] != tz:
+                self.seen.pop(user_id, None)        # days of the old timezone
+            self.zones[user_id] = cached = (tz, now)
+        return cached[0]
+
+    def handle(self, event: dict):
+        if event["type"] not in STREAK_EVENTS:
+            return
+        user_id = event["user_id"]
+        tz = self.zone(user_id)
+        day = local_date(event["ts"], tz)
+        if self.seen.get(user_id, 0) >= day.toordinal():
+            return
+        from pymongo import ReturnDocument
+        from utils.events import emit
+
+        doc = streaks_collection.find_one_and_update(
+            {"_id": user_id}, streak_update(user_id, day, tz, datetime.now(timezone.utc)),
+            projection={"current_streak": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        self.updates += 1
+        if not emit(user_id, "streak_updated", streak=doc["current_streak"]):
+            raise RuntimeError("streak_updated not recorded")      # delivered again: the update is a no-op
+        self.seen[user_id] = day.toordinal()
+
+    def sweep(self, now: float = None) -> int:
+        """Reset broken streaks of every timezone in one bulk write"""
+        from pymongo import UpdateMany
+
+        now = now or time.time()
+        requests = []
+        for tz in streaks_collection.distinct("timezone", {"current_streak": {"$gt": 0}}):
+            yesterday = local_date(now, tz) - timedelta(days=1)
+            requests.append(UpdateMany(
+                {"timezone": tz, "current_streak": {"$gt": 0}, "last_day": {"$lt": yesterday.toordinal()}},
+                {"$set": {"current_streak": 0}}
+            ))
+        if not requests:
+            return 0
+        return streaks_collection.bulk_write(requests, ordered=False).modified_count
+
+    def start(self):
+        from utils.events import subscribe
+
+        subscribe(self.handle, name="streaks")
+
+    async def stop(self):
+        from utils.events import unsubscribe
+
+        unsubscribe(self.handle)
+
+streak_tracker = StreakTracker()
@@ -0,0 +1,271 @@
+"""
+Bulk trade import - streaming parser for broker CSV / MT4 / MT5 statements
+"""
+import hashlib
+import os
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from pymongo.errors import BulkWriteError
+
+from utils.database import trades_collection, trade_imports_collection
+
+CHUNK_ROWS = 20000
+INSERT_BATCH_SIZE = 5000
+MAX_ERROR_SAMPLES = 20
+
+# Broker column name -> trade field, per statement format.
+# MT4/MT5 statements repeat "Price"/"Time" for the close leg, which pandas
+# reads as "price.1"/"time.1".
+COLUMN_MAPS = {
+    "csv": {
+        "id": "broker_trade_id",
+        "broker_trade_id": "broker_trade_id",
+        "symbol": "symbol",
+        "direction": "direction",
+        "entry_price": "entry_price",
+        "exit_price": "exit_price",
+        "stop_loss": "stop_loss",
+        "take_profit": "take_profit",
+        "position_size": "position_size",
+        "notes": "notes",
+        "setup_type": "setup_type",
+        "emotions": "emotions",
+        "followed_plan": "followed_plan",
+        "entry_time": "opened_at",
+        "exit_time": "closed_at",
+        "created_at": "opened_at",
+    },
+    "mt4": {
+        "ticket": "broker_trade_id",
+        "open time": "opened_at",
+        "type": "direction",
+        "size": "position_size",
+        "item": "symbol",
+        "price": "entry_price",
+        "s / l": "stop_loss",
+        "t / p": "take_profit",
+        "close time": "closed_at",
+        "price.1": "exit_price",
+    },
+    "mt5": {
+        "position": "broker_trade_id",
+        "time": "opened_at",
+        "symbol": "symbol",
+        "type": "direction",
+        "volume": "position_size",
+        "price": "entry_price",
+        "s / l": "stop_loss",
+        "t / p": "take_profit",
+        "time.1": "closed_at",
+        "price.1": "exit_price",
+    },
+}
+
+DATE_FORMATS = {"csv": "ISO8601", "mt4": "%Y.%m.%d %H:%M:%S", "mt5": "%Y.%m.%d %H:%M:%S"}
+
+DIRECTIONS = {"long": "LONG", "buy": "LONG", "short": "SHORT", "sell": "SHORT"}
+
+NUMERIC_FIELDS = ["entry_price", "exit_price", "stop_loss", "take_profit", "position_size"]
+
+def sniff_delimiter(path: str) -> str:
+    """Pick the delimiter used by the header line (broker exports vary)"""
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+    return max((",", ";", "\t"), key=header.count)
+
+def detect_format(columns) -> str:
+    """Guess the statement format from its header row"""
+    names = {str(c).strip().lower() for c in columns}
+    if {"ticket", "item", "open time"} <= names:
+        return "mt4"
+    if {"position", "symbol", "volume"} <= names:
+        return "mt5"
+    return "csv"
+
+def _normalize_chunk(chunk: pd.DataFrame, fmt: str) -> pd.DataFrame:
+    """Rename broker columns to trade fields and coerce types, vectorized"""
+    chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+    mapping = {k: v for k, v in COLUMN_MAPS[fmt].items() if k in chunk.columns}
+    df = chunk[list(mapping)].rename(columns=mapping)
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    for field in NUMERIC_FIELDS:
+        df[field] = pd.to_numeric(df[field], errors="coerce") if field in df else np.nan
+    for field in ("opened_at", "closed_at"):
+        if field in df:
+            df[field] = pd.to_datetime(df[field], format=DATE_FORMATS[fmt], errors="coerce", utc=True)
+    df["symbol"] = df["symbol"].astype("string").str.strip().str.upper() if "symbol" in df else pd.NA
+    df["direction"] = (
+        df["direction"].astype("string").str.strip().str.lower().map(DIRECTIONS)
+        if "direction" in df else pd.NA
+    )
+    return df
+
+def _compute_pnl(df: pd.DataFrame):
+    """Vectorized equivalent of trades.calculate_pnl and the pnl_percent formula"""
+    entry = df["entry_price"].to_numpy(dtype=float)
+    exit_ = df["exit_price"].to_numpy(dtype=float)
+    size = df["position_size"].to_numpy(dtype=float)
+    sign = np.where(df["direction"].to_numpy(dtype=object) == "LONG", 1.0, -1.0)
+    diff = (exit_ - entry) * sign
+    return diff * size, np.round(diff / entry * 100, 2)
+
+def _row_hash(row: dict) -> str:
+    """Stable id for rows without a broker ticket, so re-imports dedup.
+    Hashes the row as read: a missing time stays None (not the import time)"""
+    key = "|".join(str(row.get(f)) for f in ("symbol", "direction", "opened_at", "entry_price", "exit_price", "position_size"))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def _column(df: pd.DataFrame, field: str) -> list:
+    """Column as a Python list with missing values as None, ready for BSON"""
+    if field not in df:
+        return [None] * len(df)
+    series = df[field]
+    values = series.to_numpy(dtype=object)
+    values[series.isna().to_numpy()] = None
+    return values.tolist()
+
+def _float_column(values: np.ndarray, mask: np.ndarray) -> list:
+    """Float array as a list, None where mask is False"""
+    out = values.astype(object)
+    out[~mask] = None
+    return out.tolist()
+
+def build_trades(df: pd.DataFrame, user_id: str, import_id: str):
+    """Validate a normalized chunk and build trade documents.
+
+    Returns (documents, errors) where errors are (row_number, reason) tuples.
+    """
+    invalid = (
+        df["symbol"].isna() | (df["symbol"] == "")
+        | df["direction"].isna()
+        | ~(df["entry_price"] > 0)
+        | ~(df["position_size"] > 0)
+    )
+    errors = [(int(i), "symbol, direction, entry_price et position_size requis") for i in df.index[invalid]]
+    df = df[~invalid]
+    if df.empty:
+        return [], errors
+
+    now = datetime.now(timezone.utc)
+    pnl, pnl_percent = _compute_pnl(df)
+    closed = ~np.isnan(df["exit_price"].to_numpy(dtype=float))
+
+    entry_times = _column(df, "opened_at")
+    exit_times = _column(df, "closed_at")
+    opened_at = [value or now for value in entry_times]
+
+    columns = {
+        field: _column(df, field)
+        for field in ("symbol", "direction", "entry_price", "exit_price", "stop_loss",
+                      "take_profit", "position_size", "notes", "setup_type", "emotions",
+                      "followed_plan", "broker_trade_id")
+    }
+    columns["followed_plan"] = [
+        v.strip().lower() in ("true", "1", "oui", "yes") if isinstance(v, str) else v
+        for v in columns["followed_plan"]
+    ]
+    pnl_values = _float_column(pnl, closed)
+    pnl_percent_values = _float_column(pnl_percent, closed)
+    statuses = np.where(closed, "closed", "open").tolist()
+
+    documents = []
+    for i in range(len(df)):
+        row = {field: values[i] for field, values in columns.items()}
+        broker_id = row["broker_trade_id"]
+        documents.append({
+            "_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "broker_trade_id": str(broker_id) if broker_id is not None else _row_hash({**row, "opened_at": entry_times[i]}),
+            "import_id": import_id,
+            "symbol": row["symbol"],
+            "direction": row["direction"],
+            "entry_price": row["entry_price"],
+            "exit_price": row["exit_price"],
+            "stop_loss": row["stop_loss"],
+            "take_profit": row["take_profit"],
+            "position_size": row["position_size"],
+            "pnl": pnl_values[i],
+            "pnl_percent": pnl_percent_values[i],
+            "status": statuses[i],
+            "notes": row["notes"],
+            "screenshot_base64": None,
+            "setup_type": row["setup_type"],
+            "emotions": row["emotions"],
+            "followed_plan": row["followed_plan"],
+            "entry_time": entry_times[i],
+            "exit_time": exit_times[i] if closed[i] else None,
+            "created_at": opened_at[i],
+            "updated_at": now
+        })
+    return documents, errors
+
+def _insert_batch(documents: list) -> tuple:
+    """Unordered insert; duplicate broker ids are counted, not fatal"""
+    try:
+        result = trades_collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        details = e.details
+        duplicates = sum(1 for err in details.get("writeErrors", []) if err.get("code") == 11000)
+        other = [err for err in details.get("writeErrors", []) if err.get("code") != 11000]
+        if other:
+            raise
+        return details.get("nInserted", 0), duplicates
+
+def run_import(import_id: str, user_id: str, path: str, fmt: str = None, on_complete=None):
+    """Parse and insert a statement file, recording progress on the import job.
+
+    `on_complete(user_id)` runs once after the last batch when trades were added.
+    """
+    counters = {"rows_read": 0, "imported": 0, "duplicates": 0, "errors": 0}
+    error_samples = []
+    trade_imports_collection.update_one(
+        {"_id": import_id},
+        {"$set": {"status": "processing", "started_at": datetime.now(timezone.utc)}}
+    )
+    try:
+        reader = pd.read_csv(
+            path, chunksize=CHUNK_ROWS, sep=sniff_delimiter(path), dtype=str,
+            skipinitialspace=True, encoding="utf-8-sig", encoding_errors="replace"
+        )
+        for chunk in reader:
+            if fmt is None:
+                fmt = detect_format(chunk.columns)
+            counters["rows_read"] += len(chunk)
+            documents, errors = build_trades(_normalize_chunk(chunk, fmt), user_id, import_id)
+
+            counters["errors"] += len(errors)
+            for row, reason in errors[:MAX_ERROR_SAMPLES - len(error_samples)]:
+                # Chunk indexes are file-wide; +2 for the header line and 1-based numbering
+                error_samples.append({"row": row + 2, "error": reason})
+
+            for start in range(0, len(documents), INSERT_BATCH_SIZE):
+                inserted, duplicates = _insert_batch(documents[start:start + INSERT_BATCH_SIZE])
+                counters["imported"] += inserted
+                counters["duplicates"] += duplicates
+
+            trade_imports_collection.update_one(
+                {"_id": import_id},
+                {"$set": {**counters, "format": fmt, "error_samples": error_samples}}
+            )
+
+        if counters["imported"] and on_complete:
+            on_complete(user_id)
+        trade_imports_collection.update_one(
+            {"_id": import_id},
+            {"$set": {**counters, "status": "completed", "finished_at": datetime.now(timezone.utc)}}
+        )
+    except Exception as e:
+        trade_imports_collection.update_one(
+            {"_id": import_id},
+            {"$set": {**counters, "status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)}}
+        )
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
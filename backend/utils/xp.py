@@ -0,0 +1,230 @@
+"""
+XP ledger - every XP change is an append-only entry in xp_transactions;
+users.xp and users.level are its running total.
+
+credit() writes the ledger entries first (deterministic _id per source
+award, so a replayed award is dropped), then one bulk `$inc` per user and
+a conditional level raise ({"level": {"$lt": new}}): a level-up fires
+notify_level_up exactly once even under concurrent credits.
+
+Activity XP (trades recorded, setups analyzed, posts...) is frequent and
+small: it is coalesced in memory and credited once per user per flush as a
+single "activity" entry, within a daily cap.
+
+reconcile() (on the scheduler, RECONCILE_CRON) streams the ledger totals
+per user (one $group aggregation) and repairs the users whose xp or level
+drifted, with a compare-and-set on the value read so a concurrent credit
+is never overwritten.
+"""
+import asyncio
+import os
+import threading
+import uuid
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from utils.database import insert_new, users_collection, xp_transactions_collection
+
+ACTIVITY_XP = {
+    "trade_created": 10,
+    "trade_closed": 5,
+    "setup_analyzed": 10,
+    "backtest_completed": 20,
+    "post_created": 5,
+    "comment_created": 2,
+}
+ACTIVITY_DAILY_CAP = 300
+FLUSH_INTERVAL = 1.0
+RECONCILE_CRON = "17 */6 * * *"
+RECONCILE_BATCH = 1000
+
+class LevelCurve:
+    """XP to go from level L to L+1 is base * L ** exponent (1000, 2000, 3000... by default)"""
+
+    def __init__(self, base: int = 1000, exponent: float = 1.0, max_level: int = 100):
+        self.thresholds = [0]           # thresholds[i]: total XP to reach level i + 1
+        for level in range(1, max_level):
+            self.thresholds.append(self.thresholds[-1] + round(base * level ** exponent))
+
+    @classmethod
+    def from_env(cls) -> "LevelCurve":
+        return cls(
+            int(os.environ.get("LEVEL_BASE_XP", 1000)),
+            float(os.environ.get("LEVEL_EXPONENT", 1.0)),
+            int(os.environ.get("LEVEL_MAX", 100))
+        )
+
+    @property
+    def max_level(self) -> int:
+        return len(self.thresholds)
+
+    def level_for(self, xp: int) -> int:
+        return max(1, bisect_right(self.thresholds, xp))
+
+    def progress(self, xp: int) -> dict:
+        level = self.level_for(xp)
+        start = self.thresholds[level - 1]
+        if level >= self.max_level:
+            return {"level": level, "xp_into_level": xp - start, "xp_for_next_level": 0, "xp_progress_percent": 100.0}
+        span = self.thresholds[level] - start
+        return {
+            "level": level, "xp_into_level": xp - start, "xp_for_next_level": span,
+            "xp_progress_percent": round((xp - start) / span * 100, 1)
+        }
+
+class XpService:
+    """Credits the ledger, coalesces activity XP and sends level-ups"""
+
+    def __init__(self, curve: LevelCurve = None, flush_interval: float = FLUSH_INTERVAL):
+        self.curve = curve or LevelCurve.from_env()
+        self.flush_interval = flush_interval
+        self.activity = defaultdict(lambda: defaultdict(int))   # user_id -> event type -> count
+        self.pending = defaultdict(int)                         # user_id -> activity XP not credited
+        self.refs = {}                                          # user_id -> ledger ref of the pending credit
+        self.granted = {}                                       # user_id -> activity XP granted today
+        self.day = None
+        self.level_ups = []                                     # (user_id, level) to notify
+        self._retry = []
+        self._lock = threading.Lock()                           # events are handled on the dispatch thread
+        self._tasks = []
+
+    def handle(self, event: dict):
+        amount = ACTIVITY_XP.get(event["type"])
+        if not amount:
+            return
+        day = datetime.fromtimestamp(event["ts"], timezone.utc).date()
+        user_id = event["user_id"]
+        with self._lock:
+            if day != self.day:
+                self.day, self.granted = day, {}
+            granted = self.granted.get(user_id, 0)
+            amount = min(amount, ACTIVITY_DAILY_CAP - granted)
+            if amount <= 0:
+                return
+            self.granted[user_id] = granted + amount
+            self.pending[user_id] += amount
+            self.activity[user_id][event["type"]] += 1
+            if user_id not in self.refs:
+                # The first event's id: a batch delivered again credits nothing twice
+                self.refs[user_id] = str(event.get("_id") or uuid.uuid4().hex)
+
+    def take_activity(self) -> list:
+        """Coalesced activity credits since the last call"""
+        with self._lock:
+            pending, self.pending = self.pending, defaultdict(int)
+            activity, self.activity = self.activity, defaultdict(lambda: defaultdict(int))
+            refs, self.refs = self.refs, {}
+        return [{"user_id": u, "amount": n, "source": "activity", "ref": refs[u], "events": dict(activity[u])}
+                for u, n in pending.items()]
+
+    def credit(self, entries: list) -> list:
+        """Append entries {"user_id", "amount", "source", "ref"?, ...} to the
+        ledger and apply them to the users; returns the entries applied
+        (those whose source/ref was already in the ledger are skipped)"""
+        if not entries:
+            return []
+        from pymongo import UpdateOne
+
+        now = datetime.now(timezone.utc)
+        docs = [{
+            **entry,
+            "_id": f"{entry['source']}:{entry['ref']}" if entry.get("ref") else str(uuid.uuid4()),
+            "created_at": now
+        } for entry in entries]
+        duplicates = insert_new(xp_transactions_collection, docs)
+        applied = [entry for i, entry in enumerate(entries) if i not in duplicates]
+
+        totals = defaultdict(int)
+        for entry in applied:
+            totals[entry["user_id"]] += entry["amount"]
+        totals = {u: n for u, n in totals.items() if n}
+        if not totals:
+            return applied
+        users_collection.bulk_write([UpdateOne({"_id": u}, {"$inc": {"xp": n}}) for u, n in totals.items()], ordered=False)
+        for user in users_collection.find({"_id": {"$in": list(totals)}}, {"xp": 1, "level": 1}):
+            level = self.curve.level_for(user.get("xp", 0))
+            if level > user.get("level", 1):
+                result = users_collection.update_one(
+                    {"_id": user["_id"], "$or": [{"level": {"$lt": level}}, {"level": {"$exists": False}}]},
+                    {"$set": {"level": level}}
+                )
+                if result.modified_count:
+                    self.level_ups.append((user["_id"], level))
+        return applied
+
+    def reconcile(self, fix: bool = True, batch_size: int = RECONCILE_BATCH) -> dict:
+        """Compare users.xp / level with the ledger totals, streamed user by user"""
+        report = {"users": 0, "mismatched": 0, "fixed": 0}
+        cursor = xp_transactions_collection.aggregate(
+            [{"$group": {"_id": "$user_id", "xp": {"$sum": "$amount"}}}],
+            allowDiskUse=True, batchSize=batch_size
+        )
+        chunk = []
+        for row in cursor:
+            chunk.append(row)
+            if len(chunk) >= batch_size:
+                self._reconcile_chunk(chunk, fix, report)
+                chunk = []
+        if chunk:
+            self._reconcile_chunk(chunk, fix, report)
+        return report
+
+    def _reconcile_chunk(self, rows: list, fix: bool, report: dict):
+        from pymongo import UpdateOne
+
+        users = {u["_id"]: u for u in users_collection.find({"_id": {"$in": [r["_id"] for r in rows]}}, {"xp": 1, "level": 1})}
+        repairs = []
+        for row in rows:
+            user = users.get(row["_id"])
+            if user is None:
+                continue                        # deleted account
+            report["users"] += 1
+            xp, level = user.get("xp", 0), user.get("level", 1)
+            expected = self.curve.level_for(row["xp"])
+            if xp != row["xp"] or level != expected:
+                report["mismatched"] += 1
+                repairs.append(UpdateOne({"_id": row["_id"], "xp": xp}, {"$set": {"xp": row["xp"], "level": expected}}))
+        if fix and repairs:
+            report["fixed"] += users_collection.bulk_write(repairs, ordered=False).modified_count
+
+    async def flush(self):
+        # A failed batch is retried as is: entries already in the ledger are skipped
+        entries, self._retry = self._retry + self.take_activity(), []
+        try:
+            self.credit(entries)
+        except Exception:
+            self._retry = entries
+            raise
+        finally:
+            if self.level_ups:
+                from routers.push import notify_level_up
+
+                level_ups, self.level_ups = self.level_ups, []
+                for user_id, level in level_ups:
+                    await notify_level_up(user_id, level)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print("⚠️ XP flush failed:", repr(e))
+
+    def start(self):
+        from utils.events import subscribe
+
+        subscribe(self.handle, name="xp", flush=self.flush)
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+
+    async def stop(self):
+        from utils.events import unsubscribe
+
+        unsubscribe(self.handle)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+xp_service = XpService()